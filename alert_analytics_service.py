@@ -0,0 +1,377 @@
+"""
+Alert Analytics Service for Falco Vanguard
+
+Columnar view of recent alerts for the analytics and threat-intelligence
+dashboards. The alerts of a window are loaded from SQLite once into NumPy
+arrays - alert IDs, epoch seconds and dictionary-encoded rule, priority and
+source codes - and every statistic (frequencies, distributions, timelines,
+diversity, risk factors) is computed with vectorized operations on them.
+
+One frame is cached per process and covers the longest window requested so
+far; shorter windows are masks over it. After ANALYTICS_FRAME_TTL_SECONDS the
+frame is refreshed incrementally (alerts are append-only by ID, so only new
+rows are read and rows that fell out of the window are dropped), and it is
+reloaded in full every ANALYTICS_FRAME_RELOAD_SECONDS to pick up deletions.
+
+Timestamps are converted to epoch seconds. Values without a UTC offset are
+UTC, which is what SQLite's CURRENT_TIMESTAMP stores; explicit offsets are
+applied. Daily timelines use UTC calendar days.
+
+The per-rule history of threat predictions reads the frame when it holds
+enough matching alerts, and otherwise falls back to SQLite without a time
+bound, so rare rules still see their older alerts.
+"""
+
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Hashable, List, Optional
+
+import numpy as np
+
+from config_service import default_db_path
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ('rule', 'priority', 'source')
+
+# Weights of the threat-intelligence risk score (keys are matched as stored)
+PRIORITY_WEIGHTS = {'critical': 10, 'error': 8, 'warning': 6, 'notice': 4, 'info': 2}
+DEFAULT_PRIORITY_WEIGHT = 5
+
+_OFFSET_RE = re.compile(r'(Z|[+-]\d{2}:?\d{2})$')
+
+
+def parse_timestamps(values: List[Optional[str]]) -> np.ndarray:
+    """
+    Epoch seconds of ISO 8601 or SQLite timestamps.
+
+    Values without a UTC offset are UTC (SQLite CURRENT_TIMESTAMP); 'Z' and
+    +HH:MM offsets are applied. Fractional seconds are dropped; values that
+    cannot be parsed become NaN.
+    """
+    text = np.array([value[:19] if isinstance(value, str) else 'NaT' for value in values])
+    try:
+        stamps = text.astype('datetime64[s]')
+    except ValueError:
+        stamps = np.array([_parse_timestamp(value) for value in text], dtype='datetime64[s]')
+    epoch = stamps.astype(np.int64).astype(np.float64)
+    epoch[np.isnat(stamps)] = np.nan
+    # numpy reads naive values as UTC; only the rare values with an offset need a correction
+    for index, value in enumerate(values):
+        if isinstance(value, str) and len(value) > 19:
+            epoch[index] -= _utc_offset(value)
+    return epoch
+
+
+def _utc_offset(value: str) -> float:
+    """Seconds east of UTC of a timestamp's offset suffix (0 without one)."""
+    match = _OFFSET_RE.search(value[19:])
+    if match is None or match.group(1) == 'Z':
+        return 0.0
+    offset = match.group(1).replace(':', '')
+    seconds = int(offset[1:3]) * 3600 + int(offset[3:5]) * 60
+    return float(-seconds if offset[0] == '-' else seconds)
+
+
+def _parse_timestamp(value: str) -> np.datetime64:
+    try:
+        return np.datetime64(value, 's')
+    except ValueError:
+        return np.datetime64('NaT', 's')
+
+
+def now_epoch() -> float:
+    """Current time in the epoch scale of parse_timestamps()."""
+    return time.time()
+
+
+class Dictionary:
+    """Maps the distinct values of a column to dense integer codes."""
+
+    def __init__(self):
+        self.values: List[Hashable] = []
+        self._codes: Dict[Hashable, int] = {}
+
+    def encode(self, values: List[Hashable]) -> np.ndarray:
+        """Codes of ``values``, adding values not seen before."""
+        codes = self._codes
+
+        def code(value):
+            found = codes.get(value)
+            if found is None:
+                found = codes[value] = len(self.values)
+                self.values.append(value)
+            return found
+
+        return np.fromiter(map(code, values), dtype=np.int32, count=len(values))
+
+    def lookup(self, value: Hashable) -> int:
+        """Code of ``value``, or -1 if it never occurred."""
+        return self._codes.get(value, -1)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class AlertFrame:
+    """Immutable columnar alerts: IDs, epoch seconds and dictionary codes per column."""
+
+    def __init__(self, ids: np.ndarray, epoch: np.ndarray, codes: Dict[str, np.ndarray],
+                 dictionaries: Dict[str, Dictionary], span_days: int, loaded_at: float):
+        self.ids = ids
+        self.epoch = epoch
+        self.codes = codes
+        self.dictionaries = dictionaries
+        self.span_days = span_days
+        self.loaded_at = loaded_at
+        self.max_id = int(ids[-1]) if len(ids) else 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def since(self, epoch: float) -> np.ndarray:
+        """Mask of alerts after ``epoch``."""
+        return self.epoch > epoch
+
+    def value_counts(self, column: str, mask: Optional[np.ndarray] = None,
+                     top: Optional[int] = None) -> Dict[Any, int]:
+        """Counts per value of a column (most frequent first, None values left out)."""
+        codes = self.codes[column] if mask is None else self.codes[column][mask]
+        values = self.dictionaries[column].values
+        counts = np.bincount(codes, minlength=len(values))
+        order = np.argsort(-counts, kind='stable')
+        result = {}
+        for code in order[:np.count_nonzero(counts)].tolist():
+            if values[code] is None:
+                continue
+            result[values[code]] = int(counts[code])
+            if top is not None and len(result) >= top:
+                break
+        return result
+
+    def distinct(self, column: str, mask: Optional[np.ndarray] = None) -> int:
+        """Number of distinct values of a column."""
+        codes = self.codes[column] if mask is None else self.codes[column][mask]
+        return int(np.count_nonzero(np.bincount(codes, minlength=len(self.dictionaries[column]))))
+
+    def daily_counts(self, mask: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Alerts per UTC calendar day, oldest first."""
+        epoch = self.epoch if mask is None else self.epoch[mask]
+        days, counts = np.unique((epoch[~np.isnan(epoch)] // 86400).astype(np.int64), return_counts=True)
+        dates = days.astype('datetime64[D]').astype(str)
+        return [{"date": date, "count": count} for date, count in zip(dates.tolist(), counts.tolist())]
+
+    def matching_codes(self, column: str, text: str) -> np.ndarray:
+        """Codes of the values of a column equal to or containing ``text`` (case-insensitive, like SQL LIKE)."""
+        text = text.lower()
+        return np.array([code for code, value in enumerate(self.dictionaries[column].values)
+                         if value is not None and text in value.lower()], dtype=np.int32)
+
+
+class AlertAnalytics:
+    """Cached alert frame plus the vectorized statistics of the dashboards."""
+
+    def __init__(self, db_path: Optional[str] = None, ttl: Optional[float] = None,
+                 reload_seconds: Optional[float] = None, history_days: Optional[int] = None):
+        """
+        Initialize the analytics service.
+
+        Args:
+            db_path: SQLite database path (defaults to the app's DB_PATH resolution)
+            ttl: Seconds before the frame is refreshed with new alerts (ANALYTICS_FRAME_TTL_SECONDS)
+            reload_seconds: Seconds between full reloads (ANALYTICS_FRAME_RELOAD_SECONDS)
+            history_days: Days the frame always covers, so threat predictions share it (ANALYTICS_HISTORY_DAYS)
+        """
+        self.db_path = db_path or default_db_path()
+        self.ttl = ttl if ttl is not None else float(os.getenv('ANALYTICS_FRAME_TTL_SECONDS', '15'))
+        self.reload_seconds = reload_seconds or float(os.getenv('ANALYTICS_FRAME_RELOAD_SECONDS', '600'))
+        self.history_days = history_days or int(os.getenv('ANALYTICS_HISTORY_DAYS', '90'))
+        self._frame: Optional[AlertFrame] = None
+        self._reloaded_at = 0.0
+        self._lock = threading.Lock()
+        self._counters = {'full_loads': 0, 'refreshes': 0, 'hits': 0, 'history_reads': 0}
+
+    # --- Frame ---
+
+    def frame(self, days: int) -> AlertFrame:
+        """Frame covering at least the last ``days`` days, loaded or refreshed as needed."""
+        frame = self._frame
+        now = time.time()
+        if frame is not None and frame.span_days >= days and now - frame.loaded_at < self.ttl:
+            self._counters['hits'] += 1
+            return frame
+        with self._lock:
+            frame = self._frame
+            now = time.time()
+            if frame is not None and frame.span_days >= days and now - frame.loaded_at < self.ttl:
+                return frame
+            if frame is None or frame.span_days < days or now - self._reloaded_at >= self.reload_seconds:
+                # The first load also covers the rule history, so threat predictions share the frame
+                frame = self._load(max(days, self.history_days, frame.span_days if frame is not None else 0))
+                self._reloaded_at = now
+                self._counters['full_loads'] += 1
+            else:
+                frame = self._refresh(frame)
+                self._counters['refreshes'] += 1
+            self._frame = frame
+            return frame
+
+    def _read(self, query: str, params: tuple) -> Dict[str, list]:
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            rows = conn.execute(query, params).fetchall()
+        finally:
+            conn.close()
+        columns = list(zip(*rows)) if rows else [(), (), (), (), ()]
+        return dict(zip(('id', 'timestamp') + COLUMNS, columns))
+
+    def _load(self, span_days: int) -> AlertFrame:
+        started = time.time()
+        # Whole days as a superset, trimmed exactly by epoch below
+        since = (datetime.now(timezone.utc) - timedelta(days=span_days + 1)).strftime('%Y-%m-%d')
+        data = self._read(f"SELECT id, timestamp, {', '.join(COLUMNS)} FROM alerts "
+                          f"WHERE timestamp >= ? ORDER BY id", (since,))
+        dictionaries = {column: Dictionary() for column in COLUMNS}
+        frame = self._build(data, dictionaries, span_days)
+        logger.debug(f"📊 ANALYTICS: Loaded {len(frame)} alerts ({span_days} days) "
+                     f"in {(time.time() - started) * 1000:.0f}ms")
+        return frame
+
+    def _refresh(self, frame: AlertFrame) -> AlertFrame:
+        data = self._read(f"SELECT id, timestamp, {', '.join(COLUMNS)} FROM alerts "
+                          f"WHERE id > ? ORDER BY id", (frame.max_id,))
+        new = self._build(data, frame.dictionaries, frame.span_days)
+        ids = np.concatenate([frame.ids, new.ids])
+        epoch = np.concatenate([frame.epoch, new.epoch])
+        codes = {column: np.concatenate([frame.codes[column], new.codes[column]]) for column in COLUMNS}
+        keep = epoch > now_epoch() - frame.span_days * 86400
+        return AlertFrame(ids[keep], epoch[keep], {column: values[keep] for column, values in codes.items()},
+                          frame.dictionaries, frame.span_days, time.time())
+
+    def _read_rule_history(self, rule: str, limit: int) -> AlertFrame:
+        """The ``limit`` most recent alerts of a rule (or rules containing its name), without a time bound."""
+        data = self._read(f"SELECT id, timestamp, {', '.join(COLUMNS)} FROM alerts "
+                          f"WHERE rule = ? OR rule LIKE ? ORDER BY timestamp DESC LIMIT ?", (rule, f'%{rule}%', limit))
+        dictionaries = {column: Dictionary() for column in COLUMNS}
+        ids = np.fromiter(data['id'], dtype=np.int64, count=len(data['id']))
+        codes = {column: dictionaries[column].encode(list(data[column])) for column in COLUMNS}
+        return AlertFrame(ids, parse_timestamps(list(data['timestamp'])), codes, dictionaries, 0, time.time())
+
+    def _build(self, data: Dict[str, list], dictionaries: Dict[str, Dictionary], span_days: int) -> AlertFrame:
+        ids = np.fromiter(data['id'], dtype=np.int64, count=len(data['id']))
+        epoch = parse_timestamps(list(data['timestamp']))
+        codes = {column: dictionaries[column].encode(list(data[column])) for column in COLUMNS}
+        keep = epoch > now_epoch() - span_days * 86400
+        return AlertFrame(ids[keep], epoch[keep], {column: values[keep] for column, values in codes.items()},
+                          dictionaries, span_days, time.time())
+
+    # --- Statistics ---
+
+    def alert_patterns(self, days: int = 30) -> Dict[str, Any]:
+        """
+        Rule frequencies, priority and source distributions and the daily timeline.
+
+        Args:
+            days: Number of days to analyze
+
+        Returns:
+            Dictionary with pattern analysis
+        """
+        frame = self.frame(days)
+        mask = frame.since(now_epoch() - days * 86400)
+        total = int(np.count_nonzero(mask))
+        if not total:
+            return {
+                "total_alerts": 0,
+                "rule_frequency": {},
+                "priority_distribution": {},
+                "source_distribution": {},
+                "timeline": [],
+                "message": "No alerts found for the specified time period"
+            }
+        return {
+            "total_alerts": total,
+            "rule_frequency": frame.value_counts('rule', mask, top=10),
+            "priority_distribution": frame.value_counts('priority', mask),
+            "source_distribution": frame.value_counts('source', mask),
+            "timeline": frame.daily_counts(mask),
+            "analysis_period_days": days,
+            "message": f"Analyzed {total} alerts over {days} days"
+        }
+
+    def rule_history(self, rule: str, limit: int = 50, recent_days: int = 7) -> Dict[str, Any]:
+        """
+        Statistics of the most recent alerts of a rule (or rules containing its name).
+
+        Args:
+            rule: Rule name
+            limit: Most recent matching alerts considered
+            recent_days: Window of ``recent_count``
+
+        Returns:
+            Dictionary with incidents, avg_priority_weight, recent_count, source_diversity
+            and priority_trend (most common priorities with counts)
+        """
+        frame = self.frame(self.history_days)
+        matching = np.nonzero(np.isin(frame.codes['rule'], frame.matching_codes('rule', rule)))[0]
+        if len(matching) < limit:
+            # The rule's history may reach back past the frame: read it from SQLite instead
+            frame = self._read_rule_history(rule, limit)
+            matching = np.arange(len(frame))
+            self._counters['history_reads'] += 1
+        elif len(matching) > limit:
+            # Most recent by timestamp, like ORDER BY timestamp DESC LIMIT
+            epoch = np.nan_to_num(frame.epoch[matching], nan=-np.inf)
+            matching = matching[np.argpartition(-epoch, limit - 1)[:limit]]
+        if not len(matching):
+            return {'incidents': 0}
+
+        priorities = frame.dictionaries['priority']
+        weights = np.array([PRIORITY_WEIGHTS.get(value, DEFAULT_PRIORITY_WEIGHT) for value in priorities.values],
+                           dtype=np.float64)
+        priority_codes = frame.codes['priority'][matching]
+        priority_counts = np.bincount(priority_codes, minlength=len(priorities))
+        trend = np.argsort(-priority_counts, kind='stable')[:min(3, np.count_nonzero(priority_counts))]
+        return {
+            'incidents': int(len(matching)),
+            'avg_priority_weight': float(weights[priority_codes].mean()),
+            'recent_count': int(np.count_nonzero(frame.epoch[matching] >= now_epoch() - recent_days * 86400)),
+            'source_diversity': frame.distinct('source', matching),
+            'priority_trend': [(priorities.values[code], int(priority_counts[code])) for code in trend.tolist()]
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get frame size and cache counters."""
+        frame = self._frame
+        return {
+            'alerts': len(frame) if frame is not None else 0,
+            'span_days': frame.span_days if frame is not None else 0,
+            'age_seconds': round(time.time() - frame.loaded_at, 1) if frame is not None else None,
+            'dictionary_sizes': {column: len(frame.dictionaries[column]) for column in COLUMNS} if frame else {},
+            'ttl_seconds': self.ttl,
+            'counters': dict(self._counters)
+        }
+
+
+# Global instance, created on first use
+alert_analytics = None
+_alert_analytics_lock = threading.Lock()
+
+def get_alert_analytics(db_path: Optional[str] = None) -> AlertAnalytics:
+    """
+    Get the global alert analytics instance.
+
+    Args:
+        db_path: Alerts database; only used when the instance is created
+    """
+    global alert_analytics
+    if alert_analytics is None:
+        with _alert_analytics_lock:
+            if alert_analytics is None:
+                alert_analytics = AlertAnalytics(db_path)
+    return alert_analytics
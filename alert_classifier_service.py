@@ -0,0 +1,219 @@
+"""
+Alert Classifier Service for Falco Vanguard
+
+Keyword matching for real-time alert classification. All keyword lists used
+by the classification helpers (threat categories, escalation and persistence
+indicators, technical tags, false-positive hints) are compiled once into an
+Aho-Corasick automaton, stored as a dense byte transition table. One linear
+pass over an alert's UTF-8 encoded rule and output finds every occurrence of
+every keyword, overlapping ones included, and the classification helpers share
+that single match result instead of rescanning the text per keyword list.
+
+Matches keep their position, so helpers that only look at the rule or only at
+the output get exactly the keywords they would have found by searching those
+fields alone. scripts/benchmark_alert_classification.py compares the cost with the
+per-keyword substring scans.
+"""
+
+import threading
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# Threat categories and their keywords (searched in rule and output)
+THREAT_CATEGORIES = {
+    'malware': ['virus', 'trojan', 'ransomware', 'backdoor', 'rootkit'],
+    'intrusion': ['breakout', 'escape', 'privilege', 'escalation', 'unauthorized'],
+    'data_exfiltration': ['copy', 'transfer', 'upload', 'download', 'exfil'],
+    'reconnaissance': ['scan', 'probe', 'enumerate', 'discover', 'fingerprint'],
+    'lateral_movement': ['pivot', 'hop', 'spread', 'move', 'traverse'],
+    'persistence': ['cron', 'service', 'startup', 'autostart', 'schedule'],
+    'evasion': ['hide', 'mask', 'obfuscate', 'encode', 'stealth'],
+    'misconfiguration': ['permission', 'config', 'setting', 'policy', 'rule']
+}
+
+# Indicators that raise the severity when found in the output
+ESCALATION_INDICATORS = ['root', 'admin', 'privilege', 'escalat', 'sudo', 'su ']
+PERSISTENCE_INDICATORS = ['cron', 'service', 'startup', 'registry', 'autostart']
+
+# Technical tags and the keywords that set them (searched in rule and output)
+TECH_TAGS = {
+    'tech:container': ['container'],
+    'tech:network': ['network', 'connection'],
+    'tech:filesystem': ['file', 'filesystem'],
+    'tech:process': ['process', 'execution']
+}
+
+# Rule name hints of likely false positives
+FALSE_POSITIVE_INDICATORS = ['informational', 'notice', 'debug']
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton over bytes: all occurrences of all patterns in one pass."""
+
+    def __init__(self, patterns: Iterable[str]):
+        """
+        Compile the automaton.
+
+        Args:
+            patterns: Keywords to find (matched case-sensitively; pass lowercase keywords
+                      and lowercase text for case-insensitive matching)
+        """
+        self.patterns: List[str] = list(dict.fromkeys(pattern for pattern in patterns if pattern))
+        self.lengths = [len(pattern.encode()) for pattern in self.patterns]
+
+        # Trie
+        goto: List[Dict[int, int]] = [{}]
+        outputs: List[List[int]] = [[]]
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for byte in pattern.encode():
+                if byte not in goto[state]:
+                    goto.append({})
+                    outputs.append([])
+                    goto[state][byte] = len(goto) - 1
+                state = goto[state][byte]
+            outputs[state].append(index)
+
+        # Failure links folded into a dense transition table, breadth first
+        table = [[0] * 256 for _ in goto]
+        fail = [0] * len(goto)
+        for byte, state in goto[0].items():
+            table[0][byte] = state
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            row, fallback = table[state], table[fail[state]]
+            outputs[state] = outputs[state] + outputs[fail[state]]
+            for byte in range(256):
+                child = goto[state].get(byte)
+                if child is None:
+                    row[byte] = fallback[byte]
+                else:
+                    row[byte] = child
+                    fail[child] = fallback[byte]
+                    queue.append(child)
+
+        self._table: List[Tuple[int, ...]] = [tuple(row) for row in table]
+        self._outputs: List[Tuple[int, ...]] = [tuple(output) for output in outputs]
+        self._accepting: List[bool] = [bool(output) for output in outputs]
+
+    @property
+    def states(self) -> int:
+        """Number of automaton states."""
+        return len(self._table)
+
+    def scan(self, data: bytes) -> List[Tuple[int, int]]:
+        """
+        Find all pattern occurrences.
+
+        Returns:
+            (start offset, pattern index) of every occurrence, in order of their end
+        """
+        table, accepting, outputs, lengths = self._table, self._accepting, self._outputs, self.lengths
+        hits = []
+        state = 0
+        for position, byte in enumerate(data):
+            state = table[state][byte]
+            if accepting[state]:
+                for index in outputs[state]:
+                    hits.append((position + 1 - lengths[index], index))
+        return hits
+
+
+class AlertKeywordMatch:
+    """Keywords found in an alert: anywhere, in the rule only and in the output only."""
+
+    __slots__ = ('text', 'rule', 'output')
+
+    def __init__(self, text: Set[str], rule: Set[str], output: Set[str]):
+        self.text = text
+        self.rule = rule
+        self.output = output
+
+
+class AlertClassifier:
+    """Keyword-driven classification helpers sharing one automaton match per alert."""
+
+    def __init__(self, threat_categories: Dict[str, List[str]]):
+        """
+        Compile the classifier.
+
+        Args:
+            threat_categories: Category name -> lowercase keywords
+        """
+        self.threat_categories = threat_categories
+        self._category_sets = [(category, frozenset(keywords)) for category, keywords in threat_categories.items()]
+        self._tag_sets = [(tag, frozenset(keywords)) for tag, keywords in TECH_TAGS.items()]
+        self._escalation = frozenset(ESCALATION_INDICATORS)
+        self._persistence = frozenset(PERSISTENCE_INDICATORS)
+        self._false_positive = frozenset(FALSE_POSITIVE_INDICATORS)
+        keywords = [keyword for category_keywords in threat_categories.values() for keyword in category_keywords]
+        keywords += ESCALATION_INDICATORS + PERSISTENCE_INDICATORS + FALSE_POSITIVE_INDICATORS
+        keywords += [keyword for tag_keywords in TECH_TAGS.values() for keyword in tag_keywords]
+        self.automaton = KeywordAutomaton(keywords)
+
+    def match(self, alert_data: Dict[str, Any]) -> AlertKeywordMatch:
+        """Match all keywords against ``"<rule> <output>"`` (lowercased) in one pass."""
+        rule = str(alert_data.get('rule') or '').lower().encode()
+        output = str(alert_data.get('output') or '').lower().encode()
+        output_start = len(rule) + 1
+        patterns, lengths = self.automaton.patterns, self.automaton.lengths
+        text, rule_hits, output_hits = set(), set(), set()
+        for start, index in self.automaton.scan(rule + b' ' + output):
+            keyword = patterns[index]
+            text.add(keyword)
+            if start >= output_start:
+                output_hits.add(keyword)
+            elif start + lengths[index] <= len(rule):
+                rule_hits.add(keyword)
+        return AlertKeywordMatch(text, rule_hits, output_hits)
+
+    def threat_category(self, match: AlertKeywordMatch) -> str:
+        """Category with the most distinct keywords in the alert (first listed wins ties), or 'unknown'."""
+        best, best_score = "unknown", 0
+        for category, keywords in self._category_sets:
+            score = len(keywords & match.text)
+            if score > best_score:
+                best, best_score = category, score
+        return best
+
+    def severity_adjustment(self, match: AlertKeywordMatch) -> float:
+        """Escalation (+0.2 each) and persistence (+0.15 each) indicators in the output, capped at 1.0."""
+        adjustment = 0.0
+        # Added one by one, so the float result is the same as summing per indicator
+        for _ in range(len(self._escalation & match.output)):
+            adjustment += 0.2
+        for _ in range(len(self._persistence & match.output)):
+            adjustment += 0.15
+        return min(1.0, adjustment)
+
+    def tech_tags(self, match: AlertKeywordMatch) -> List[str]:
+        """Technical tags whose keywords occur in the alert."""
+        return [tag for tag, keywords in self._tag_sets if not keywords.isdisjoint(match.text)]
+
+    def false_positive_hint(self, match: AlertKeywordMatch) -> bool:
+        """Whether the rule name suggests an informational alert."""
+        return not self._false_positive.isdisjoint(match.rule)
+
+    def category_keywords(self, match: AlertKeywordMatch, category: str) -> List[str]:
+        """Keywords of ``category`` found in the alert, in list order."""
+        return [keyword for keyword in self.threat_categories.get(category, ()) if keyword in match.text]
+
+
+# Global instance, created on first use
+alert_classifier: Optional[AlertClassifier] = None
+_alert_classifier_lock = threading.Lock()
+
+def get_alert_classifier(threat_categories: Dict[str, List[str]]) -> AlertClassifier:
+    """
+    Get the global alert classifier.
+
+    Args:
+        threat_categories: Category keywords; the classifier is recompiled if they change
+    """
+    global alert_classifier
+    if alert_classifier is None or alert_classifier.threat_categories != threat_categories:
+        with _alert_classifier_lock:
+            if alert_classifier is None or alert_classifier.threat_categories != threat_categories:
+                alert_classifier = AlertClassifier(threat_categories)
+    return alert_classifier
@@ -0,0 +1,518 @@
+"""
+Alert Clustering Service for Falco Vanguard
+
+Groups alerts by content rather than by rule name. A clustering model is
+fitted in a child process (alert_clustering_worker), off the request path:
+
+- alerts of the last ALERT_CLUSTER_FIT_DAYS (at most ALERT_CLUSTER_MAX_FIT_ALERTS,
+  newest first) are read from SQLite in batches and embedded as hashed TF-IDF
+  vectors (the embedding of the local vector index, ALERT_CLUSTER_DIM buckets)
+  into a temporary memory-mapped matrix,
+- MiniBatchKMeans clusters the unit-length vectors (ALERT_CLUSTER_COUNT
+  clusters, by default about sqrt(n / 2)); alerts whose cosine similarity to
+  their centroid is below ALERT_CLUSTER_MIN_SIMILARITY are noise,
+- near-duplicate variants are counted per cluster on a sample of its alerts.
+
+Centroids, IDF weights and per-alert assignments are persisted in SQLite
+(alert_cluster_models, alert_clusters, alert_cluster_assignments). New alerts
+are assigned to the nearest centroid at ingest time, and the model is re-fitted
+every ALERT_CLUSTER_REFIT_SECONDS or once ALERT_CLUSTER_REFIT_FRACTION of its
+size has been assigned incrementally. A fit running longer than
+ALERT_CLUSTER_FIT_TIMEOUT_SECONDS is killed and retried later. Cluster reports only read the
+precomputed assignments; until the first model exists they return a pending
+result right away.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from alert_clustering_worker import FIT_BATCH_SIZE, parse_fields, run_fit
+from config_service import default_db_path
+from vector_index_service import alert_tokens, hashed_counts
+
+logger = logging.getLogger(__name__)
+
+# Assignments buffered at ingest before they are written
+ASSIGN_FLUSH_SIZE = 200
+ASSIGN_FLUSH_SECONDS = 1.0
+# Incremental assignments never trigger a re-fit below this many
+MIN_REFIT_ALERTS = 1000
+# Delay before a failed or empty fit is retried
+FIT_RETRY_SECONDS = 300.0
+
+
+def utc_cutoff(days: float) -> str:
+    """Timestamp ``days`` ago in the UTC 'YYYY-MM-DD HH:MM:SS' format CURRENT_TIMESTAMP stores."""
+    return (datetime.now(timezone.utc) - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class AlertClusteringService:
+    """Persisted alert clusters: worker-process fits plus incremental assignment at ingest."""
+
+    def __init__(self, db_path: Optional[str] = None, dim: Optional[int] = None,
+                 n_clusters: Optional[int] = None, fit_days: Optional[int] = None,
+                 refit_seconds: Optional[float] = None):
+        """
+        Initialize the service.
+
+        Args:
+            db_path: SQLite database path (defaults to the app's DB_PATH resolution)
+            dim: Hashed vector dimensions (ALERT_CLUSTER_DIM)
+            n_clusters: Clusters per fit, 0 for automatic (ALERT_CLUSTER_COUNT)
+            fit_days: Days of alerts each fit covers (ALERT_CLUSTER_FIT_DAYS)
+            refit_seconds: Longest time between fits (ALERT_CLUSTER_REFIT_SECONDS)
+        """
+        self.db_path = db_path or default_db_path()
+        self.enabled = os.getenv('ALERT_CLUSTERING_ENABLED', 'true').lower() == 'true'
+        self.dim = dim or int(os.getenv('ALERT_CLUSTER_DIM', '256'))
+        self.n_clusters = n_clusters if n_clusters is not None else int(os.getenv('ALERT_CLUSTER_COUNT', '0'))
+        self.fit_days = fit_days or int(os.getenv('ALERT_CLUSTER_FIT_DAYS', '90'))
+        self.max_fit_alerts = int(os.getenv('ALERT_CLUSTER_MAX_FIT_ALERTS', '200000'))
+        self.refit_seconds = refit_seconds or float(os.getenv('ALERT_CLUSTER_REFIT_SECONDS', '3600'))
+        self.refit_fraction = float(os.getenv('ALERT_CLUSTER_REFIT_FRACTION', '0.2'))
+        self.fit_timeout = float(os.getenv('ALERT_CLUSTER_FIT_TIMEOUT_SECONDS', '1800'))
+        self.min_similarity = float(os.getenv('ALERT_CLUSTER_MIN_SIMILARITY', '0.3'))
+
+        self._model: Optional[Dict[str, Any]] = None
+        self._model_loaded = False
+        self._fit_finished = threading.Event()
+        self._tables_ready = False
+        self._lock = threading.Lock()
+        self._wake_event = threading.Event()
+        self._refit_requested = False
+        self._pending: List[Tuple[int, int, float, int]] = []
+        self._assigned_since_fit = 0
+        self._started_pid: Optional[int] = None
+        self._fitting = False
+        self._last_fit: Dict[str, Any] = {}
+        self._last_error: Optional[str] = None
+        self._counters = {'fits': 0, 'fit_failures': 0, 'assigned': 0, 'noise': 0, 'caught_up': 0}
+
+    # --- Storage ---
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        if not self._tables_ready:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS alert_cluster_models (
+                    version INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_at REAL NOT NULL,
+                    alerts INTEGER NOT NULL,
+                    dim INTEGER NOT NULL,
+                    n_clusters INTEGER NOT NULL,
+                    max_alert_id INTEGER NOT NULL,
+                    idf BLOB NOT NULL,
+                    inertia REAL,
+                    duration_seconds REAL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS alert_clusters (
+                    model_version INTEGER NOT NULL,
+                    cluster_id INTEGER NOT NULL,
+                    centroid BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    variants TEXT,
+                    PRIMARY KEY (model_version, cluster_id)
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS alert_cluster_assignments (
+                    alert_id INTEGER PRIMARY KEY,
+                    cluster_id INTEGER NOT NULL,
+                    similarity REAL NOT NULL,
+                    model_version INTEGER NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_alert_cluster_assignments_cluster '
+                         'ON alert_cluster_assignments (cluster_id)')
+            conn.commit()
+            self._tables_ready = True
+        return conn
+
+    def model(self) -> Optional[Dict[str, Any]]:
+        """The current model (version, centroids, IDF weights), loaded from SQLite on first use."""
+        if self._model_loaded:
+            return self._model
+        with self._lock:
+            if not self._model_loaded:
+                conn = self._connect()
+                try:
+                    self._model = self._read_model(conn)
+                finally:
+                    conn.close()
+                self._model_loaded = True
+        return self._model
+
+    def _read_model(self, conn: sqlite3.Connection) -> Optional[Dict[str, Any]]:
+        row = conn.execute('SELECT version, created_at, alerts, dim, n_clusters, max_alert_id, idf '
+                           'FROM alert_cluster_models ORDER BY version DESC LIMIT 1').fetchone()
+        if row is None:
+            return None
+        version, created_at, alerts, dim, n_clusters, max_alert_id, idf = row
+        centroids = np.zeros((n_clusters, dim), dtype=np.float32)
+        sizes = np.zeros(n_clusters, dtype=np.int64)
+        for cluster_id, centroid, size in conn.execute(
+                'SELECT cluster_id, centroid, size FROM alert_clusters WHERE model_version = ?', (version,)):
+            centroids[cluster_id] = np.frombuffer(centroid, dtype=np.float32)
+            sizes[cluster_id] = size
+        return {'version': version, 'created_at': created_at, 'alerts': alerts, 'dim': dim,
+                'n_clusters': n_clusters, 'max_alert_id': max_alert_id,
+                'idf': np.frombuffer(idf, dtype=np.float32), 'centroids': centroids, 'sizes': sizes}
+
+    def _store_fit(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Replace the model and all assignments with a fit result, in one transaction."""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                'INSERT INTO alert_cluster_models (created_at, alerts, dim, n_clusters, max_alert_id, idf, '
+                'inertia, duration_seconds) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (time.time(), result['alerts'], result['dim'], result['n_clusters'], result['max_alert_id'],
+                 result['idf'].tobytes(), result['inertia'], result['duration_seconds']))
+            version = cursor.lastrowid
+            sizes = np.bincount(result['labels'][result['labels'] >= 0], minlength=result['n_clusters'])
+            conn.executemany(
+                'INSERT INTO alert_clusters (model_version, cluster_id, centroid, size, variants) VALUES (?, ?, ?, ?, ?)',
+                [(version, cluster_id, result['centroids'][cluster_id].tobytes(), int(sizes[cluster_id]),
+                  json.dumps(result['variants'].get(cluster_id, {})))
+                 for cluster_id in range(result['n_clusters'])])
+            conn.execute('DELETE FROM alert_cluster_assignments')
+            conn.executemany(
+                'INSERT INTO alert_cluster_assignments (alert_id, cluster_id, similarity, model_version) '
+                'VALUES (?, ?, ?, ?)',
+                zip(result['ids'].tolist(), result['labels'].tolist(),
+                    result['similarities'].astype(float).tolist(), [version] * len(result['ids'])))
+            conn.execute('DELETE FROM alert_clusters WHERE model_version < ?', (version,))
+            conn.execute('DELETE FROM alert_cluster_models WHERE version < ?', (version,))
+            conn.commit()
+            return self._read_model(conn)
+        finally:
+            conn.close()
+
+    # --- Assignment ---
+
+    def _nearest(self, model: Dict[str, Any], rule: str, output: str,
+                 fields: Dict[str, Any]) -> Tuple[int, float]:
+        vector = hashed_counts(alert_tokens(rule, output, fields), model['dim'])
+        vector = np.sign(vector) * np.log1p(np.abs(vector)) * model['idf']
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return -1, 0.0
+        scores = model['centroids'] @ (vector / norm)
+        cluster_id = int(scores.argmax())
+        similarity = float(scores[cluster_id])
+        return (cluster_id if similarity >= self.min_similarity else -1), similarity
+
+    def assign(self, alert_id: Optional[int], alert: Dict[str, Any]) -> Optional[int]:
+        """
+        Assign a newly stored alert to the nearest cluster of the current model.
+
+        The assignment is written by the background thread shortly after.
+
+        Args:
+            alert_id: Alert row ID
+            alert: Alert payload (rule, output, output_fields)
+
+        Returns:
+            Cluster ID (-1 for noise), or None if there is no model yet
+        """
+        if not self.enabled or alert_id is None:
+            return None
+        self.start()
+        model = self.model()
+        if model is None:
+            return None
+        cluster_id, similarity = self._nearest(model, alert.get('rule', '') or '', alert.get('output', '') or '',
+                                               parse_fields(alert.get('output_fields')))
+        with self._lock:
+            self._pending.append((alert_id, cluster_id, similarity, model['version']))
+            self._counters['assigned'] += 1
+            if cluster_id < 0:
+                self._counters['noise'] += 1
+            self._assigned_since_fit += 1
+            if self._assigned_since_fit >= max(MIN_REFIT_ALERTS, self.refit_fraction * model['alerts']):
+                self._refit_requested = True
+            # The first pending assignment starts the flush timer
+            if len(self._pending) in (1, ASSIGN_FLUSH_SIZE) or self._refit_requested:
+                self._wake_event.set()
+        return cluster_id
+
+    def _flush_assignments(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, []
+        version = self._model['version'] if self._model else None
+        # Assignments made with a replaced model were redone by the catch-up after the fit
+        rows = [row for row in pending if row[3] == version]
+        if not rows:
+            return
+        conn = self._connect()
+        try:
+            conn.executemany('INSERT OR REPLACE INTO alert_cluster_assignments '
+                             '(alert_id, cluster_id, similarity, model_version) VALUES (?, ?, ?, ?)', rows)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _catch_up(self, model: Dict[str, Any]) -> int:
+        """Assign alerts stored after the fit snapshot was taken."""
+        assigned = 0
+        last_id = model['max_alert_id']
+        conn = self._connect()
+        try:
+            while True:
+                rows = conn.execute('SELECT id, rule, output, fields FROM alerts WHERE id > ? ORDER BY id LIMIT ?',
+                                    (last_id, FIT_BATCH_SIZE)).fetchall()
+                if not rows:
+                    break
+                assignments = []
+                for alert_id, rule, output, fields in rows:
+                    cluster_id, similarity = self._nearest(model, rule or '', output or '', parse_fields(fields))
+                    assignments.append((alert_id, cluster_id, similarity, model['version']))
+                conn.executemany('INSERT OR REPLACE INTO alert_cluster_assignments '
+                                 '(alert_id, cluster_id, similarity, model_version) VALUES (?, ?, ?, ?)', assignments)
+                conn.commit()
+                assigned += len(rows)
+                last_id = rows[-1][0]
+        finally:
+            conn.close()
+        return assigned
+
+    # --- Fitting ---
+
+    def start(self) -> None:
+        """Start the background thread that flushes assignments and schedules fits (idempotent per process)."""
+        if not self.enabled or self._started_pid == os.getpid():
+            return
+        with self._lock:
+            if self._started_pid != os.getpid():
+                self._started_pid = os.getpid()
+                threading.Thread(target=self._run, name='alert-clustering', daemon=True).start()
+
+    def request_refit(self) -> None:
+        """Ask the background thread to re-fit the model as soon as possible."""
+        self.start()
+        with self._lock:
+            self._refit_requested = True
+            self._fit_finished.clear()
+        self._wake_event.set()
+
+    def wait_for_model(self, timeout: float) -> bool:
+        """Wait for the requested fit to finish; True if a model exists."""
+        if self.model() is None:
+            self._fit_finished.wait(timeout)
+        return self.model() is not None
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self._flush_assignments()
+                model = self.model()
+                retry_at = self._last_fit.get('at', 0) + FIT_RETRY_SECONDS
+                due_at = retry_at if model is None else max(model['created_at'] + self.refit_seconds, retry_at)
+                due = due_at - time.time()
+                if due <= 0 or self._refit_requested:
+                    self._refit()
+                    continue
+            except Exception as e:
+                self._last_error = str(e)
+                logger.error(f"❌ ALERT_CLUSTERS: {e}")
+                due = 60.0
+            self._wake_event.wait(min(ASSIGN_FLUSH_SECONDS if self._pending else due, due))
+            self._wake_event.clear()
+
+    def _refit(self) -> None:
+        with self._lock:
+            self._refit_requested = False
+            self._fitting = True
+        since = utc_cutoff(self.fit_days)
+        try:
+            # A fresh interpreter, not a fork: the app process runs many threads
+            result = run_fit(timeout=self.fit_timeout, db_path=self.db_path, since=since, dim=self.dim, n_clusters=self.n_clusters,
+                             max_alerts=self.max_fit_alerts, min_similarity=self.min_similarity)
+            if result.get('alerts', 0) < 2:
+                logger.debug("ALERT_CLUSTERS: Not enough alerts to cluster yet")
+                with self._lock:
+                    self._last_fit = {'at': time.time(), 'alerts': result.get('alerts', 0)}
+                return
+            model = self._store_fit(result)
+            with self._lock:
+                self._model = model
+                self._model_loaded = True
+                self._assigned_since_fit = 0
+                self._counters['fits'] += 1
+            caught_up = self._catch_up(model)
+            with self._lock:
+                self._counters['caught_up'] += caught_up
+                self._last_fit = {'at': model['created_at'], 'alerts': result['alerts'],
+                                  'n_clusters': result['n_clusters'], 'caught_up': caught_up,
+                                  'duration_seconds': result['duration_seconds']}
+            logger.info(f"🧩 ALERT_CLUSTERS: Fitted {result['n_clusters']} clusters on {result['alerts']} alerts "
+                        f"in {result['duration_seconds']}s (model v{model['version']})")
+        except Exception as e:
+            self._fit_failed(e)
+        finally:
+            self._fitting = False
+            self._fit_finished.set()
+
+    def _fit_failed(self, error: Exception) -> None:
+        self._last_error = str(error)
+        self._counters['fit_failures'] += 1
+        self._last_fit = {'at': time.time(), 'error': str(error)}
+        logger.error(f"❌ ALERT_CLUSTERS: Fit failed: {error}")
+
+    # --- Reports ---
+
+    def get_clusters(self, days: int = 30, min_cluster_size: int = 2) -> Dict[str, Any]:
+        """
+        Report clusters over the last ``days`` from the precomputed assignments.
+
+        Never waits for a fit: without a model the result is empty and marked
+        ``pending`` while the background thread fits the first one.
+
+        Args:
+            days: Number of days to analyze
+            min_cluster_size: Minimum alerts per cluster in the window
+
+        Returns:
+            Dictionary with clustering results
+        """
+        if self.model() is None and self.enabled:
+            # The background thread fits a first model as soon as it runs
+            self.start()
+        self._flush_assignments()
+        model = self.model()
+        cutoff = utc_cutoff(days)
+
+        conn = self._connect()
+        try:
+            total_alerts = conn.execute('SELECT COUNT(*) FROM alerts WHERE timestamp > ?', (cutoff,)).fetchone()[0]
+            if model is None or not total_alerts:
+                return {
+                    "clusters": [],
+                    "total_alerts": total_alerts,
+                    "clustered_alerts": 0,
+                    "noise_alerts": total_alerts,
+                    "cluster_count": 0,
+                    "clustering_efficiency": 0.0,
+                    "pending": model is None and self.enabled and bool(total_alerts),
+                    "message": ("No alerts found for the specified time period" if not total_alerts
+                                else "Clustering model is being fitted, check back shortly" if self.enabled
+                                else "Alert clustering is disabled")
+                }
+
+            window = ('FROM alert_cluster_assignments c JOIN alerts a ON a.id = c.alert_id '
+                      'WHERE a.timestamp > ? AND c.cluster_id >= 0')
+            sizes = {row[0]: row[1:] for row in conn.execute(
+                f'SELECT c.cluster_id, COUNT(*), COUNT(DISTINCT a.source), COUNT(DISTINCT a.rule), AVG(c.similarity) '
+                f'{window} GROUP BY c.cluster_id HAVING COUNT(*) >= ?', (cutoff, min_cluster_size))}
+            common = {column: self._most_common(conn, window, column, cutoff) for column in ('rule', 'source', 'priority')}
+            samples = defaultdict(list)
+            for row in conn.execute(
+                    f'SELECT cluster_id, rule, priority, output, source, timestamp FROM ('
+                    f'SELECT c.cluster_id, a.rule, a.priority, a.output, a.source, a.timestamp, '
+                    f'ROW_NUMBER() OVER (PARTITION BY c.cluster_id ORDER BY a.id DESC) AS position '
+                    f'{window}) WHERE position <= 5', (cutoff,)):
+                samples[row[0]].append(dict(zip(('rule', 'priority', 'output', 'source', 'timestamp'), row[1:])))
+            variants = {cluster_id: json.loads(value or '{}') for cluster_id, value in conn.execute(
+                'SELECT cluster_id, variants FROM alert_clusters WHERE model_version = ?', (model['version'],))}
+        finally:
+            conn.close()
+
+        clusters = []
+        for cluster_id, (size, source_count, rule_count, cohesion) in sizes.items():
+            rule = common['rule'].get(cluster_id)
+            description = f"Cluster of {size} alerts from rule '{rule}'"
+            if rule_count > 1:
+                description += f" and {rule_count - 1} related rule{'s' if rule_count > 2 else ''}"
+            cluster_variants = variants.get(cluster_id, {})
+            clusters.append({
+                "cluster_id": cluster_id,
+                "size": size,
+                "common_rule": rule,
+                "common_source": common['source'].get(cluster_id),
+                "common_priority": common['priority'].get(cluster_id),
+                "rule_count": rule_count,
+                "description": description,
+                "alerts": samples.get(cluster_id, []),
+                "diversity_score": source_count / size,
+                "cohesion": round(cohesion, 3),
+                "variant_count": cluster_variants.get('variant_count', 0),
+                "variants": cluster_variants.get('variants', [])
+            })
+        clusters.sort(key=lambda x: x['size'], reverse=True)
+
+        clustered_count = sum(cluster['size'] for cluster in clusters)
+        return {
+            "clusters": clusters,
+            "total_alerts": total_alerts,
+            "clustered_alerts": clustered_count,
+            "noise_alerts": total_alerts - clustered_count,
+            "cluster_count": len(clusters),
+            "clustering_efficiency": clustered_count / total_alerts,
+            "pending": False,
+            "model": {"version": model['version'], "fitted_at": datetime.fromtimestamp(model['created_at']).isoformat(),
+                      "alerts": model['alerts'], "n_clusters": model['n_clusters']},
+            "message": f"Successfully clustered {clustered_count} out of {total_alerts} alerts"
+        }
+
+    @staticmethod
+    def _most_common(conn: sqlite3.Connection, window: str, column: str, cutoff: str) -> Dict[int, Any]:
+        """Most frequent value of an alerts column per cluster."""
+        best: Dict[int, Tuple[int, Any]] = {}
+        for cluster_id, value, count in conn.execute(
+                f'SELECT c.cluster_id, a.{column}, COUNT(*) {window} GROUP BY c.cluster_id, a.{column}', (cutoff,)):
+            if cluster_id not in best or count > best[cluster_id][0]:
+                best[cluster_id] = (count, value)
+        return {cluster_id: value for cluster_id, (_, value) in best.items()}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get model, fit and assignment statistics."""
+        model = self.model() if self.enabled else None
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'model': None if model is None else {
+                    'version': model['version'],
+                    'fitted_at': datetime.fromtimestamp(model['created_at']).isoformat(),
+                    'alerts': model['alerts'],
+                    'n_clusters': model['n_clusters'],
+                    'dim': model['dim']
+                },
+                'fitting': self._fitting,
+                'assigned_since_fit': self._assigned_since_fit,
+                'pending_assignments': len(self._pending),
+                'refit_seconds': self.refit_seconds,
+                'refit_fraction': self.refit_fraction,
+                'min_similarity': self.min_similarity,
+                'last_fit': dict(self._last_fit),
+                'last_error': self._last_error,
+                'counters': dict(self._counters)
+            }
+
+
+# Global instance, created on first use
+alert_clustering_service = None
+_alert_clustering_service_lock = threading.Lock()
+
+def get_alert_clustering_service(db_path: Optional[str] = None) -> AlertClusteringService:
+    """
+    Get the global alert clustering service.
+
+    Args:
+        db_path: Alerts database; only used when the service is created
+    """
+    global alert_clustering_service
+    if alert_clustering_service is None:
+        with _alert_clustering_service_lock:
+            if alert_clustering_service is None:
+                alert_clustering_service = AlertClusteringService(db_path)
+    return alert_clustering_service
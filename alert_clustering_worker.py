@@ -0,0 +1,203 @@
+"""
+Alert Clustering Worker for Falco Vanguard
+
+Fits the alert clustering model in a child process. The service runs this
+file as a script (``python alert_clustering_worker.py <params> <output>``)
+rather than through a multiprocessing pool: a spawned multiprocessing child
+first re-imports the parent's ``__main__``, which would load the whole app
+(and its Flask setup) for every worker. As a script the child imports only
+this module and what the fit needs, and hands the result back as a pickle
+in a temporary file.
+"""
+
+import os
+import sys
+import json
+import time
+import pickle
+import sqlite3
+import tempfile
+import subprocess
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from vector_index_service import alert_tokens, embed_tokens
+
+# Alert rows read from SQLite per step, while fitting and when catching up
+FIT_BATCH_SIZE = 5000
+# Alerts per cluster grouped into near-duplicate variants while fitting
+VARIANT_SAMPLE_SIZE = 500
+MAX_AUTO_CLUSTERS = 64
+
+
+def parse_fields(fields: Any) -> Dict[str, Any]:
+    if isinstance(fields, dict):
+        return fields
+    try:
+        parsed = json.loads(fields) if fields else {}
+    except (TypeError, ValueError):
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+def _unit_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def auto_cluster_count(alerts: int) -> int:
+    """Default number of clusters for ``alerts`` alerts (about sqrt(n / 2), between 2 and 64)."""
+    return int(min(max(round((alerts / 2) ** 0.5), 2), MAX_AUTO_CLUSTERS, alerts))
+
+
+def fit_alert_clusters(db_path: str, since: str, dim: int, n_clusters: int, max_alerts: int,
+                       min_similarity: float, seed: int = 0) -> Dict[str, Any]:
+    """
+    Fit the clustering model. Runs in the worker process.
+
+    Args:
+        db_path: Alerts database
+        since: Only alerts with a timestamp after this are clustered
+        dim: Hashed vector dimensions
+        n_clusters: Number of clusters, 0 for auto_cluster_count()
+        max_alerts: Most recent alerts clustered at most
+        min_similarity: Alerts less similar than this to their centroid are noise (-1)
+        seed: Random seed of the k-means initialization
+
+    Returns:
+        Model (idf, centroids), assignments (ids, labels, similarities) and variants per cluster
+    """
+    from sklearn.cluster import MiniBatchKMeans
+    from near_duplicate_service import group_near_duplicates
+
+    started = time.time()
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        count = conn.execute('SELECT COUNT(*) FROM alerts WHERE timestamp > ?', (since,)).fetchone()[0]
+        count = min(count, max_alerts)
+        if count < 2:
+            return {'alerts': count}
+
+        ids = np.empty(count, dtype=np.int64)
+        doc_freq = np.zeros(dim, dtype=np.float64)
+        with tempfile.TemporaryDirectory(prefix='alert-clusters-') as tmp_dir:
+            vectors = np.lib.format.open_memmap(os.path.join(tmp_dir, 'vectors.npy'), mode='w+',
+                                                dtype=np.float32, shape=(count, dim))
+            cursor = conn.execute('SELECT id, rule, output, fields FROM alerts WHERE timestamp > ? '
+                                  'ORDER BY id DESC LIMIT ?', (since, count))
+            rows = 0
+            while True:
+                batch = cursor.fetchmany(FIT_BATCH_SIZE)
+                if not batch:
+                    break
+                for offset, (alert_id, rule, output, fields) in enumerate(batch):
+                    ids[rows + offset] = alert_id
+                    vectors[rows + offset] = embed_tokens(
+                        alert_tokens(rule or '', output or '', parse_fields(fields)), dim)
+                doc_freq += np.count_nonzero(vectors[rows:rows + len(batch)], axis=0)
+                rows += len(batch)
+            count = rows
+            ids = ids[:count]
+            if count < 2:
+                return {'alerts': count}
+
+            idf = (np.log((1.0 + count) / (1.0 + doc_freq)) + 1.0).astype(np.float32)
+            for start in range(0, count, FIT_BATCH_SIZE):
+                vectors[start:start + FIT_BATCH_SIZE] = _unit_rows(vectors[start:start + FIT_BATCH_SIZE] * idf)
+
+            k = min(n_clusters or auto_cluster_count(count), count)
+            kmeans = MiniBatchKMeans(n_clusters=k, batch_size=min(4096, count), n_init=3,
+                                     random_state=seed)
+            kmeans.fit(vectors[:count])
+            centroids = _unit_rows(kmeans.cluster_centers_.astype(np.float32))
+
+            labels = np.empty(count, dtype=np.int32)
+            similarities = np.empty(count, dtype=np.float32)
+            for start in range(0, count, FIT_BATCH_SIZE):
+                scores = vectors[start:start + FIT_BATCH_SIZE] @ centroids.T
+                labels[start:start + FIT_BATCH_SIZE] = scores.argmax(axis=1)
+                similarities[start:start + FIT_BATCH_SIZE] = scores.max(axis=1)
+        labels[similarities < min_similarity] = -1
+
+        # Near-duplicate variants on the most recent alerts of each cluster
+        samples: Dict[int, List[int]] = defaultdict(list)
+        for alert_id, label in zip(ids.tolist(), labels.tolist()):
+            if label >= 0 and len(samples[label]) < VARIANT_SAMPLE_SIZE:
+                samples[label].append(alert_id)
+        variants = {}
+        for label, alert_ids in samples.items():
+            alerts = _load_alerts(conn, alert_ids)
+            groups = sorted(group_near_duplicates(alerts), key=len, reverse=True)
+            variants[label] = {
+                'variant_count': len(groups),
+                'variants': [{'size': len(group), 'sample': _public_alert(alerts[group[0]])} for group in groups[:5]]
+            }
+    finally:
+        conn.close()
+
+    return {
+        'alerts': count,
+        'dim': dim,
+        'n_clusters': k,
+        'idf': idf,
+        'centroids': centroids,
+        'ids': ids,
+        'labels': labels,
+        'similarities': similarities,
+        'max_alert_id': int(ids.max()),
+        'inertia': float(kmeans.inertia_),
+        'variants': variants,
+        'duration_seconds': round(time.time() - started, 2)
+    }
+
+
+def _load_alerts(conn: sqlite3.Connection, alert_ids: List[int]) -> List[Dict[str, Any]]:
+    alerts = []
+    for start in range(0, len(alert_ids), 500):
+        chunk = alert_ids[start:start + 500]
+        placeholders = ','.join('?' * len(chunk))
+        rows = conn.execute(f'SELECT id, rule, priority, output, source, timestamp, fields FROM alerts '
+                            f'WHERE id IN ({placeholders}) ORDER BY id DESC', chunk).fetchall()
+        for alert_id, rule, priority, output, source, timestamp, fields in rows:
+            alerts.append({'id': alert_id, 'rule': rule, 'priority': priority, 'output': output,
+                           'source': source, 'timestamp': timestamp, 'output_fields': parse_fields(fields)})
+    return alerts
+
+
+def _public_alert(alert: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: alert.get(key) for key in ('rule', 'priority', 'output', 'source', 'timestamp')}
+
+
+def run_fit(timeout: Optional[float] = None, **params: Any) -> Dict[str, Any]:
+    """
+    Run fit_alert_clusters() in a child process and return its result.
+
+    Args:
+        timeout: Seconds before the child is killed (None waits for it)
+        **params: Keyword arguments of fit_alert_clusters()
+
+    Raises:
+        RuntimeError: If the child exits with an error or is killed after ``timeout``
+    """
+    with tempfile.TemporaryDirectory(prefix='alert-cluster-fit-') as tmp_dir:
+        output = os.path.join(tmp_dir, 'result.pickle')
+        try:
+            completed = subprocess.run([sys.executable, os.path.abspath(__file__), json.dumps(params), output],
+                                       capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            raise RuntimeError(f"Fit worker timed out after {timeout:g}s and was killed") from None
+        if completed.returncode != 0:
+            error = completed.stderr.strip().splitlines()
+            raise RuntimeError(f"Fit worker exited with code {completed.returncode}: "
+                               f"{error[-1] if error else 'no output'}")
+        with open(output, 'rb') as f:
+            return pickle.load(f)
+
+
+if __name__ == '__main__':
+    result = fit_alert_clusters(**json.loads(sys.argv[1]))
+    with open(sys.argv[2], 'wb') as f:
+        pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
@@ -0,0 +1,287 @@
+"""
+Async Event Stream Server for Falco Vanguard
+
+Serves the dashboard's Server-Sent Events stream from an aiohttp event loop
+running in its own thread, instead of one blocking werkzeug thread per open
+tab. Idle connections cost a coroutine and a socket, not an OS thread.
+
+The server is fed by the in-process EventHub: a single hub listener hands each
+event to the loop with ``call_soon_threadsafe`` and the loop fans it out to
+every client's bounded queue. Heartbeats for all clients are sent from one
+periodic timer.
+
+Environment:
+    SSE_ASYNC_ENABLED      Start the server (default true when aiohttp is installed)
+    SSE_ASYNC_HOST/PORT    Listen address (default 0.0.0.0:8085)
+    SSE_ASYNC_PUBLIC_URL   Public stream URL clients are redirected to; without it the Flask
+                           stream serves clients directly (a guessed host:port breaks behind
+                           TLS or a proxy), unless a proxy routes the stream path to the port
+    SSE_HEARTBEAT_SECONDS  Heartbeat interval for idle connections (default 30)
+"""
+
+import os
+import json
+import asyncio
+import logging
+import datetime
+import threading
+from typing import Any, Dict, List, Optional
+
+from event_stream_service import EventFilter, EventHub, FrameQueue, filter_verdicts, get_event_hub
+
+logger = logging.getLogger(__name__)
+
+STREAM_PATH = '/api/events/stream'
+
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Cache-Control, Last-Event-ID',
+    'Access-Control-Allow-Methods': 'GET, OPTIONS'
+}
+
+
+class AsyncEventSubscription(FrameQueue):
+    """A client served by a coroutine; only touched from the event loop thread."""
+
+    def __init__(self, max_queue: int, overflow_policy: str, high_water: int,
+                 event_filter: Optional[EventFilter] = None):
+        super().__init__(max_queue, overflow_policy, event_filter)
+        # Events up to this ID were already part of the replay
+        self.high_water = high_water
+        self.heartbeat_due = False
+        self.last_write = 0.0
+        self.wakeup = asyncio.Event()
+
+    def offer(self, event_id: int, event_type: str, frame: str) -> bool:
+        if event_id <= self.high_water:
+            return True
+        accepted = self._push(event_id, event_type, frame)
+        self.wakeup.set()
+        return accepted
+
+    def take(self) -> Optional[List[str]]:
+        """Take queued frames (plus a heartbeat if due), or None once closed."""
+        self.wakeup.clear()
+        if self.closed and not self._frames:
+            return None
+        frames = self._drain()
+        if not frames and self.heartbeat_due:
+            frames.append(": heartbeat\n\n")
+        self.heartbeat_due = False
+        return frames
+
+    def close(self) -> None:
+        self.closed = True
+        self.wakeup.set()
+
+
+class AsyncEventStreamServer:
+    """aiohttp SSE server running on a dedicated event loop thread."""
+
+    def __init__(self, hub: Optional[EventHub] = None, host: Optional[str] = None, port: Optional[int] = None,
+                 heartbeat_seconds: Optional[float] = None):
+        """
+        Initialize the server.
+
+        Args:
+            hub: Event hub to subscribe to (defaults to the global hub)
+            host: Listen host (SSE_ASYNC_HOST)
+            port: Listen port (SSE_ASYNC_PORT)
+            heartbeat_seconds: Heartbeat interval for idle clients (SSE_HEARTBEAT_SECONDS)
+        """
+        self.hub = hub or get_event_hub()
+        self.host = host or os.getenv('SSE_ASYNC_HOST', '0.0.0.0')
+        self.port = port or int(os.getenv('SSE_ASYNC_PORT', '8085'))
+        self.heartbeat_seconds = heartbeat_seconds or float(os.getenv('SSE_HEARTBEAT_SECONDS', '30'))
+        self.public_url = os.getenv('SSE_ASYNC_PUBLIC_URL', '')
+        self.running = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._clients = set()
+        self._started_pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._error: Optional[str] = None
+        self._counters = {'connections': 0, 'disconnected_slow': 0, 'heartbeats': 0, 'filtered_out': 0}
+
+    def start(self, timeout: float = 5.0) -> bool:
+        """
+        Start the server thread (idempotent per process).
+
+        Returns:
+            True if the server is listening
+        """
+        if self._started_pid == os.getpid():
+            return self.running
+        with self._start_lock:
+            if self._started_pid != os.getpid():
+                self._started_pid = os.getpid()
+                self._ready.clear()
+                threading.Thread(target=self._run, name='sse-async', daemon=True).start()
+        self._ready.wait(timeout)
+        return self.running
+
+    def stream_url(self) -> Optional[str]:
+        """Public URL of the async stream, or None if clients can't be redirected to it."""
+        return self.public_url or None
+
+    # --- Event loop ---
+
+    def _run(self) -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        try:
+            loop.run_until_complete(self._serve())
+        except Exception as e:
+            self._error = str(e)
+            logger.error(f"❌ SSE_ASYNC: Could not start event stream server on port {self.port}: {e}")
+            self._ready.set()
+            return
+        self.running = True
+        self._ready.set()
+        logger.info(f"📡 SSE_ASYNC: Event stream server listening on {self.host}:{self.port}{STREAM_PATH}")
+        try:
+            loop.run_forever()
+        finally:
+            self.running = False
+
+    async def _serve(self) -> None:
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_get(STREAM_PATH, self._handle_stream)
+        app.router.add_route('OPTIONS', STREAM_PATH, self._handle_options)
+        app.router.add_get('/api/events/stats', self._handle_stats)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, self.host, self.port).start()
+
+        self.hub.add_listener(self._on_event)
+        self._loop.call_later(self.heartbeat_seconds, self._heartbeat)
+
+    def _on_event(self, event_id: int, event_type: str, frame: str, attrs: Optional[Dict[str, Any]]) -> None:
+        # Called from the publishing thread. Always hand over to the loop: a client that is
+        # registering right now is only added there, after it has taken its replay.
+        self._loop.call_soon_threadsafe(self._dispatch, event_id, event_type, frame, attrs)
+
+    def _dispatch(self, event_id: int, event_type: str, frame: str, attrs: Optional[Dict[str, Any]]) -> None:
+        accepts = filter_verdicts(attrs)
+        for client in list(self._clients):
+            if not accepts(client.event_filter):
+                self._counters['filtered_out'] += 1
+            elif not client.offer(event_id, event_type, frame):
+                self._counters['disconnected_slow'] += 1
+                client.close()
+
+    def _heartbeat(self) -> None:
+        now = self._loop.time()
+        for client in self._clients:
+            if now - client.last_write >= self.heartbeat_seconds * 0.9:
+                client.heartbeat_due = True
+                client.wakeup.set()
+                self._counters['heartbeats'] += 1
+        self._loop.call_later(self.heartbeat_seconds, self._heartbeat)
+
+    # --- Handlers ---
+
+    async def _handle_options(self, request):
+        from aiohttp import web
+        return web.Response(status=204, headers=CORS_HEADERS)
+
+    async def _handle_stats(self, request):
+        from aiohttp import web
+        return web.json_response(self._collect_stats())
+
+    async def _handle_stream(self, request):
+        from aiohttp import web
+
+        last_event_id = request.headers.get('Last-Event-ID') or request.query.get('last_event_id')
+        try:
+            last_event_id = int(last_event_id) if last_event_id not in (None, '') else None
+        except ValueError:
+            last_event_id = None
+        try:
+            event_filter = EventFilter.from_params(request.query)
+        except ValueError as e:
+            return web.json_response({'error': str(e)}, status=400, headers=CORS_HEADERS)
+
+        response = web.StreamResponse(headers={
+            'Content-Type': 'text/event-stream',
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',
+            **CORS_HEADERS
+        })
+        await response.prepare(request)
+
+        replay, high_water = self.hub.replay_since(last_event_id, event_filter)
+        client = AsyncEventSubscription(self.hub.max_queue, self.hub.overflow_policy, high_water, event_filter)
+        self._clients.add(client)
+        self._counters['connections'] += 1
+        try:
+            connected = {'type': 'connected', 'timestamp': datetime.datetime.now().isoformat(),
+                         'last_event_id': high_water}
+            if event_filter is not None:
+                connected['filter'] = event_filter.describe()
+            await response.write(f"retry: 5000\ndata: {json.dumps(connected)}\n\n{''.join(replay)}".encode())
+            client.last_write = self._loop.time()
+            while True:
+                await client.wakeup.wait()
+                frames = client.take()
+                if frames is None:
+                    break
+                if frames:
+                    await response.write(''.join(frames).encode())
+                    client.last_write = self._loop.time()
+        except (ConnectionResetError, asyncio.CancelledError):
+            pass
+        except Exception as e:
+            logger.error(f"❌ SSE_ASYNC: Stream error: {e}")
+        finally:
+            self._clients.discard(client)
+        return response
+
+    def get_stats(self, timeout: float = 2.0) -> Dict[str, Any]:
+        """
+        Get connection statistics.
+
+        The client set and counters belong to the event loop, so they are read there.
+
+        Args:
+            timeout: Seconds to wait for the event loop
+        """
+        if not self.running:
+            return self._collect_stats()
+        try:
+            return asyncio.run_coroutine_threadsafe(self._stats_on_loop(), self._loop).result(timeout)
+        except Exception as e:
+            logger.warning(f"⚠️ SSE_ASYNC: Could not collect stats from the event loop: {e}")
+            return {'running': self.running, 'port': self.port, 'error': f"stats unavailable: {e}"}
+
+    async def _stats_on_loop(self) -> Dict[str, Any]:
+        return self._collect_stats()
+
+    def _collect_stats(self) -> Dict[str, Any]:
+        clients = list(self._clients)
+        return {
+            'running': self.running,
+            'port': self.port,
+            'clients': len(clients),
+            'max_queue_depth': max((client.depth for client in clients), default=0),
+            'heartbeat_seconds': self.heartbeat_seconds,
+            'error': self._error,
+            'counters': dict(self._counters)
+        }
+
+
+# Global instance, created on first use
+async_event_server = None
+_async_event_server_lock = threading.Lock()
+
+def get_async_event_server() -> AsyncEventStreamServer:
+    """Get the global async event stream server instance."""
+    global async_event_server
+    if async_event_server is None:
+        with _async_event_server_lock:
+            if async_event_server is None:
+                async_event_server = AsyncEventStreamServer()
+    return async_event_server
@@ -0,0 +1,481 @@
+"""
+Behavior Baseline Service for Falco Vanguard
+
+Streaming per-workload baselines for anomaly scoring. Every ingested alert
+updates two key families in O(1):
+
+- workload: (rule, source container)
+- image: (Kubernetes namespace, container image), when the alert carries them
+
+Each tracked key is one row of fixed-size state (about 230 bytes):
+
+- two exponentially decayed alert counts (BEHAVIOR_BASELINE_SHORT_HALF_LIFE_SECONDS
+  and BEHAVIOR_BASELINE_LONG_HALF_LIFE_SECONDS), i.e. EWMA alert rates, corrected
+  for the age of young keys so a steady rate reads the same on both horizons,
+- the number of alerts and the times the key was first and last seen,
+- a count-min sketch (2 x 32 uint16 counters) of command lines,
+- a HyperLogLog (64 registers) of distinct process names.
+
+The anomaly score (0-10) of an alert is read from that state: how often the
+rule fired for the workload recently, whether the current rate bursts above
+the long-term rate, and whether the command line or process is new for the
+workload. Rows are kept in preallocated NumPy arrays bounded by
+BEHAVIOR_BASELINE_MAX_KEYS per family (least recently seen keys are reused)
+and checkpointed to BEHAVIOR_BASELINE_PATH every
+BEHAVIOR_BASELINE_CHECKPOINT_SECONDS. One process owns the checkpoint (flock);
+other processes load it at startup and keep their state in memory.
+"""
+
+import os
+import json
+import math
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config_service import default_db_path
+
+logger = logging.getLogger(__name__)
+
+CMS_DEPTH = 2
+CMS_WIDTH = 32
+CMS_MAX = int(np.iinfo(np.uint16).max)
+SEEN_MAX = int(np.iinfo(np.uint32).max)
+HLL_BITS = 6
+HLL_REGISTERS = 1 << HLL_BITS
+HLL_ALPHA = 0.709  # Bias correction for 64 registers
+HLL_POWERS = [2.0 ** -rank for rank in range(65)]
+
+# Anomaly scoring
+BURST_RATIO = 3.0  # Short-term rate over long-term rate that counts as a burst
+BURST_MIN_ALERTS = 5  # Alerts of a workload before bursts are scored
+PROFILE_MIN_ALERTS = 20  # Alerts of a workload before new commands/processes are scored
+MIN_RATE_AGE_SECONDS = 60.0  # Younger keys are rated as if one minute old
+INITIAL_ROWS = 256
+ARRAY_NAMES = ('counts', 'first_seen', 'last_seen', 'seen', 'cms', 'hll')
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'little')
+
+
+def _hll_slot(hashed: int) -> Tuple[int, int]:
+    """HyperLogLog register index and rank (position of the first set bit) of a 64-bit hash."""
+    rest_bits = 64 - HLL_BITS
+    rest = hashed & ((1 << rest_bits) - 1)
+    return hashed >> rest_bits, rest_bits - rest.bit_length() + 1
+
+
+def _cms_columns(hashed: int) -> List[int]:
+    return [((hashed >> (20 * depth)) & 0xFFFFF) % CMS_WIDTH for depth in range(CMS_DEPTH)]
+
+
+def alert_fields(alert: Dict[str, Any]) -> Dict[str, Any]:
+    """Falco output fields of an incoming (output_fields) or stored (fields) alert."""
+    fields = alert.get('output_fields') or alert.get('fields') or {}
+    if isinstance(fields, str):
+        try:
+            fields = json.loads(fields)
+        except ValueError:
+            fields = {}
+    return fields if isinstance(fields, dict) else {}
+
+
+def baseline_keys(alert: Dict[str, Any]) -> Tuple[Tuple[str, str], Optional[Tuple[str, str]]]:
+    """(rule, source) key and (namespace, image) key of an alert; the latter is None if neither is known."""
+    fields = alert_fields(alert)
+    source = fields.get('container.name') or alert.get('source') or 'unknown'
+    workload = (str(alert.get('rule') or ''), str(source))
+    namespace = fields.get('k8s.ns.name')
+    image = fields.get('container.image.repository') or fields.get('container.image')
+    if not namespace and not image:
+        return workload, None
+    return workload, (str(namespace or '-'), str(image or '-'))
+
+
+class BaselineTable:
+    """Fixed-size baseline rows for the keys of one family."""
+
+    def __init__(self, max_keys: int, half_lives: Tuple[float, float]):
+        self.max_keys = max_keys
+        self.short_decay, self.long_decay = (math.log(2) / half_life for half_life in half_lives)
+        self.keys: OrderedDict = OrderedDict()  # key -> row, least recently seen first
+        self.row_keys: List[Optional[Tuple[str, str]]] = []
+        self.evicted = 0
+        self._allocate(min(INITIAL_ROWS, max_keys))
+
+    def _allocate(self, rows: int) -> None:
+        used = len(self.row_keys)
+        arrays = {
+            'counts': np.zeros((rows, 2), dtype=np.float64),
+            'first_seen': np.zeros(rows, dtype=np.float64),
+            'last_seen': np.zeros(rows, dtype=np.float64),
+            'seen': np.zeros(rows, dtype=np.uint32),
+            'cms': np.zeros((rows, CMS_DEPTH, CMS_WIDTH), dtype=np.uint16),
+            'hll': np.zeros((rows, HLL_REGISTERS), dtype=np.uint8),
+        }
+        for name, array in arrays.items():
+            if used:
+                array[:used] = getattr(self, name)[:used]
+            setattr(self, name, array)
+        # Flat views of the same memory: scalar access is several times faster than NumPy indexing
+        self._counts, self._first_seen, self._last_seen, self._seen, self._cms, self._hll = (
+            memoryview(getattr(self, name)).cast('B').cast(getattr(self, name).dtype.char) for name in ARRAY_NAMES)
+
+    @property
+    def row_bytes(self) -> int:
+        """Bytes of state per tracked key."""
+        return sum(getattr(self, name)[0].nbytes for name in ARRAY_NAMES)
+
+    def row(self, key: Tuple[str, str], create: bool = False) -> Optional[int]:
+        """
+        Row of a key; with ``create`` the key is marked as seen, and a new row (or the row
+        of the least recently seen key) is assigned to it if it has none.
+        """
+        row = self.keys.get(key)
+        if row is not None:
+            if create:
+                self.keys.move_to_end(key)
+            return row
+        if not create:
+            return None
+        if len(self.row_keys) < self.max_keys:
+            if len(self.row_keys) == len(self.last_seen):
+                self._allocate(min(self.max_keys, 2 * len(self.last_seen)))
+            row = len(self.row_keys)
+            self.row_keys.append(key)
+        else:
+            _, row = self.keys.popitem(last=False)
+            self.row_keys[row] = key
+            for name in ARRAY_NAMES:
+                getattr(self, name)[row] = 0
+            self.evicted += 1
+        self.keys[key] = row
+        return row
+
+    def decayed_counts(self, row: int, now: float) -> Tuple[float, float]:
+        """Short- and long-term decayed alert counts of a row at ``now``."""
+        elapsed = max(0.0, now - self._last_seen[row])
+        return (self._counts[2 * row] * math.exp(-self.short_decay * elapsed),
+                self._counts[2 * row + 1] * math.exp(-self.long_decay * elapsed))
+
+    def rates_per_hour(self, row: int, counts: Tuple[float, float], now: float) -> Tuple[float, float]:
+        """Short- and long-term EWMA alert rates (per hour), corrected for the age of the key."""
+        age = max(MIN_RATE_AGE_SECONDS, now - self._first_seen[row])
+        return (counts[0] * self.short_decay / -math.expm1(-self.short_decay * age) * 3600.0,
+                counts[1] * self.long_decay / -math.expm1(-self.long_decay * age) * 3600.0)
+
+    def alerts(self, row: int) -> int:
+        """Alerts added to a row."""
+        return self._seen[row]
+
+    def cms_estimate(self, row: int, columns: List[int]) -> int:
+        """Count-min estimate of how often a command line was added to a row."""
+        base = row * CMS_DEPTH * CMS_WIDTH
+        return min(self._cms[base + depth * CMS_WIDTH + column] for depth, column in enumerate(columns))
+
+    def hll_contains(self, row: int, slot: Tuple[int, int]) -> bool:
+        """False if the value of a HyperLogLog slot was certainly never added (its rank exceeds the register)."""
+        register, rank = slot
+        return rank <= self._hll[row * HLL_REGISTERS + register]
+
+    def distinct_estimate(self, row: int) -> float:
+        """HyperLogLog estimate of the distinct processes of a row."""
+        registers = self._hll[row * HLL_REGISTERS:(row + 1) * HLL_REGISTERS].tolist()
+        estimate = HLL_ALPHA * HLL_REGISTERS * HLL_REGISTERS / sum(map(HLL_POWERS.__getitem__, registers))
+        zeros = registers.count(0)
+        if estimate <= 2.5 * HLL_REGISTERS and zeros:
+            estimate = HLL_REGISTERS * math.log(HLL_REGISTERS / zeros)
+        return estimate
+
+    def update(self, row: int, now: float, cmd_columns: Optional[List[int]], process_slot: Optional[Tuple[int, int]]) -> None:
+        """Add one alert to a row."""
+        if self._seen[row] == 0:
+            self._first_seen[row] = now
+        short, long = self.decayed_counts(row, now)
+        self._counts[2 * row] = short + 1.0
+        self._counts[2 * row + 1] = long + 1.0
+        self._last_seen[row] = now
+        if self._seen[row] < SEEN_MAX:
+            self._seen[row] += 1
+        if cmd_columns is not None:
+            base = row * CMS_DEPTH * CMS_WIDTH
+            for depth, column in enumerate(cmd_columns):
+                index = base + depth * CMS_WIDTH + column
+                if self._cms[index] < CMS_MAX:
+                    self._cms[index] += 1
+        if process_slot is not None:
+            register, rank = process_slot
+            index = row * HLL_REGISTERS + register
+            if rank > self._hll[index]:
+                self._hll[index] = rank
+
+    def to_arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        used = len(self.row_keys)
+        arrays = {f'{prefix}_{name}': getattr(self, name)[:used].copy() for name in ARRAY_NAMES}
+        arrays[f'{prefix}_keys'] = np.array(json.dumps(self.row_keys))
+        return arrays
+
+    def load_arrays(self, prefix: str, arrays: Any) -> None:
+        keys = [tuple(key) for key in json.loads(str(arrays[f'{prefix}_keys']))][:self.max_keys]
+        used = len(keys)
+        self.row_keys = []
+        self._allocate(max(min(INITIAL_ROWS, self.max_keys), used))
+        for name in ARRAY_NAMES:
+            getattr(self, name)[:used] = arrays[f'{prefix}_{name}'][:used]
+        self.row_keys = keys
+        self.keys = OrderedDict((keys[row], int(row)) for row in np.argsort(self.last_seen[:used], kind='stable'))
+
+
+class BehaviorBaselines:
+    """Streaming per-(rule, source) and per-(namespace, image) baselines with anomaly scoring."""
+
+    def __init__(self, db_path: Optional[str] = None, path: Optional[str] = None,
+                 max_keys: Optional[int] = None, checkpoint_seconds: Optional[float] = None):
+        """
+        Initialize the baselines and load the last checkpoint.
+
+        Args:
+            db_path: SQLite database; the checkpoint defaults to its directory
+            path: Checkpoint file (BEHAVIOR_BASELINE_PATH, '' to keep the state in memory only)
+            max_keys: Keys tracked per family before the least recently seen is reused (BEHAVIOR_BASELINE_MAX_KEYS)
+            checkpoint_seconds: Seconds between checkpoints (BEHAVIOR_BASELINE_CHECKPOINT_SECONDS)
+        """
+        self.db_path = db_path or default_db_path()
+        if path is None:
+            path = os.getenv('BEHAVIOR_BASELINE_PATH',
+                             os.path.join(os.path.dirname(os.path.abspath(self.db_path)), 'behavior_baselines.npz'))
+        self.path = path
+        self.max_keys = max_keys or int(os.getenv('BEHAVIOR_BASELINE_MAX_KEYS', '50000'))
+        self.checkpoint_seconds = checkpoint_seconds or float(os.getenv('BEHAVIOR_BASELINE_CHECKPOINT_SECONDS', '60'))
+        half_lives = (float(os.getenv('BEHAVIOR_BASELINE_SHORT_HALF_LIFE_SECONDS', '3600')),
+                      float(os.getenv('BEHAVIOR_BASELINE_LONG_HALF_LIFE_SECONDS', str(7 * 86400))))
+        self.half_lives = half_lives
+
+        self.workloads = BaselineTable(self.max_keys, half_lives)
+        self.images = BaselineTable(self.max_keys, half_lives)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_pid: Optional[int] = None
+        self._lock_file = None
+        self._owner = False
+        # Observations so far and as of the last written checkpoint
+        self._changes = 0
+        self._checkpointed_changes = 0
+        self._counters = {'observed': 0, 'scored': 0, 'checkpoints': 0, 'checkpoint_errors': 0}
+        self.last_checkpoint: Optional[float] = None
+        self._load()
+
+    # --- Scoring ---
+
+    def _score(self, alert: Dict[str, Any], now: float) -> Tuple[Dict[str, Any], Tuple]:
+        workload_key, image_key = baseline_keys(alert)
+        fields = alert_fields(alert)
+        cmdline = fields.get('proc.cmdline')
+        process = fields.get('proc.name') or fields.get('proc.exepath')
+        cmd_columns = _cms_columns(_hash64(str(cmdline))) if cmdline else None
+        process_slot = _hll_slot(_hash64(str(process))) if process else None
+
+        workload_row = self.workloads.row(workload_key)
+        image_row = self.images.row(image_key) if image_key is not None else None
+        reasons = []
+        baseline: Dict[str, Any] = {'rule_alerts': 0.0, 'rate_per_hour': 0.0, 'baseline_rate_per_hour': 0.0}
+
+        if workload_row is None:
+            if image_row is None:
+                score = 5.0  # Neutral score for no history
+                reasons.append("No baseline yet for this workload")
+            else:
+                score = 8.0
+                reasons.append("Rule never seen before for this workload")
+        else:
+            counts = self.workloads.decayed_counts(workload_row, now)
+            short_rate, long_rate = self.workloads.rates_per_hour(workload_row, counts, now)
+            baseline.update({'rule_alerts': round(counts[1], 1),
+                             'rate_per_hour': round(short_rate, 3),
+                             'baseline_rate_per_hour': round(long_rate, 3)})
+            if counts[1] < 0.5:
+                score = 8.0  # High anomaly - not seen recently
+                reasons.append("Rule not seen recently for this workload")
+            elif counts[1] < 3:
+                score = 6.5  # Medium anomaly - rare
+                reasons.append("Rule is rare for this workload")
+            elif counts[1] < 10:
+                score = 4.0  # Low anomaly - uncommon
+            else:
+                score = 2.0  # Normal - common pattern
+            # Floor the long-term rate at one alert per long half-life so young keys don't burst
+            ratio = short_rate / max(long_rate, self.workloads.long_decay * 3600.0)
+            if self.workloads.alerts(workload_row) >= BURST_MIN_ALERTS and ratio >= BURST_RATIO:
+                score += 1.5
+                reasons.append(f"Alert rate {ratio:.1f}x above the workload baseline")
+
+        # Command lines and processes are profiled per image when known, else per workload
+        profile, profile_row = (self.images, image_row) if image_key is not None else (self.workloads, workload_row)
+        if profile_row is not None:
+            baseline['profile_alerts'] = profile.alerts(profile_row)
+            baseline['distinct_processes'] = round(profile.distinct_estimate(profile_row), 1)
+            if profile.alerts(profile_row) >= PROFILE_MIN_ALERTS:
+                if cmd_columns is not None and profile.cms_estimate(profile_row, cmd_columns) == 0:
+                    score += 1.0
+                    reasons.append("Command line never seen before for this workload")
+                if process_slot is not None and not profile.hll_contains(profile_row, process_slot):
+                    score += 0.5
+                    reasons.append(f"Process '{process}' never seen before for this workload")
+
+        result = {
+            'anomaly_score': round(min(10.0, score), 1),
+            'reasons': reasons,
+            'baseline': baseline,
+            'workload': {'rule': workload_key[0], 'source': workload_key[1]},
+        }
+        if image_key is not None:
+            result['image'] = {'namespace': image_key[0], 'image': image_key[1]}
+        return result, (workload_key, image_key, cmd_columns, process_slot)
+
+    def score(self, alert: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Anomaly score of an alert against the current baselines, without recording it.
+
+        Returns:
+            Dictionary with anomaly_score (0-10), reasons and the baseline figures used
+        """
+        with self._lock:
+            self._counters['scored'] += 1
+            return self._score(alert, time.time())[0]
+
+    def observe(self, alert: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Score an ingested alert against the baselines, then add it to them.
+
+        Returns:
+            The anomaly score of the alert before it was added (see score())
+        """
+        now = time.time()
+        with self._lock:
+            result, (workload_key, image_key, cmd_columns, process_slot) = self._score(alert, now)
+            self.workloads.update(self.workloads.row(workload_key, create=True), now, cmd_columns, process_slot)
+            if image_key is not None:
+                self.images.update(self.images.row(image_key, create=True), now, cmd_columns, process_slot)
+            self._counters['observed'] += 1
+            self._changes += 1
+        self._ensure_thread()
+        return result
+
+    # --- Checkpoints ---
+
+    def _acquire_owner(self) -> bool:
+        """Take the checkpoint lock; only its owner writes the checkpoint."""
+        try:
+            import fcntl
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._lock_file = open(self.path + '.lock', 'w')
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except (ImportError, OSError) as e:
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+            logger.info(f"📈 BASELINES: Checkpoint in use or not writable ({e}), keeping baselines in memory")
+            return False
+
+    def _load(self) -> None:
+        if not self.path:
+            return
+        self._owner = self._acquire_owner()
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as arrays:
+                if tuple(arrays['half_lives']) != self.half_lives:
+                    logger.info("📈 BASELINES: Half-lives changed, starting new baselines")
+                    return
+                self.workloads.load_arrays('workload', arrays)
+                self.images.load_arrays('image', arrays)
+            logger.info(f"📈 BASELINES: Loaded {len(self.workloads.keys)} workload and "
+                        f"{len(self.images.keys)} image baselines")
+        except Exception as e:
+            logger.error(f"❌ BASELINES: Failed to load checkpoint {self.path}: {e}")
+            self.workloads = BaselineTable(self.max_keys, self.half_lives)
+            self.images = BaselineTable(self.max_keys, self.half_lives)
+
+    def checkpoint(self) -> bool:
+        """Write the baselines to the checkpoint file (atomically replaced); returns whether it was written."""
+        if not self.path or not self._owner:
+            return False
+        try:
+            with self._lock:
+                arrays = {'half_lives': np.array(self.half_lives)}
+                arrays.update(self.workloads.to_arrays('workload'))
+                arrays.update(self.images.to_arrays('image'))
+                changes = self._changes
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, self.path)
+            # Only now is the state as of the snapshot safe; later observations stay pending
+            with self._lock:
+                self._checkpointed_changes = changes
+                self.last_checkpoint = time.time()
+                self._counters['checkpoints'] += 1
+            return True
+        except Exception as e:
+            with self._lock:
+                self._counters['checkpoint_errors'] += 1
+            logger.error(f"❌ BASELINES: Checkpoint failed: {e}")
+            return False
+
+    def _ensure_thread(self) -> None:
+        if not self._owner or (self._thread is not None and self._thread_pid == os.getpid()):
+            return
+        with self._lock:
+            if self._thread is not None and self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='behavior-baseline-checkpoint', daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.checkpoint_seconds)
+            self._wake.clear()
+            if self._changes != self._checkpointed_changes:
+                self.checkpoint()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get tracked keys, memory use, configuration and counters."""
+        with self._lock:
+            return {
+                'workload_keys': len(self.workloads.keys),
+                'image_keys': len(self.images.keys),
+                'max_keys': self.max_keys,
+                'bytes_per_key': self.workloads.row_bytes,
+                'state_bytes': self.workloads.row_bytes * (len(self.workloads.keys) + len(self.images.keys)),
+                'evicted': {'workload': self.workloads.evicted, 'image': self.images.evicted},
+                'half_lives_seconds': {'short': self.half_lives[0], 'long': self.half_lives[1]},
+                'checkpoint_path': self.path,
+                'checkpoint_owner': self._owner,
+                'checkpoint_seconds': self.checkpoint_seconds,
+                'last_checkpoint': self.last_checkpoint,
+                'counters': dict(self._counters)
+            }
+
+
+# Global instance, created on first use
+behavior_baselines: Optional[BehaviorBaselines] = None
+_behavior_baselines_lock = threading.Lock()
+
+def get_behavior_baselines(db_path: Optional[str] = None) -> BehaviorBaselines:
+    """Get the global behavior baselines (loads the last checkpoint on first use)."""
+    global behavior_baselines
+    if behavior_baselines is None:
+        with _behavior_baselines_lock:
+            if behavior_baselines is None:
+                behavior_baselines = BehaviorBaselines(db_path)
+    return behavior_baselines
@@ -0,0 +1,690 @@
+"""
+Configuration Service for Falco Vanguard
+
+This module owns every database-backed configuration section (Slack, AI,
+general, AI chat and multilingual). Defaults are seeded once at startup and
+each section is served from an immutable in-memory snapshot, so reading
+configuration on the alert, chat and health-check paths never touches SQLite.
+Updates write through to the database, publish a new snapshot version and
+notify subscribers.
+
+Version bumps are also broadcast over an invalidation bus so that every
+worker process or replica sharing the database converges on the same
+configuration within a second, without polling the config tables.
+"""
+
+import os
+import uuid
+import socket
+import sqlite3
+import threading
+import logging
+from abc import ABC, abstractmethod
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT_FILE = "templates/system_prompt.txt"
+
+DEFAULT_SYSTEM_PROMPT = """You are an expert in cloud security and Falco alerts. Analyze the provided Falco security alert and provide a comprehensive but concise security assessment.
+
+Structure your response with the following sections:
+
+**Security Impact:** Briefly describe the potential security risks and possible exploits related to this Falco alert (1-2 sentences).
+
+**Next Steps:** Provide immediate investigation steps that security teams should take (1-2 sentences). Include relevant reference links within these recommendations whenever possible.
+
+**Remediation Steps:** Explain how to fix or mitigate the issue (1-2 sentences). Focus on actionable steps that can be implemented immediately.
+
+**Commands:** If there are safe, specific commands that can help investigate or remediate this issue, include them on separate lines starting with "Command:" - use placeholders like <container_id>, <pod_name>, <namespace> for values that need to be filled in. Only include commands that are safe and directly relevant to this security alert.
+
+Guidelines:
+- Keep responses concise and actionable
+- Focus on Kubernetes and container security context
+- Prioritize immediate security concerns
+- Provide practical, implementable solutions
+- Include relevant security best practices
+- Consider the alert priority level in your response severity"""
+
+# (setting_name, default_value, setting_type, description)
+SLACK_DEFAULTS = [
+    ('bot_token', '', 'password', 'Slack Bot Token (xoxb-...)'),
+    ('channel_name', '#security-alerts', 'string', 'Slack Channel Name'),
+    ('enabled', 'true', 'boolean', 'Enable Slack Notifications'),
+    ('username', 'Falco Vanguard', 'string', 'Bot Display Name'),
+    ('icon_emoji', ':shield:', 'string', 'Bot Icon Emoji'),
+    ('template_style', 'detailed', 'select', 'Message Template Style'),
+    ('min_priority_slack', 'warning', 'select', 'Minimum Priority for Slack'),
+    ('include_commands', 'true', 'boolean', 'Include Suggested Commands'),
+    ('thread_alerts', 'false', 'boolean', 'Use Threading for Related Alerts'),
+    ('notification_throttling', 'false', 'boolean', 'Enable Notification Throttling'),
+    ('throttle_threshold', '10', 'number', 'Throttle Threshold (alerts per 5 min)'),
+    ('business_hours_only', 'false', 'boolean', 'Business Hours Filtering'),
+    ('business_hours', '09:00-17:00', 'string', 'Business Hours Range'),
+    ('escalation_enabled', 'false', 'boolean', 'Enable Alert Escalation'),
+    ('escalation_interval', '30', 'number', 'Escalation Interval (minutes)'),
+    ('digest_mode_enabled', 'false', 'boolean', 'Enable Daily Digest Mode'),
+    ('digest_time', '09:00', 'string', 'Daily Digest Delivery Time')
+]
+
+AI_DEFAULTS = [
+    ('provider_name', 'ollama', 'select', 'AI Provider (openai, gemini, ollama)'),
+    ('model_name', 'tinyllama', 'string', 'Model Name'),
+    ('openai_model_name', 'gpt-3.5-turbo', 'string', 'OpenAI Model Name'),
+    ('gemini_model_name', 'gemini-pro', 'string', 'Gemini Model Name'),
+    ('portkey_api_key', '', 'password', 'Portkey API Key (Security Layer for Cloud AI)'),
+    ('openai_virtual_key', '', 'password', 'OpenAI Virtual Key (Portkey)'),
+    ('gemini_virtual_key', '', 'password', 'Gemini Virtual Key (Portkey)'),
+    ('ollama_api_url', 'http://prod-ollama:11434/api/generate', 'string', 'Ollama API URL'),
+    ('ollama_model_name', 'tinyllama', 'string', 'Ollama Model Name'),
+    ('ollama_timeout', '30', 'number', 'Ollama Request Timeout (seconds)'),
+    ('ollama_keep_alive', '10', 'number', 'Ollama Keep Alive (minutes)'),
+    ('ollama_parallel', '1', 'number', 'Ollama Parallel Requests'),
+    ('openai_timeout', '30', 'number', 'OpenAI Request Timeout (seconds)'),
+    ('gemini_timeout', '30', 'number', 'Gemini Request Timeout (seconds)'),
+    ('max_tokens', '500', 'number', 'Maximum Response Tokens'),
+    ('temperature', '0.7', 'number', 'Response Temperature (0.0-1.0)'),
+    ('enabled', 'true', 'boolean', 'Enable AI Analysis'),
+    ('system_prompt', '', 'textarea', 'AI System Prompt (leave empty for default)')
+]
+
+GENERAL_DEFAULTS = [
+    ('min_priority', 'warning', 'select', 'Minimum Alert Priority to Process'),
+    ('ignore_older_minutes', '1', 'number', 'Ignore Alerts Older Than (minutes)'),
+    ('web_ui_enabled', 'true', 'boolean', 'Enable Web UI Dashboard'),
+    ('web_ui_port', '8081', 'number', 'Web UI Port Number'),
+    ('falco_ai_port', '8080', 'number', 'Main Webhook Port Number'),
+    ('log_level', 'INFO', 'select', 'System Log Level'),
+    ('deduplication_enabled', 'true', 'boolean', 'Enable Alert Deduplication'),
+    ('deduplication_window_minutes', '60', 'number', 'Deduplication Window (minutes)'),
+    ('max_alerts_storage', '10000', 'number', 'Maximum Alerts to Store in Database'),
+    ('alert_retention_days', '30', 'number', 'Delete Alerts Older Than (days)'),
+    ('rate_limit_enabled', 'false', 'boolean', 'Enable Alert Rate Limiting'),
+    ('max_alerts_per_minute', '60', 'number', 'Maximum Alerts Per Minute'),
+    ('batch_processing_enabled', 'false', 'boolean', 'Enable Alert Batching'),
+    ('batch_size', '10', 'number', 'Alert Batch Size'),
+    ('alert_correlation_enabled', 'false', 'boolean', 'Enable Alert Correlation'),
+    ('correlation_window_minutes', '15', 'number', 'Alert Correlation Window (minutes)')
+]
+
+# The chat section lives in the generic ``config`` table, which has no type column
+CHAT_DEFAULTS = [
+    ('chat_enabled', 'true', None, 'Enable AI Security Chat'),
+    ('chat_max_history', '50', None, 'Maximum chat messages to keep in history'),
+    ('chat_session_timeout', '30', None, 'Auto-clear chat after inactivity (minutes)'),
+    ('chat_context_alerts', '10', None, 'Number of recent alerts to include as context'),
+    ('chat_response_length', 'normal', None, 'AI response length (brief/normal/detailed)'),
+    ('chat_tone', 'professional', None, 'AI response tone (professional/casual/technical/educational)'),
+    ('chat_include_remediation', 'true', None, 'Include remediation steps in responses'),
+    ('chat_include_context', 'true', None, 'Include alert context in responses')
+]
+
+
+def default_db_path() -> str:
+    """Resolve the alerts database path the same way app.py does."""
+    default_path = './data/alerts.db' if not os.path.exists('/app') else '/app/data/alerts.db'
+    return os.getenv('DB_PATH', default_path)
+
+
+class InvalidationBus(ABC):
+    """
+    Broadcasts named version bumps (``config:<section>`` or ``cache:<name>``) to
+    every process sharing the deployment.
+    """
+
+    _origin: Optional[str] = None
+    _origin_pid: Optional[int] = None
+
+    @property
+    def origin_id(self) -> str:
+        """Identifies this process as a publisher; regenerated after fork so workers stay distinct."""
+        pid = os.getpid()
+        if self._origin_pid != pid:
+            self._origin = f"{socket.gethostname()}:{pid}:{uuid.uuid4().hex[:8]}"
+            self._origin_pid = pid
+        return self._origin
+
+    @abstractmethod
+    def publish(self, channel: str) -> None:
+        """Announce that the named channel has a new version."""
+
+    @abstractmethod
+    def start(self, callback: Callable[[str], None]) -> None:
+        """Start delivering channels changed by *other* processes to ``callback``."""
+
+    def stop(self) -> None:
+        """Stop delivering notifications."""
+
+
+class LocalInvalidationBus(InvalidationBus):
+    """In-process stand-in for single-worker deployments: nothing to propagate."""
+
+    def publish(self, channel: str) -> None:
+        pass
+
+    def start(self, callback: Callable[[str], None]) -> None:
+        pass
+
+
+class SQLiteInvalidationBus(InvalidationBus):
+    """
+    Invalidation channel backed by a shared ``config_versions`` table.
+
+    Publishers bump a per-channel version counter and record their origin id. A
+    watcher thread keeps its own connection and polls ``PRAGMA data_version``,
+    which only changes when another connection commits, so the versions table is
+    read only after a real write. Bumps whose origin is this process are skipped.
+    """
+
+    def __init__(self, db_path: str, poll_interval: float = 0.5):
+        """
+        Args:
+            db_path: SQLite database shared by all workers
+            poll_interval: Seconds between ``data_version`` checks
+        """
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self._known_versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._table_ready = False
+
+    def _ensure_table(self, conn: sqlite3.Connection) -> None:
+        if self._table_ready:
+            return
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS config_versions (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                origin TEXT
+            )
+        ''')
+        try:
+            conn.execute('ALTER TABLE config_versions ADD COLUMN origin TEXT')
+        except sqlite3.OperationalError:
+            # Column already exists
+            pass
+        self._table_ready = True
+
+    def _read_versions(self, conn: sqlite3.Connection) -> Dict[str, Tuple[int, Optional[str]]]:
+        return {name: (version, origin) for name, version, origin in
+                conn.execute('SELECT name, version, origin FROM config_versions').fetchall()}
+
+    def publish(self, channel: str) -> None:
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            try:
+                self._ensure_table(conn)
+                conn.execute('''
+                    INSERT INTO config_versions (name, version, origin) VALUES (?, 1, ?)
+                    ON CONFLICT(name) DO UPDATE SET version = version + 1, updated_at = CURRENT_TIMESTAMP,
+                                                    origin = excluded.origin
+                ''', (channel, self.origin_id))
+                version = conn.execute('SELECT version FROM config_versions WHERE name = ?',
+                                       (channel,)).fetchone()[0]
+                conn.commit()
+            finally:
+                conn.close()
+            # Our own bump must not bounce back to us (the watcher also skips our origin id)
+            with self._lock:
+                self._known_versions[channel] = max(version, self._known_versions.get(channel, 0))
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ CONFIG_BUS: Failed to publish '{channel}': {e}")
+
+    def start(self, callback: Callable[[str], None]) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._watch, args=(callback,),
+                                        name='config-invalidation', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def _watch(self, callback: Callable[[str], None]) -> None:
+        conn = None
+        last_data_version = None
+        while not self._stop_event.is_set():
+            try:
+                if conn is None:
+                    conn = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False)
+                    self._ensure_table(conn)
+                    conn.commit()
+                    with self._lock:
+                        for name, (version, _) in self._read_versions(conn).items():
+                            self._known_versions.setdefault(name, version)
+
+                data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+                if data_version != last_data_version:
+                    last_data_version = data_version
+                    changed = []
+                    origin_id = self.origin_id
+                    with self._lock:
+                        for name, (version, origin) in self._read_versions(conn).items():
+                            if version > self._known_versions.get(name, 0):
+                                self._known_versions[name] = version
+                                if origin != origin_id:
+                                    changed.append(name)
+                    for name in changed:
+                        try:
+                            callback(name)
+                        except Exception as e:
+                            logger.warning(f"⚠️ CONFIG_BUS: Handler failed for '{name}': {e}")
+            except sqlite3.Error as e:
+                logger.debug(f"📋 CONFIG_BUS: Watch error, reconnecting: {e}")
+                if conn:
+                    conn.close()
+                conn = None
+            self._stop_event.wait(self.poll_interval)
+        if conn:
+            conn.close()
+
+
+def create_invalidation_bus(db_path: str) -> InvalidationBus:
+    """
+    Create the invalidation bus selected by ``CONFIG_INVALIDATION_BUS``.
+
+    ``sqlite`` (default) propagates changes between workers sharing the database,
+    ``local`` keeps everything in-process.
+    """
+    backend = os.getenv('CONFIG_INVALIDATION_BUS', 'sqlite').lower()
+    if backend == 'local':
+        return LocalInvalidationBus()
+    poll_interval = float(os.getenv('CONFIG_INVALIDATION_POLL_SECONDS', '0.5'))
+    return SQLiteInvalidationBus(db_path, poll_interval=poll_interval)
+
+
+class ConfigSection:
+    """Describes how one configuration section is stored in SQLite."""
+
+    def __init__(self, name: str, table: str, key_column: str = 'setting_name',
+                 value_column: str = 'setting_value', type_column: Optional[str] = 'setting_type',
+                 defaults: Optional[List[Tuple[str, str, Optional[str], str]]] = None,
+                 key_prefix: str = '', upsert: bool = False, has_description: bool = True):
+        """
+        Args:
+            name: Section name used by callers (e.g. 'ai')
+            table: Backing table name
+            key_column: Column holding the setting name
+            value_column: Column holding the setting value
+            type_column: Column holding the setting type, or None if the table has none
+            defaults: Expected settings seeded once at startup
+            key_prefix: Only rows whose key starts with this prefix belong to the section
+            upsert: Whether updates may create settings that do not exist yet
+            has_description: Whether the table has a description column
+        """
+        self.name = name
+        self.table = table
+        self.key_column = key_column
+        self.value_column = value_column
+        self.type_column = type_column
+        self.defaults = defaults or []
+        self.key_prefix = key_prefix
+        self.upsert = upsert
+        self.has_description = has_description
+
+
+SECTIONS = {
+    'slack': ConfigSection('slack', 'slack_config', defaults=SLACK_DEFAULTS),
+    'ai': ConfigSection('ai', 'ai_config', defaults=AI_DEFAULTS),
+    'general': ConfigSection('general', 'general_config', defaults=GENERAL_DEFAULTS),
+    'chat': ConfigSection('chat', 'config', key_column='name', value_column='value',
+                          type_column=None, defaults=CHAT_DEFAULTS, key_prefix='chat_', upsert=True),
+    'multilingual': ConfigSection('multilingual', 'multilingual_config', type_column=None,
+                                  upsert=True, has_description=False),
+}
+
+
+class ConfigSnapshot:
+    """Immutable view of one configuration section at a given version."""
+
+    __slots__ = ('section', 'version', 'settings')
+
+    def __init__(self, section: str, version: int, settings: Dict[str, Dict[str, Any]]):
+        self.section = section
+        self.version = version
+        self.settings: Mapping[str, Mapping[str, Any]] = MappingProxyType({
+            name: MappingProxyType(dict(entry)) for name, entry in settings.items()
+        })
+
+    def get_value(self, setting_name: str, default_value: Any = None) -> Any:
+        """Return the raw value of a setting, or the default if it is missing."""
+        entry = self.settings.get(setting_name)
+        if entry is None:
+            return default_value
+        return entry.get('value', default_value)
+
+    def as_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Return a mutable copy in the legacy ``{name: {'value', ...}}`` format."""
+        return {name: dict(entry) for name, entry in self.settings.items()}
+
+    def values(self) -> Dict[str, Any]:
+        """Return a flat ``{name: value}`` copy of the section."""
+        return {name: entry.get('value') for name, entry in self.settings.items()}
+
+
+class ConfigService:
+    """Serves configuration snapshots from memory and publishes new versions on change."""
+
+    def __init__(self, db_path: Optional[str] = None, bus: Optional[InvalidationBus] = None):
+        """
+        Initialize the configuration service.
+
+        Args:
+            db_path: SQLite database path (defaults to the app's DB_PATH resolution)
+            bus: Cross-process invalidation bus (defaults to create_invalidation_bus())
+        """
+        self.db_path = db_path or default_db_path()
+        self.bus = bus or create_invalidation_bus(self.db_path)
+        self.version = 0
+        self._snapshots: Dict[str, ConfigSnapshot] = {}
+        self._lock = threading.RLock()
+        self._subscribers: List[Callable[[str, ConfigSnapshot], None]] = []
+        self._cache_subscribers: List[Callable[[str], None]] = []
+        self._system_prompt: Optional[Tuple[int, str]] = None
+        self._bus_pid: Optional[int] = None
+
+    # --- Lifecycle ---
+
+    def initialize(self) -> None:
+        """Seed any missing default settings once and load every section into memory."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS multilingual_config (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        setting_name TEXT UNIQUE NOT NULL,
+                        setting_value TEXT,
+                        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                for section in SECTIONS.values():
+                    self._seed_section(cursor, section)
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ CONFIG: Could not seed configuration defaults: {e}")
+
+        self.reload()
+        self._ensure_bus()
+        logger.info(f"✅ CONFIG: Loaded {len(self._snapshots)} configuration sections (version {self.version})")
+
+    def _ensure_bus(self) -> None:
+        """
+        Start the invalidation watcher for this process.
+
+        Threads do not survive fork(), so pre-fork workers start their own
+        watcher the first time they read configuration.
+        """
+        pid = os.getpid()
+        if self._bus_pid == pid:
+            return
+        with self._lock:
+            if self._bus_pid == pid:
+                return
+            self._bus_pid = pid
+            self.bus.start(self._on_remote_change)
+
+    def _on_remote_change(self, channel: str) -> None:
+        """Apply a version bump published by another process."""
+        kind, _, name = channel.partition(':')
+        if kind == 'config' and name in SECTIONS:
+            logger.info(f"🔄 CONFIG: Section '{name}' changed in another worker, reloading")
+            self.reload([name])
+        elif kind == 'cache':
+            self._notify_cache_invalidated(name)
+
+    def _seed_section(self, cursor: sqlite3.Cursor, section: ConfigSection) -> None:
+        """Insert the section's expected settings without overwriting existing values."""
+        for setting_name, default_value, setting_type, description in section.defaults:
+            if section.type_column:
+                cursor.execute(f'''
+                    INSERT OR IGNORE INTO {section.table}
+                    ({section.key_column}, {section.value_column}, {section.type_column}, description)
+                    VALUES (?, ?, ?, ?)
+                ''', (setting_name, default_value, setting_type, description))
+            else:
+                cursor.execute(f'''
+                    INSERT OR IGNORE INTO {section.table}
+                    ({section.key_column}, {section.value_column}, description)
+                    VALUES (?, ?, ?)
+                ''', (setting_name, default_value, description))
+
+    def reload(self, section_names: Optional[List[str]] = None) -> None:
+        """
+        Rebuild snapshots from the database and publish them.
+
+        Args:
+            section_names: Sections to reload, or None for all of them
+        """
+        names = section_names or list(SECTIONS.keys())
+        conn = None
+        try:
+            conn = sqlite3.connect(self.db_path)
+            for name in names:
+                self._publish(name, self._read_section(conn, SECTIONS[name]))
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ CONFIG: Failed to reload configuration: {e}")
+        finally:
+            if conn:
+                conn.close()
+
+    def _read_section(self, conn: sqlite3.Connection, section: ConfigSection) -> Dict[str, Dict[str, Any]]:
+        """Load one section, falling back to defaults for rows that are missing."""
+        settings: Dict[str, Dict[str, Any]] = {}
+        for setting_name, default_value, setting_type, description in section.defaults:
+            entry = {'value': default_value, 'description': description}
+            if section.type_column:
+                entry['type'] = setting_type
+            settings[setting_name] = entry
+
+        columns = [section.key_column, section.value_column]
+        if section.type_column:
+            columns.append(section.type_column)
+        if section.has_description:
+            columns.append('description')
+        query = f"SELECT {', '.join(columns)} FROM {section.table}"
+        params: Tuple[Any, ...] = ()
+        if section.key_prefix:
+            query += f" WHERE {section.key_column} LIKE ?"
+            params = (f"{section.key_prefix}%",)
+
+        try:
+            rows = conn.execute(query, params).fetchall()
+        except sqlite3.OperationalError as e:
+            logger.debug(f"📋 CONFIG: Table {section.table} not available, using defaults: {e}")
+            return settings
+
+        for row in rows:
+            entry = {'value': row[1]}
+            if section.type_column:
+                entry['type'] = row[2]
+            if section.has_description:
+                entry['description'] = row[-1]
+            settings[row[0]] = entry
+        return settings
+
+    def _publish(self, name: str, settings: Dict[str, Dict[str, Any]]) -> ConfigSnapshot:
+        """Swap in a new snapshot for a section and notify subscribers."""
+        with self._lock:
+            self.version += 1
+            snapshot = ConfigSnapshot(name, self.version, settings)
+            self._snapshots[name] = snapshot
+            if name == 'ai':
+                self._system_prompt = None
+            subscribers = list(self._subscribers)
+
+        for callback in subscribers:
+            try:
+                callback(name, snapshot)
+            except Exception as e:
+                logger.warning(f"⚠️ CONFIG: Subscriber failed for section '{name}': {e}")
+        return snapshot
+
+    # --- Reads (memory only) ---
+
+    def snapshot(self, section_name: str) -> ConfigSnapshot:
+        """
+        Get the current immutable snapshot of a section.
+
+        The first access loads the section if initialize() has not run yet,
+        e.g. for webhook-only deployments that skip database initialization.
+        """
+        if self._bus_pid != os.getpid():
+            self._ensure_bus()
+        snapshot = self._snapshots.get(section_name)
+        if snapshot is None:
+            with self._lock:
+                snapshot = self._snapshots.get(section_name)
+                if snapshot is None:
+                    self.reload([section_name])
+                    snapshot = self._snapshots.get(section_name)
+                    if snapshot is None:
+                        snapshot = self._publish(section_name, self._defaults_only(SECTIONS[section_name]))
+        return snapshot
+
+    def _defaults_only(self, section: ConfigSection) -> Dict[str, Dict[str, Any]]:
+        settings = {}
+        for setting_name, default_value, setting_type, description in section.defaults:
+            entry = {'value': default_value, 'description': description}
+            if section.type_column:
+                entry['type'] = setting_type
+            settings[setting_name] = entry
+        return settings
+
+    def get_value(self, section_name: str, setting_name: str, default_value: Any = None) -> Any:
+        """Get a single setting value from the in-memory snapshot."""
+        return self.snapshot(section_name).get_value(setting_name, default_value)
+
+    def get_system_prompt(self) -> str:
+        """
+        Resolve the AI system prompt: database setting, then template file, then default.
+
+        The result is cached until the AI section publishes a new version.
+        """
+        ai_snapshot = self.snapshot('ai')
+        cached = self._system_prompt
+        if cached and cached[0] == ai_snapshot.version:
+            return cached[1]
+
+        prompt = (ai_snapshot.get_value('system_prompt', '') or '').strip()
+        if prompt:
+            logger.info("✅ Loaded system prompt from database configuration")
+        else:
+            try:
+                with open(SYSTEM_PROMPT_FILE, 'r') as f:
+                    prompt = f.read().strip()
+                logger.info(f"✅ Loaded system prompt from {SYSTEM_PROMPT_FILE}")
+            except FileNotFoundError:
+                logger.warning("⚠️ System prompt file not found, using default prompt")
+            if not prompt:
+                prompt = DEFAULT_SYSTEM_PROMPT
+                logger.info("✅ Using default system prompt")
+
+        self._system_prompt = (ai_snapshot.version, prompt)
+        return prompt
+
+    # --- Writes ---
+
+    def update(self, section_name: str, setting_name: str, setting_value: Any) -> ConfigSnapshot:
+        """
+        Write a setting through to the database and publish a new snapshot.
+
+        Args:
+            section_name: Section to update
+            setting_name: Setting to change
+            setting_value: New value
+
+        Returns:
+            The newly published snapshot
+        """
+        section = SECTIONS[section_name]
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            if section.upsert:
+                description = None
+                for name, _, _, default_description in section.defaults:
+                    if name == setting_name:
+                        description = default_description
+                        break
+                if not section.has_description:
+                    cursor.execute(f'''
+                        INSERT OR REPLACE INTO {section.table} ({section.key_column}, {section.value_column}, updated_at)
+                        VALUES (?, ?, CURRENT_TIMESTAMP)
+                    ''', (setting_name, setting_value))
+                else:
+                    cursor.execute(f'''
+                        INSERT OR REPLACE INTO {section.table} ({section.key_column}, {section.value_column}, description)
+                        VALUES (?, ?, ?)
+                    ''', (setting_name, setting_value, description or 'AI Chat configuration setting'))
+            else:
+                cursor.execute(f'''
+                    UPDATE {section.table}
+                    SET {section.value_column} = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE {section.key_column} = ?
+                ''', (setting_value, setting_name))
+            conn.commit()
+            settings = self._read_section(conn, section)
+        finally:
+            conn.close()
+
+        snapshot = self._publish(section_name, settings)
+        self.bus.publish(f'config:{section_name}')
+        return snapshot
+
+    def invalidate_cache(self, cache_name: str, local: bool = True) -> None:
+        """
+        Invalidate a named cache (e.g. 'features') in this and every other worker.
+
+        Args:
+            cache_name: Name that cache owners registered with on_cache_invalidated()
+            local: Also invalidate it in this worker; False when the caller has just refreshed it
+        """
+        if local:
+            self._notify_cache_invalidated(cache_name)
+        self.bus.publish(f'cache:{cache_name}')
+
+    def _notify_cache_invalidated(self, cache_name: str) -> None:
+        with self._lock:
+            subscribers = list(self._cache_subscribers)
+        for callback in subscribers:
+            try:
+                callback(cache_name)
+            except Exception as e:
+                logger.warning(f"⚠️ CONFIG: Cache subscriber failed for '{cache_name}': {e}")
+
+    def on_cache_invalidated(self, callback: Callable[[str], None]) -> None:
+        """Register a callback invoked with the cache name whenever it is invalidated."""
+        with self._lock:
+            self._cache_subscribers.append(callback)
+
+    def subscribe(self, callback: Callable[[str, ConfigSnapshot], None]) -> None:
+        """
+        Register a callback invoked with ``(section_name, snapshot)`` on every publish.
+
+        Callbacks run on the publishing thread and must be cheap.
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+
+
+# Global instance, created on first use
+config_service = None
+_config_service_lock = threading.Lock()
+
+def get_config_service() -> ConfigService:
+    """Get the global configuration service instance."""
+    global config_service
+    if config_service is None:
+        with _config_service_lock:
+            if config_service is None:
+                config_service = ConfigService()
+    return config_service
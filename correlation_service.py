@@ -0,0 +1,695 @@
+"""
+Correlation Service for Falco Vanguard
+
+Incremental attack-chain correlation over the ingest stream. Every alert is
+appended to a sliding window for its container and, when Kubernetes fields are
+present, for its pod (CORRELATION_WINDOW_SECONDS, at most
+CORRELATION_WINDOW_MAX_ALERTS alerts each). Attack sequences are ordered lists
+of steps, each step matching rule names by regular expression, e.g.
+
+    shell spawn -> write below binary dir -> outbound connection
+
+Per window and sequence a small state machine keeps, for every step, the most
+recent partial chain that reached it; an alert matching step N extends the
+chain that reached step N-1, as long as the chain started within the
+sequence's window. A completed chain becomes an incident: a row in the
+incidents table (alerts linked in incident_alerts) and an SSE event. Further
+alerts of the same sequence and scope attach to the incident while it stays
+active and its status is 'open'; once acknowledged or resolved, the next
+completed chain starts a new incident.
+
+Rule names map to their steps through a cache, and windows, partial chains
+and incidents are kept per scope, so looking up the chain of an alert is a
+dictionary read. Sequences come from CORRELATION_SEQUENCES_FILE (JSON list)
+or the defaults below. On startup the windows are rebuilt from the last
+window of stored alerts.
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from config_service import default_db_path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEQUENCES = [
+    {
+        'name': 'container_compromise',
+        'description': 'Shell spawned, binaries written or dropped, then an outbound connection',
+        'scope': 'container',
+        'severity': 'critical',
+        'steps': [
+            {'name': 'shell_spawn', 'phase': 'execution', 'rules': r'terminal shell|run shell|shell in container'},
+            {'name': 'write_binary_dir', 'phase': 'persistence',
+             'rules': r'binary dir|drop and execute|container drift'},
+            {'name': 'outbound_connection', 'phase': 'command_and_control',
+             'rules': r'outbound|c2 server|redirect stdout|network connection'},
+        ]
+    },
+    {
+        'name': 'credential_theft',
+        'description': 'Shell spawned, credentials read, then an outbound connection',
+        'scope': 'container',
+        'severity': 'critical',
+        'steps': [
+            {'name': 'shell_spawn', 'phase': 'execution', 'rules': r'terminal shell|run shell|shell in container'},
+            {'name': 'credential_access', 'phase': 'credential_access',
+             'rules': r'sensitive file|private keys|credentials'},
+            {'name': 'outbound_connection', 'phase': 'exfiltration',
+             'rules': r'outbound|c2 server|redirect stdout|network connection'},
+        ]
+    },
+    {
+        'name': 'privilege_escalation',
+        'description': 'Shell spawned, then privilege escalation',
+        'scope': 'container',
+        'severity': 'error',
+        'steps': [
+            {'name': 'shell_spawn', 'phase': 'execution', 'rules': r'terminal shell|run shell|shell in container'},
+            {'name': 'privilege_escalation', 'phase': 'privilege_escalation',
+             'rules': r'privilege escalation|sudo|setuid|privileged'},
+        ]
+    },
+    {
+        'name': 'recon_to_cluster_api',
+        'description': 'Network reconnaissance tooling, then contact with the Kubernetes API',
+        'scope': 'pod',
+        'severity': 'error',
+        'steps': [
+            {'name': 'network_recon', 'phase': 'reconnaissance', 'rules': r'network tool|packet socket|netcat|scan'},
+            {'name': 'cluster_api_access', 'phase': 'lateral_movement', 'rules': r'k8s api|kubernetes api'},
+        ]
+    },
+    {
+        'name': 'persistence_and_cleanup',
+        'description': 'Persistence set up, then traces removed',
+        'scope': 'container',
+        'severity': 'error',
+        'steps': [
+            {'name': 'persistence', 'phase': 'persistence', 'rules': r'cron|write below etc|startup'},
+            {'name': 'trace_removal', 'phase': 'defense_evasion', 'rules': r'clear log|shell history'},
+        ]
+    },
+]
+
+SCOPES = ('container', 'pod')
+INCIDENT_STATUSES = ('open', 'acknowledged', 'resolved')
+
+# Rule names whose matching steps are cached before the cache is reset
+RULE_CACHE_SIZE = 10000
+# Alerts whose incident IDs are kept in memory
+ALERT_INDEX_SIZE = 100000
+
+
+def load_sequences(path: Optional[str] = None) -> List['AttackSequence']:
+    """
+    Load the attack sequences.
+
+    Args:
+        path: JSON file with a list of sequences (CORRELATION_SEQUENCES_FILE); the defaults if unset
+
+    Raises:
+        ValueError: If a sequence is malformed
+    """
+    path = path if path is not None else os.getenv('CORRELATION_SEQUENCES_FILE', '')
+    definitions = DEFAULT_SEQUENCES
+    if path:
+        with open(path) as f:
+            definitions = json.load(f)
+    default_window = float(os.getenv('CORRELATION_WINDOW_SECONDS', '1800'))
+    return [AttackSequence(definition, default_window) for definition in definitions]
+
+
+def iso_time(epoch: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat() if epoch is not None else None
+
+
+def parse_db_timestamp(value: Any) -> Optional[float]:
+    """Epoch seconds of an alerts.timestamp value (SQLite CURRENT_TIMESTAMP is UTC)."""
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class AttackSequence:
+    """An ordered list of steps that must occur in one scope within a time window."""
+
+    def __init__(self, definition: Dict[str, Any], default_window: float):
+        """
+        Compile a sequence definition.
+
+        Args:
+            definition: name, description, scope ('container' or 'pod'), severity, optional
+                        window_seconds, and steps (name, phase, rules regular expression)
+            default_window: Window used when the definition has none
+
+        Raises:
+            ValueError: If the scope is unknown, there are fewer than two steps or a pattern is invalid
+        """
+        self.name = definition['name']
+        self.description = definition.get('description', '')
+        self.scope = definition.get('scope', 'container')
+        if self.scope not in SCOPES:
+            raise ValueError(f"Sequence {self.name}: unknown scope {self.scope}")
+        self.severity = definition.get('severity', 'warning').lower()
+        self.window_seconds = float(definition.get('window_seconds', default_window))
+        self.steps = definition['steps']
+        if len(self.steps) < 2:
+            raise ValueError(f"Sequence {self.name}: at least two steps are required")
+        try:
+            self.patterns = [re.compile(step['rules'], re.IGNORECASE) for step in self.steps]
+        except re.error as e:
+            raise ValueError(f"Sequence {self.name}: invalid rule pattern: {e}")
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'description': self.description,
+            'scope': self.scope,
+            'severity': self.severity,
+            'window_seconds': self.window_seconds,
+            'steps': [{'name': step['name'], 'phase': step.get('phase', 'unknown'), 'rules': step['rules']}
+                      for step in self.steps]
+        }
+
+
+class ScopeState:
+    """Sliding window and per-sequence state machines of one container or pod."""
+
+    __slots__ = ('alerts', 'progress', 'incidents', 'last_seen')
+
+    def __init__(self, max_alerts: int):
+        self.alerts: deque = deque(maxlen=max_alerts)  # (alert_id, at, rule, priority) oldest first
+        # Sequence index -> per step the latest partial chain that reached it: [(alert_id, at, rule), ...]
+        self.progress: Dict[int, List[Optional[List[Tuple[Optional[int], float, str]]]]] = {}
+        self.incidents: Dict[int, Dict[str, Any]] = {}  # Sequence index -> open incident
+        self.last_seen = 0.0
+
+
+def scope_keys(alert: Dict[str, Any]) -> Dict[str, str]:
+    """Container and pod keys of an alert (the pod key only with Kubernetes fields)."""
+    fields = alert.get('output_fields') or alert.get('fields') or {}
+    if isinstance(fields, str):
+        try:
+            fields = json.loads(fields)
+        except ValueError:
+            fields = {}
+    keys = {'container': str(fields.get('container.id') or fields.get('container.name')
+                             or alert.get('source') or 'unknown')}
+    if fields.get('k8s.pod.name'):
+        keys['pod'] = f"{fields.get('k8s.ns.name') or '-'}/{fields['k8s.pod.name']}"
+    return keys
+
+
+class CorrelationEngine:
+    """Sliding-window attack sequence matching with incidents stored in SQLite."""
+
+    def __init__(self, db_path: Optional[str] = None, sequences: Optional[List[AttackSequence]] = None,
+                 window_seconds: Optional[float] = None, max_alerts: Optional[int] = None,
+                 max_scopes: Optional[int] = None):
+        """
+        Initialize the engine.
+
+        Args:
+            db_path: SQLite database with the alerts table; incidents are stored next to it
+            sequences: Attack sequences (load_sequences() by default)
+            window_seconds: Sliding window per scope (CORRELATION_WINDOW_SECONDS)
+            max_alerts: Alerts kept per window (CORRELATION_WINDOW_MAX_ALERTS)
+            max_scopes: Containers and pods tracked before the least recently seen is dropped (CORRELATION_MAX_SCOPES)
+        """
+        self.db_path = db_path or default_db_path()
+        self.enabled = os.getenv('CORRELATION_ENABLED', 'true').lower() == 'true'
+        self.sequences = sequences if sequences is not None else load_sequences()
+        self.window_seconds = window_seconds or float(os.getenv('CORRELATION_WINDOW_SECONDS', '1800'))
+        self.max_alerts = max_alerts or int(os.getenv('CORRELATION_WINDOW_MAX_ALERTS', '50'))
+        self.max_scopes = max_scopes or int(os.getenv('CORRELATION_MAX_SCOPES', '20000'))
+        # Incidents and partial chains never outlive the longest window
+        self.retention_seconds = max([self.window_seconds] + [seq.window_seconds for seq in self.sequences])
+
+        self._scopes: OrderedDict = OrderedDict()  # (scope, key) -> ScopeState, least recently seen first
+        self._rule_steps: Dict[str, Tuple[Tuple[int, int], ...]] = {}
+        self._alert_incidents: OrderedDict = OrderedDict()  # alert_id -> incident IDs
+        self._lock = threading.RLock()
+        self._tables_ready = False
+        self._warmed_up = False
+        self._replayed_through = 0  # Highest alert ID replayed by warm_up()
+        self._counters = {'observed': 0, 'matched': 0, 'incidents_created': 0, 'incidents_updated': 0,
+                          'scopes_evicted': 0, 'replayed': 0}
+
+    # --- Storage ---
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        if not self._tables_ready:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS incidents (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    sequence TEXT NOT NULL,
+                    description TEXT,
+                    severity TEXT NOT NULL,
+                    scope TEXT NOT NULL,
+                    scope_key TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'open',
+                    alert_count INTEGER NOT NULL,
+                    steps TEXT NOT NULL,
+                    first_alert_at REAL NOT NULL,
+                    last_alert_at REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS incident_alerts (
+                    incident_id INTEGER NOT NULL,
+                    alert_id INTEGER NOT NULL,
+                    step TEXT,
+                    PRIMARY KEY (incident_id, alert_id)
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_incident_alerts_alert ON incident_alerts (alert_id)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_incidents_last_alert ON incidents (last_alert_at)')
+            conn.commit()
+            self._tables_ready = True
+        return conn
+
+    def warm_up(self, before_id: Optional[int] = None) -> None:
+        """
+        Rebuild the windows from the last stored alerts and reattach the incidents still open.
+
+        Args:
+            before_id: Replay only alerts with a lower ID; alerts from this ID on are observed
+                       live (all stored alerts are replayed if None)
+        """
+        with self._lock:
+            if self._warmed_up:
+                return
+            self._warmed_up = True
+            since = time.time() - self.retention_seconds
+            try:
+                conn = self._connect()
+                try:
+                    cutoff = datetime.fromtimestamp(since, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+                    query = 'SELECT id, timestamp, rule, priority, source, fields FROM alerts WHERE timestamp >= ?'
+                    params: List[Any] = [cutoff]
+                    if before_id is not None:
+                        query += ' AND id < ?'
+                        params.append(before_id)
+                    rows = conn.execute(query + ' ORDER BY id', params).fetchall()
+                    for alert_id, timestamp, rule, priority, source, fields in rows:
+                        at = parse_db_timestamp(timestamp)
+                        if at is None or at < since:
+                            continue
+                        alert = {'rule': rule, 'priority': priority, 'source': source, 'fields': fields}
+                        self._observe(alert_id, alert, at, replay=True)
+                        self._replayed_through = alert_id
+                        self._counters['replayed'] += 1
+                    self._load_open_incidents(conn, since)
+                finally:
+                    conn.close()
+                logger.info(f"🔗 CORRELATION: Replayed {self._counters['replayed']} alerts into "
+                            f"{len(self._scopes)} windows")
+            except Exception as e:
+                logger.error(f"❌ CORRELATION: Warm-up failed: {e}")
+
+    def _load_open_incidents(self, conn: sqlite3.Connection, since: float) -> None:
+        sequence_index = {seq.name: index for index, seq in enumerate(self.sequences)}
+        rows = conn.execute('SELECT id, sequence, description, severity, scope, scope_key, status, alert_count, '
+                            'steps, first_alert_at, last_alert_at, created_at, updated_at FROM incidents '
+                            "WHERE last_alert_at >= ? AND status = 'open' ORDER BY id", (since,)).fetchall()
+        for row in rows:
+            incident = self._incident_from_row(row)
+            index = sequence_index.get(incident['sequence'])
+            if index is None:
+                continue
+            state = self._scope_state(incident['scope'], incident['scope_key'], incident['last_alert_at'])
+            state.incidents[index] = incident
+            alert_ids = [alert_id for (alert_id,) in conn.execute(
+                'SELECT alert_id FROM incident_alerts WHERE incident_id = ?', (incident['id'],))]
+            incident['alert_ids'] = alert_ids
+            for alert_id in alert_ids:
+                self._link_alert(alert_id, incident['id'])
+
+    @staticmethod
+    def _incident_from_row(row: Tuple) -> Dict[str, Any]:
+        (incident_id, sequence, description, severity, scope, scope_key, status, alert_count,
+         steps, first_alert_at, last_alert_at, created_at, updated_at) = row
+        return {
+            'id': incident_id, 'sequence': sequence, 'description': description, 'severity': severity,
+            'scope': scope, 'scope_key': scope_key, 'status': status, 'alert_count': alert_count,
+            'steps': json.loads(steps), 'first_alert_at': first_alert_at, 'last_alert_at': last_alert_at,
+            'created_at': created_at, 'updated_at': updated_at
+        }
+
+    # --- Ingest ---
+
+    def _steps_for_rule(self, rule: str) -> Tuple[Tuple[int, int], ...]:
+        """(sequence index, step index) pairs a rule matches, last step first."""
+        steps = self._rule_steps.get(rule)
+        if steps is None:
+            if len(self._rule_steps) >= RULE_CACHE_SIZE:
+                self._rule_steps.clear()
+            steps = tuple(sorted(((seq_index, step_index)
+                                  for seq_index, seq in enumerate(self.sequences)
+                                  for step_index, pattern in enumerate(seq.patterns) if pattern.search(rule)),
+                                 key=lambda pair: -pair[1]))
+            self._rule_steps[rule] = steps
+        return steps
+
+    def rule_phase(self, rule: str) -> Optional[str]:
+        """Attack phase of the first sequence step a rule matches, if any."""
+        with self._lock:
+            steps = self._steps_for_rule(rule)
+        if not steps:
+            return None
+        seq_index, step_index = min(steps)
+        return self.sequences[seq_index].steps[step_index].get('phase')
+
+    def _scope_state(self, scope: str, key: str, now: float) -> ScopeState:
+        state = self._scopes.get((scope, key))
+        if state is None:
+            state = self._scopes[(scope, key)] = ScopeState(self.max_alerts)
+            while len(self._scopes) > self.max_scopes:
+                self._scopes.popitem(last=False)
+                self._counters['scopes_evicted'] += 1
+        else:
+            self._scopes.move_to_end((scope, key))
+        state.last_seen = max(state.last_seen, now)
+        # Scopes idle for longer than any window hold nothing that can still match
+        while True:
+            oldest = next(iter(self._scopes.values()))
+            if oldest is state or now - oldest.last_seen <= self.retention_seconds:
+                break
+            self._scopes.popitem(last=False)
+        return state
+
+    def _link_alert(self, alert_id: Optional[int], incident_id: int) -> None:
+        if alert_id is None:
+            return
+        self._alert_incidents.setdefault(alert_id, set()).add(incident_id)
+        self._alert_incidents.move_to_end(alert_id)
+        while len(self._alert_incidents) > ALERT_INDEX_SIZE:
+            self._alert_incidents.popitem(last=False)
+
+    def observe(self, alert_id: Optional[int], alert: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Add an ingested alert to its windows and advance the sequence state machines.
+
+        Args:
+            alert_id: ID of the stored alert
+            alert: Alert data (rule, priority and output_fields)
+
+        Returns:
+            ('incident_created' or 'incident_updated', incident) for every incident the alert created or extended
+        """
+        if not self.enabled:
+            return []
+        if not self._warmed_up:
+            # Replay only what came before this alert, so the alert itself is observed live
+            self.warm_up(before_id=alert_id)
+        with self._lock:
+            if alert_id is not None and alert_id <= self._replayed_through:
+                return []  # Stored before the warm-up read the alerts table, already replayed
+            self._counters['observed'] += 1
+            return self._observe(alert_id, alert, time.time(), replay=False)
+
+    def _observe(self, alert_id: Optional[int], alert: Dict[str, Any], now: float,
+                 replay: bool) -> List[Tuple[str, Dict[str, Any]]]:
+        rule = str(alert.get('rule') or '')
+        steps = self._steps_for_rule(rule)
+        if steps:
+            self._counters['matched'] += 1
+        events = []
+        for scope, key in scope_keys(alert).items():
+            state = self._scope_state(scope, key, now)
+            window = state.alerts
+            window.append((alert_id, now, rule, alert.get('priority', '')))
+            while window and now - window[0][1] > self.window_seconds:
+                window.popleft()
+            for seq_index, step_index in steps:
+                sequence = self.sequences[seq_index]
+                if sequence.scope != scope:
+                    continue
+                event = self._advance(state, scope, key, seq_index, step_index, (alert_id, now, rule), replay)
+                if event is not None:
+                    events.append(event)
+        return events
+
+    def _advance(self, state: ScopeState, scope: str, key: str, seq_index: int, step_index: int,
+                 entry: Tuple[Optional[int], float, str], replay: bool) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Feed one step match into a sequence's state machine."""
+        sequence = self.sequences[seq_index]
+        now = entry[1]
+        incident = state.incidents.get(seq_index)
+        if (incident is not None and incident['status'] == 'open'
+                and now - incident['last_alert_at'] <= sequence.window_seconds):
+            # The attack is still going on: attach to the open incident
+            if replay or entry[0] in incident.get('alert_ids', ()):
+                return None
+            return 'incident_updated', self._update_incident(incident, entry, sequence.steps[step_index]['name'])
+        state.incidents.pop(seq_index, None)
+
+        progress = state.progress.setdefault(seq_index, [None] * len(sequence.steps))
+        if step_index == 0:
+            progress[0] = [entry]
+            return None
+        previous = progress[step_index - 1]
+        if previous is None or now - previous[0][1] > sequence.window_seconds:
+            return None
+        chain = previous + [entry]
+        if step_index < len(sequence.steps) - 1:
+            progress[step_index] = chain
+            return None
+        # Sequence complete
+        state.progress[seq_index] = [None] * len(sequence.steps)
+        if replay:
+            return None
+        incident = self._create_incident(sequence, scope, key, chain)
+        state.incidents[seq_index] = incident
+        return 'incident_created', incident
+
+    def _create_incident(self, sequence: AttackSequence, scope: str, key: str,
+                         chain: List[Tuple[Optional[int], float, str]]) -> Dict[str, Any]:
+        now = time.time()
+        step_names = [step['name'] for step in sequence.steps]
+        incident = {
+            'sequence': sequence.name, 'description': sequence.description, 'severity': sequence.severity,
+            'scope': scope, 'scope_key': key, 'status': 'open', 'alert_count': len(chain), 'steps': step_names,
+            'first_alert_at': chain[0][1], 'last_alert_at': chain[-1][1], 'created_at': now, 'updated_at': now,
+            'alert_ids': [alert_id for alert_id, _, _ in chain if alert_id is not None]
+        }
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                'INSERT INTO incidents (sequence, description, severity, scope, scope_key, status, alert_count, '
+                'steps, first_alert_at, last_alert_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (sequence.name, sequence.description, sequence.severity, scope, key, 'open', len(chain),
+                 json.dumps(step_names), incident['first_alert_at'], incident['last_alert_at'], now, now))
+            incident['id'] = cursor.lastrowid
+            conn.executemany('INSERT OR IGNORE INTO incident_alerts (incident_id, alert_id, step) VALUES (?, ?, ?)',
+                             [(incident['id'], alert_id, step_names[position])
+                              for position, (alert_id, _, _) in enumerate(chain) if alert_id is not None])
+            conn.commit()
+        finally:
+            conn.close()
+        for alert_id in incident['alert_ids']:
+            self._link_alert(alert_id, incident['id'])
+        self._counters['incidents_created'] += 1
+        logger.info(f"🔗 CORRELATION: Incident {incident['id']} ({sequence.name}) in {scope} {key}")
+        return incident
+
+    def _update_incident(self, incident: Dict[str, Any], entry: Tuple[Optional[int], float, str],
+                         step: str) -> Dict[str, Any]:
+        alert_id, at, _ = entry
+        now = time.time()
+        incident['alert_count'] += 1
+        incident['last_alert_at'] = max(incident['last_alert_at'], at)
+        incident['updated_at'] = now
+        conn = self._connect()
+        try:
+            conn.execute('UPDATE incidents SET alert_count = alert_count + 1, last_alert_at = ?, updated_at = ? '
+                         'WHERE id = ?', (incident['last_alert_at'], now, incident['id']))
+            if alert_id is not None:
+                conn.execute('INSERT OR IGNORE INTO incident_alerts (incident_id, alert_id, step) VALUES (?, ?, ?)',
+                             (incident['id'], alert_id, step))
+            conn.commit()
+        finally:
+            conn.close()
+        if alert_id is not None:
+            incident.setdefault('alert_ids', []).append(alert_id)
+            self._link_alert(alert_id, incident['id'])
+        self._counters['incidents_updated'] += 1
+        return incident
+
+    # --- Lookups ---
+
+    def chain(self, alert: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Correlation state of an alert's container and pod, read from the windows.
+
+        Returns:
+            Dictionary with the recent alerts per scope, sequences in progress (steps seen,
+            next step, seconds left), open incidents and the incident IDs the alert belongs to
+        """
+        if not self._warmed_up:
+            self.warm_up()
+        now = time.time()
+        alert_id = alert.get('id')
+        with self._lock:
+            scopes = {}
+            for scope, key in scope_keys(alert).items():
+                state = self._scopes.get((scope, key))
+                if state is None:
+                    scopes[scope] = {'key': key, 'alerts': [], 'in_progress': [], 'incidents': []}
+                    continue
+                scopes[scope] = {
+                    'key': key,
+                    'alerts': [{'id': a_id, 'rule': rule, 'priority': priority, 'timestamp': iso_time(at)}
+                               for a_id, at, rule, priority in state.alerts if now - at <= self.window_seconds],
+                    'in_progress': self._in_progress(state, now),
+                    'incidents': [self.describe_incident(incident) for incident in self._open_incidents(state, now)]
+                }
+            incident_ids = sorted(self._alert_incidents.get(alert_id, ())) if alert_id is not None else []
+        return {'scopes': scopes, 'alert_incidents': incident_ids, 'window_seconds': self.window_seconds}
+
+    def _open_incidents(self, state: ScopeState, now: float) -> List[Dict[str, Any]]:
+        return [incident for seq_index, incident in state.incidents.items()
+                if incident['status'] == 'open'
+                and now - incident['last_alert_at'] <= self.sequences[seq_index].window_seconds]
+
+    def _in_progress(self, state: ScopeState, now: float) -> List[Dict[str, Any]]:
+        in_progress = []
+        for seq_index, progress in state.progress.items():
+            sequence = self.sequences[seq_index]
+            reached = max((index for index, chain in enumerate(progress) if chain), default=None)
+            if reached is None:
+                continue
+            chain = progress[reached]
+            remaining = sequence.window_seconds - (now - chain[0][1])
+            if remaining <= 0:
+                continue
+            in_progress.append({
+                'sequence': sequence.name,
+                'severity': sequence.severity,
+                'steps_seen': [{'step': sequence.steps[position]['name'],
+                                'phase': sequence.steps[position].get('phase', 'unknown'),
+                                'alert_id': alert_id, 'rule': rule, 'timestamp': iso_time(at)}
+                               for position, (alert_id, at, rule) in enumerate(chain)],
+                'next_step': sequence.steps[reached + 1]['name'],
+                'next_phase': sequence.steps[reached + 1].get('phase', 'unknown'),
+                'progress': round((reached + 1) / len(sequence.steps), 2),
+                'expires_in_seconds': round(remaining)
+            })
+        in_progress.sort(key=lambda item: -item['progress'])
+        return in_progress
+
+    def describe_incident(self, incident: Dict[str, Any]) -> Dict[str, Any]:
+        """JSON-ready incident (timestamps as ISO strings)."""
+        described = {key: value for key, value in incident.items() if key != 'alert_ids'}
+        for key in ('first_alert_at', 'last_alert_at', 'created_at', 'updated_at'):
+            described[key] = iso_time(incident[key])
+        sequence = next((seq for seq in self.sequences if seq.name == incident['sequence']), None)
+        if sequence is not None:
+            described['phases'] = [step.get('phase', 'unknown') for step in sequence.steps]
+        if 'alert_ids' in incident:
+            described['alert_ids'] = list(incident['alert_ids'])
+        return described
+
+    def list_incidents(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Stored incidents, newest first."""
+        conn = self._connect()
+        try:
+            query = ('SELECT id, sequence, description, severity, scope, scope_key, status, alert_count, steps, '
+                     'first_alert_at, last_alert_at, created_at, updated_at FROM incidents')
+            params: List[Any] = []
+            if status:
+                query += ' WHERE status = ?'
+                params.append(status)
+            query += ' ORDER BY id DESC LIMIT ?'
+            params.append(limit)
+            return [self.describe_incident(self._incident_from_row(row)) for row in conn.execute(query, params)]
+        finally:
+            conn.close()
+
+    def get_incident(self, incident_id: int) -> Optional[Dict[str, Any]]:
+        """A stored incident with its alerts (ID, step, rule, priority, timestamp) in order."""
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT id, sequence, description, severity, scope, scope_key, status, alert_count, '
+                               'steps, first_alert_at, last_alert_at, created_at, updated_at FROM incidents '
+                               'WHERE id = ?', (incident_id,)).fetchone()
+            if row is None:
+                return None
+            incident = self.describe_incident(self._incident_from_row(row))
+            incident['alerts'] = [
+                {'id': alert_id, 'step': step, 'rule': rule, 'priority': priority, 'timestamp': timestamp}
+                for alert_id, step, rule, priority, timestamp in conn.execute(
+                    'SELECT ia.alert_id, ia.step, a.rule, a.priority, a.timestamp FROM incident_alerts ia '
+                    'LEFT JOIN alerts a ON a.id = ia.alert_id WHERE ia.incident_id = ? ORDER BY ia.alert_id',
+                    (incident_id,))
+            ]
+            return incident
+        finally:
+            conn.close()
+
+    def set_incident_status(self, incident_id: int, status: str) -> bool:
+        """Set an incident's status (e.g. 'acknowledged', 'resolved'); returns whether it exists."""
+        conn = self._connect()
+        try:
+            updated = conn.execute('UPDATE incidents SET status = ?, updated_at = ? WHERE id = ?',
+                                   (status, time.time(), incident_id)).rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        with self._lock:
+            for state in self._scopes.values():
+                for incident in state.incidents.values():
+                    if incident['id'] == incident_id:
+                        incident['status'] = status
+        return bool(updated)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get tracked windows, sequences in progress, configuration and counters."""
+        with self._lock:
+            now = time.time()
+            return {
+                'enabled': self.enabled,
+                'scopes': {scope: sum(1 for key in self._scopes if key[0] == scope) for scope in SCOPES},
+                'sequences_in_progress': sum(len(self._in_progress(state, now)) for state in self._scopes.values()),
+                'open_incidents': sum(len(self._open_incidents(state, now)) for state in self._scopes.values()),
+                'window_seconds': self.window_seconds,
+                'max_alerts_per_window': self.max_alerts,
+                'max_scopes': self.max_scopes,
+                'sequences': [sequence.describe() for sequence in self.sequences],
+                'counters': dict(self._counters)
+            }
+
+
+# Global instance, created on first use
+correlation_engine: Optional[CorrelationEngine] = None
+_correlation_engine_lock = threading.Lock()
+
+def get_correlation_engine(db_path: Optional[str] = None) -> CorrelationEngine:
+    """
+    Get the global correlation engine.
+
+    Args:
+        db_path: SQLite database path (defaults to the configured database)
+    """
+    global correlation_engine
+    if correlation_engine is None:
+        with _correlation_engine_lock:
+            if correlation_engine is None:
+                correlation_engine = CorrelationEngine(db_path)
+    return correlation_engine
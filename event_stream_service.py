@@ -0,0 +1,453 @@
+"""
+Event Stream Service for Falco Vanguard
+
+Fan-out hub for the dashboard's Server-Sent Events stream.
+
+- Every event gets a monotonically increasing ID and is serialized once.
+- Each client has a bounded queue. When it is full, the oldest events are
+  dropped (and the client is told to resync) or the client is disconnected,
+  depending on SSE_OVERFLOW_POLICY.
+- A ring buffer of recent events lets a reconnecting client resume from its
+  ``Last-Event-ID``. If the gap is larger than the buffer, the client gets a
+  ``resync`` event instead.
+- Bursty events such as ``counts_updated`` are coalesced, both at publish time
+  and in each client's queue.
+- Clients can subscribe with an ``EventFilter`` (priority, rule, namespace,
+  status). Events published with attributes are only queued for clients whose
+  filter matches; events without attributes go to everyone.
+
+Publishing only appends to client queues and never waits on a consumer.
+"""
+
+import os
+import json
+import time
+import logging
+import datetime
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Events where only the newest pending copy is worth delivering
+COALESCED_EVENT_TYPES = {'counts_updated'}
+
+# Falco priorities, lowest first
+PRIORITY_RANK = {'debug': 0, 'informational': 1, 'info': 1, 'notice': 2, 'warning': 3,
+                 'error': 4, 'critical': 5, 'alert': 6, 'emergency': 7}
+
+FILTER_PARAMS = ('min_priority', 'priority', 'rule', 'namespace', 'status')
+
+
+def format_event(event_id: Optional[int], data: Dict[str, Any]) -> str:
+    """Format one SSE frame."""
+    frame = f"data: {json.dumps(data)}\n\n"
+    return f"id: {event_id}\n{frame}" if event_id is not None else frame
+
+
+def _split_param(value: Optional[str]) -> frozenset:
+    return frozenset(item.strip() for item in (value or '').split(',') if item.strip())
+
+
+class EventFilter:
+    """
+    Subscription filter, compiled once per connection into a tuple of checks.
+
+    Matched against the attributes an event was published with:
+    ``priority``, ``rule``, ``namespace`` and ``statuses`` (an alert's status,
+    or old and new status for a status change).
+    """
+
+    def __init__(self, min_priority: Optional[str] = None, priorities=(), rules=(), namespaces=(), statuses=()):
+        """
+        Initialize the filter.
+
+        Args:
+            min_priority: Priority floor (e.g. 'error' also matches 'critical')
+            priorities: Exact priorities to match
+            rules: Rule names to match
+            namespaces: Kubernetes namespaces to match
+            statuses: Alert statuses to match
+
+        Raises:
+            ValueError: If a priority is not a Falco priority
+        """
+        checks = []
+        if min_priority:
+            floor = PRIORITY_RANK.get(min_priority.lower())
+            if floor is None:
+                raise ValueError(f"Unknown priority: {min_priority}")
+            checks.append(lambda attrs: PRIORITY_RANK.get(attrs.get('priority', ''), -1) >= floor)
+        if priorities:
+            priority_set = frozenset(p.lower() for p in priorities)
+            unknown = priority_set - PRIORITY_RANK.keys()
+            if unknown:
+                raise ValueError(f"Unknown priority: {', '.join(sorted(unknown))}")
+            checks.append(lambda attrs: attrs.get('priority') in priority_set)
+        if rules:
+            rule_set = frozenset(rules)
+            checks.append(lambda attrs: attrs.get('rule') in rule_set)
+        if namespaces:
+            namespace_set = frozenset(namespaces)
+            checks.append(lambda attrs: attrs.get('namespace') in namespace_set)
+        if statuses:
+            status_set = frozenset(s.lower() for s in statuses)
+            checks.append(lambda attrs: not status_set.isdisjoint(attrs.get('statuses', ())))
+        self._checks = tuple(checks)
+        # Clients with the same filter share one evaluation per event
+        self.key = (min_priority.lower() if min_priority else None, tuple(sorted(p.lower() for p in priorities)),
+                    tuple(sorted(rules)), tuple(sorted(namespaces)), tuple(sorted(s.lower() for s in statuses)))
+
+    @classmethod
+    def from_params(cls, params) -> Optional['EventFilter']:
+        """
+        Build a filter from stream query parameters (comma-separated lists).
+
+        Args:
+            params: Mapping with ``get()``, e.g. Flask ``request.args`` or aiohttp ``request.query``
+
+        Returns:
+            EventFilter, or None if no filter parameters were given
+        """
+        values = {name: params.get(name) for name in FILTER_PARAMS}
+        if not any(values.values()):
+            return None
+        return cls(min_priority=(values['min_priority'] or '').strip() or None,
+                   priorities=_split_param(values['priority']), rules=_split_param(values['rule']),
+                   namespaces=_split_param(values['namespace']), statuses=_split_param(values['status']))
+
+    def matches(self, attrs: Optional[Dict[str, Any]]) -> bool:
+        if attrs is None:
+            return True
+        for check in self._checks:
+            if not check(attrs):
+                return False
+        return True
+
+    def describe(self) -> Dict[str, Any]:
+        min_priority, priorities, rules, namespaces, statuses = self.key
+        described = {'min_priority': min_priority, 'priority': list(priorities), 'rule': list(rules),
+                     'namespace': list(namespaces), 'status': list(statuses)}
+        return {name: value for name, value in described.items() if value}
+
+
+def filter_verdicts(attrs: Optional[Dict[str, Any]]) -> Callable[[Optional[EventFilter]], bool]:
+    """Return a predicate for one event that evaluates each distinct filter only once."""
+    verdicts: Dict[tuple, bool] = {}
+
+    def accepts(event_filter: Optional[EventFilter]) -> bool:
+        if event_filter is None or attrs is None:
+            return True
+        verdict = verdicts.get(event_filter.key)
+        if verdict is None:
+            verdict = verdicts[event_filter.key] = event_filter.matches(attrs)
+        return verdict
+
+    return accepts
+
+
+class FrameQueue:
+    """
+    Bounded queue of pre-formatted SSE frames for one client (not thread-safe).
+
+    Applies the overflow policy and per-client coalescing; subclasses add the
+    wake-up mechanism (threading or asyncio).
+    """
+
+    def __init__(self, max_queue: int, overflow_policy: str, event_filter: Optional[EventFilter] = None):
+        self.max_queue = max_queue
+        self.overflow_policy = overflow_policy
+        self.event_filter = event_filter
+        self.connected_at = time.time()
+        self.closed = False
+        self.dropped = 0
+        self.delivered = 0
+        self._frames: deque = deque()
+        # Queued entry per coalesced event type, replaced by newer events of that type
+        self._pending: Dict[str, List[Any]] = {}
+        self._resync_needed = False
+
+    def _push(self, event_id: int, event_type: str, frame: str) -> bool:
+        if self.closed:
+            return False
+        pending = self._pending.get(event_type)
+        if pending is not None:
+            # Replace the queued frame with the newest one, moved to the tail so event IDs
+            # stay in order (a client resuming from this ID must not skip earlier events)
+            self._frames.remove(pending)
+            pending[0] = event_id
+            pending[2] = frame
+            self._frames.append(pending)
+            return True
+        if len(self._frames) >= self.max_queue:
+            if self.overflow_policy == 'disconnect':
+                self.closed = True
+                return False
+            dropped = self._frames.popleft()
+            if self._pending.get(dropped[1]) is dropped:
+                del self._pending[dropped[1]]
+            self.dropped += 1
+            self._resync_needed = True
+        entry = [event_id, event_type, frame]
+        self._frames.append(entry)
+        if event_type in COALESCED_EVENT_TYPES:
+            self._pending[event_type] = entry
+        return True
+
+    def _drain(self) -> List[str]:
+        frames = []
+        if self._resync_needed:
+            # Events were dropped for this client; tell it to reload
+            self._resync_needed = False
+            frames.append(format_event(None, {'type': 'resync', 'reason': 'client_lagging',
+                                              'dropped': self.dropped}))
+        while self._frames:
+            frames.append(self._frames.popleft()[2])
+        self._pending.clear()
+        self.delivered += len(frames)
+        return frames
+
+    @property
+    def depth(self) -> int:
+        return len(self._frames)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {'depth': self.depth, 'dropped': self.dropped, 'delivered': self.delivered,
+                 'connected_seconds': round(time.time() - self.connected_at, 1)}
+        if self.event_filter is not None:
+            stats['filter'] = self.event_filter.describe()
+        return stats
+
+
+class EventSubscription(FrameQueue):
+    """A client served by a thread (the Flask streaming response)."""
+
+    def __init__(self, max_queue: int, overflow_policy: str, event_filter: Optional[EventFilter] = None):
+        super().__init__(max_queue, overflow_policy, event_filter)
+        self._cond = threading.Condition()
+
+    def offer(self, event_id: int, event_type: str, frame: str) -> bool:
+        """
+        Queue a frame without blocking.
+
+        Returns:
+            False if the subscription is (now) closed
+        """
+        with self._cond:
+            accepted = self._push(event_id, event_type, frame)
+            self._cond.notify()
+            return accepted
+
+    def get(self, timeout: float) -> Optional[List[str]]:
+        """
+        Wait for queued frames and take all of them.
+
+        Returns:
+            List of frames (empty on timeout), or None once the subscription is closed
+        """
+        with self._cond:
+            if not self._frames and not self.closed:
+                self._cond.wait(timeout=timeout)
+            if self.closed and not self._frames:
+                return None
+            return self._drain()
+
+    def close(self) -> None:
+        with self._cond:
+            self.closed = True
+            self._cond.notify()
+
+
+class EventHub:
+    """Publishes events to all subscriptions and keeps a replay buffer."""
+
+    def __init__(self, max_queue: Optional[int] = None, replay_size: Optional[int] = None,
+                 overflow_policy: Optional[str] = None, coalesce_seconds: Optional[float] = None):
+        """
+        Initialize the hub.
+
+        Args:
+            max_queue: Per-client queue bound (SSE_CLIENT_QUEUE_SIZE)
+            replay_size: Events kept for Last-Event-ID resume (SSE_REPLAY_BUFFER_SIZE)
+            overflow_policy: 'drop_oldest' or 'disconnect' (SSE_OVERFLOW_POLICY)
+            coalesce_seconds: Window for merging coalesced events (SSE_COALESCE_SECONDS)
+        """
+        self.max_queue = max_queue or int(os.getenv('SSE_CLIENT_QUEUE_SIZE', '256'))
+        self.overflow_policy = overflow_policy or os.getenv('SSE_OVERFLOW_POLICY', 'drop_oldest')
+        self.coalesce_seconds = coalesce_seconds if coalesce_seconds is not None else \
+            float(os.getenv('SSE_COALESCE_SECONDS', '0.25'))
+        self._replay: deque = deque(maxlen=replay_size or int(os.getenv('SSE_REPLAY_BUFFER_SIZE', '1000')))
+        self._subscriptions: List[EventSubscription] = []
+        self._listeners: List[Callable[[int, str, str, Optional[Dict[str, Any]]], None]] = []
+        self._last_id = 0
+        self._lock = threading.RLock()
+        self._coalesce_timers: Dict[str, threading.Timer] = {}
+        self._coalesce_data: Dict[str, Any] = {}
+        self._coalesce_lock = threading.Lock()
+        self._counters = {'published': 0, 'coalesced': 0, 'disconnected_slow': 0, 'filtered_out': 0}
+
+    def publish(self, event_type: str, data: Optional[Dict[str, Any]] = None,
+                attrs: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Publish an event to every connected client whose filter matches.
+
+        Args:
+            event_type: Event type (sent as the ``type`` field)
+            data: Event payload
+            attrs: Attributes matched against subscription filters
+                (``priority``, ``rule``, ``namespace``, ``statuses``); None delivers to all
+
+        Returns:
+            The event ID
+        """
+        payload = {'type': event_type, 'timestamp': datetime.datetime.now().isoformat(), **(data or {})}
+        # Serialize once for all clients, outside the lock
+        body = format_event(None, payload)
+        with self._lock:
+            self._last_id += 1
+            event_id = self._last_id
+            frame = f"id: {event_id}\n{body}"
+            self._replay.append((event_id, event_type, frame, attrs))
+            accepts = filter_verdicts(attrs)
+            slow = []
+            for sub in self._subscriptions:
+                if not accepts(sub.event_filter):
+                    self._counters['filtered_out'] += 1
+                elif not sub.offer(event_id, event_type, frame):
+                    slow.append(sub)
+            for listener in self._listeners:
+                try:
+                    listener(event_id, event_type, frame, attrs)
+                except Exception as e:
+                    logger.error(f"❌ SSE: Event listener failed: {e}")
+            if slow:
+                self._subscriptions = [sub for sub in self._subscriptions if sub not in slow]
+                self._counters['disconnected_slow'] += len(slow)
+            clients = len(self._subscriptions)
+        self._counters['published'] += 1
+        if slow:
+            logger.warning(f"⚠️ SSE: Disconnected {len(slow)} slow clients (queue limit {self.max_queue})")
+        if clients:
+            logger.debug(f"📡 Broadcasted {event_type} #{event_id} to {clients} clients")
+        return event_id
+
+    def publish_coalesced(self, event_type: str, data=None) -> None:
+        """
+        Publish an event, merging repeated calls within the coalescing window into one.
+
+        Args:
+            event_type: Event type
+            data: Event payload, or a callable returning it when the event is sent
+        """
+        if self.coalesce_seconds <= 0:
+            self.publish(event_type, data() if callable(data) else data)
+            return
+        with self._coalesce_lock:
+            # The newest payload wins when the window closes
+            self._coalesce_data[event_type] = data
+            if event_type in self._coalesce_timers:
+                self._counters['coalesced'] += 1
+                return
+            timer = threading.Timer(self.coalesce_seconds, self._flush_coalesced, args=(event_type,))
+            timer.daemon = True
+            self._coalesce_timers[event_type] = timer
+        timer.start()
+
+    def _flush_coalesced(self, event_type: str) -> None:
+        with self._coalesce_lock:
+            self._coalesce_timers.pop(event_type, None)
+            data = self._coalesce_data.pop(event_type, None)
+        try:
+            payload = data() if callable(data) else data
+        except Exception as e:
+            logger.error(f"❌ SSE: Could not build {event_type} event: {e}")
+            payload = None
+        self.publish(event_type, payload)
+
+    def subscribe(self, last_event_id: Optional[int] = None,
+                  event_filter: Optional[EventFilter] = None) -> Tuple[EventSubscription, List[str]]:
+        """
+        Register a client.
+
+        Args:
+            last_event_id: ID of the last event the client saw, to resume after a reconnect
+            event_filter: Only deliver matching events (None for everything)
+
+        Returns:
+            tuple: (subscription, frames to replay before live events)
+        """
+        subscription = EventSubscription(self.max_queue, self.overflow_policy, event_filter)
+        with self._lock:
+            replay, _ = self.replay_since(last_event_id, event_filter)
+            self._subscriptions = self._subscriptions + [subscription]
+        return subscription, replay
+
+    def replay_since(self, last_event_id: Optional[int],
+                     event_filter: Optional[EventFilter] = None) -> Tuple[List[str], int]:
+        """
+        Frames a reconnecting client missed (that match its filter).
+
+        Returns:
+            tuple: (frames to replay, ID of the newest event included)
+        """
+        with self._lock:
+            replay: List[str] = []
+            if last_event_id is not None and last_event_id < self._last_id:
+                oldest = self._replay[0][0] if self._replay else self._last_id + 1
+                if last_event_id < oldest - 1:
+                    replay.append(format_event(None, {'type': 'resync', 'reason': 'replay_gap',
+                                                      'last_event_id': last_event_id}))
+                replay.extend(frame for event_id, _, frame, attrs in self._replay
+                              if event_id > last_event_id and (event_filter is None or event_filter.matches(attrs)))
+            return replay, self._last_id
+
+    def add_listener(self, listener: Callable[[int, str, str, Optional[Dict[str, Any]]], None]) -> None:
+        """
+        Register a callback ``listener(event_id, event_type, frame, attrs)`` run for every event.
+
+        Listeners are called in event order from the publishing thread and must not block
+        (e.g. hand the event to an event loop with ``call_soon_threadsafe``).
+        """
+        with self._lock:
+            self._listeners = self._listeners + [listener]
+
+    def unsubscribe(self, subscription: EventSubscription) -> None:
+        subscription.close()
+        with self._lock:
+            self._subscriptions = [sub for sub in self._subscriptions if sub is not subscription]
+
+    @property
+    def last_event_id(self) -> int:
+        return self._last_id
+
+    def client_count(self) -> int:
+        return len(self._subscriptions)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hub and per-client queue statistics."""
+        subscriptions = list(self._subscriptions)
+        return {
+            'clients': len(subscriptions),
+            'last_event_id': self._last_id,
+            'replay_buffer': {'size': len(self._replay), 'capacity': self._replay.maxlen,
+                              'oldest_event_id': self._replay[0][0] if self._replay else None},
+            'max_queue': self.max_queue,
+            'overflow_policy': self.overflow_policy,
+            'queues': [sub.stats() for sub in subscriptions],
+            'counters': dict(self._counters)
+        }
+
+
+# Global instance, created on first use
+event_hub = None
+_event_hub_lock = threading.Lock()
+
+def get_event_hub() -> EventHub:
+    """Get the global event hub instance."""
+    global event_hub
+    if event_hub is None:
+        with _event_hub_lock:
+            if event_hub is None:
+                event_hub = EventHub()
+    return event_hub
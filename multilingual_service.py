@@ -989,14 +989,12 @@ Response:"""
         
         return fallback_responses.get(language, fallback_responses["en"])
 
-# Global service instance
-multilingual_service = MultilingualService()
+# Global service instance, created on first use (construction reads the database)
+multilingual_service = None
 
 def get_multilingual_service() -> MultilingualService:
     """Get the global multilingual service instance"""
-    return multilingual_service
-
-# Legacy compatibility function
-def get_multilingual_service() -> MultilingualService:
-    """Legacy compatibility function - returns multilingual service"""
+    global multilingual_service
+    if multilingual_service is None:
+        multilingual_service = MultilingualService()
     return multilingual_service 
\ No newline at end of file
@@ -0,0 +1,275 @@
+"""
+Near-Duplicate Service for Falco Vanguard
+
+Recognizes alerts that are "the same thing" with different PIDs, users, paths
+or timestamps. Each alert is reduced to word-bigram shingles of its normalized
+output and command line (see slack_thread_service.normalize_output), hashed
+into a MinHash signature, and indexed with LSH banding: alerts of the same
+rule whose signatures agree on every row of at least one band become
+candidates, and a candidate matches when the estimated Jaccard similarity
+(share of equal signature rows) reaches NEAR_DUP_THRESHOLD.
+
+The ingest index keeps one representative per group of near-duplicates and
+remembers when the group last had an alert forwarded; the deduplication window
+is measured from that time, so suppressed repeats do not extend it. It is
+bounded: least recently seen representatives are evicted beyond
+NEAR_DUP_CAPACITY or once unseen for NEAR_DUP_MAX_AGE_SECONDS. Matches drive
+webhook deduplication, reuse of AI analysis for near-identical alerts
+(NEAR_DUP_REUSE_THRESHOLD) and the variant grouping in cluster_alerts_smart().
+"""
+
+import os
+import time
+import zlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from slack_thread_service import normalize_output
+
+logger = logging.getLogger(__name__)
+
+# Candidates compared per lookup; buckets only grow this large for pathological outputs
+MAX_CANDIDATES = 64
+
+
+def alert_shingles(alert: Dict[str, Any]) -> List[str]:
+    """Word bigrams of the normalized output (plus the command line if the output lacks it)."""
+    output = str(alert.get('output') or '')
+    cmdline = (alert.get('output_fields') or {}).get('proc.cmdline')
+    if cmdline and str(cmdline) not in output:
+        output = f"{output} {cmdline}"
+    tokens = normalize_output(output).split()
+    if len(tokens) < 2:
+        return tokens
+    return list({f"{a} {b}" for a, b in zip(tokens, tokens[1:])})
+
+
+class NearDuplicateEntry:
+    """Representative of a group of near-duplicate alerts."""
+
+    __slots__ = ('rule', 'signature', 'band_keys', 'alert_id', 'first_seen', 'last_seen', 'last_forwarded',
+                 'hits', 'analysis')
+
+    def __init__(self, rule: str, signature: np.ndarray, band_keys: List[int], alert_id: Optional[int], now: float):
+        self.rule = rule
+        self.signature = signature
+        self.band_keys = band_keys
+        self.alert_id = alert_id
+        self.first_seen = now
+        self.last_seen = now
+        self.last_forwarded = now
+        self.hits = 1
+        self.analysis: Optional[Dict[str, Any]] = None
+
+
+class NearDuplicateMatch:
+    """
+    A lookup hit: the representative, the estimated Jaccard similarity, the seconds since
+    the group last had an alert forwarded and whether this alert was suppressed.
+    """
+
+    __slots__ = ('entry', 'similarity', 'age_seconds', 'suppressed')
+
+    def __init__(self, entry: NearDuplicateEntry, similarity: float, age_seconds: float):
+        self.entry = entry
+        self.similarity = similarity
+        self.age_seconds = age_seconds
+        self.suppressed = False
+
+
+class NearDuplicateIndex:
+    """MinHash signatures of recent alerts with an LSH band index, bounded by LRU and age eviction."""
+
+    def __init__(self, num_perm: Optional[int] = None, bands: Optional[int] = None,
+                 threshold: Optional[float] = None, capacity: Optional[int] = None,
+                 max_age_seconds: Optional[float] = None, seed: int = 1):
+        """
+        Initialize the index.
+
+        Args:
+            num_perm: MinHash permutations (NEAR_DUP_NUM_PERM); must be divisible by ``bands``
+            bands: LSH bands (NEAR_DUP_BANDS); with 64 permutations, 16 bands of 4 rows find
+                   nearly all pairs above 0.7 similarity, fewer wider bands return fewer candidates
+            threshold: Minimum estimated Jaccard similarity of a match (NEAR_DUP_THRESHOLD)
+            capacity: Representatives kept before the least recently seen is evicted (NEAR_DUP_CAPACITY)
+            max_age_seconds: Representatives unseen for this long are evicted (NEAR_DUP_MAX_AGE_SECONDS)
+            seed: Seed of the hash functions
+        """
+        self.num_perm = num_perm or int(os.getenv('NEAR_DUP_NUM_PERM', '64'))
+        self.bands = bands or int(os.getenv('NEAR_DUP_BANDS', '16'))
+        if self.num_perm % self.bands:
+            raise ValueError(f"num_perm ({self.num_perm}) must be divisible by bands ({self.bands})")
+        self.rows = self.num_perm // self.bands
+        self.threshold = threshold if threshold is not None else float(os.getenv('NEAR_DUP_THRESHOLD', '0.75'))
+        self.reuse_threshold = float(os.getenv('NEAR_DUP_REUSE_THRESHOLD', '0.9'))
+        self.capacity = capacity or int(os.getenv('NEAR_DUP_CAPACITY', '50000'))
+        self.max_age_seconds = max_age_seconds or float(os.getenv('NEAR_DUP_MAX_AGE_SECONDS', '86400'))
+
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hashing: ((a * x + b) mod 2^64) >> 32, with odd a
+        self._a = rng.integers(1, 2 ** 63, self.num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, self.num_perm, dtype=np.uint64)
+
+        self._entries: OrderedDict = OrderedDict()  # id(entry) -> entry, least recently seen first
+        self._buckets: Dict[int, List[NearDuplicateEntry]] = {}
+        self._lock = threading.Lock()
+        self._counters = {'lookups': 0, 'matches': 0, 'added': 0, 'evicted': 0, 'analysis_reused': 0}
+
+    # --- Signatures ---
+
+    def signature(self, shingles: List[str]) -> np.ndarray:
+        """MinHash signature (uint32 per permutation) of a shingle set."""
+        if not shingles:
+            return np.full(self.num_perm, np.iinfo(np.uint32).max, dtype=np.uint32)
+        hashes = np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles))
+        with np.errstate(over='ignore'):
+            mixed = (self._a[:, None] * hashes[None, :] + self._b[:, None]) >> np.uint64(32)
+        return mixed.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, rule: str, signature: np.ndarray) -> List[int]:
+        bands = signature.reshape(self.bands, self.rows)
+        return [hash((rule, i, bands[i].tobytes())) for i in range(self.bands)]
+
+    def similarity(self, a: np.ndarray, b: np.ndarray) -> float:
+        """Estimated Jaccard similarity of two signatures."""
+        return float(np.count_nonzero(a == b)) / self.num_perm
+
+    # --- Index ---
+
+    def _best_match(self, signature: np.ndarray, band_keys: List[int], now: float) -> Optional[NearDuplicateMatch]:
+        best, best_similarity, seen = None, 0.0, set()
+        for key in band_keys:
+            for entry in self._buckets.get(key, ()):
+                if id(entry) in seen or len(seen) >= MAX_CANDIDATES:
+                    continue
+                seen.add(id(entry))
+                similarity = self.similarity(signature, entry.signature)
+                if similarity > best_similarity:
+                    best, best_similarity = entry, similarity
+        if best is None or best_similarity < self.threshold or now - best.last_seen > self.max_age_seconds:
+            return None
+        return NearDuplicateMatch(best, best_similarity, now - best.last_forwarded)
+
+    def query(self, alert: Dict[str, Any]) -> Optional[NearDuplicateMatch]:
+        """Nearest prior alert of the same rule with Jaccard similarity >= threshold, without recording this one."""
+        rule = alert.get('rule', '')
+        signature = self.signature(alert_shingles(alert))
+        with self._lock:
+            self._counters['lookups'] += 1
+            return self._best_match(signature, self._band_keys(rule, signature), time.time())
+
+    def observe(self, alert: Dict[str, Any], alert_id: Optional[int] = None,
+                window_seconds: Optional[float] = None) -> Tuple[NearDuplicateEntry, Optional[NearDuplicateMatch]]:
+        """
+        Record an ingested alert.
+
+        Args:
+            alert: Falco alert payload
+            alert_id: Database id, kept on a new representative
+            window_seconds: Deduplication window; a match whose group was forwarded less than
+                this long ago is marked suppressed (None suppresses nothing)
+
+        Returns:
+            (representative, match): the matching representative and the match, or a
+            new representative for this alert and None
+        """
+        rule = alert.get('rule', '')
+        signature = self.signature(alert_shingles(alert))
+        band_keys = self._band_keys(rule, signature)
+        now = time.time()
+        with self._lock:
+            self._counters['lookups'] += 1
+            match = self._best_match(signature, band_keys, now)
+            if match is not None:
+                entry = match.entry
+                entry.hits += 1
+                entry.last_seen = now
+                match.suppressed = window_seconds is not None and match.age_seconds <= window_seconds
+                if not match.suppressed:
+                    entry.last_forwarded = now
+                self._entries.move_to_end(id(entry))
+                self._counters['matches'] += 1
+                return entry, match
+            entry = NearDuplicateEntry(rule, signature, band_keys, alert_id, now)
+            self._entries[id(entry)] = entry
+            for key in band_keys:
+                self._buckets.setdefault(key, []).append(entry)
+            self._counters['added'] += 1
+            self._evict(now)
+            return entry, None
+
+    def attach_analysis(self, entry: NearDuplicateEntry, analysis: Dict[str, Any]) -> None:
+        """Keep the AI analysis of a representative for reuse by its near-duplicates."""
+        entry.analysis = analysis
+
+    def reusable_analysis(self, match: Optional[NearDuplicateMatch]) -> Optional[Dict[str, Any]]:
+        """AI analysis of the matched alert if it is similar enough to reuse."""
+        if match is None or match.entry.analysis is None or match.similarity < self.reuse_threshold:
+            return None
+        self._counters['analysis_reused'] += 1
+        return match.entry.analysis
+
+    def _evict(self, now: float) -> None:
+        while self._entries:
+            oldest = next(iter(self._entries.values()))
+            if len(self._entries) <= self.capacity and now - oldest.last_seen <= self.max_age_seconds:
+                break
+            del self._entries[id(oldest)]
+            for key in oldest.band_keys:
+                bucket = self._buckets.get(key)
+                if bucket is not None:
+                    bucket.remove(oldest)
+                    if not bucket:
+                        del self._buckets[key]
+            self._counters['evicted'] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index size, configuration and match counters."""
+        with self._lock:
+            return {
+                'representatives': len(self._entries),
+                'buckets': len(self._buckets),
+                'capacity': self.capacity,
+                'max_age_seconds': self.max_age_seconds,
+                'num_perm': self.num_perm,
+                'bands': self.bands,
+                'threshold': self.threshold,
+                'reuse_threshold': self.reuse_threshold,
+                'counters': dict(self._counters)
+            }
+
+
+def group_near_duplicates(alerts: List[Dict[str, Any]], threshold: Optional[float] = None) -> List[List[int]]:
+    """
+    Group alerts into near-duplicate variants.
+
+    Each alert joins the group of the most similar earlier alert of the same rule
+    (Jaccard >= threshold) or starts a new group.
+
+    Returns:
+        Lists of indexes into ``alerts``, one per group, in order of first appearance
+    """
+    index = NearDuplicateIndex(threshold=threshold, capacity=max(1, len(alerts)), max_age_seconds=float('inf'))
+    groups: Dict[int, List[int]] = {}
+    for position, alert in enumerate(alerts):
+        entry, _ = index.observe(alert)
+        groups.setdefault(id(entry), []).append(position)
+    return list(groups.values())
+
+
+# Global instance, created on first use
+near_duplicate_index = None
+_near_duplicate_index_lock = threading.Lock()
+
+def get_near_duplicate_index() -> NearDuplicateIndex:
+    """Get the global near-duplicate index used on ingest."""
+    global near_duplicate_index
+    if near_duplicate_index is None:
+        with _near_duplicate_index_lock:
+            if near_duplicate_index is None:
+                near_duplicate_index = NearDuplicateIndex()
+    return near_duplicate_index
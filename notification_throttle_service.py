@@ -0,0 +1,684 @@
+"""
+Notification Throttle Service for Falco Vanguard
+
+Implements the Slack notification policies configured in ``slack_config``:
+
+- notification_throttling / throttle_threshold: sliding-window counters per
+  (rule, channel). Once a window holds more than ``throttle_threshold`` alerts,
+  individual posts for that rule switch to a periodic digest listing the top
+  rules, counts and a sample alert. The rule returns to individual posts after
+  a digest period without alerts.
+- business_hours_only / business_hours: alerts outside business hours are held
+  and delivered as one digest when business hours start.
+- digest_mode_enabled / digest_time: all alerts are collected into a daily
+  digest delivered at ``digest_time``.
+- escalation_enabled / escalation_interval: critical alerts that are still
+  unread are re-posted as reminders every interval.
+
+Critical, alert and emergency priorities bypass throttling and digests.
+
+Held alerts and pending escalations are stored in SQLite, so they survive a
+restart and are shared by all workers; digests and reminders are scheduled on
+an in-memory timer wheel (re-armed from the tables at startup), so Slack API
+calls scale with the number of windows rather than alerts. Whichever process
+fires first claims the rows, so each digest and reminder is sent once. The
+sliding-window counters are kept per process.
+"""
+
+import os
+import json
+import math
+import time
+import sqlite3
+import logging
+import datetime
+import threading
+from collections import Counter, deque
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from config_service import default_db_path, get_config_service
+
+logger = logging.getLogger(__name__)
+
+# Priorities that trigger escalation reminders
+ESCALATION_PRIORITIES = {'critical', 'alert', 'emergency'}
+
+# Priorities that are always posted individually, never throttled or held for a digest
+BYPASS_PRIORITIES = {'critical', 'alert', 'emergency'}
+
+DIGEST_REASONS = {
+    'throttle': 'Notification throttling',
+    'business_hours': 'Held outside business hours',
+    'daily': 'Daily digest'
+}
+
+
+class TimerWheel:
+    """
+    Hashed timing wheel.
+
+    Timers are hashed into ``slots`` buckets of ``tick_seconds``; timers further
+    out than one revolution carry a remaining round count. Scheduling and
+    cancelling are O(1), and a single thread advances the wheel. The thread
+    blocks while no timers are pending instead of ticking.
+    """
+
+    def __init__(self, tick_seconds: float = 1.0, slots: int = 512, name: str = 'timer-wheel'):
+        self.tick_seconds = tick_seconds
+        self.slots: List[Dict[Hashable, list]] = [{} for _ in range(slots)]
+        self.name = name
+        self._cursor = 0
+        self._count = 0
+        self._keys: Dict[Hashable, int] = {}  # key -> slot index
+        self._cond = threading.Condition()
+        self._thread_pid: Optional[int] = None
+        self._next_tick = time.monotonic() + tick_seconds
+
+    def schedule(self, delay: float, callback: Callable[[], None], key: Optional[Hashable] = None) -> Hashable:
+        """
+        Schedule ``callback`` to run after ``delay`` seconds.
+
+        Args:
+            delay: Seconds from now (rounded up to the wheel's tick)
+            callback: Function called from the wheel thread
+            key: Optional timer key; scheduling an existing key replaces that timer
+
+        Returns:
+            The timer key, usable with cancel()
+        """
+        self._ensure_thread()
+        with self._cond:
+            if key is None:
+                key = object()
+            else:
+                self._remove(key)
+            if self._count == 0:
+                # The wheel was idle; start counting ticks from now
+                self._next_tick = time.monotonic() + self.tick_seconds
+            ticks = max(1, math.ceil(delay / self.tick_seconds))
+            slot = (self._cursor + ticks) % len(self.slots)
+            rounds = (ticks - 1) // len(self.slots)
+            self.slots[slot][key] = [rounds, callback]
+            self._keys[key] = slot
+            self._count += 1
+            self._cond.notify()
+        return key
+
+    def cancel(self, key: Hashable) -> bool:
+        """Cancel a scheduled timer. Returns True if it was pending."""
+        with self._cond:
+            return self._remove(key)
+
+    def pending(self) -> int:
+        """Number of scheduled timers."""
+        return self._count
+
+    def is_scheduled(self, key: Hashable) -> bool:
+        return key in self._keys
+
+    def _remove(self, key: Hashable) -> bool:
+        slot = self._keys.pop(key, None)
+        if slot is None:
+            return False
+        del self.slots[slot][key]
+        self._count -= 1
+        return True
+
+    def _ensure_thread(self) -> None:
+        if self._thread_pid == os.getpid():
+            return
+        with self._cond:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            threading.Thread(target=self._run, name=self.name, daemon=True).start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._count == 0:
+                    self._cond.wait()
+                wait = self._next_tick - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(timeout=wait)
+                    continue
+                due = []
+                # Catch up on every tick that has elapsed
+                while self._next_tick <= time.monotonic():
+                    self._next_tick += self.tick_seconds
+                    self._cursor = (self._cursor + 1) % len(self.slots)
+                    bucket = self.slots[self._cursor]
+                    for key, entry in list(bucket.items()):
+                        if entry[0] > 0:
+                            entry[0] -= 1
+                            continue
+                        del bucket[key]
+                        del self._keys[key]
+                        self._count -= 1
+                        due.append(entry[1])
+            for callback in due:
+                try:
+                    callback()
+                except Exception as e:
+                    logger.error(f"❌ TIMER_WHEEL: Timer callback failed: {e}")
+
+
+class SlidingWindowCounter:
+    """
+    Sliding-window "more than N events" detector.
+
+    Keeps only the most recent ``threshold + 1`` timestamps: the window exceeds
+    the threshold exactly when the oldest of them is still inside the window.
+    """
+
+    def __init__(self, threshold: int, window_seconds: float):
+        self.threshold = threshold
+        self.window_seconds = window_seconds
+        self.events = deque(maxlen=threshold + 1)
+
+    def add(self, now: float) -> bool:
+        """Record an event. Returns True if the window now exceeds the threshold."""
+        self.events.append(now)
+        return self.exceeded(now)
+
+    def exceeded(self, now: float) -> bool:
+        return len(self.events) == self.events.maxlen and now - self.events[0] <= self.window_seconds
+
+    def idle(self, now: float) -> bool:
+        return not self.events or now - self.events[-1] > self.window_seconds
+
+
+class Digest:
+    """Aggregated alerts waiting to be delivered as one Slack message."""
+
+    def __init__(self, channel: str, reason: str, started_at: Optional[float] = None):
+        self.channel = channel
+        self.reason = reason
+        self.started_at = started_at or time.time()
+        self.total = 0
+        self.rules = Counter()
+        self.priorities = Counter()
+        self.samples: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, alert: Dict[str, Any]) -> None:
+        rule = alert.get('rule', 'Unknown')
+        self.total += 1
+        self.rules[rule] += 1
+        self.priorities[str(alert.get('priority', 'unknown')).lower()] += 1
+        self.samples.setdefault(rule, alert)
+
+    def build_message(self, top_n: int = 5) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Build the Block Kit digest message.
+
+        Returns:
+            tuple: (blocks, text)
+        """
+        started = datetime.datetime.fromtimestamp(self.started_at).strftime('%Y-%m-%d %H:%M')
+        ended = datetime.datetime.now().strftime('%Y-%m-%d %H:%M')
+        top_rules = '\n'.join(f"• *{rule}* — {count}" for rule, count in self.rules.most_common(top_n))
+        if len(self.rules) > top_n:
+            top_rules += f"\n• _…and {len(self.rules) - top_n} more rules_"
+        priorities = ', '.join(f"{priority}: {count}" for priority, count in self.priorities.most_common())
+
+        top_rule = self.rules.most_common(1)[0][0]
+        sample = self.samples[top_rule]
+        sample_output = str(sample.get('output', 'N/A'))
+        if len(sample_output) > 500:
+            sample_output = sample_output[:500] + '…'
+
+        blocks = [
+            {"type": "header", "text": {"type": "plain_text", "text": "📦 Falco Alert Digest", "emoji": True}},
+            {"type": "section", "text": {"type": "mrkdwn", "text":
+                f"*{self.total} alerts* from {len(self.rules)} rules between {started} and {ended}\n"
+                f"_{DIGEST_REASONS.get(self.reason, self.reason)}_"}},
+            {"type": "section", "text": {"type": "mrkdwn", "text": f"*Top rules:*\n{top_rules}"}},
+            {"type": "section", "text": {"type": "mrkdwn", "text": f"*Priorities:* {priorities}"}},
+            {"type": "divider"},
+            {"type": "section", "text": {"type": "mrkdwn", "text":
+                f"*Sample alert ({top_rule}, {sample.get('priority', 'N/A')}):*\n{sample_output}"}}
+        ]
+        text = f"Falco Alert Digest: {self.total} alerts from {len(self.rules)} rules"
+        return blocks, text
+
+
+class NotificationThrottleService:
+    """Decides whether an alert is posted individually or folded into a digest."""
+
+    def __init__(self, db_path: Optional[str] = None, send: Optional[Callable[..., Optional[int]]] = None):
+        """
+        Initialize the throttle service.
+
+        Args:
+            db_path: SQLite database path for held alerts, escalations and alert status
+            send: Function ``send(channel, text, blocks=None, rule=None)`` used to post digests
+                  and reminders (defaults to the Slack delivery outbox)
+        """
+        self.db_path = db_path or default_db_path()
+        self.window_seconds = float(os.getenv('SLACK_THROTTLE_WINDOW_SECONDS', '300'))
+        self.digest_interval = float(os.getenv('SLACK_DIGEST_INTERVAL_SECONDS', str(self.window_seconds)))
+        self.max_escalations = int(os.getenv('SLACK_ESCALATION_MAX_REMINDERS', '3'))
+        self._send = send
+        self.wheel = TimerWheel(name='notification-timers')
+
+        self._lock = threading.Lock()
+        self._windows: Dict[Tuple[str, str], SlidingWindowCounter] = {}
+        self._throttled = set()
+        self._tables_ready = False
+        self._counters = Counter()
+
+    # --- Storage ---
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        if not self._tables_ready:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS notification_digest_items (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    channel TEXT NOT NULL,
+                    reason TEXT NOT NULL,
+                    rule TEXT,
+                    alert TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    due_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_notification_digest_items_key
+                ON notification_digest_items (channel, reason)
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS notification_escalations (
+                    alert_id INTEGER PRIMARY KEY,
+                    channel TEXT NOT NULL,
+                    alert TEXT NOT NULL,
+                    reminder INTEGER NOT NULL,
+                    due_at REAL NOT NULL
+                )
+            ''')
+            conn.commit()
+            self._tables_ready = True
+        return conn
+
+    def restore(self) -> int:
+        """
+        Re-arm digest and escalation timers for entries held by a previous run.
+
+        Returns:
+            Number of timers scheduled
+        """
+        try:
+            conn = self._connect()
+            try:
+                digests = conn.execute('''
+                    SELECT channel, reason, MIN(due_at), COUNT(*) FROM notification_digest_items
+                    GROUP BY channel, reason
+                ''').fetchall()
+                escalations = conn.execute('SELECT alert_id, due_at FROM notification_escalations').fetchall()
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.error(f"❌ THROTTLE: Could not restore held digests and escalations: {e}")
+            return 0
+
+        now = time.time()
+        for channel, reason, due_at, _ in digests:
+            self.wheel.schedule(max(0.0, due_at - now), lambda c=channel, r=reason: self._flush_digest(c, r),
+                                key=('digest', channel, reason))
+        for alert_id, due_at in escalations:
+            self.wheel.schedule(max(0.0, due_at - now), lambda a=alert_id: self._escalate(a),
+                                key=('escalation', alert_id))
+        if digests or escalations:
+            held = sum(row[3] for row in digests)
+            logger.info(f"📦 THROTTLE: Restored {len(digests)} digests ({held} held alerts) and "
+                        f"{len(escalations)} escalations")
+        return len(digests) + len(escalations)
+
+    # --- Configuration ---
+
+    @staticmethod
+    def _settings() -> Dict[str, Any]:
+        snapshot = get_config_service().snapshot('slack')
+
+        def enabled(name):
+            return str(snapshot.get_value(name, 'false')).lower() == 'true'
+
+        def number(name, default):
+            try:
+                return float(snapshot.get_value(name, default))
+            except (TypeError, ValueError):
+                return float(default)
+
+        return {
+            'throttling': enabled('notification_throttling'),
+            'threshold': max(1, int(number('throttle_threshold', 10))),
+            'business_hours_only': enabled('business_hours_only'),
+            'business_hours': snapshot.get_value('business_hours', '09:00-17:00'),
+            'digest_mode': enabled('digest_mode_enabled'),
+            'digest_time': snapshot.get_value('digest_time', '09:00'),
+            'escalation': enabled('escalation_enabled'),
+            'escalation_interval': max(1.0, number('escalation_interval', 30)) * 60
+        }
+
+    @staticmethod
+    def _parse_clock(value: str, default: str) -> datetime.time:
+        try:
+            return datetime.datetime.strptime(str(value).strip(), '%H:%M').time()
+        except ValueError:
+            return datetime.datetime.strptime(default, '%H:%M').time()
+
+    @staticmethod
+    def _seconds_until(clock: datetime.time, now: Optional[datetime.datetime] = None) -> float:
+        now = now or datetime.datetime.now()
+        target = datetime.datetime.combine(now.date(), clock)
+        if target <= now:
+            target += datetime.timedelta(days=1)
+        return (target - now).total_seconds()
+
+    def _business_hours(self, value: str) -> Tuple[datetime.time, datetime.time]:
+        start, _, end = str(value).partition('-')
+        return self._parse_clock(start, '09:00'), self._parse_clock(end, '17:00')
+
+    def in_business_hours(self, value: str, now: Optional[datetime.datetime] = None) -> bool:
+        """Check whether ``now`` falls within a ``HH:MM-HH:MM`` range (ranges may wrap midnight)."""
+        start, end = self._business_hours(value)
+        current = (now or datetime.datetime.now()).time()
+        if start <= end:
+            return start <= current < end
+        return current >= start or current < end
+
+    # --- Routing ---
+
+    def route(self, alert: Dict[str, Any], channel: str) -> Tuple[str, Optional[str]]:
+        """
+        Decide how an alert is delivered to Slack.
+
+        Args:
+            alert: Falco alert payload
+            channel: Target Slack channel
+
+        Returns:
+            tuple: ('send', None) to post the alert individually, or ('digest', reason)
+                   if it was added to a pending digest
+        """
+        if str(alert.get('priority', '')).lower() in BYPASS_PRIORITIES:
+            with self._lock:
+                self._counters['sent_urgent'] += 1
+            return 'send', None
+
+        settings = self._settings()
+
+        if settings['digest_mode']:
+            delay = self._seconds_until(self._parse_clock(settings['digest_time'], '09:00'))
+            self._add_to_digest(channel, 'daily', alert, delay)
+            return 'digest', 'daily'
+
+        if settings['business_hours_only'] and not self.in_business_hours(settings['business_hours']):
+            start, _ = self._business_hours(settings['business_hours'])
+            self._add_to_digest(channel, 'business_hours', alert, self._seconds_until(start))
+            return 'digest', 'business_hours'
+
+        if settings['throttling']:
+            rule = alert.get('rule', 'Unknown')
+            key = (rule, channel)
+            now = time.time()
+            with self._lock:
+                window = self._windows.get(key)
+                if window is None or window.threshold != settings['threshold'] \
+                        or window.window_seconds != self.window_seconds:
+                    window = self._windows[key] = SlidingWindowCounter(settings['threshold'], self.window_seconds)
+                exceeded = window.add(now)
+                newly_throttled = exceeded and key not in self._throttled
+                if exceeded:
+                    self._throttled.add(key)
+                throttled = key in self._throttled
+            if newly_throttled:
+                logger.warning(f"🚦 THROTTLE: '{rule}' exceeded {settings['threshold']} alerts per "
+                               f"{self.window_seconds / 60:.0f} min on {channel}, switching to digests")
+            if throttled:
+                self._add_to_digest(channel, 'throttle', alert, self.digest_interval)
+                return 'digest', 'throttle'
+
+        with self._lock:
+            self._counters['sent_individually'] += 1
+        return 'send', None
+
+    def _add_to_digest(self, channel: str, reason: str, alert: Dict[str, Any], delay: float) -> None:
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('''
+                INSERT INTO notification_digest_items (channel, reason, rule, alert, created_at, due_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (channel, reason, alert.get('rule', 'Unknown'), json.dumps(alert, default=str), now, now + delay))
+            conn.commit()
+        finally:
+            conn.close()
+        timer_key = ('digest', channel, reason)
+        with self._lock:
+            self._counters[f'digested_{reason}'] += 1
+            if not self.wheel.is_scheduled(timer_key):
+                self.wheel.schedule(delay, lambda: self._flush_digest(channel, reason), key=timer_key)
+
+    def _claim_digest(self, channel: str, reason: str) -> Optional[Digest]:
+        """Take all held alerts for a digest out of the table (atomically, across workers)."""
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            rows = conn.execute('''
+                SELECT id, alert, created_at FROM notification_digest_items
+                WHERE channel = ? AND reason = ? ORDER BY id
+            ''', (channel, reason)).fetchall()
+            if rows:
+                conn.execute('DELETE FROM notification_digest_items WHERE channel = ? AND reason = ? AND id <= ?',
+                             (channel, reason, rows[-1][0]))
+            conn.commit()
+        finally:
+            conn.close()
+        if not rows:
+            return None
+        digest = Digest(channel, reason, started_at=rows[0][2])
+        for _, alert, _ in rows:
+            digest.add(json.loads(alert))
+        return digest
+
+    def _flush_digest(self, channel: str, reason: str) -> None:
+        released = []
+        still_throttled = False
+        digest = self._claim_digest(channel, reason)
+        with self._lock:
+            if reason == 'throttle':
+                # Rules without alerts in this period go back to individual posts
+                for key in list(self._throttled):
+                    if key[1] != channel:
+                        continue
+                    if digest is None or key[0] not in digest.rules:
+                        self._throttled.discard(key)
+                        released.append(key[0])
+                    else:
+                        still_throttled = True
+                self._prune_windows()
+        if released:
+            logger.info(f"🚦 THROTTLE: Resuming individual posts on {channel} for {', '.join(released)}")
+        if still_throttled:
+            # Keep the digest cadence so quiet rules are released even if no further alerts arrive
+            self.wheel.schedule(self.digest_interval, lambda: self._flush_digest(channel, reason),
+                                key=('digest', channel, reason))
+        if digest is None or digest.total == 0:
+            return
+
+        blocks, text = digest.build_message()
+        self._post(channel, text, blocks=blocks, rule='digest')
+        with self._lock:
+            self._counters['digests_sent'] += 1
+        logger.info(f"📦 DIGEST: Sent {reason} digest of {digest.total} alerts "
+                    f"({len(digest.rules)} rules) to {channel}")
+
+    def _prune_windows(self) -> None:
+        now = time.time()
+        for key in [key for key, window in self._windows.items()
+                    if key not in self._throttled and window.idle(now)]:
+            del self._windows[key]
+
+    # --- Escalation ---
+
+    def schedule_escalation(self, alert: Dict[str, Any], channel: str, alert_id: Optional[int]) -> bool:
+        """
+        Schedule reminders for a critical alert until it is no longer unread.
+
+        Args:
+            alert: Falco alert payload
+            channel: Slack channel the alert was posted to
+            alert_id: Database id of the stored alert
+
+        Returns:
+            True if a reminder was scheduled
+        """
+        if alert_id is None or str(alert.get('priority', '')).lower() not in ESCALATION_PRIORITIES:
+            return False
+        settings = self._settings()
+        if not settings['escalation']:
+            return False
+        interval = settings['escalation_interval']
+        conn = self._connect()
+        try:
+            conn.execute('''
+                INSERT OR REPLACE INTO notification_escalations (alert_id, channel, alert, reminder, due_at)
+                VALUES (?, ?, ?, 1, ?)
+            ''', (alert_id, channel, json.dumps(alert, default=str), time.time() + interval))
+            conn.commit()
+        finally:
+            conn.close()
+        self.wheel.schedule(interval, lambda: self._escalate(alert_id), key=('escalation', alert_id))
+        return True
+
+    def _claim_escalation(self, alert_id: int, interval: Optional[float]) -> Optional[Tuple[str, Dict[str, Any], int]]:
+        """
+        Claim a due escalation reminder, advancing (or removing) its row so no other worker sends it.
+
+        Args:
+            alert_id: Escalated alert
+            interval: Seconds until the following reminder, or None to drop the escalation
+
+        Returns:
+            tuple: (channel, alert, reminder number), or None if nothing is due
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT channel, alert, reminder, due_at FROM notification_escalations WHERE alert_id = ?',
+                               (alert_id,)).fetchone()
+            if row is None:
+                conn.commit()
+                return None
+            channel, alert, reminder, due_at = row
+            # The wheel may fire up to one tick early
+            if due_at > now + self.wheel.tick_seconds and interval is not None:
+                conn.commit()
+                self.wheel.schedule(due_at - now, lambda: self._escalate(alert_id), key=('escalation', alert_id))
+                return None
+            if interval is None or reminder >= self.max_escalations:
+                conn.execute('DELETE FROM notification_escalations WHERE alert_id = ?', (alert_id,))
+            else:
+                conn.execute('UPDATE notification_escalations SET reminder = ?, due_at = ? WHERE alert_id = ?',
+                             (reminder + 1, now + interval, alert_id))
+            conn.commit()
+        finally:
+            conn.close()
+        return channel, json.loads(alert), reminder
+
+    def _drop_escalation(self, alert_id: int) -> None:
+        conn = self._connect()
+        try:
+            conn.execute('DELETE FROM notification_escalations WHERE alert_id = ?', (alert_id,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _alert_status(self, alert_id: int) -> Optional[str]:
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            row = conn.execute('SELECT status FROM alerts WHERE id = ?', (alert_id,)).fetchone()
+            return row[0] if row else None
+        finally:
+            conn.close()
+
+    def _escalate(self, alert_id: int) -> None:
+        settings = self._settings()
+        interval = settings['escalation_interval'] if settings['escalation'] else None
+        claimed = self._claim_escalation(alert_id, interval)
+        if claimed is None or interval is None:
+            return
+        channel, alert, reminder = claimed
+        status = self._alert_status(alert_id)
+        if status != 'unread':
+            self._drop_escalation(alert_id)
+            logger.info(f"✅ ESCALATION: Alert #{alert_id} is {status or 'gone'}, no reminder needed")
+            return
+
+        minutes = settings['escalation_interval'] * reminder / 60
+        text = (f":rotating_light: *Escalation:* {alert.get('priority', 'critical').capitalize()} alert "
+                f"*{alert.get('rule', 'Unknown')}* (#{alert_id}) has been unacknowledged for {minutes:.0f} minutes")
+        self._post(channel, text, rule=alert.get('rule'))
+        with self._lock:
+            self._counters['escalations_sent'] += 1
+        logger.warning(f"🚨 ESCALATION: Reminder {reminder}/{self.max_escalations} for alert #{alert_id} sent to {channel}")
+
+        if reminder < self.max_escalations:
+            self.wheel.schedule(interval, lambda: self._escalate(alert_id), key=('escalation', alert_id))
+
+    # --- Delivery ---
+
+    def _post(self, channel: str, text: str, blocks: Optional[List[Dict[str, Any]]] = None,
+              rule: Optional[str] = None) -> Optional[int]:
+        if self._send is None:
+            from slack_delivery_service import get_slack_delivery_service
+            self._send = get_slack_delivery_service().enqueue
+        return self._send(channel, text, blocks=blocks, rule=rule)
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Get throttling state for monitoring.
+
+        Returns:
+            Dict with throttled rules, pending digests and escalations, timer count and counters
+        """
+        conn = self._connect()
+        try:
+            digests = conn.execute('''
+                SELECT channel, reason, COUNT(*), COUNT(DISTINCT rule), MIN(created_at), MIN(due_at)
+                FROM notification_digest_items GROUP BY channel, reason
+            ''').fetchall()
+            escalations = conn.execute('SELECT COUNT(*) FROM notification_escalations').fetchone()[0]
+        finally:
+            conn.close()
+        with self._lock:
+            return {
+                'throttled': [{'rule': rule, 'channel': channel} for rule, channel in sorted(self._throttled)],
+                'pending_digests': [
+                    {'channel': channel, 'reason': reason, 'alerts': total, 'rules': rules,
+                     'started_at': started_at, 'due_at': due_at}
+                    for channel, reason, total, rules, started_at, due_at in digests
+                ],
+                'pending_escalations': escalations,
+                'tracked_windows': len(self._windows),
+                'scheduled_timers': self.wheel.pending(),
+                'window_seconds': self.window_seconds,
+                'digest_interval_seconds': self.digest_interval,
+                'counters': dict(self._counters)
+            }
+
+
+# Global instance, created on first use
+notification_throttle_service = None
+_notification_throttle_lock = threading.Lock()
+
+def get_notification_throttle_service() -> NotificationThrottleService:
+    """Get the global notification throttle service instance."""
+    global notification_throttle_service
+    if notification_throttle_service is None:
+        with _notification_throttle_lock:
+            if notification_throttle_service is None:
+                notification_throttle_service = NotificationThrottleService()
+    return notification_throttle_service
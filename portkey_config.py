@@ -1,5 +1,4 @@
 import os
-from portkey_ai import Portkey
 import logging
 
 def initialize_portkey_clients():
@@ -23,6 +22,9 @@ def initialize_portkey_clients():
         return None, None  # Return None tuple if API key is missing
 
     try:
+        # portkey_ai is slow to import, so only load it once a client is actually needed
+        from portkey_ai import Portkey
+
         if provider_name == "openai":
             if virtual_key_openai:
                 portkey_client_openai = Portkey(
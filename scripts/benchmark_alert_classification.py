@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for keyword-based alert classification
+
+Compares the legacy helpers (each one lowercasing the alert text and testing
+every keyword of its lists with a substring search, the category scan running
+up to three times per alert) with the shared Aho-Corasick match used by
+classify_alert_realtime(), and checks that both classify a set of sample
+alerts identically.
+
+Usage:
+    python scripts/benchmark_alert_classification.py
+    python scripts/benchmark_alert_classification.py --iterations 20000
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from alert_classifier_service import (  # noqa: E402
+    ESCALATION_INDICATORS, FALSE_POSITIVE_INDICATORS, PERSISTENCE_INDICATORS, THREAT_CATEGORIES, AlertClassifier
+)
+
+SAMPLE_ALERTS = [
+    {
+        'rule': 'Terminal shell in container',
+        'priority': 'Notice',
+        'output': 'A shell was spawned in a container with an attached terminal (evt_type=execve user=root '
+                  'user_uid=0 process=bash proc_exepath=/usr/bin/bash parent=runc command=bash -il terminal=34816 '
+                  'container_id=0123456789ab container_image=docker.io/library/nginx k8s_ns=default k8s_pod_name=web)'
+    },
+    {
+        'rule': 'Schedule Cron Jobs',
+        'priority': 'Notice',
+        'output': 'Cron jobs were scheduled to run (user=root command=crontab -e file=/var/spool/cron/root '
+                  'container_id=host container_name=host)'
+    },
+    {
+        'rule': 'Launch Privileged Container',
+        'priority': 'Informational',
+        'output': 'Privileged container started (user=admin command=container:3ad7b26ded6d image=nginx:latest)'
+    },
+    {
+        'rule': 'Outbound Connection to C2 Servers',
+        'priority': 'Critical',
+        'output': 'Outbound connection to C2 server (command=curl -s http://198.51.100.7/upload connection=10.0.0.4:'
+                  '43210->198.51.100.7:443 user=www-data container_name=api) data transfer started'
+    },
+    {
+        'rule': 'Debug rule with ünïcode',
+        'priority': 'Debug',
+        'output': 'Ünïcode output with sudo su escalation and a hidden network scan'
+    }
+]
+
+
+def legacy_classify(alert_data):
+    """Keyword features as the helpers computed them before the shared match."""
+    def category():
+        alert_text = f"{alert_data.get('rule', '')} {alert_data.get('output', '')}".lower()
+        category_scores = {}
+        for name, keywords in THREAT_CATEGORIES.items():
+            score = sum(1 for keyword in keywords if keyword in alert_text)
+            if score > 0:
+                category_scores[name] = score
+        return max(category_scores, key=category_scores.get) if category_scores else "unknown"
+
+    threat_category = category()
+
+    output = alert_data.get('output', '').lower()
+    severity = sum(0.2 for indicator in ESCALATION_INDICATORS if indicator in output)
+    severity += sum(0.15 for indicator in PERSISTENCE_INDICATORS if indicator in output)
+
+    alert_text = f"{alert_data.get('rule', '')} {alert_data.get('output', '')}".lower()
+    tags = []
+    tag_category = category()
+    if tag_category != "unknown":
+        tags.append(f"threat:{tag_category}")
+    if 'container' in alert_text:
+        tags.append("tech:container")
+    if 'network' in alert_text or 'connection' in alert_text:
+        tags.append("tech:network")
+    if 'file' in alert_text or 'filesystem' in alert_text:
+        tags.append("tech:filesystem")
+    if 'process' in alert_text or 'execution' in alert_text:
+        tags.append("tech:process")
+
+    rule = alert_data.get('rule', '').lower()
+    false_positive = any(indicator in rule for indicator in FALSE_POSITIVE_INDICATORS)
+
+    alert_text = f"{alert_data.get('rule', '')} {alert_data.get('output', '')}".lower()
+    reasons = [keyword for keyword in THREAT_CATEGORIES.get(threat_category, ()) if keyword in alert_text]
+    return threat_category, round(min(1.0, severity), 6), tags, false_positive, reasons
+
+
+def shared_classify(classifier, alert_data):
+    """The same features from one automaton pass."""
+    match = classifier.match(alert_data)
+    threat_category = classifier.threat_category(match)
+    tags = [f"threat:{threat_category}"] if threat_category != "unknown" else []
+    tags.extend(classifier.tech_tags(match))
+    return (threat_category, round(classifier.severity_adjustment(match), 6), tags,
+            classifier.false_positive_hint(match), classifier.category_keywords(match, threat_category))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Benchmark keyword-based alert classification')
+    parser.add_argument('--iterations', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5, help='Repetitions (fastest is kept)')
+    args = parser.parse_args()
+
+    build_seconds = min(timeit.repeat(lambda: AlertClassifier(THREAT_CATEGORIES), repeat=3, number=1))
+    classifier = AlertClassifier(THREAT_CATEGORIES)
+    print(f"🔧 Automaton: {len(classifier.automaton.patterns)} keywords, {classifier.automaton.states} states, "
+          f"built in {build_seconds * 1000:.1f} ms")
+
+    for alert in SAMPLE_ALERTS:
+        legacy, shared = legacy_classify(alert), shared_classify(classifier, alert)
+        if legacy != shared:
+            print(f"❌ Classification differs for '{alert['rule']}':\n   legacy {legacy}\n   shared {shared}")
+            return 1
+
+    results = {}
+    for name, func in (('legacy', legacy_classify), ('automaton', lambda alert: shared_classify(classifier, alert))):
+        timer = timeit.Timer(lambda: [func(alert) for alert in SAMPLE_ALERTS])
+        best = min(timer.repeat(repeat=args.repeat, number=args.iterations))
+        results[name] = best / (args.iterations * len(SAMPLE_ALERTS)) * 1e6
+        print(f"⏱️  {name:<10} {results[name]:8.1f} µs per alert ({1e6 / results[name]:,.0f} alerts/s)")
+
+    print(f"🚀 Speedup: {results['legacy'] / results['automaton']:.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
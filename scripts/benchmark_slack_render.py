@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for Slack alert message rendering
+
+Compares the legacy path (json.load of the template plus recursive
+replace_template_variables on every alert) with the compiled template used by
+build_alert_message(), and checks that both produce identical blocks.
+
+Usage:
+    python scripts/benchmark_slack_render.py
+    python scripts/benchmark_slack_render.py --iterations 20000
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+os.chdir(REPO_ROOT)
+
+from slack import ALERT_TEMPLATE_FILE, build_alert_message, replace_template_variables  # noqa: E402
+
+SAMPLE_ALERT = {
+    'rule': 'Terminal shell in container',
+    'priority': 'Critical',
+    'output': 'A shell was spawned in a container with an attached terminal (user=root shell=bash)',
+    'time': '2024-01-01T12:00:00.000000000Z',
+    'output_fields': {'proc.cmdline': 'bash -il', 'container.id': 'abc123'}
+}
+
+SAMPLE_ANALYSIS = {
+    'Security Impact': {'content': 'An interactive shell may indicate unauthorized access.'},
+    'Next Steps': {'content': 'Verify who opened the shell and review recent container activity.'},
+    'Remediation Steps': {'content': 'Restrict exec permissions and add runtime protection rules.'},
+    'Suggested Commands': {'content': 'kubectl logs <pod>\nkubectl describe pod <pod>'},
+    'llm_provider': 'OpenAI via Portkey'
+}
+
+
+def legacy_render(falco_alert, explanation_sections):
+    """Rendering as it was done before templates were compiled (blocks from the template only)."""
+    with open(ALERT_TEMPLATE_FILE, 'r') as f:
+        template = json.load(f)
+    priority = falco_alert.get('priority', 'N/A')
+    template_vars = {
+        'rule': falco_alert.get('rule', 'N/A'),
+        'priority': priority.capitalize(),
+        'urgency_emoji': ':fire:',
+        'output': falco_alert.get('output', 'N/A'),
+        'time': falco_alert.get('time', 'N/A'),
+        'llm_provider': explanation_sections.get('llm_provider', 'N/A'),
+        'falco_command': falco_alert.get('output_fields', {}).get('proc.cmdline', 'N/A'),
+        'explanation_sections': {
+            key.replace(' ', '_'): {'content': explanation_sections.get(key, {}).get('content', 'N/A')}
+            for key in ('Security Impact', 'Next Steps', 'Remediation Steps', 'Suggested Commands')
+        }
+    }
+    return [replace_template_variables(block, template_vars) for block in template['blocks']]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Benchmark Slack alert message rendering')
+    parser.add_argument('--iterations', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5, help='Repetitions (fastest is kept)')
+    args = parser.parse_args()
+
+    compiled_blocks, _ = build_alert_message(SAMPLE_ALERT, SAMPLE_ANALYSIS)
+    legacy_blocks = legacy_render(SAMPLE_ALERT, SAMPLE_ANALYSIS)
+    if compiled_blocks[:len(legacy_blocks)] != legacy_blocks:
+        print("❌ Compiled template output differs from legacy rendering")
+        return 1
+
+    results = {}
+    for name, func in (('legacy', legacy_render), ('compiled', build_alert_message)):
+        timer = timeit.Timer(lambda: func(SAMPLE_ALERT, SAMPLE_ANALYSIS))
+        best = min(timer.repeat(repeat=args.repeat, number=args.iterations))
+        results[name] = best / args.iterations * 1e6
+        print(f"⏱️  {name:<9} {results[name]:8.1f} µs per alert")
+
+    print(f"🚀 Speedup: {results['legacy'] / results['compiled']:.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Import-time report for app.py
+
+Runs ``python -X importtime -c "import app"`` in a fresh interpreter, summarizes
+the most expensive top-level imports and compares the result against the
+checked-in baseline (scripts/import_time_baseline.json).
+
+The check fails if a heavy optional dependency is imported eagerly again, or if
+the total import time regresses beyond the allowed tolerance.
+
+Usage:
+    python scripts/import_time_report.py                  # report + compare
+    python scripts/import_time_report.py --write-baseline # refresh baseline
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(REPO_ROOT, 'scripts', 'import_time_baseline.json')
+
+# Dependencies that must only be imported on first use
+LAZY_MODULES = [
+    'weaviate', 'weaviate_service', 'vector_index_service', 'near_duplicate_service',
+    'alert_clustering_service', 'alert_clustering_worker', 'alert_analytics_service',
+    'behavior_baseline_service', 'correlation_service', 'sklearn', 'numpy', 'portkey_ai',
+    'aiohttp', 'mcp_service'
+]
+
+
+def run_importtime(runs: int) -> dict:
+    """Import app in fresh interpreters and return the fastest run's measurements."""
+    best = None
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = dict(os.environ)
+        env.setdefault('DB_PATH', os.path.join(tmp_dir, 'alerts.db'))
+        for _ in range(runs):
+            result = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', 'import app'],
+                cwd=REPO_ROOT, env=env, capture_output=True, text=True
+            )
+            if result.returncode != 0:
+                sys.stderr.write(result.stderr)
+                raise SystemExit("❌ Importing app failed")
+            measurement = parse_importtime(result.stderr)
+            if best is None or measurement['total_ms'] < best['total_ms']:
+                best = measurement
+    return best
+
+
+def parse_importtime(output: str) -> dict:
+    """Parse ``-X importtime`` output into totals per module."""
+    modules = {}
+    top_level = {}
+    total_us = 0
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        module = name.strip()
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        modules[module] = int(cumulative_us) / 1000
+        if module == 'app':
+            total_us = int(cumulative_us)
+        elif depth == 1:
+            top_level[module] = int(cumulative_us) / 1000
+    return {
+        'total_ms': round(total_us / 1000, 1),
+        'top_level_ms': dict(sorted(top_level.items(), key=lambda item: -item[1])),
+        'imported': sorted(modules.keys())
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Import-time regression report for app.py')
+    parser.add_argument('--runs', type=int, default=5, help='Number of runs (fastest is kept)')
+    parser.add_argument('--top', type=int, default=15, help='Number of top-level imports to show')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='Allowed slowdown versus baseline total (0.5 = +50%%)')
+    parser.add_argument('--write-baseline', action='store_true', help='Write the measured result as the new baseline')
+    args = parser.parse_args()
+
+    measurement = run_importtime(args.runs)
+
+    print(f"⏱️  import app: {measurement['total_ms']:.1f} ms (fastest of {args.runs})")
+    print("📊 Top-level imports (cumulative ms):")
+    for name, ms in list(measurement['top_level_ms'].items())[:args.top]:
+        print(f"   {ms:9.1f}  {name}")
+
+    eager = [module for module in LAZY_MODULES if module in measurement['imported']]
+
+    if args.write_baseline:
+        baseline = {
+            'python': sys.version.split()[0],
+            'total_ms': measurement['total_ms'],
+            'top_level_ms': {name: round(ms, 1) for name, ms in list(measurement['top_level_ms'].items())[:args.top]},
+            'lazy_modules': LAZY_MODULES
+        }
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(baseline, f, indent=2)
+            f.write('\n')
+        print(f"✅ Baseline written to {os.path.relpath(BASELINE_PATH, REPO_ROOT)}")
+        return 0
+
+    failed = False
+    if eager:
+        print(f"❌ Heavy modules imported eagerly: {', '.join(eager)}")
+        failed = True
+
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+        limit = baseline['total_ms'] * (1 + args.tolerance)
+        print(f"📋 Baseline: {baseline['total_ms']:.1f} ms (limit {limit:.1f} ms)")
+        if measurement['total_ms'] > limit:
+            print(f"❌ Import time regressed: {measurement['total_ms']:.1f} ms > {limit:.1f} ms")
+            failed = True
+        if baseline.get('lazy_modules') != LAZY_MODULES:
+            print("❌ Baseline lazy_modules differ from LAZY_MODULES, run with --write-baseline")
+            failed = True
+    else:
+        print("⚠️ No baseline found, run with --write-baseline to create one")
+
+    if not failed:
+        print("✅ Import time within budget")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,7 @@
 import json
 import logging
+import re
+import threading
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
 import os
@@ -7,6 +9,97 @@ import os
 LLM_PROVIDER_OPENAI = "OpenAI via Portkey"
 LLM_PROVIDER_GEMINI = "Gemini via Portkey"
 
+ALERT_TEMPLATE_FILE = "templates/falco_alert_template.json"
+
+_PLACEHOLDER_RE = re.compile(r'\{\{([\w.]+)\}\}')
+
+
+class CompiledTemplate:
+    """
+    Block Kit template compiled into a render plan.
+
+    The JSON is parsed once; every string leaf that contains ``{{placeholders}}``
+    is split into literal and variable parts, so rendering is a single join per
+    templated leaf instead of a replace per variable per node. Static subtrees
+    are kept as-is and only their containers are rebuilt on render.
+    """
+
+    def __init__(self, template, mtime=None):
+        self.mtime = mtime
+        self.leaves = []  # (path, placeholder names) for every templated leaf
+        self._render_blocks = self._compile(template.get('blocks', []), ('blocks',))
+
+    @property
+    def placeholders(self):
+        """All placeholder names used by the template."""
+        return sorted({name for _, names in self.leaves for name in names})
+
+    def _compile(self, node, path):
+        if isinstance(node, dict):
+            items = [(key, self._compile(value, path + (key,))) for key, value in node.items()]
+            return lambda values: {key: render(values) for key, render in items}
+        if isinstance(node, list):
+            items = [self._compile(item, path + (index,)) for index, item in enumerate(node)]
+            return lambda values: [render(values) for render in items]
+        if isinstance(node, str):
+            parts = _PLACEHOLDER_RE.split(node)
+            if len(parts) == 1:
+                return lambda values: node
+            # Odd indexes are placeholder names, even indexes are literal text
+            names = parts[1::2]
+            self.leaves.append((path, names))
+            literals = parts[0::2]
+            if len(names) == 1 and not literals[0] and not literals[1]:
+                name = names[0]
+                return lambda values: values.get(name, node)
+
+            def render_leaf(values):
+                out = [literals[0]]
+                for name, literal in zip(names, literals[1:]):
+                    value = values.get(name)
+                    out.append(value if value is not None else "{{" + name + "}}")
+                    out.append(literal)
+                return ''.join(out)
+            return render_leaf
+        return lambda values: node
+
+    def render(self, values):
+        """
+        Render the template blocks.
+
+        Args:
+            values: Flat mapping of placeholder name (e.g. ``explanation_sections.Next_Steps.content``) to string
+
+        Returns:
+            list: Block Kit blocks; unknown placeholders are left untouched
+        """
+        return self._render_blocks(values)
+
+
+_template_cache = {}
+_template_lock = threading.Lock()
+
+
+def get_compiled_template(template_file=ALERT_TEMPLATE_FILE):
+    """
+    Returns the compiled template, recompiling only when the file's mtime changes.
+
+    Raises:
+        FileNotFoundError: If the template file does not exist
+    """
+    mtime = os.stat(template_file).st_mtime_ns
+    compiled = _template_cache.get(template_file)
+    if compiled is not None and compiled.mtime == mtime:
+        return compiled
+    with _template_lock:
+        compiled = _template_cache.get(template_file)
+        if compiled is None or compiled.mtime != mtime:
+            with open(template_file, 'r') as f:
+                compiled = CompiledTemplate(json.load(f), mtime)
+            _template_cache[template_file] = compiled
+            logging.info(f"Compiled Slack template '{template_file}' ({len(compiled.leaves)} templated fields)")
+    return compiled
+
 
 def format_slack_message_basic(alert_payload, error_message=""):
     """
@@ -46,16 +139,17 @@ def send_slack_message(message_content, slack_client, slack_channel_name):
         raise  # Re-raise the exception so the caller can handle it
 
 
-def post_to_slack(falco_alert, explanation_sections, slack_client, slack_channel_name):
+def build_alert_message(falco_alert, explanation_sections):
     """
-    Posts a formatted Falco alert message to Slack, including LLM explanations.
+    Builds the Block Kit blocks and fallback text for a Falco alert with LLM explanations.
+
+    Returns:
+        tuple: (blocks, text), or None if the message template is missing.
     """
     try:
-        template_file = "templates/falco_alert_template.json"
-        with open(template_file, 'r') as f:
-            template = json.load(f)
+        template = get_compiled_template()
     except FileNotFoundError:
-        logging.error(f"Template file '{template_file}' not found.")
+        logging.error(f"Template file '{ALERT_TEMPLATE_FILE}' not found.")
         return None
 
     # --- Extract relevant information ---
@@ -76,29 +170,29 @@ def post_to_slack(falco_alert, explanation_sections, slack_client, slack_channel
     elif priority.lower() == "notice":
         urgency_emoji = ":information_source:"
 
+    def section_content(name, default):
+        if not explanation_sections:
+            return default
+        return explanation_sections.get(name, {}).get('content', default)
+
+    suggested_commands = str(section_content('Suggested Commands', '') or '')
     template_vars = {
-        'rule': rule,
+        'rule': str(rule),
         'priority': priority.capitalize(),
         'urgency_emoji': urgency_emoji,
-        'output': output,
-        'time': time,
-        'llm_provider': llm_provider,
-        'falco_command': falco_command,
-        'explanation_sections': {
-            'Security_Impact': {'content': explanation_sections.get('Security Impact', {}).get('content', 'N/A') if explanation_sections else 'N/A'},
-            'Next_Steps': {'content': explanation_sections.get('Next Steps', {}).get('content', 'N/A') if explanation_sections else 'N/A'},
-            'Remediation_Steps': {'content': explanation_sections.get('Remediation Steps', {}).get('content', 'N/A') if explanation_sections else 'N/A'},
-            'Suggested_Commands': {'content': explanation_sections.get('Suggested Commands', {}).get('content', '') if explanation_sections else ''},
-        }
+        'output': str(output),
+        'time': str(time),
+        'llm_provider': str(llm_provider),
+        'falco_command': str(falco_command),
+        'explanation_sections.Security_Impact.content': str(section_content('Security Impact', 'N/A')),
+        'explanation_sections.Next_Steps.content': str(section_content('Next Steps', 'N/A')),
+        'explanation_sections.Remediation_Steps.content': str(section_content('Remediation Steps', 'N/A')),
+        'explanation_sections.Suggested_Commands.content': suggested_commands,
     }
 
-    message_blocks = []
-    for block in template['blocks']:
-        updated_block = replace_template_variables(block, template_vars)
-        message_blocks.append(updated_block)
+    message_blocks = template.render(template_vars)
 
     # Add suggested commands section if commands are available
-    suggested_commands = template_vars['explanation_sections']['Suggested_Commands']['content']
     if suggested_commands and suggested_commands.strip():
         commands_block = {
             "type": "section",
@@ -117,13 +211,25 @@ def post_to_slack(falco_alert, explanation_sections, slack_client, slack_channel
         }
         message_blocks.append(commands_block)
 
+    return message_blocks, f"Falco Alert: {rule} - Priority: {priority}"
+
+
+def post_to_slack(falco_alert, explanation_sections, slack_client, slack_channel_name):
+    """
+    Posts a formatted Falco alert message to Slack, including LLM explanations.
+    """
+    message = build_alert_message(falco_alert, explanation_sections)
+    if message is None:
+        return None
+    message_blocks, text = message
+
     logging.info(f"Sending Slack message with {len(message_blocks)} blocks")
 
     try:
         response = slack_client.chat_postMessage(
             channel=slack_channel_name,
             blocks=message_blocks,
-            text=f"Falco Alert: {rule} - Priority: {priority}"
+            text=text
         )
         logging.info(f"Slack message sent successfully to channel '{slack_channel_name}'")
         return response
@@ -135,6 +241,9 @@ def post_to_slack(falco_alert, explanation_sections, slack_client, slack_channel
 def replace_template_variables(block, template_vars):
     """
     Recursively replaces template variables in a Slack message block with validation.
+
+    Legacy per-node replacement, kept for callers with nested template_vars;
+    alert messages are rendered through CompiledTemplate.
     """
     if isinstance(block, dict):
         updated_block = {}
@@ -0,0 +1,367 @@
+"""
+Slack Thread Service for Falco Vanguard
+
+Groups related alerts into Slack threads when ``thread_alerts`` is enabled.
+The first alert of a group is posted as a full Block Kit message; related
+alerts within the thread window are posted as compact replies under its
+``thread_ts``.
+
+Alerts are related when they share a normalized fingerprint (rule plus output
+with volatile tokens such as numbers, IDs and timestamps removed) or the same
+rule and workload (namespace plus pod owner, image or container).
+
+The fingerprint → thread index is an in-memory LRU backed by the
+``slack_threads`` table, so threads survive restarts. The keys of active
+threads are also cached in memory (synced incrementally from the table, so
+threads started by other workers show up within
+SLACK_THREAD_KEY_SYNC_SECONDS); alerts without a thread never query SQLite.
+"""
+
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from config_service import default_db_path, get_config_service
+
+logger = logging.getLogger(__name__)
+
+# Volatile parts of Falco output that differ between otherwise identical alerts
+_TIMESTAMP_RE = re.compile(r'\d{2}:\d{2}:\d{2}(?:\.\d+)?|\d{4}-\d{2}-\d{2}[t ]?\S*')
+_HEX_RE = re.compile(r'\b(?:0x)?[0-9a-f]{8,}\b')
+_NUMBER_RE = re.compile(r'\d+')
+_WHITESPACE_RE = re.compile(r'\s+')
+# Deployment/ReplicaSet pod suffixes (e.g. web-7d9c8b6f4-x2k9z) and StatefulSet ordinals
+_POD_SUFFIX_RE = re.compile(r'(-[a-z0-9]{8,10})?-[a-z0-9]{5}$|-\d+$')
+
+
+def normalize_output(output: str) -> str:
+    """Strip volatile tokens from a Falco output string."""
+    normalized = str(output or '').lower()
+    normalized = _TIMESTAMP_RE.sub('<ts>', normalized)
+    normalized = _HEX_RE.sub('<id>', normalized)
+    normalized = _NUMBER_RE.sub('#', normalized)
+    return _WHITESPACE_RE.sub(' ', normalized).strip()
+
+
+def workload_of(alert: Dict[str, Any]) -> Optional[str]:
+    """Identify the workload an alert came from, or None if it cannot be determined."""
+    fields = alert.get('output_fields') or {}
+    pod = fields.get('k8s.pod.name')
+    if pod:
+        return f"{fields.get('k8s.ns.name', '')}/{_POD_SUFFIX_RE.sub('', str(pod))}"
+    image = fields.get('container.image.repository')
+    if image:
+        return f"image:{image}"
+    container = fields.get('container.name')
+    if container and container not in ('host', '<NA>'):
+        return f"container:{container}"
+    return None
+
+
+def thread_keys(alert: Dict[str, Any], channel: str) -> List[str]:
+    """Index keys for an alert: normalized fingerprint first, then rule+workload."""
+    rule = alert.get('rule', '')
+    fingerprint = hashlib.sha1(f"{rule}\x00{normalize_output(alert.get('output', ''))}".encode()).hexdigest()
+    keys = [f"{channel}|fp:{fingerprint}"]
+    workload = workload_of(alert)
+    if workload:
+        keys.append(f"{channel}|wl:{hashlib.sha1(f'{rule}{chr(0)}{workload}'.encode()).hexdigest()}")
+    return keys
+
+
+class ThreadEntry:
+    """A thread root: the outbox message and, once delivered, its Slack ``ts``."""
+
+    __slots__ = ('channel', 'outbox_id', 'thread_ts', 'rule', 'created_at', 'replies')
+
+    def __init__(self, channel: str, outbox_id: Optional[int], thread_ts: Optional[str], rule: str,
+                 created_at: float, replies: int = 0):
+        self.channel = channel
+        self.outbox_id = outbox_id
+        self.thread_ts = thread_ts
+        self.rule = rule
+        self.created_at = created_at
+        self.replies = replies
+
+
+class SlackThreadService:
+    """LRU fingerprint → thread index persisted to SQLite."""
+
+    def __init__(self, db_path: Optional[str] = None, capacity: Optional[int] = None,
+                 window_seconds: Optional[float] = None):
+        """
+        Initialize the thread service.
+
+        Args:
+            db_path: SQLite database path (defaults to the app's DB_PATH resolution)
+            capacity: Maximum in-memory index entries (SLACK_THREAD_INDEX_SIZE)
+            window_seconds: How long a thread accepts related alerts (SLACK_THREAD_WINDOW_SECONDS)
+        """
+        self.db_path = db_path or default_db_path()
+        self.capacity = capacity or int(os.getenv('SLACK_THREAD_INDEX_SIZE', '5000'))
+        self.window_seconds = window_seconds or float(os.getenv('SLACK_THREAD_WINDOW_SECONDS', '3600'))
+        self._index: 'OrderedDict[str, ThreadEntry]' = OrderedDict()
+        self._pending_roots: Dict[int, ThreadEntry] = {}  # outbox id -> root waiting for its ts
+        self.key_sync_seconds = float(os.getenv('SLACK_THREAD_KEY_SYNC_SECONDS', '1'))
+        self._active_keys: Dict[str, float] = {}  # thread key in slack_threads -> created_at
+        self._keys_rowid = 0  # Highest slack_threads rowid synced into _active_keys
+        self._keys_synced_at = 0.0
+        self._last_purge = time.time()
+        self._lock = threading.Lock()
+        self._table_ready = False
+        self._registered = False
+        self._counters = {'roots': 0, 'replies': 0, 'index_hits': 0, 'db_hits': 0, 'misses': 0}
+
+    # --- Storage ---
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        if not self._table_ready:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS slack_threads (
+                    thread_key TEXT PRIMARY KEY,
+                    channel TEXT NOT NULL,
+                    outbox_id INTEGER,
+                    thread_ts TEXT,
+                    rule TEXT,
+                    created_at REAL NOT NULL,
+                    replies INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_slack_threads_outbox ON slack_threads (outbox_id)')
+            conn.commit()
+            self._table_ready = True
+        return conn
+
+    def _load(self, key: str) -> Optional[ThreadEntry]:
+        conn = self._connect()
+        try:
+            row = conn.execute('''
+                SELECT channel, outbox_id, thread_ts, rule, created_at, replies
+                FROM slack_threads WHERE thread_key = ?
+            ''', (key,)).fetchone()
+        finally:
+            conn.close()
+        return ThreadEntry(*row) if row else None
+
+    def _sync_active_keys(self, now: float) -> None:
+        """Pick up thread keys written since the last sync, by this or any other worker."""
+        if now - self._keys_synced_at < self.key_sync_seconds:
+            return
+        self._keys_synced_at = now
+        conn = self._connect()
+        try:
+            # INSERT OR REPLACE assigns a new rowid, so replaced threads are picked up too
+            rows = conn.execute('SELECT rowid, thread_key, created_at FROM slack_threads WHERE rowid > ?',
+                                (self._keys_rowid,)).fetchall()
+        finally:
+            conn.close()
+        cutoff = now - self.window_seconds
+        with self._lock:
+            for rowid, key, created_at in rows:
+                self._keys_rowid = max(self._keys_rowid, rowid)
+                if created_at >= cutoff:
+                    self._active_keys[key] = created_at
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def _remember(self, key: str, entry: ThreadEntry) -> None:
+        self._index[key] = entry
+        self._index.move_to_end(key)
+        while len(self._index) > self.capacity:
+            self._index.popitem(last=False)
+
+    # --- Public API ---
+
+    @staticmethod
+    def enabled() -> bool:
+        """Whether ``thread_alerts`` is turned on in the Slack configuration."""
+        return str(get_config_service().get_value('slack', 'thread_alerts', 'false')).lower() == 'true'
+
+    def find_thread(self, alert: Dict[str, Any], channel: str) -> Optional[ThreadEntry]:
+        """
+        Find the open thread an alert belongs to.
+
+        Args:
+            alert: Falco alert payload
+            channel: Slack channel the alert will be posted to
+
+        Returns:
+            The thread root entry, or None if the alert should start a new thread
+        """
+        now = time.time()
+        try:
+            self._sync_active_keys(now)
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ SLACK_THREADS: Could not sync thread keys: {e}")
+        for key in thread_keys(alert, channel):
+            with self._lock:
+                entry = self._index.get(key)
+                if entry is not None:
+                    self._index.move_to_end(key)
+                    self._counters['index_hits'] += 1
+                else:
+                    created_at = self._active_keys.get(key)
+                    if created_at is not None and now - created_at > self.window_seconds:
+                        del self._active_keys[key]
+                        created_at = None
+            if entry is None:
+                # Only threads known to exist (but evicted from the LRU) are read back from SQLite
+                if created_at is None:
+                    continue
+                try:
+                    entry = self._load(key)
+                except sqlite3.Error as e:
+                    logger.warning(f"⚠️ SLACK_THREADS: Could not read thread index: {e}")
+                    entry = None
+                if entry is None:
+                    continue
+                with self._lock:
+                    self._remember(key, entry)
+                    self._counters['db_hits'] += 1
+            if now - entry.created_at <= self.window_seconds and (entry.thread_ts or entry.outbox_id):
+                return entry
+        self._count('misses')
+        return None
+
+    def start_thread(self, alert: Dict[str, Any], channel: str, outbox_id: int) -> None:
+        """Record a newly queued root message under all of the alert's keys."""
+        entry = ThreadEntry(channel, outbox_id, None, alert.get('rule', ''), time.time())
+        keys = thread_keys(alert, channel)
+        with self._lock:
+            for key in keys:
+                self._remember(key, entry)
+                self._active_keys[key] = entry.created_at
+            self._pending_roots[outbox_id] = entry
+        try:
+            conn = self._connect()
+            try:
+                conn.executemany('''
+                    INSERT OR REPLACE INTO slack_threads (thread_key, channel, outbox_id, thread_ts, rule, created_at, replies)
+                    VALUES (?, ?, ?, NULL, ?, ?, 0)
+                ''', [(key, channel, outbox_id, entry.rule, entry.created_at) for key in keys])
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ SLACK_THREADS: Could not persist thread: {e}")
+        self._count('roots')
+
+        if time.time() - self._last_purge > self.window_seconds:
+            self._last_purge = time.time()
+            try:
+                self.purge_expired()
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ SLACK_THREADS: Could not purge expired threads: {e}")
+
+    def record_reply(self, entry: ThreadEntry) -> None:
+        """Count a reply posted under a thread."""
+        with self._lock:
+            entry.replies += 1
+            self._counters['replies'] += 1
+        try:
+            self._execute('UPDATE slack_threads SET replies = replies + 1 WHERE outbox_id = ?', (entry.outbox_id,))
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ SLACK_THREADS: Could not update reply count: {e}")
+
+    def reply_target(self, entry: ThreadEntry) -> Dict[str, Any]:
+        """chat.postMessage/enqueue arguments that place a message under the thread."""
+        if entry.thread_ts:
+            return {'thread_ts': entry.thread_ts}
+        return {'thread_parent_id': entry.outbox_id}
+
+    @staticmethod
+    def build_reply(alert: Dict[str, Any], entry: ThreadEntry) -> str:
+        """Compact text reply for a follow-up alert (no Block Kit)."""
+        fields = alert.get('output_fields') or {}
+        output = str(alert.get('output', ''))
+        if len(output) > 300:
+            output = output[:300] + '…'
+        where = fields.get('k8s.pod.name') or fields.get('container.name') or ''
+        suffix = f" `{where}`" if where else ''
+        return f"↪️ #{entry.replies + 2} *{str(alert.get('priority', '')).capitalize()}*{suffix}: {output}"
+
+    def on_message_sent(self, message: Dict[str, Any], response_data: Dict[str, Any]) -> None:
+        """Delivery callback: attach the Slack ``ts`` to thread roots once they are posted."""
+        payload = message.get('payload') or {}
+        thread_ts = response_data.get('ts')
+        if not thread_ts or 'thread_ts' in payload or '_thread_parent_id' in payload:
+            return
+        with self._lock:
+            entry = self._pending_roots.pop(message['id'], None)
+            if entry is not None:
+                entry.thread_ts = thread_ts
+        try:
+            self._execute('UPDATE slack_threads SET thread_ts = ? WHERE outbox_id = ? AND thread_ts IS NULL',
+                          (thread_ts, message['id']))
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ SLACK_THREADS: Could not store thread_ts: {e}")
+
+    def register(self, delivery_service) -> None:
+        """Subscribe to delivery notifications of the Slack delivery service (once)."""
+        if self._registered:
+            return
+        with self._lock:
+            if not self._registered:
+                delivery_service.on_sent(self.on_message_sent)
+                self._registered = True
+
+    def purge_expired(self) -> int:
+        """Delete threads older than the window. Returns the number of rows removed."""
+        cutoff = time.time() - self.window_seconds
+        with self._lock:
+            for key in [key for key, entry in self._index.items() if entry.created_at < cutoff]:
+                del self._index[key]
+            for outbox_id in [outbox_id for outbox_id, entry in self._pending_roots.items()
+                              if entry.created_at < cutoff]:
+                del self._pending_roots[outbox_id]
+            for key in [key for key, created_at in self._active_keys.items() if created_at < cutoff]:
+                del self._active_keys[key]
+        conn = self._connect()
+        try:
+            cursor = conn.execute('DELETE FROM slack_threads WHERE created_at < ?', (cutoff,))
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index size and hit counters."""
+        with self._lock:
+            return {
+                'index_size': len(self._index),
+                'active_keys': len(self._active_keys),
+                'capacity': self.capacity,
+                'window_seconds': self.window_seconds,
+                'counters': dict(self._counters)
+            }
+
+    def _execute(self, query: str, params: tuple) -> None:
+        conn = self._connect()
+        try:
+            conn.execute(query, params)
+            conn.commit()
+        finally:
+            conn.close()
+
+
+# Global instance, created on first use
+slack_thread_service = None
+_slack_thread_lock = threading.Lock()
+
+def get_slack_thread_service() -> SlackThreadService:
+    """Get the global Slack thread service instance."""
+    global slack_thread_service
+    if slack_thread_service is None:
+        with _slack_thread_lock:
+            if slack_thread_service is None:
+                slack_thread_service = SlackThreadService()
+    return slack_thread_service
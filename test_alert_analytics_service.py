@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for the columnar alert analytics frame
+Runs under pytest or directly: python test_alert_analytics_service.py
+"""
+
+import calendar
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from alert_analytics_service import AlertAnalytics, parse_timestamps
+
+
+def make_db(tmp, alerts):
+    """alerts: (rule, priority, source, hours ago) tuples, stored with UTC timestamps like CURRENT_TIMESTAMP."""
+    db_path = os.path.join(tmp, 'alerts.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        CREATE TABLE alerts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            rule TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            output TEXT NOT NULL,
+            source TEXT
+        )
+    ''')
+    now = datetime.now(timezone.utc)
+    conn.executemany('INSERT INTO alerts (timestamp, rule, priority, output, source) VALUES (?, ?, ?, ?, ?)',
+                     [((now - timedelta(hours=hours)).strftime('%Y-%m-%d %H:%M:%S'), rule, priority, rule, source)
+                      for rule, priority, source, hours in alerts])
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+def test_parse_timestamps_reads_naive_values_as_utc():
+    midnight = calendar.timegm((2026, 1, 1, 0, 0, 0))
+    epoch = parse_timestamps(['2026-01-01 00:00:00', '2026-01-01T00:00:00.123456', '2026-01-01T00:00:00Z',
+                              '2026-01-01T02:00:00+02:00', '2025-12-31T19:00:00-0500', None, 'garbage'])
+    assert epoch[:5].tolist() == [midnight] * 5
+    assert all(value != value for value in epoch[5:])  # NaN
+
+
+def test_window_uses_utc_regardless_of_local_timezone():
+    previous = os.environ.get('TZ')
+    os.environ['TZ'] = 'Asia/Tokyo'
+    time.tzset()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            analytics = AlertAnalytics(db_path=make_db(tmp, [('Shell', 'warning', 'web', 20),
+                                                             ('Shell', 'warning', 'web', 30)]), history_days=1)
+            patterns = analytics.alert_patterns(days=1)
+            assert patterns['total_alerts'] == 1
+    finally:
+        if previous is None:
+            del os.environ['TZ']
+        else:
+            os.environ['TZ'] = previous
+        time.tzset()
+
+
+def test_alert_patterns_counts():
+    with tempfile.TemporaryDirectory() as tmp:
+        analytics = AlertAnalytics(db_path=make_db(tmp, [('Shell', 'warning', 'web', 1), ('Shell', 'error', 'db', 2),
+                                                         ('Write below etc', 'error', 'db', 3)]))
+        patterns = analytics.alert_patterns(days=7)
+        assert patterns['total_alerts'] == 3
+        assert patterns['rule_frequency'] == {'Shell': 2, 'Write below etc': 1}
+        assert patterns['priority_distribution'] == {'error': 2, 'warning': 1}
+        assert sum(day['count'] for day in patterns['timeline']) == 3
+
+
+def test_rule_history_reaches_past_the_frame():
+    with tempfile.TemporaryDirectory() as tmp:
+        alerts = [('Terminal shell in container', 'warning', 'web', 2), ('Terminal shell in container', 'critical', 'db', 24 * 30)]
+        analytics = AlertAnalytics(db_path=make_db(tmp, alerts), history_days=7)
+        history = analytics.rule_history('terminal shell')
+        assert history['incidents'] == 2
+        assert history['recent_count'] == 1
+        assert history['source_diversity'] == 2
+
+
+def test_rule_history_of_frequent_rule_reads_the_frame():
+    with tempfile.TemporaryDirectory() as tmp:
+        alerts = [('Shell', 'warning', 'web', hours) for hours in range(1, 61)]
+        analytics = AlertAnalytics(db_path=make_db(tmp, alerts), history_days=7)
+        history = analytics.rule_history('Shell', limit=50)
+        assert history['incidents'] == 50
+        assert analytics.get_stats()['counters']['history_reads'] == 0
+
+
+if __name__ == '__main__':
+    failures = 0
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            try:
+                test()
+                print(f"✅ {name}")
+            except AssertionError as e:
+                failures += 1
+                print(f"❌ {name}: {e!r}")
+    sys.exit(1 if failures else 0)
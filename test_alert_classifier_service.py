@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for the Aho-Corasick alert classifier against the legacy keyword matcher
+Runs under pytest or directly: python test_alert_classifier_service.py
+"""
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+
+from alert_classifier_service import (  # noqa: E402
+    ESCALATION_INDICATORS, FALSE_POSITIVE_INDICATORS, PERSISTENCE_INDICATORS, TECH_TAGS, THREAT_CATEGORIES,
+    AlertClassifier, KeywordAutomaton
+)
+from benchmark_alert_classification import SAMPLE_ALERTS, legacy_classify, shared_classify  # noqa: E402
+
+KEYWORDS = sorted({keyword for keywords in THREAT_CATEGORIES.values() for keyword in keywords}
+                  | set(ESCALATION_INDICATORS) | set(PERSISTENCE_INDICATORS) | set(FALSE_POSITIVE_INDICATORS)
+                  | {keyword for keywords in TECH_TAGS.values() for keyword in keywords})
+FILLER = ['a', 'the', 'pid=42', '/etc/', 'ü', 'İ', '-', '=', ' ', 'su', 'esc', 'file_', 'CRON', 'Sudo ', 'x']
+
+
+def random_text(rng, parts):
+    """Keywords (sometimes uppercased or cut short) glued to filler, so matches overlap and straddle words."""
+    pieces = []
+    for _ in range(parts):
+        if rng.random() < 0.4:
+            keyword = rng.choice(KEYWORDS)
+            if rng.random() < 0.2:
+                keyword = keyword[:rng.randint(1, len(keyword))]
+            pieces.append(keyword.upper() if rng.random() < 0.2 else keyword)
+        else:
+            pieces.append(rng.choice(FILLER))
+        if rng.random() < 0.5:
+            pieces.append(' ')
+    return ''.join(pieces)
+
+
+def test_sample_alerts_match_legacy():
+    classifier = AlertClassifier(THREAT_CATEGORIES)
+    for alert in SAMPLE_ALERTS:
+        assert shared_classify(classifier, alert) == legacy_classify(alert), alert['rule']
+
+
+def test_random_alerts_match_legacy():
+    classifier = AlertClassifier(THREAT_CATEGORIES)
+    rng = random.Random(48)
+    for _ in range(3000):
+        alert = {'rule': random_text(rng, rng.randint(0, 6)), 'output': random_text(rng, rng.randint(0, 25))}
+        assert shared_classify(classifier, alert) == legacy_classify(alert), alert
+
+
+def test_automaton_finds_overlapping_occurrences():
+    automaton = KeywordAutomaton(['escalat', 'escalation', 'file', 'filesystem', 'su '])
+    hits = [(start, automaton.patterns[index]) for start, index in automaton.scan(b'escalation filesystem su ')]
+    assert sorted(hits) == [(0, 'escalat'), (0, 'escalation'), (11, 'file'), (11, 'filesystem'), (22, 'su ')]
+
+
+def test_keywords_are_attributed_to_rule_or_output():
+    classifier = AlertClassifier(THREAT_CATEGORIES)
+    match = classifier.match({'rule': 'Debug sudo', 'output': 'notice cron'})
+    assert {'debug', 'sudo'} <= match.rule and not {'notice', 'cron'} & match.rule
+    assert {'notice', 'cron'} <= match.output and not {'debug', 'sudo'} & match.output
+    assert classifier.false_positive_hint(match)
+
+
+if __name__ == '__main__':
+    failures = 0
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            try:
+                test()
+                print(f"✅ {name}")
+            except AssertionError as e:
+                failures += 1
+                print(f"❌ {name}: {e!r}")
+    sys.exit(1 if failures else 0)
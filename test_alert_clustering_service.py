@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Tests for alert clustering and its fit worker
+Runs under pytest or directly: python test_alert_clustering_service.py
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from alert_clustering_service import AlertClusteringService
+
+
+def make_db(tmp, shells=30, writes=30):
+    db_path = os.path.join(tmp, 'alerts.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        CREATE TABLE alerts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            rule TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            output TEXT NOT NULL,
+            source TEXT,
+            fields TEXT
+        )
+    ''')
+    rows = [('Terminal shell in container', 'warning',
+             f'A shell was spawned in a container (user=root shell=bash pid={n} image=nginx)', 'web-1',
+             json.dumps({'proc.name': 'bash'})) for n in range(shells)]
+    rows += [('Write below etc', 'error', f'File below /etc opened for writing (file=/etc/conf{n} command=vi)', 'db-1',
+              json.dumps({'fd.name': f'/etc/conf{n}'})) for n in range(writes)]
+    conn.executemany('INSERT INTO alerts (rule, priority, output, source, fields) VALUES (?, ?, ?, ?, ?)', rows)
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+def make_service(db_path):
+    service = AlertClusteringService(db_path=db_path, dim=128, n_clusters=2)
+    # Tests drive fits directly instead of through the background thread
+    service._started_pid = os.getpid()
+    return service
+
+
+def test_get_clusters_without_model_returns_pending_at_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        service = make_service(make_db(tmp))
+        started = time.time()
+        results = service.get_clusters(days=30)
+        assert time.time() - started < 1.0
+        assert results['pending'] is True
+        assert results['clusters'] == [] and results['total_alerts'] == 60
+
+
+def test_worker_fit_separates_rules():
+    with tempfile.TemporaryDirectory() as tmp:
+        service = make_service(make_db(tmp))
+        service._refit()
+        assert service.get_stats()['counters']['fits'] == 1, service.get_stats()['last_error']
+        results = service.get_clusters(days=30)
+        assert results['pending'] is False
+        assert sorted((cluster['common_rule'], cluster['size']) for cluster in results['clusters']) == \
+            [('Terminal shell in container', 30), ('Write below etc', 30)]
+
+
+def test_new_alert_is_assigned_to_its_cluster():
+    with tempfile.TemporaryDirectory() as tmp:
+        service = make_service(make_db(tmp))
+        service._refit()
+        shell = service.assign(1000, {'rule': 'Terminal shell in container',
+                                      'output': 'A shell was spawned in a container (user=root shell=bash pid=7 image=nginx)',
+                                      'output_fields': {'proc.name': 'bash'}})
+        write = service.assign(1001, {'rule': 'Write below etc',
+                                      'output': 'File below /etc opened for writing (file=/etc/hosts command=vi)',
+                                      'output_fields': {'fd.name': '/etc/hosts'}})
+        assert shell >= 0 and write >= 0 and shell != write
+
+
+def test_failed_fit_is_recorded():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'alerts.db')
+        sqlite3.connect(db_path).close()  # No alerts table
+        service = make_service(db_path)
+        service._refit()
+        stats = service.get_stats()
+        assert stats['counters']['fit_failures'] == 1
+        assert stats['last_error'] and not stats['fitting']
+
+
+def test_report_window_is_utc_regardless_of_local_timezone():
+    previous = os.environ.get('TZ')
+    os.environ['TZ'] = 'Asia/Tokyo'
+    time.tzset()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = make_db(tmp, shells=0, writes=0)
+            now = datetime.now(timezone.utc)
+            conn = sqlite3.connect(db_path)
+            conn.executemany("INSERT INTO alerts (timestamp, rule, priority, output) VALUES (?, 'R', 'warning', 'out')",
+                             [((now - timedelta(hours=hours)).strftime('%Y-%m-%d %H:%M:%S'),) for hours in (1, 20, 30)])
+            conn.commit()
+            conn.close()
+            assert make_service(db_path).get_clusters(days=1)['total_alerts'] == 2
+    finally:
+        if previous is None:
+            del os.environ['TZ']
+        else:
+            os.environ['TZ'] = previous
+        time.tzset()
+
+
+def test_hung_fit_is_killed_after_timeout():
+    with tempfile.TemporaryDirectory() as tmp:
+        service = make_service(make_db(tmp))
+        service.fit_timeout = 0.01
+        service._refit()
+        stats = service.get_stats()
+        assert stats['counters']['fit_failures'] == 1 and stats['counters']['fits'] == 0
+        assert 'timed out' in stats['last_error'] and not stats['fitting']
+
+
+if __name__ == '__main__':
+    failures = 0
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            try:
+                test()
+                print(f"✅ {name}")
+            except AssertionError as e:
+                failures += 1
+                print(f"❌ {name}: {e!r}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests for the aiohttp event stream server
+Runs under pytest or directly: python test_async_event_server.py
+"""
+
+import asyncio
+import json
+import socket
+import sys
+
+import aiohttp
+
+from async_event_server import STREAM_PATH, AsyncEventStreamServer
+from event_stream_service import EventHub
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server():
+    hub = EventHub(max_queue=10, replay_size=10, overflow_policy='drop_oldest', coalesce_seconds=0)
+    server = AsyncEventStreamServer(hub=hub, host='127.0.0.1', port=free_port(), heartbeat_seconds=60)
+    assert server.start(), server._error
+    return hub, server
+
+
+async def read_event(response):
+    """Next SSE frame as (id, payload)."""
+    frame = (await asyncio.wait_for(response.content.readuntil(b'\n\n'), timeout=5)).decode()
+    fields = dict(line.split(': ', 1) for line in frame.strip().split('\n') if ': ' in line)
+    return (int(fields['id']) if 'id' in fields else None), json.loads(fields['data'])
+
+
+def test_reconnect_replays_missed_events_then_filtered_live_events():
+    hub, server = start_server()
+    for priority in ('critical', 'warning', 'error', 'critical'):
+        hub.publish('new_alert', {'priority': priority}, attrs={'priority': priority})
+
+    async def scenario():
+        url = f'http://127.0.0.1:{server.port}{STREAM_PATH}?min_priority=error'
+        async with aiohttp.ClientSession() as session:
+            async with session.get(url, headers={'Last-Event-ID': '1'}) as response:
+                _, connected = await read_event(response)
+                assert connected['type'] == 'connected' and connected['last_event_id'] == 4
+                replayed = [await read_event(response) for _ in range(2)]
+                assert [event_id for event_id, _ in replayed] == [3, 4]
+
+                assert server.get_stats()['clients'] == 1
+                hub.publish('new_alert', {'priority': 'notice'}, attrs={'priority': 'notice'})
+                hub.publish('new_alert', {'priority': 'error'}, attrs={'priority': 'error'})
+                event_id, live = await read_event(response)
+                assert (event_id, live['priority']) == (6, 'error')
+
+    asyncio.run(scenario())
+    stats = server.get_stats()
+    assert stats['counters']['connections'] == 1 and stats['counters']['filtered_out'] == 1
+
+
+def test_stats_from_another_thread_while_clients_come_and_go():
+    _, server = start_server()
+
+    async def churn():
+        url = f'http://127.0.0.1:{server.port}{STREAM_PATH}'
+        async with aiohttp.ClientSession() as session:
+            for _ in range(20):
+                async with session.get(url) as response:
+                    await read_event(response)
+                    await asyncio.to_thread(server.get_stats)
+
+    asyncio.run(churn())
+    stats = server.get_stats()
+    assert stats['counters']['connections'] == 20 and stats['error'] is None
+
+
+if __name__ == '__main__':
+    failures = 0
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            try:
+                test()
+                print(f"✅ {name}")
+            except AssertionError as e:
+                failures += 1
+                print(f"❌ {name}: {e!r}")
+    sys.exit(1 if failures else 0)
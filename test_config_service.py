@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests for the cross-worker invalidation bus
+Runs under pytest or directly: python test_config_service.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from config_service import InvalidationBus, SQLiteInvalidationBus
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+def test_bus_base_is_abstract():
+    try:
+        InvalidationBus()
+    except TypeError:
+        return
+    raise AssertionError("InvalidationBus should not be instantiable")
+
+
+def test_other_workers_receive_bumps_but_not_the_origin():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'alerts.db')
+        origin, worker = SQLiteInvalidationBus(db_path, 0.02), SQLiteInvalidationBus(db_path, 0.02)
+        assert origin.origin_id != worker.origin_id
+        origin_seen, worker_seen = [], []
+        origin.start(origin_seen.append)
+        worker.start(worker_seen.append)
+        try:
+            time.sleep(0.1)
+            origin.publish('cache:features')
+            assert wait_for(lambda: worker_seen == ['cache:features'])
+            worker.publish('config:slack')
+            assert wait_for(lambda: origin_seen == ['config:slack'])
+            time.sleep(0.1)
+            assert origin_seen == ['config:slack'] and worker_seen == ['cache:features']
+        finally:
+            origin.stop()
+            worker.stop()
+
+
+if __name__ == '__main__':
+    failures = 0
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            try:
+                test()
+                print(f"✅ {name}")
+            except AssertionError as e:
+                failures += 1
+                print(f"❌ {name}: {e!r}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Tests for the attack-chain correlation engine
+Runs under pytest or directly: python test_correlation_service.py
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+
+from correlation_service import CorrelationEngine, load_sequences
+
+CONTAINER = {'container.id': 'abc123', 'container.name': 'web'}
+
+
+def alert(rule):
+    return {'rule': rule, 'priority': 'warning', 'output_fields': dict(CONTAINER)}
+
+
+def make_engine(tmp):
+    db_path = os.path.join(tmp, 'alerts.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS alerts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            rule TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            output TEXT NOT NULL,
+            source TEXT,
+            fields TEXT
+        )
+    ''')
+    conn.commit()
+    conn.close()
+    sequences = [seq for seq in load_sequences('') if seq.name == 'privilege_escalation']
+    return CorrelationEngine(db_path=db_path, sequences=sequences, window_seconds=600)
+
+
+def store(engine, rule):
+    conn = sqlite3.connect(engine.db_path)
+    alert_id = conn.execute('INSERT INTO alerts (rule, priority, output, fields) VALUES (?, ?, ?, ?)',
+                            (rule, 'warning', rule, json.dumps(CONTAINER))).lastrowid
+    conn.commit()
+    conn.close()
+    return alert_id
+
+
+def ingest(engine, rule):
+    alert_id = store(engine, rule)
+    return alert_id, engine.observe(alert_id, alert(rule))
+
+
+def test_completed_sequence_creates_incident_and_later_alerts_attach():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(tmp)
+        _, events = ingest(engine, 'Terminal shell in container')
+        assert events == []
+        _, events = ingest(engine, 'Sudo privilege escalation')
+        assert [event_type for event_type, _ in events] == ['incident_created']
+        incident_id = events[0][1]['id']
+        _, events = ingest(engine, 'Sudo privilege escalation')
+        assert events == [('incident_updated', events[0][1])] and events[0][1]['id'] == incident_id
+
+
+def test_alert_after_restart_is_observed_not_replayed():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(tmp)
+        ingest(engine, 'Terminal shell in container')
+
+        # A new process warms up lazily on its first ingested alert
+        restarted = make_engine(tmp)
+        alert_id, events = ingest(restarted, 'Sudo privilege escalation')
+        assert [event_type for event_type, _ in events] == ['incident_created']
+        assert restarted.chain(dict(alert('Sudo privilege escalation'), id=alert_id))['alert_incidents'] == \
+            [events[0][1]['id']]
+
+
+def test_resolved_incident_does_not_absorb_new_alerts():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(tmp)
+        ingest(engine, 'Terminal shell in container')
+        _, events = ingest(engine, 'Sudo privilege escalation')
+        first_id = events[0][1]['id']
+        assert engine.set_incident_status(first_id, 'resolved')
+
+        _, events = ingest(engine, 'Sudo privilege escalation')
+        assert events == []
+        ingest(engine, 'Terminal shell in container')
+        _, events = ingest(engine, 'Sudo privilege escalation')
+        assert [event_type for event_type, _ in events] == ['incident_created']
+        assert events[0][1]['id'] != first_id
+        assert engine.get_incident(first_id)['alert_count'] == 2
+
+
+if __name__ == '__main__':
+    failures = 0
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            try:
+                test()
+                print(f"✅ {name}")
+            except AssertionError as e:
+                failures += 1
+                print(f"❌ {name}: {e!r}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Tests for the SSE event hub and per-client queues
+Runs under pytest or directly: python test_event_stream_service.py
+"""
+
+import json
+import sys
+import time
+
+from event_stream_service import EventFilter, EventHub, EventSubscription
+
+
+def payloads(frames):
+    return [json.loads(frame.split('data: ', 1)[1]) for frame in frames]
+
+
+def test_pending_counts_frame_takes_newest_payload():
+    hub = EventHub(max_queue=10, replay_size=10, overflow_policy='drop_oldest', coalesce_seconds=0)
+    sub, _ = hub.subscribe()
+    hub.publish('counts_updated', {'total': 5})
+    hub.publish('new_alert', {'rule': 'A'})
+    hub.publish('counts_updated', {'total': 6})
+    frames = sub.get(timeout=0)
+    events = payloads(frames)
+    assert [event['type'] for event in events] == ['new_alert', 'counts_updated']
+    assert events[1]['total'] == 6
+    # IDs stay in order, so resuming from the last one cannot skip the alert
+    assert [int(frame.split('\n', 1)[0][len('id: '):]) for frame in frames] == [2, 3]
+
+
+def test_counts_frame_queued_again_after_drain():
+    sub = EventSubscription(max_queue=10, overflow_policy='drop_oldest')
+    sub.offer(1, 'counts_updated', 'data: {"total": 1}\n\n')
+    assert len(sub.get(timeout=0)) == 1
+    sub.offer(2, 'counts_updated', 'data: {"total": 2}\n\n')
+    sub.offer(3, 'counts_updated', 'data: {"total": 3}\n\n')
+    assert payloads(sub.get(timeout=0)) == [{'total': 3}]
+
+
+def test_dropped_pending_frame_is_not_updated():
+    sub = EventSubscription(max_queue=2, overflow_policy='drop_oldest')
+    sub.offer(1, 'counts_updated', 'data: {"total": 1}\n\n')
+    sub.offer(2, 'new_alert', 'data: {"rule": "A"}\n\n')
+    sub.offer(3, 'new_alert', 'data: {"rule": "B"}\n\n')
+    sub.offer(4, 'counts_updated', 'data: {"total": 4}\n\n')
+    frames = sub.get(timeout=0)
+    events = payloads(frames[1:])
+    assert payloads(frames[:1])[0]['type'] == 'resync'
+    assert events == [{'rule': 'B'}, {'total': 4}]
+
+
+def test_publish_coalesced_sends_newest_data():
+    hub = EventHub(max_queue=10, replay_size=10, overflow_policy='drop_oldest', coalesce_seconds=0.05)
+    sub, _ = hub.subscribe()
+    hub.publish_coalesced('counts_updated', {'total': 5})
+    hub.publish_coalesced('counts_updated', {'total': 6})
+    time.sleep(0.2)
+    events = payloads(sub.get(timeout=0))
+    assert [event['total'] for event in events] == [6]
+    assert hub.get_stats()['counters']['coalesced'] == 1
+
+
+def test_filtered_subscription_skips_non_matching_events():
+    hub = EventHub(max_queue=10, replay_size=10, overflow_policy='drop_oldest', coalesce_seconds=0)
+    sub, _ = hub.subscribe(event_filter=EventFilter(min_priority='critical'))
+    hub.publish('new_alert', {'rule': 'low'}, attrs={'priority': 'warning'})
+    hub.publish('new_alert', {'rule': 'high'}, attrs={'priority': 'critical'})
+    assert [event['rule'] for event in payloads(sub.get(timeout=0))] == ['high']
+
+
+if __name__ == '__main__':
+    failures = 0
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            try:
+                test()
+                print(f"✅ {name}")
+            except AssertionError as e:
+                failures += 1
+                print(f"❌ {name}: {e!r}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Tests for MinHash/LSH near-duplicate detection and the deduplication window
+Runs under pytest or directly: python test_near_duplicate_service.py
+"""
+
+import sys
+import time
+
+from near_duplicate_service import NearDuplicateIndex, group_near_duplicates
+
+
+def shell_alert(pid, user='root', rule='Terminal shell in container'):
+    return {
+        'rule': rule,
+        'priority': 'warning',
+        'output': f'A shell was spawned in a container with an attached terminal '
+                  f'(user={user} shell=bash parent=runc cmdline=bash -i pid={pid} container_id=abc123 image=nginx)',
+        'output_fields': {'proc.cmdline': 'bash -i', 'proc.pid': pid}
+    }
+
+
+def write_alert(path):
+    return {
+        'rule': 'Write below etc',
+        'priority': 'error',
+        'output': f'File below /etc opened for writing (user=root command=vi {path} file={path} parent=sshd)',
+        'output_fields': {'proc.cmdline': f'vi {path}', 'fd.name': path}
+    }
+
+
+def test_variants_with_different_pids_match():
+    index = NearDuplicateIndex(threshold=0.75, capacity=100, max_age_seconds=3600)
+    entry, match = index.observe(shell_alert(101))
+    assert match is None
+    same, match = index.observe(shell_alert(202))
+    assert match is not None and same is entry
+    assert match.similarity >= 0.75
+    assert entry.hits == 2
+
+
+def test_other_rules_and_outputs_do_not_match():
+    index = NearDuplicateIndex(threshold=0.75, capacity=100, max_age_seconds=3600)
+    index.observe(shell_alert(101))
+    assert index.query(shell_alert(101, rule='Other rule')) is None
+    assert index.query(write_alert('/etc/passwd')) is None
+
+
+def test_dedup_window_is_not_extended_by_suppressed_repeats():
+    index = NearDuplicateIndex(threshold=0.75, capacity=100, max_age_seconds=3600)
+    window = 0.3
+    index.observe(shell_alert(1), window_seconds=window)
+    suppressed = []
+    for pid in range(2, 6):
+        time.sleep(0.1)
+        _, match = index.observe(shell_alert(pid), window_seconds=window)
+        suppressed.append(match.suppressed)
+    # Alerts arrive every 0.1s, but the window counts from the forwarded alert and expires
+    assert suppressed[:2] == [True, True]
+    assert False in suppressed[2:]
+    # The forwarded repeat starts a new window
+    _, match = index.observe(shell_alert(99), window_seconds=window)
+    assert match.suppressed and match.age_seconds < window
+
+
+def test_no_window_suppresses_nothing():
+    index = NearDuplicateIndex(threshold=0.75, capacity=100, max_age_seconds=3600)
+    index.observe(shell_alert(1))
+    _, match = index.observe(shell_alert(2))
+    assert match is not None and not match.suppressed
+
+
+def test_capacity_evicts_least_recently_seen():
+    index = NearDuplicateIndex(threshold=0.75, capacity=2, max_age_seconds=3600)
+    index.observe(write_alert('/etc/passwd'))
+    index.observe(shell_alert(1))
+    index.observe(write_alert('/etc/shadow'))
+    index.observe({'rule': 'Read sensitive file', 'output': 'Sensitive file opened for reading by cat'})
+    stats = index.get_stats()
+    assert stats['representatives'] == 2
+    assert stats['counters']['evicted'] >= 1
+
+
+def test_group_near_duplicates():
+    alerts = [shell_alert(1), write_alert('/etc/passwd'), shell_alert(2), shell_alert(3, user='admin')]
+    groups = group_near_duplicates(alerts)
+    assert groups == [[0, 2, 3], [1]]
+
+
+if __name__ == '__main__':
+    failures = 0
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            try:
+                test()
+                print(f"✅ {name}")
+            except AssertionError as e:
+                failures += 1
+                print(f"❌ {name}: {e!r}")
+    sys.exit(1 if failures else 0)
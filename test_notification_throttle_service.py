@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Tests for Slack notification throttling, digests and escalations
+Runs under pytest or directly: python test_notification_throttle_service.py
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from notification_throttle_service import NotificationThrottleService
+
+
+class Outbox:
+    def __init__(self):
+        self.messages = []
+
+    def __call__(self, channel, text, blocks=None, rule=None):
+        self.messages.append({'channel': channel, 'text': text, 'blocks': blocks, 'rule': rule})
+        return len(self.messages)
+
+
+def make_service(db_path, outbox):
+    service = NotificationThrottleService(db_path=db_path, send=outbox)
+    service.wheel.tick_seconds = 0.05
+    return service
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+def throttling_settings(threshold):
+    return {'throttling': True, 'threshold': threshold, 'business_hours_only': False,
+            'business_hours': '09:00-17:00', 'digest_mode': False, 'digest_time': '09:00',
+            'escalation': False, 'escalation_interval': 1800.0}
+
+
+def test_rule_over_threshold_switches_to_digest_until_window_expires():
+    with tempfile.TemporaryDirectory() as tmp:
+        outbox = Outbox()
+        service = make_service(os.path.join(tmp, 'alerts.db'), outbox)
+        service._settings = lambda: throttling_settings(3)
+        service.window_seconds = 0.5
+        service.digest_interval = 3600  # Digests are flushed by the test
+        alert = {'rule': 'Noisy', 'priority': 'warning'}
+        other = {'rule': 'Quiet', 'priority': 'warning'}
+
+        assert [service.route(alert, '#sec') for _ in range(3)] == [('send', None)] * 3
+        assert service.route(alert, '#sec') == ('digest', 'throttle')
+        assert service.route(alert, '#sec') == ('digest', 'throttle')
+        # Throttling is per rule
+        assert service.route(other, '#sec') == ('send', None)
+
+        # A digest period with alerts keeps the rule throttled
+        service._flush_digest('#sec', 'throttle')
+        assert outbox.messages[-1]['text'] == 'Falco Alert Digest: 2 alerts from 1 rules'
+        assert service.route(alert, '#sec') == ('digest', 'throttle')
+        service._flush_digest('#sec', 'throttle')
+        assert outbox.messages[-1]['text'] == 'Falco Alert Digest: 1 alerts from 1 rules'
+
+        # A quiet period releases the rule once its window has expired
+        time.sleep(service.window_seconds + 0.1)
+        service._flush_digest('#sec', 'throttle')
+        assert len(outbox.messages) == 2
+        assert [service.route(alert, '#sec') for _ in range(3)] == [('send', None)] * 3
+        assert service.route(alert, '#sec') == ('digest', 'throttle')
+        counters = service.get_status()['counters']
+        assert (counters['sent_individually'], counters['digested_throttle'], counters['digests_sent']) == (7, 4, 2)
+
+
+def test_critical_alerts_bypass_digests():
+    with tempfile.TemporaryDirectory() as tmp:
+        service = make_service(os.path.join(tmp, 'alerts.db'), Outbox())
+        for priority in ('critical', 'Emergency'):
+            assert service.route({'rule': 'R', 'priority': priority}, '#sec') == ('send', None)
+        assert service.get_status()['counters']['sent_urgent'] == 2
+
+
+def test_held_digest_survives_restart():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'alerts.db')
+        before = make_service(db_path, Outbox())
+        before._add_to_digest('#sec', 'business_hours', {'rule': 'A', 'priority': 'warning'}, 3600)
+        before._add_to_digest('#sec', 'business_hours', {'rule': 'B', 'priority': 'notice'}, 3600)
+        assert before.get_status()['pending_digests'][0]['alerts'] == 2
+
+        # A new process finds the held alerts and delivers them when due
+        conn = sqlite3.connect(db_path)
+        conn.execute('UPDATE notification_digest_items SET due_at = ?', (time.time(),))
+        conn.commit()
+        conn.close()
+        outbox = Outbox()
+        after = make_service(db_path, outbox)
+        assert after.restore() == 1
+        assert wait_for(lambda: outbox.messages)
+        assert outbox.messages[0]['text'] == 'Falco Alert Digest: 2 alerts from 2 rules'
+        assert after.get_status()['pending_digests'] == []
+
+
+def test_digest_is_sent_once_across_workers():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'alerts.db')
+        first_outbox, second_outbox = Outbox(), Outbox()
+        first = make_service(db_path, first_outbox)
+        second = make_service(db_path, second_outbox)
+        first._add_to_digest('#sec', 'throttle', {'rule': 'A', 'priority': 'warning'}, 3600)
+        second._add_to_digest('#sec', 'throttle', {'rule': 'A', 'priority': 'warning'}, 3600)
+        first._flush_digest('#sec', 'throttle')
+        second._flush_digest('#sec', 'throttle')
+        assert len(first_outbox.messages) == 1 and not second_outbox.messages
+        assert first_outbox.messages[0]['text'].startswith('Falco Alert Digest: 2 alerts')
+
+
+if __name__ == '__main__':
+    failures = 0
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            try:
+                test()
+                print(f"✅ {name}")
+            except AssertionError as e:
+                failures += 1
+                print(f"❌ {name}: {e!r}")
+    sys.exit(1 if failures else 0)
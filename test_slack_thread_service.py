@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Tests for the Slack thread index
+Runs under pytest or directly: python test_slack_thread_service.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from slack_thread_service import SlackThreadService
+
+
+def alert(rule='Terminal shell in container', pod='web-7d9f8b6c4d-x2k9p'):
+    return {
+        'rule': rule,
+        'priority': 'warning',
+        'output': f'A shell was spawned in a container (user=root pod={pod})',
+        'output_fields': {'k8s.ns.name': 'shop', 'k8s.pod.name': pod, 'container.name': 'web'}
+    }
+
+
+def make_service(tmp, window_seconds=3600):
+    service = SlackThreadService(db_path=os.path.join(tmp, 'alerts.db'), capacity=10,
+                                 window_seconds=window_seconds)
+    service.key_sync_seconds = 0
+    loads = []
+    load = service._load
+    service._load = lambda key: loads.append(key) or load(key)
+    return service, loads
+
+
+def test_unmatched_alert_does_not_read_thread_rows():
+    with tempfile.TemporaryDirectory() as tmp:
+        service, loads = make_service(tmp)
+        assert service.find_thread(alert(), '#alerts') is None
+        assert service.find_thread(alert(rule='Write below etc'), '#alerts') is None
+        assert loads == []
+        assert service.get_stats()['counters']['misses'] == 2
+
+
+def test_started_thread_is_found_from_index_and_after_eviction():
+    with tempfile.TemporaryDirectory() as tmp:
+        service, loads = make_service(tmp)
+        service.start_thread(alert(), '#alerts', outbox_id=1)
+        assert service.find_thread(alert(), '#alerts').outbox_id == 1
+        assert loads == []
+
+        service._index.clear()
+        assert service.find_thread(alert(), '#alerts').outbox_id == 1
+        assert loads
+        assert service.get_stats()['counters']['db_hits'] == 1
+
+
+def test_thread_started_by_another_worker_is_synced():
+    with tempfile.TemporaryDirectory() as tmp:
+        service, loads = make_service(tmp)
+        other, _ = make_service(tmp)
+        assert service.find_thread(alert(), '#alerts') is None
+        other.start_thread(alert(), '#alerts', outbox_id=7)
+        assert service.find_thread(alert(), '#alerts').outbox_id == 7
+
+
+def test_expired_thread_keys_are_dropped():
+    with tempfile.TemporaryDirectory() as tmp:
+        service, loads = make_service(tmp, window_seconds=0.1)
+        service.start_thread(alert(), '#alerts', outbox_id=1)
+        time.sleep(0.2)
+        service._index.clear()
+        assert service.find_thread(alert(), '#alerts') is None
+        assert loads == []
+        assert service.get_stats()['active_keys'] == 0
+
+
+if __name__ == '__main__':
+    failures = 0
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            try:
+                test()
+                print(f"✅ {name}")
+            except AssertionError as e:
+                failures += 1
+                print(f"❌ {name}: {e!r}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Tests for the local vector index used while Weaviate is unavailable
+Runs under pytest or directly: python test_vector_index_service.py
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from vector_index_service import LocalVectorIndex
+
+RULES = {
+    'Terminal shell in container': 'A shell was spawned in a container (user=root shell=bash pid={n})',
+    'Write below etc': 'File below /etc opened for writing (file=/etc/conf{n} command=vi)',
+    'Outbound connection to C2 server': 'Disallowed outbound connection destination (connection=10.0.0.{n}:4444)',
+    'Read sensitive file untrusted': 'Sensitive file opened for reading (file=/etc/shadow{n} command=cat)',
+    'Launch privileged container': 'Privileged container started (image=registry/tool{n})',
+    'Clear log activities': 'Log files were tampered (file=/var/log/syslog{n} command=truncate)',
+    'Change thread namespace': 'Namespace change (setns) by unexpected program (proc=nsenter{n})',
+    'Create symlink over sensitive files': 'Symlinks created over sensitive files (target=/etc/passwd{n})',
+}
+
+
+def make_db(tmp):
+    db_path = os.path.join(tmp, 'alerts.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        CREATE TABLE alerts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            rule TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            output TEXT NOT NULL,
+            source TEXT,
+            fields TEXT,
+            ai_analysis TEXT
+        )
+    ''')
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+def add_alerts(db_path, rule, count, priority='warning', container='web', hours_ago=1, start=0):
+    """Insert ``count`` alerts of one rule; returns their IDs."""
+    timestamp = (datetime.now(timezone.utc) - timedelta(hours=hours_ago)).strftime('%Y-%m-%d %H:%M:%S')
+    conn = sqlite3.connect(db_path)
+    ids = [conn.execute('INSERT INTO alerts (timestamp, rule, priority, output, source, fields) VALUES (?, ?, ?, ?, ?, ?)',
+                        (timestamp, rule, priority, RULES[rule].format(n=start + n), 'falco',
+                         json.dumps({'container.name': container}))).lastrowid for n in range(count)]
+    conn.commit()
+    conn.close()
+    return ids
+
+
+def make_index(db_path, tmp, **kwargs):
+    return LocalVectorIndex(db_path=db_path, index_dir=os.path.join(tmp, 'vector_index'), dim=128, **kwargs)
+
+
+def close(index):
+    """Release the index files so another LocalVectorIndex can own them."""
+    index._lock_file.close()
+
+
+def test_reopened_index_only_syncs_new_alerts():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = make_db(tmp)
+        shell_ids = add_alerts(db_path, 'Terminal shell in container', 20)
+        write_ids = add_alerts(db_path, 'Write below etc', 20)
+        index = make_index(db_path, tmp)
+        assert index.sync() == 40 and index.persistent
+        assert index.sync() == 0
+        assert index.search('file below /etc opened for writing', k=1)[0][0] in write_ids
+        close(index)
+
+        # More alerts than the initial capacity, so the reopened files have to grow
+        new_ids = add_alerts(db_path, 'Terminal shell in container', 1100, start=20)
+        reopened = make_index(db_path, tmp)
+        assert reopened.sync() == 1100
+        assert reopened.count == 1140 and reopened.last_alert_id == new_ids[-1]
+        assert reopened.search('shell spawned in a container', k=1)[0][0] in shell_ids + new_ids
+        close(reopened)
+
+        again = make_index(db_path, tmp)
+        assert again.sync() == 0 and again.count == 1140
+        assert np.array_equal(again._ids[:1140], np.array(shell_ids + write_ids + new_ids))
+        close(again)
+
+
+def test_ivf_probes_candidate_lists():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = make_db(tmp)
+        for rule in RULES:
+            add_alerts(db_path, rule, 40)
+        index = make_index(db_path, tmp, ivf_min=100, nprobe=2)
+        index.sync()
+        deadline = time.time() + 30
+        while (index._ivf is None or index._training) and time.time() < deadline:
+            time.sleep(0.05)
+        stats = index.get_stats()
+        assert stats['mode'] == 'ivf' and stats['ivf_lists'] >= 16
+
+        query = index._query_vector('Write below etc file opened for writing')
+        assert len(index._ivf.candidates(query, index.nprobe)) < index.count
+        hit_id, _ = index.search('Write below etc file opened for writing', k=1)[0]
+        assert index._load_alerts([hit_id])[hit_id]['rule'] == 'Write below etc'
+
+        # Probing every list is exact: the same ranking as brute force
+        index.nprobe = stats['ivf_lists']
+        brute = index._vectors[:index.count] @ query
+        assert [score for _, score in index.search('Write below etc file opened for writing', k=5)] == \
+            [float(score) for score in np.sort(brute)[::-1][:5]]
+
+        # Alerts appended after training land in the pending lists and are found
+        new_id, = add_alerts(db_path, 'Launch privileged container', 1, start=999)
+        assert index.sync() == 1
+        assert sum(len(pending) for pending in index._ivf.pending) == 1
+        assert new_id in [alert_id for alert_id, _ in
+                          index.search('Launch privileged container Privileged container started tool999', k=3)]
+        close(index)
+
+
+def test_filters_and_excluded_ids():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = make_db(tmp)
+        recent_warning = add_alerts(db_path, 'Terminal shell in container', 3)
+        recent_critical = add_alerts(db_path, 'Terminal shell in container', 3, priority='critical', start=3)
+        old_warning = add_alerts(db_path, 'Terminal shell in container', 3, hours_ago=24 * 40, start=6)
+        other_source = add_alerts(db_path, 'Terminal shell in container', 3, container='web-1', start=9)
+        index = make_index(db_path, tmp)
+
+        def found(**kwargs):
+            return {int(alert['_additional']['id']) for alert in
+                    index.find_similar_alerts('shell spawned in a container', limit=20, certainty=0.0, **kwargs)}
+
+        assert found() == set(recent_warning + recent_critical + old_warning + other_source)
+        assert found(filters={'time_range': '24h'}) == set(recent_warning + recent_critical + other_source)
+        assert found(filters={'priority': 'warn', 'time_range': '7d'}) == set(recent_warning + other_source)
+        assert found(filters={'priority': ['critical']}) == set(recent_critical)
+        assert found(filters={'source': 'web', 'time_range': 'all'}) == \
+            set(recent_warning + recent_critical + old_warning)
+        assert found(filters={'priority': 'warning', 'source': 'web'}, exclude_ids={recent_warning[0]}) == \
+            set(recent_warning[1:] + old_warning)
+        close(index)
+
+
+if __name__ == '__main__':
+    failures = 0
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            try:
+                test()
+                print(f"✅ {name}")
+            except AssertionError as e:
+                failures += 1
+                print(f"❌ {name}: {e!r}")
+    sys.exit(1 if failures else 0)
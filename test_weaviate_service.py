@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Tests for the Weaviate service: window queries, search filters, batch writes, UUID backfill and cached state
+Runs under pytest or directly: python test_weaviate_service.py
+"""
+
+import sys
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import weaviate_service
+from weaviate_service import WeaviateService, alert_fingerprint, alert_object_uuid
+
+NOW = datetime.now(timezone.utc)
+
+
+class StubAlertCollection:
+    """Stands in for the SecurityAlert collection.
+
+    Filters are not evaluated: every object stands for a match of the word-tokenized
+    source filter, so the service has to drop other sources itself.
+    """
+
+    def __init__(self, alerts):
+        self.objects = [SimpleNamespace(uuid=f'id-{n}', properties=dict(alert, timestamp=NOW - timedelta(minutes=n)))
+                        for n, alert in enumerate(alerts)]
+        self.fetches = 0
+        self.bm25_calls = []
+        self.aggregate = SimpleNamespace(over_all=self._over_all)
+        self.query = SimpleNamespace(fetch_objects=self._fetch_objects, bm25=self._bm25)
+
+    def _over_all(self, filters=None, total_count=False, group_by=None):
+        if group_by is None:
+            return SimpleNamespace(total_count=len(self.objects), groups=[])
+        counts = Counter(obj.properties[group_by.prop] for obj in self.objects)
+        groups = [SimpleNamespace(grouped_by=SimpleNamespace(value=value), total_count=count)
+                  for value, count in counts.most_common(group_by.limit)]
+        return SimpleNamespace(total_count=len(self.objects), groups=groups)
+
+    def _fetch_objects(self, limit, offset=0, filters=None, sort=None, return_properties=None):
+        self.fetches += 1
+        page = self.objects[offset:offset + limit]
+        return SimpleNamespace(objects=[SimpleNamespace(uuid=obj.uuid, properties={
+            key: value for key, value in obj.properties.items() if key in return_properties}) for obj in page])
+
+    def _bm25(self, query, limit, query_properties=None, filters=None, return_metadata=None, return_properties=None):
+        self.bm25_calls.append({'query': query, 'limit': limit, 'query_properties': query_properties,
+                                'filters': filters})
+        return SimpleNamespace(objects=[SimpleNamespace(uuid=obj.uuid, metadata=SimpleNamespace(score=10.0 - n),
+                                                        properties=dict(obj.properties))
+                                        for n, obj in enumerate(self.objects[:limit])])
+
+
+class StubObjectStore:
+    """SecurityAlert objects by ID, for the batch write and UUID backfill paths.
+
+    Only ID filters are evaluated; objects whose ID is in ``fail_ids`` fail to write.
+    """
+
+    def __init__(self):
+        self.objects = {}  # ID -> (properties, vector)
+        self.fail_ids = set()
+        self.added = []
+        self.batch = SimpleNamespace(fixed_size=self._batch, dynamic=self._batch, failed_objects=[])
+        self.query = SimpleNamespace(fetch_objects=self._fetch_objects)
+        self.data = SimpleNamespace(delete_many=self._delete_many)
+
+    def put(self, object_id, properties, vector=None):
+        self.objects[object_id] = (dict(properties), vector)
+
+    def _batch(self, batch_size=None):
+        store = self
+
+        class Batch:
+            def __enter__(self):
+                store.batch.failed_objects = []
+                return self
+
+            def add_object(self, properties, uuid, vector=None):
+                store.added.append(uuid)
+                if uuid in store.fail_ids:
+                    store.batch.failed_objects.append(SimpleNamespace(
+                        original_uuid=uuid, object_=SimpleNamespace(uuid=uuid), message='stub write failure'))
+                else:
+                    store.put(uuid, properties, vector)
+
+            def __exit__(self, *exc):
+                return False
+
+        return Batch()
+
+    def _matching(self, where):
+        return [object_id for object_id in self.objects if object_id in where.value]
+
+    def _fetch_objects(self, filters, limit, return_properties=None, include_vector=False):
+        return SimpleNamespace(objects=[
+            SimpleNamespace(uuid=object_id, properties=dict(self.objects[object_id][0]),
+                            vector={'default': self.objects[object_id][1]} if include_vector else {})
+            for object_id in self._matching(filters)[:limit]])
+
+    def _delete_many(self, where):
+        for object_id in self._matching(where):
+            del self.objects[object_id]
+
+    def iterator(self, return_properties=None):
+        for object_id, (properties, _) in list(self.objects.items()):
+            yield SimpleNamespace(uuid=object_id, properties=dict(properties))
+
+
+def make_store_service():
+    service = WeaviateService()
+    store = StubObjectStore()
+    service.client = object()
+    service._known_collections.add('SecurityAlert')
+    service._collections['SecurityAlert'] = store
+    return service, store
+
+
+def stored_alert(rule, output='out', with_hash=True):
+    properties = {'rule': rule, 'output': output}
+    if with_hash:
+        properties['alertHash'] = alert_fingerprint(rule, output)
+    return properties
+
+
+def make_service(alerts):
+    service = WeaviateService()
+    collection = StubAlertCollection(alerts)
+    service._collections['SecurityAlert'] = collection
+    return service, collection
+
+
+def make_search_service(alerts):
+    """A connected service without a vectorizer, so searches go through BM25."""
+    service, collection = make_service(alerts)
+    service.client = object()
+    service._semantic_capable = False
+    return service, collection
+
+
+def alert(source, rule='Terminal shell in container', priority='warning'):
+    return {'rule': rule, 'priority': priority, 'source': source, 'output': f'{rule} in {source}'}
+
+
+def test_source_counts_keep_exact_matches_only():
+    service, _ = make_service([alert('web'), alert('web-1'), alert('web', rule='Write below etc'), alert('web-1')])
+    start = NOW - timedelta(days=1)
+    assert service.count_alert_window(start, source='web') == 2
+    assert service.count_alert_window(start, source='web', group_by='rule') == \
+        {'Terminal shell in container': 1, 'Write below etc': 1}
+
+
+def test_source_counts_use_aggregates_without_collisions():
+    service, collection = make_service([alert('web'), alert('web', priority='error')])
+    start = NOW - timedelta(days=1)
+    assert service.count_alert_window(start, source='web', group_by='priority') == {'warning': 1, 'error': 1}
+    assert service.count_alert_window(start, source='web') == 2
+    assert collection.fetches == 0
+
+
+def test_query_window_pages_past_other_sources():
+    service, _ = make_service([alert('web-1'), alert('web-1'), alert('web'), alert('web-1'), alert('web')])
+    alerts = service.query_alert_window(NOW - timedelta(days=1), source='web', limit=2,
+                                        return_properties=['rule', 'timestamp'])
+    assert [a['id'] for a in alerts] == ['id-2', 'id-4']
+    assert set(alerts[0]) == {'rule', 'timestamp', 'id'}
+
+
+def test_temporal_context_total_is_not_capped_by_group_limit():
+    service, _ = make_service([alert(f'pod-{n}') for n in range(5)])
+    limit = weaviate_service.WINDOW_GROUP_LIMIT
+    weaviate_service.WINDOW_GROUP_LIMIT = 2
+    try:
+        context = service._get_temporal_context({'time': NOW.isoformat()})
+    finally:
+        weaviate_service.WINDOW_GROUP_LIMIT = limit
+    assert context['total_alerts'] == 5
+    assert context['unique_sources'] == 2
+
+
+def test_ai_config_change_resets_semantic_capability():
+    weaviate_service.weaviate_service = None
+    service = weaviate_service.get_weaviate_service()
+    try:
+        service._semantic_capable = True
+        weaviate_service.get_config_service()._publish('slack', {})
+        assert service._semantic_capable is True
+        weaviate_service.get_config_service()._publish('ai', {})
+        assert service._semantic_capable is None
+    finally:
+        weaviate_service.weaviate_service = None
+
+
+def test_text_search_pushes_filters_down_and_keeps_exact_sources():
+    service, collection = make_search_service([alert('web'), alert('web-1'), alert('web')])
+    results = service.find_similar_alerts('shell', limit=5, certainty=0.0,
+                                          filters={'source': 'web', 'priority': 'warning'})
+    call, = collection.bm25_calls
+    assert call['filters'] is not None and call['limit'] == 5
+    assert call['query_properties'] == weaviate_service.ALERT_SEARCH_PROPERTIES
+    assert [r['_additional']['id'] for r in results] == ['id-0', 'id-2']
+
+
+def test_text_search_rescores_returned_candidates_only():
+    service, _ = make_search_service([alert(f'pod-{n}') for n in range(20)])
+    scored = []
+    original = weaviate_service.text_match_score
+
+    def recording_score(query, properties, score, top_score):
+        scored.append(properties['source'])
+        return original(query, properties, score, top_score)
+
+    weaviate_service.text_match_score = recording_score
+    try:
+        results = service.find_similar_alerts('shell', limit=3, certainty=0.0)
+    finally:
+        weaviate_service.text_match_score = original
+    assert scored == ['pod-0', 'pod-1', 'pod-2']
+    assert results[0]['_additional']['certainty'] >= results[-1]['_additional']['certainty']
+
+
+def test_semantic_and_intelligent_search_pass_filters():
+    for search_type in ('semantic', 'intelligent', 'keyword'):
+        service, collection = make_search_service([alert('web'), alert('web-1')])
+        response = service.advanced_semantic_search('shell in container', search_type=search_type, limit=4,
+                                                    filters={'source': 'web'})
+        assert collection.bm25_calls and all(call['filters'] is not None for call in collection.bm25_calls)
+        assert {result['source'] for result in response['results']} == {'web'}, search_type
+
+
+def test_batch_skips_stored_and_repeated_alerts():
+    service, store = make_store_service()
+    stored, new, failing = stored_alert('Stored'), stored_alert('New'), stored_alert('Failing')
+    stored_id, new_id, failing_id = (alert_object_uuid(p['alertHash']) for p in (stored, new, failing))
+    store.put(stored_id, stored)
+    store.fail_ids.add(failing_id)
+
+    result = service.store_alerts_batch([stored, new, dict(new), failing])
+    assert store.added == [new_id, failing_id]
+    assert result['existing'] == {0, 2}
+    assert result['uuids'] == [stored_id, new_id, new_id, None]
+    assert result['errors'] == {3: 'stub write failure'}
+
+
+def backfill_store():
+    """Objects covering each backfill case; returns the service, the store and the interesting IDs."""
+    service, store = make_store_service()
+    keyed = stored_alert('Keyed')
+    keyed_id = alert_object_uuid(keyed['alertHash'])
+    keyed_duplicate = str(uuid.uuid4())
+    store.put(keyed_id, keyed, [1.0, 0.0])
+    store.put(keyed_duplicate, keyed, [1.0, 0.0])
+
+    # Two copies under random IDs, the second stored before alertHash existed
+    moving = stored_alert('Moving')
+    moving_id = alert_object_uuid(moving['alertHash'])
+    moving_first, moving_second = str(uuid.uuid4()), str(uuid.uuid4())
+    store.put(moving_first, moving, [0.0, 1.0])
+    store.put(moving_second, stored_alert('Moving', with_hash=False), [0.0, 1.0])
+
+    failing = stored_alert('Failing')
+    failing_id = alert_object_uuid(failing['alertHash'])
+    failing_old = str(uuid.uuid4())
+    store.put(failing_old, failing, [0.5, 0.5])
+    store.fail_ids.add(failing_id)
+    return service, store, {'keyed': keyed_id, 'keyed_duplicate': keyed_duplicate, 'moving': moving_id,
+                            'moving_first': moving_first, 'moving_second': moving_second,
+                            'failing': failing_id, 'failing_old': failing_old}
+
+
+def test_backfill_dry_run_changes_nothing():
+    service, store, _ = backfill_store()
+    before = dict(store.objects)
+    summary = service.backfill_alert_uuids(dry_run=True)
+    assert store.objects == before and store.added == []
+    assert {key: summary[key] for key in ('scanned', 'already_keyed', 'to_move', 'duplicates', 'moved')} == \
+        {'scanned': 5, 'already_keyed': 1, 'to_move': 2, 'duplicates': 2, 'moved': 0}
+
+
+def test_backfill_moves_objects_with_vectors_and_removes_duplicates():
+    service, store, ids = backfill_store()
+    summary = service.backfill_alert_uuids(batch_size=2)
+    assert (summary['moved'], summary['failed'], summary['duplicates_removed']) == (1, 1, 2)
+
+    # The keyed object stays, its duplicate is gone
+    assert ids['keyed'] in store.objects and ids['keyed_duplicate'] not in store.objects
+    # The group is re-keyed with its vector; both old IDs are gone
+    properties, vector = store.objects[ids['moving']]
+    assert properties['alertHash'] == alert_fingerprint('Moving', 'out') and vector == [0.0, 1.0]
+    assert ids['moving_first'] not in store.objects and ids['moving_second'] not in store.objects
+    # A failed copy leaves the old object in place
+    assert ids['failing_old'] in store.objects and ids['failing'] not in store.objects
+    assert len(store.objects) == 3
+
+    # A second run only retries the failed move
+    store.fail_ids.clear()
+    summary = service.backfill_alert_uuids()
+    assert (summary['already_keyed'], summary['moved'], summary['failed']) == (2, 1, 0)
+    assert set(store.objects) == {ids['keyed'], ids['moving'], ids['failing']}
+
+
+if __name__ == '__main__':
+    failures = 0
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            try:
+                test()
+                print(f"✅ {name}")
+            except AssertionError as e:
+                failures += 1
+                print(f"❌ {name}: {e!r}")
+    sys.exit(1 if failures else 0)
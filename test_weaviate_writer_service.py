@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Tests for the Weaviate batch writer
+Runs under pytest or directly: python test_weaviate_writer_service.py
+"""
+
+import sys
+
+from weaviate_writer_service import WeaviateBatchWriter
+
+
+class StubWeaviateService:
+    """Stands in for WeaviateService; fails the first `fail_calls` batch writes."""
+
+    def __init__(self, fail_calls=0, errors=None):
+        self.client = object()
+        self.fail_calls = fail_calls
+        self.errors = errors or {}
+        self.calls = 0
+        self.stored = []
+
+    def build_alert_properties(self, alert, ai_analysis):
+        return {'alertHash': alert['hash'], 'rule': alert['rule']}
+
+    def store_alerts_batch(self, properties_list, batch_size=100, mode='fixed'):
+        self.calls += 1
+        if self.calls <= self.fail_calls:
+            raise ConnectionError('weaviate unavailable')
+        errors = self.errors if self.calls == self.fail_calls + 1 else {}
+        self.stored.extend(p for i, p in enumerate(properties_list) if i not in errors)
+        return {'errors': errors, 'existing': []}
+
+
+def make_writer(service):
+    return WeaviateBatchWriter(lambda: service, max_buffer=100, batch_size=10,
+                               flush_interval=0.01, max_retries=3)
+
+
+def alert(n):
+    return {'hash': f'h{n}', 'rule': f'Rule {n}'}
+
+
+def test_failed_batch_is_retried_not_skipped_as_duplicate():
+    service = StubWeaviateService(fail_calls=1)
+    writer = make_writer(service)
+    writer.submit(alert(1))
+    writer.submit(alert(2))
+    assert writer.flush(timeout=10)
+    counters = writer.get_metrics()['counters']
+    assert [p['alertHash'] for p in service.stored] == ['h1', 'h2']
+    assert counters['written'] == 2
+    assert counters['duplicates'] == 0
+    assert counters['retried'] == 2
+
+
+def test_failed_objects_are_retried():
+    service = StubWeaviateService(errors={1: 'bad vector'})
+    writer = make_writer(service)
+    for n in range(3):
+        writer.submit(alert(n))
+    assert writer.flush(timeout=10)
+    assert sorted(p['alertHash'] for p in service.stored) == ['h0', 'h1', 'h2']
+    assert writer.get_metrics()['counters']['written'] == 3
+
+
+def test_duplicates_within_and_across_batches_are_skipped():
+    service = StubWeaviateService()
+    writer = make_writer(service)
+    writer.submit(alert(1))
+    writer.submit(alert(1))
+    assert writer.flush(timeout=5)
+    writer.submit(alert(1))
+    assert writer.flush(timeout=5)
+    counters = writer.get_metrics()['counters']
+    assert len(service.stored) == 1
+    assert counters['written'] == 1
+    assert counters['duplicates'] == 2
+
+
+def test_buffer_overflow_drops_oldest():
+    service = StubWeaviateService()
+    service.client = None
+    writer = WeaviateBatchWriter(lambda: service, max_buffer=2, batch_size=10, flush_interval=60)
+    assert writer.submit(alert(1))
+    assert writer.submit(alert(2))
+    assert not writer.submit(alert(3))
+    metrics = writer.get_metrics()
+    assert metrics['counters']['dropped_overflow'] == 1
+    assert metrics['buffer_high_water'] == 2
+
+
+if __name__ == '__main__':
+    failures = 0
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            try:
+                test()
+                print(f"✅ {name}")
+            except AssertionError as e:
+                failures += 1
+                print(f"❌ {name}: {e!r}")
+    sys.exit(1 if failures else 0)
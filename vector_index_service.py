@@ -0,0 +1,548 @@
+"""
+Local Vector Index Service for Falco Vanguard
+
+In-process similarity search over the alerts table, used when Weaviate is
+disabled or unreachable. Each alert is embedded as a hashed TF-IDF vector
+(rule, output, container and command tokens hashed into LOCAL_VECTOR_DIM
+signed buckets) and stored as a row of a float32 matrix:
+
+- the matrix, the alert IDs and the document frequencies are memory-mapped
+  files under LOCAL_VECTOR_INDEX_DIR, so a restart only indexes new alerts,
+- new alerts are appended incrementally by syncing from SQLite by alert ID,
+- small indexes are searched brute force (one matrix-vector product); from
+  LOCAL_VECTOR_IVF_MIN rows an IVF index (spherical k-means centroids,
+  LOCAL_VECTOR_NPROBE lists probed per query) is trained in the background
+  and keeps lookups in the low milliseconds at hundreds of thousands of rows.
+
+Only IDs and vectors live in the index; result rows are read back from SQLite,
+which stays the system of record. One process owns the files (flock); other
+processes keep an in-memory index.
+"""
+
+import os
+import re
+import json
+import math
+import zlib
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config_service import default_db_path
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9_]{2,}')
+
+# Alert rows read from SQLite per sync step
+SYNC_BATCH_SIZE = 5000
+
+PRIORITY_ALIASES = {'warn': 'warning', 'err': 'error', 'crit': 'critical', 'emerg': 'emergency'}
+TIME_RANGE_SECONDS = {'1h': 3600, '24h': 86400, '7d': 7 * 86400, '30d': 30 * 86400}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens of at least two characters."""
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+def alert_tokens(rule: str, output: str, fields: Dict[str, Any]) -> List[str]:
+    """Tokens an alert is embedded from: rule, output, container name and command line."""
+    # Rule tokens count twice: alerts of the same rule should cluster
+    rule_tokens = tokenize(rule)
+    return (rule_tokens * 2 + tokenize(output) + tokenize(str(fields.get('container.name') or '')) +
+            tokenize(str(fields.get('proc.cmdline') or '')))
+
+
+def hashed_counts(tokens: List[str], dim: int) -> np.ndarray:
+    """Token counts hashed into ``dim`` signed buckets."""
+    counts = np.zeros(dim, dtype=np.float32)
+    for token in tokens:
+        h = zlib.crc32(token.encode())
+        counts[h % dim] += 1.0 if h & 0x80000000 else -1.0
+    return counts
+
+
+def embed_tokens(tokens: List[str], dim: int) -> np.ndarray:
+    """Unit-length sublinear TF vector of hashed tokens."""
+    counts = hashed_counts(tokens, dim)
+    vector = np.sign(counts) * np.log1p(np.abs(counts))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def text_match_score(query: str, properties: Dict[str, Any], score: float, top_score: float) -> float:
+    """
+    Score a text-search candidate on a 0-1 scale comparable to semantic certainty.
+
+    Half of the score is the candidate's search score relative to the best hit, half the
+    share of query terms found in the alert, with a boost when the whole query appears in
+    the rule or output.
+
+    Args:
+        query: Search query
+        properties: Alert properties (rule, output, source, command, ...)
+        score: Raw search score of the candidate (BM25 or cosine)
+        top_score: Best raw score among the candidates
+    """
+    query_words = set(query.lower().split())
+    if not query_words:
+        return 0.0
+    text = " ".join(str(properties.get(field) or "") for field in
+                    ("rule", "output", "source", "command", "securityImpact", "nextSteps")).lower()
+    coverage = sum(1 for word in query_words if word in text) / len(query_words)
+    relative = score / top_score if top_score > 0 else 0.0
+    boost = 0.0
+    if query.lower() in str(properties.get("rule") or "").lower():
+        boost += 0.3
+    elif query.lower() in str(properties.get("output") or "").lower():
+        boost += 0.2
+    return min(1.0, 0.5 * relative + 0.5 * coverage + boost)
+
+
+class IVFLists:
+    """Inverted file: rows grouped by their nearest centroid."""
+
+    def __init__(self, centroids: np.ndarray, assignments: np.ndarray):
+        self.centroids = centroids
+        self.assignments = assignments
+        self.trained_rows = len(assignments)
+        order = np.argsort(assignments, kind='stable')
+        bounds = np.searchsorted(assignments[order], np.arange(len(centroids) + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(centroids))]
+        # Rows appended after training, per list
+        self.pending: List[List[int]] = [[] for _ in range(len(centroids))]
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, rows: int, iterations: int = 8, seed: int = 0) -> 'IVFLists':
+        """Spherical k-means on a sample of the first ``rows`` vectors, then assign every row."""
+        nlist = int(min(4096, max(16, math.sqrt(rows))))
+        rng = np.random.default_rng(seed)
+        sample_size = min(rows, nlist * 40)
+        sample = np.asarray(vectors[np.sort(rng.choice(rows, sample_size, replace=False))])
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            filled = norms[:, 0] > 0
+            centroids[filled] = sums[filled] / norms[filled]
+        return cls(centroids, cls.assign(centroids, vectors, 0, rows))
+
+    @staticmethod
+    def assign(centroids: np.ndarray, vectors: np.ndarray, start: int, end: int, chunk: int = 16384) -> np.ndarray:
+        """Nearest centroid of rows [start, end), computed in chunks to bound memory."""
+        labels = np.empty(end - start, dtype=np.int32)
+        for offset in range(start, end, chunk):
+            block = np.asarray(vectors[offset:min(end, offset + chunk)])
+            labels[offset - start:offset - start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        return labels
+
+    def add(self, row: int, vector: np.ndarray) -> None:
+        self.pending[int(np.argmax(self.centroids @ vector))].append(row)
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Rows in the ``nprobe`` lists whose centroids are closest to the query."""
+        probe = np.argpartition(-(self.centroids @ query), min(nprobe, len(self.centroids)) - 1)[:nprobe]
+        parts = [self.lists[i] for i in probe]
+        parts.extend(np.asarray(self.pending[i], dtype=np.int64) for i in probe if self.pending[i])
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+
+class LocalVectorIndex:
+    """Hashed TF-IDF vectors of all alerts, searchable without Weaviate."""
+
+    def __init__(self, db_path: Optional[str] = None, index_dir: Optional[str] = None,
+                 dim: Optional[int] = None, ivf_min: Optional[int] = None, nprobe: Optional[int] = None):
+        """
+        Initialize the index (files are opened on first use).
+
+        Args:
+            db_path: SQLite database with the alerts table
+            index_dir: Directory for the memory-mapped files (LOCAL_VECTOR_INDEX_DIR, '' for memory only)
+            dim: Hashed feature dimensions (LOCAL_VECTOR_DIM)
+            ivf_min: Rows from which the IVF index is used (LOCAL_VECTOR_IVF_MIN)
+            nprobe: IVF lists searched per query (LOCAL_VECTOR_NPROBE)
+        """
+        self.db_path = db_path or default_db_path()
+        if index_dir is None:
+            index_dir = os.getenv('LOCAL_VECTOR_INDEX_DIR',
+                                  os.path.join(os.path.dirname(os.path.abspath(self.db_path)), 'vector_index'))
+        self.index_dir = index_dir
+        self.enabled = os.getenv('LOCAL_VECTOR_INDEX_ENABLED', 'true').lower() == 'true'
+        self.dim = dim or int(os.getenv('LOCAL_VECTOR_DIM', '256'))
+        self.ivf_min = ivf_min or int(os.getenv('LOCAL_VECTOR_IVF_MIN', '50000'))
+        self.nprobe = nprobe or int(os.getenv('LOCAL_VECTOR_NPROBE', '8'))
+
+        self.count = 0
+        self.last_alert_id = 0
+        self.persistent = False
+        self._vectors: Optional[np.ndarray] = None
+        self._ids: Optional[np.ndarray] = None
+        self._doc_freq = np.zeros(self.dim, dtype=np.float64)
+        self._ivf: Optional[IVFLists] = None
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._training = False
+        self._lock_file = None
+        self._opened = False
+
+    # --- Storage ---
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_dir, name)
+
+    def _open(self) -> None:
+        """Load the memory-mapped files, or start an in-memory index if they are not ours to write."""
+        with self._lock:
+            if self._opened:
+                return
+            self._opened = True
+            if self.index_dir and self._acquire_file_lock():
+                try:
+                    self._open_files()
+                    self.persistent = True
+                    logger.info(f"🧭 LOCAL_INDEX: Opened {self.count} vectors from {self.index_dir}")
+                    return
+                except Exception as e:
+                    logger.warning(f"⚠️ LOCAL_INDEX: Could not open index files, rebuilding in memory: {e}")
+            self.count = 0
+            self.last_alert_id = 0
+            self._doc_freq = np.zeros(self.dim, dtype=np.float64)
+            self._vectors = np.zeros((1024, self.dim), dtype=np.float32)
+            self._ids = np.zeros(1024, dtype=np.int64)
+
+    def _acquire_file_lock(self) -> bool:
+        try:
+            import fcntl
+            os.makedirs(self.index_dir, exist_ok=True)
+            self._lock_file = open(self._path('index.lock'), 'w')
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except (ImportError, OSError) as e:
+            logger.info(f"🧭 LOCAL_INDEX: Index files in use or not writable ({e}), keeping the index in memory")
+            return False
+
+    def _open_files(self) -> None:
+        meta = {}
+        if os.path.exists(self._path('meta.json')):
+            with open(self._path('meta.json')) as f:
+                meta = json.load(f)
+        if meta.get('dim') != self.dim or meta.get('db_path') != os.path.abspath(self.db_path):
+            # New index, or the alerts it points to changed
+            meta = {}
+        capacity = max(meta.get('capacity', 0), 1024)
+        mode = 'r+' if meta else 'w+'
+        self._vectors = np.memmap(self._path('vectors.f32'), dtype=np.float32, mode=mode, shape=(capacity, self.dim))
+        self._ids = np.memmap(self._path('ids.i64'), dtype=np.int64, mode=mode, shape=(capacity,))
+        self.count = meta.get('count', 0)
+        self.last_alert_id = meta.get('last_alert_id', 0)
+        self._doc_freq = np.load(self._path('doc_freq.npy')) if meta else np.zeros(self.dim, dtype=np.float64)
+        if meta and os.path.exists(self._path('ivf.npz')):
+            with np.load(self._path('ivf.npz')) as data:
+                if data['assignments'].size <= self.count and data['centroids'].shape[1] == self.dim:
+                    self._ivf = IVFLists(data['centroids'], data['assignments'])
+                    for row in range(self._ivf.trained_rows, self.count):
+                        self._ivf.add(row, self._vectors[row])
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self._ids)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        if self.persistent:
+            self._vectors.flush()
+            self._ids.flush()
+            for name, itemsize in (('vectors.f32', 4 * self.dim), ('ids.i64', 8)):
+                with open(self._path(name), 'r+b') as f:
+                    f.truncate(capacity * itemsize)
+            self._vectors = np.memmap(self._path('vectors.f32'), dtype=np.float32, mode='r+',
+                                      shape=(capacity, self.dim))
+            self._ids = np.memmap(self._path('ids.i64'), dtype=np.int64, mode='r+', shape=(capacity,))
+        else:
+            vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+            vectors[:self.count] = self._vectors[:self.count]
+            ids = np.zeros(capacity, dtype=np.int64)
+            ids[:self.count] = self._ids[:self.count]
+            self._vectors, self._ids = vectors, ids
+
+    def _save(self) -> None:
+        if not self.persistent:
+            return
+        self._vectors.flush()
+        self._ids.flush()
+        np.save(self._path('doc_freq.npy'), self._doc_freq)
+        meta = {'dim': self.dim, 'count': self.count, 'capacity': len(self._ids),
+                'last_alert_id': self.last_alert_id, 'db_path': os.path.abspath(self.db_path)}
+        with open(self._path('meta.json.tmp'), 'w') as f:
+            json.dump(meta, f)
+        os.replace(self._path('meta.json.tmp'), self._path('meta.json'))
+
+    # --- Vectors ---
+
+    def embed(self, tokens: List[str]) -> np.ndarray:
+        """Unit-length sublinear TF vector of hashed tokens."""
+        return embed_tokens(tokens, self.dim)
+
+    def _query_vector(self, text: str) -> np.ndarray:
+        # IDF weights only the query, so stored vectors never need rewriting as document frequencies change
+        idf = (np.log((1.0 + self.count) / (1.0 + self._doc_freq)) + 1.0).astype(np.float32)
+        vector = self.embed(tokenize(text)) * idf
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    # --- Sync ---
+
+    def sync(self) -> int:
+        """
+        Append alerts added to SQLite since the last sync.
+
+        Returns:
+            Number of alerts indexed
+        """
+        if not self.enabled:
+            return 0
+        self._open()
+        if not self._sync_lock.acquire(blocking=False):
+            return 0  # Another thread is already syncing
+        indexed = 0
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            try:
+                while True:
+                    rows = conn.execute(
+                        'SELECT id, rule, output, fields FROM alerts WHERE id > ? ORDER BY id LIMIT ?',
+                        (self.last_alert_id, SYNC_BATCH_SIZE)).fetchall()
+                    if not rows:
+                        break
+                    self._append(rows)
+                    indexed += len(rows)
+                    if len(rows) < SYNC_BATCH_SIZE:
+                        break
+            finally:
+                conn.close()
+        except sqlite3.OperationalError as e:
+            logger.debug(f"LOCAL_INDEX: Alerts table not readable yet: {e}")
+        finally:
+            self._sync_lock.release()
+        if indexed:
+            with self._lock:
+                self._save()
+            logger.debug(f"🧭 LOCAL_INDEX: Indexed {indexed} alerts ({self.count} total)")
+            self._maybe_train()
+        return indexed
+
+    def _append(self, rows: List[Tuple]) -> None:
+        vectors = np.empty((len(rows), self.dim), dtype=np.float32)
+        for i, (_, rule, output, fields) in enumerate(rows):
+            try:
+                parsed = json.loads(fields) if fields else {}
+            except (TypeError, ValueError):
+                parsed = {}
+            vectors[i] = self.embed(alert_tokens(rule or '', output or '', parsed if isinstance(parsed, dict) else {}))
+        with self._lock:
+            start = self.count
+            self._grow(start + len(rows))
+            self._vectors[start:start + len(rows)] = vectors
+            self._ids[start:start + len(rows)] = [row[0] for row in rows]
+            self._doc_freq += np.count_nonzero(vectors, axis=0)
+            if self._ivf is not None:
+                for offset, vector in enumerate(vectors):
+                    self._ivf.add(start + offset, vector)
+            self.count = start + len(rows)
+            self.last_alert_id = rows[-1][0]
+
+    def _maybe_train(self) -> None:
+        """(Re)train the IVF lists in the background once the index is large enough or has doubled."""
+        with self._lock:
+            if self._training or self.count < self.ivf_min:
+                return
+            if self._ivf is not None and self.count < 2 * self._ivf.trained_rows:
+                return
+            self._training = True
+        threading.Thread(target=self._train, name='local-vector-ivf', daemon=True).start()
+
+    def _train(self) -> None:
+        try:
+            with self._lock:
+                rows, vectors = self.count, self._vectors
+            ivf = IVFLists.train(vectors, rows)
+            with self._lock:
+                # Rows appended while training
+                for row in range(rows, self.count):
+                    ivf.add(row, self._vectors[row])
+                self._ivf = ivf
+                if self.persistent:
+                    np.savez(self._path('ivf.npz'), centroids=ivf.centroids, assignments=ivf.assignments)
+            logger.info(f"🧭 LOCAL_INDEX: Trained IVF index with {len(ivf.centroids)} lists over {rows} vectors")
+        except Exception as e:
+            logger.error(f"❌ LOCAL_INDEX: IVF training failed: {e}")
+        finally:
+            self._training = False
+
+    # --- Search ---
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[int, float]]:
+        """
+        Top-k alerts by cosine similarity to the query text.
+
+        Returns:
+            List of (alert ID, score), best first
+        """
+        self._open()
+        with self._lock:
+            count, vectors, ids, ivf = self.count, self._vectors, self._ids, self._ivf
+            query_vector = self._query_vector(query)
+        if count == 0 or not np.any(query_vector):
+            return []
+        if ivf is not None and count >= self.ivf_min:
+            rows = np.sort(ivf.candidates(query_vector, self.nprobe))
+            scores = vectors[rows] @ query_vector
+        else:
+            rows = None
+            scores = vectors[:count] @ query_vector
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        positions = rows[top] if rows is not None else top
+        return [(int(ids[position]), float(scores[i])) for position, i in zip(positions, top)]
+
+    def find_similar_alerts(self, query: str, limit: int = 5, certainty: float = 0.7,
+                            filters: Optional[Dict[str, Any]] = None,
+                            exclude_ids: Optional[set] = None) -> List[Dict[str, Any]]:
+        """
+        Find similar alerts, in the same format as WeaviateService.find_similar_alerts.
+
+        Args:
+            query: Search query (alert text, rule name, or description)
+            limit: Maximum number of results
+            certainty: Minimum similarity threshold (0.0 - 1.0)
+            filters: Optional priority/rule/source/time_range filters
+            exclude_ids: Alert IDs to leave out (e.g. the alert being compared)
+
+        Returns:
+            List of similar alerts with '_additional' id and certainty
+        """
+        if not self.enabled or not query.strip():
+            return []
+        try:
+            self.sync()
+            # Over-fetch: identical alerts collapse into one result and filters drop some
+            hits = self.search(query, limit * (10 if filters else 4) + len(exclude_ids or ()))
+            if not hits:
+                return []
+            alerts = self._load_alerts([alert_id for alert_id, _ in hits])
+            top_score = hits[0][1]
+            results = []
+            seen = set()
+            for alert_id, score in hits:
+                alert = alerts.get(alert_id)
+                if alert is None or (exclude_ids and alert_id in exclude_ids):
+                    continue
+                key = (alert['rule'], alert['output'])
+                if key in seen or not self._matches(alert, filters):
+                    continue
+                seen.add(key)
+                alert_certainty = text_match_score(query, alert, score, top_score)
+                if alert_certainty >= certainty:
+                    alert['_additional'] = {'id': str(alert_id), 'certainty': alert_certainty}
+                    results.append(alert)
+                    if len(results) >= limit:
+                        break
+            logger.info(f"🔍 Found {len(results)} similar alerts using the local vector index")
+            return results
+        except Exception as e:
+            logger.error(f"❌ Local vector search failed: {e}")
+            return []
+
+    def _load_alerts(self, alert_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Read result rows from SQLite, shaped like SecurityAlert properties."""
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            placeholders = ','.join('?' * len(alert_ids))
+            rows = conn.execute(
+                f'SELECT id, rule, priority, output, source, fields, timestamp, ai_analysis '
+                f'FROM alerts WHERE id IN ({placeholders})', alert_ids).fetchall()
+        finally:
+            conn.close()
+        alerts = {}
+        for alert_id, rule, priority, output, source, fields, timestamp, ai_analysis in rows:
+            try:
+                fields = json.loads(fields) if fields else {}
+                analysis = json.loads(ai_analysis) if ai_analysis else {}
+            except (TypeError, ValueError):
+                fields, analysis = {}, {}
+            fields = fields if isinstance(fields, dict) else {}
+            analysis = analysis if isinstance(analysis, dict) else {}
+            alerts[alert_id] = {
+                'rule': rule or '',
+                'priority': priority or '',
+                'output': output or '',
+                'source': fields.get('container.name') or source or 'unknown',
+                'timestamp': timestamp or '',
+                'command': fields.get('proc.cmdline', ''),
+                'securityImpact': str(analysis.get('Security Impact') or analysis.get('security_impact') or ''),
+                'nextSteps': str(analysis.get('Next Steps') or analysis.get('next_steps') or '')
+            }
+        return alerts
+
+    def _matches(self, alert: Dict[str, Any], filters: Optional[Dict[str, Any]]) -> bool:
+        if not filters:
+            return True
+        priority = filters.get('priority')
+        if priority and priority != 'all':
+            wanted = {PRIORITY_ALIASES.get(p.lower(), p.lower()) for p in (priority if isinstance(priority, list) else [priority])}
+            if PRIORITY_ALIASES.get(alert['priority'].lower(), alert['priority'].lower()) not in wanted:
+                return False
+        for field in ('rule', 'source'):
+            value = filters.get(field)
+            if value and value != 'all' and alert[field] != value:
+                return False
+        since = filters.get('since')
+        if filters.get('time_range') in TIME_RANGE_SECONDS:
+            since = (datetime.now(timezone.utc) - timedelta(seconds=TIME_RANGE_SECONDS[filters['time_range']]))
+            since = since.strftime('%Y-%m-%d %H:%M:%S')
+        if since and str(alert['timestamp']).replace('T', ' ')[:19] < str(since).replace('T', ' ')[:19]:
+            return False
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index size and mode."""
+        return {
+            'enabled': self.enabled,
+            'vectors': self.count,
+            'dimensions': self.dim,
+            'last_alert_id': self.last_alert_id,
+            'persistent': self.persistent,
+            'index_dir': self.index_dir if self.persistent else None,
+            'mode': 'ivf' if self._ivf is not None and self.count >= self.ivf_min else 'brute_force',
+            'ivf_lists': len(self._ivf.centroids) if self._ivf is not None else 0,
+            'training': self._training
+        }
+
+
+# Global instance, created on first use
+local_vector_index = None
+_local_vector_index_lock = threading.Lock()
+
+def get_local_vector_index(db_path: Optional[str] = None) -> LocalVectorIndex:
+    """
+    Get the global local vector index.
+
+    Args:
+        db_path: Alerts database; only used when the index is created
+    """
+    global local_vector_index
+    if local_vector_index is None:
+        with _local_vector_index_lock:
+            if local_vector_index is None:
+                local_vector_index = LocalVectorIndex(db_path)
+    return local_vector_index
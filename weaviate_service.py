@@ -8,25 +8,58 @@ Enhanced with AI-driven clustering, predictive intelligence, and advanced analyt
 
 import weaviate
 import weaviate.classes as wvc
+from weaviate.util import generate_uuid5
 import json
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Optional, Any, Tuple
 import hashlib
 import os
 import re
+import time
 from collections import defaultdict, Counter
-import numpy as np
-from sklearn.cluster import DBSCAN, KMeans
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import uuid
 import sqlite3
 
+from alert_analytics_service import get_alert_analytics
+from alert_classifier_service import THREAT_CATEGORIES, AlertKeywordMatch, get_alert_classifier
+from alert_clustering_service import get_alert_clustering_service
+from behavior_baseline_service import get_behavior_baselines
+from config_service import get_config_service
+from correlation_service import get_correlation_engine
+from vector_index_service import get_local_vector_index, text_match_score
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Properties searched by BM25, with boosts: rule names and outputs matter most
+ALERT_SEARCH_PROPERTIES = ["rule^3", "output^2", "source", "command", "securityImpact", "nextSteps"]
+
+ALERT_RETURN_PROPERTIES = [
+    "rule", "priority", "output", "source", "timestamp",
+    "securityImpact", "nextSteps", "remediationSteps",
+    "suggestedCommands", "aiProvider", "command"
+]
+
+# Alerts returned by the time-window queries of the contextual analysis
+TEMPORAL_CONTEXT_LIMIT = 50
+# Distinct values counted per grouped window aggregate
+WINDOW_GROUP_LIMIT = 1000
+# Objects read at most when a window has to be counted client-side (Weaviate's default QUERY_MAXIMUM_RESULTS)
+WINDOW_FETCH_LIMIT = 10000
+
+SEARCH_TIME_RANGES = {'1h': timedelta(hours=1), '24h': timedelta(hours=24),
+                      '7d': timedelta(days=7), '30d': timedelta(days=30)}
+
+def alert_fingerprint(rule: str, output: str) -> str:
+    """Deduplication hash of an alert (same rule and output means the same alert)."""
+    return hashlib.md5(f"{rule}-{output}".encode()).hexdigest()
+
+def alert_object_uuid(alert_hash: str) -> str:
+    """Deterministic SecurityAlert object UUID (UUIDv5) for an alert fingerprint."""
+    return generate_uuid5(alert_hash, "SecurityAlert")
+
 class WeaviateService:
     """Enhanced service class for managing Weaviate operations with AI-driven analytics."""
     
@@ -43,24 +76,21 @@ class WeaviateService:
         self.port = port
         self.grpc_port = grpc_port
         self.client = None
+        # Per-connection caches, reset on reconnect or schema change
+        self._collections: Dict[str, Any] = {}
+        self._known_collections = set()
+        self._semantic_capable: Optional[bool] = None
+        self._count_cache: Dict[str, Tuple[float, int]] = {}
+        self.count_cache_ttl = float(os.getenv("WEAVIATE_COUNT_CACHE_SECONDS", "30"))
+        self._connect_retry_at = 0.0
         
         # AI-driven analytics components
-        self.vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
         self.threat_patterns = {}
         self.attack_chains = {}
         self.risk_scores = {}
         
         # Classification categories
-        self.threat_categories = {
-            'malware': ['virus', 'trojan', 'ransomware', 'backdoor', 'rootkit'],
-            'intrusion': ['breakout', 'escape', 'privilege', 'escalation', 'unauthorized'],
-            'data_exfiltration': ['copy', 'transfer', 'upload', 'download', 'exfil'],
-            'reconnaissance': ['scan', 'probe', 'enumerate', 'discover', 'fingerprint'],
-            'lateral_movement': ['pivot', 'hop', 'spread', 'move', 'traverse'],
-            'persistence': ['cron', 'service', 'startup', 'autostart', 'schedule'],
-            'evasion': ['hide', 'mask', 'obfuscate', 'encode', 'stealth'],
-            'misconfiguration': ['permission', 'config', 'setting', 'policy', 'rule']
-        }
+        self.threat_categories = THREAT_CATEGORIES
         
     def connect(self) -> bool:
         """
@@ -79,6 +109,7 @@ class WeaviateService:
 
             
             # Try simpler connection method
+            self._invalidate_schema_cache()
             self.client = weaviate.connect_to_local(
                 host=self.host,
                 port=self.port,
@@ -109,8 +140,69 @@ class WeaviateService:
         """Close the Weaviate client connection."""
         if self.client:
             self.client.close()
+            self._invalidate_schema_cache()
             logger.info("🔌 Closed Weaviate connection")
     
+    def _invalidate_schema_cache(self, name: Optional[str] = None) -> None:
+        """
+        Forget cached collection handles, schema state and counts.
+        
+        Args:
+            name: Collection whose schema changed, or None for everything (reconnect)
+        """
+        if name is None:
+            self._collections = {}
+            self._known_collections = set()
+            self._count_cache = {}
+            self._semantic_capable = None
+            return
+        self._collections.pop(name, None)
+        self._known_collections.discard(name)
+        self._count_cache.pop(name, None)
+        if name == "SecurityAlert":
+            self._semantic_capable = None
+    
+    def _collection(self, name: str):
+        """Get a cached collection handle."""
+        handle = self._collections.get(name)
+        if handle is None:
+            handle = self._collections[name] = self.client.collections.get(name)
+        return handle
+    
+    def _collection_exists(self, name: str) -> bool:
+        """Check whether a collection exists; only asks Weaviate until it has been seen once."""
+        if name in self._known_collections:
+            return True
+        if self.client.collections.exists(name):
+            self._known_collections.add(name)
+            return True
+        return False
+    
+    def _on_config_published(self, section_name: str, snapshot) -> None:
+        """Re-check semantic search on next use when the AI provider configuration changes."""
+        if section_name == 'ai':
+            self._semantic_capable = None
+    
+    def _semantic_search_available(self) -> bool:
+        """Whether SecurityAlert has a vectorizer and the provider can embed queries (cached)."""
+        if self._semantic_capable is None:
+            current_vectorizer = self._collection("SecurityAlert").config.get().vectorizer
+            provider_name = os.getenv("PROVIDER_NAME", "").lower()
+            has_openai_key = bool(os.getenv("OPENAI_API_KEY") or os.getenv("OPENAI_VIRTUAL_KEY"))
+            self._semantic_capable = current_vectorizer != "none" and (provider_name == "ollama" or has_openai_key)
+        return self._semantic_capable
+    
+    def _total_count(self, name: str) -> int:
+        """Object count of a collection, cached for WEAVIATE_COUNT_CACHE_SECONDS."""
+        now = time.time()
+        cached = self._count_cache.get(name)
+        if cached and cached[0] > now:
+            return cached[1]
+        result = self._collection(name).aggregate.over_all(total_count=True)
+        count = result.total_count if result.total_count else 0
+        self._count_cache[name] = (now + self.count_cache_ttl, count)
+        return count
+    
     def create_schema(self) -> bool:
         """
         Create the schema for security alerts in Weaviate.
@@ -120,8 +212,8 @@ class WeaviateService:
         """
         try:
             # Check if collection already exists and verify its vectorizer
-            if self.client.collections.exists("SecurityAlert"):
-                collection = self.client.collections.get("SecurityAlert")
+            if self._collection_exists("SecurityAlert"):
+                collection = self._collection("SecurityAlert")
                 collection_config = collection.config.get()
                 current_vectorizer = collection_config.vectorizer
                 
@@ -136,6 +228,7 @@ class WeaviateService:
                     
                     # Delete existing collection
                     self.client.collections.delete("SecurityAlert")
+                    self._invalidate_schema_cache("SecurityAlert")
                     logger.info("🗑️ Deleted existing SecurityAlert collection")
                 else:
                     logger.info("📋 SecurityAlert collection already exists with correct vectorizer")
@@ -219,6 +312,8 @@ class WeaviateService:
             )
             
             logger.info("✅ Created SecurityAlert collection in Weaviate")
+            self._invalidate_schema_cache("SecurityAlert")
+            self._known_collections.add("SecurityAlert")
             return True
             
         except Exception as e:
@@ -244,86 +339,30 @@ class WeaviateService:
                     logger.error("❌ Failed to connect to Weaviate")
                     return None
             
-            # Generate hash for deduplication
-            alert_content = f"{alert_data.get('rule', '')}-{alert_data.get('output', '')}"
-            alert_hash = hashlib.md5(alert_content.encode()).hexdigest()
+            properties = self.build_alert_properties(alert_data, ai_analysis)
+            alert_hash = properties["alertHash"]
+            object_id = alert_object_uuid(alert_hash)
             
             # Ensure schema exists before storing
-            if not self.client.collections.exists("SecurityAlert"):
-                logger.info("📋 Creating SecurityAlert schema on first use")
-                if not self.create_schema():
-                    return None
+            if not self._ensure_alert_schema():
+                return None
             
             # Get the collection
-            collection = self.client.collections.get("SecurityAlert")
-            
-            # Check if alert already exists (v4 API) - fix syntax
-            try:
-                # Simple approach - check for duplicates after retrieval
-                result = collection.query.fetch_objects(
-                    limit=10,
-                    return_properties=["alertHash"]
-                )
-                existing = [obj for obj in result.objects if obj.properties.get("alertHash") == alert_hash]
-            except Exception as e:
-                logger.warning(f"Could not check for existing alert: {e}")
-                existing = []
+            collection = self._collection("SecurityAlert")
             
-            if existing:
+            # The object ID is derived from the alert hash, so the duplicate check is a lookup by ID
+            if collection.data.exists(object_id):
                 logger.info(f"🔄 Alert already exists with hash {alert_hash}")
-                return str(existing[0].uuid)
-            
-            # Extract AI analysis sections
-            security_impact = ""
-            next_steps = ""
-            remediation_steps = ""
-            suggested_commands = ""
-            ai_provider = ""
-            
-            if ai_analysis and not ai_analysis.get("error"):
-                security_impact = self._extract_content(ai_analysis.get("Security Impact", ""))
-                next_steps = self._extract_content(ai_analysis.get("Next Steps", ""))
-                remediation_steps = self._extract_content(ai_analysis.get("Remediation Steps", ""))
-                suggested_commands = self._extract_content(ai_analysis.get("Suggested Commands", ""))
-                ai_provider = ai_analysis.get("llm_provider", "")
-            
-            # Prepare the data object with proper RFC3339 timestamp
-            timestamp = alert_data.get("time")
-            if timestamp:
-                # Parse and reformat to ensure RFC3339 compliance
-                try:
-                    if isinstance(timestamp, str):
-                        # Try to parse existing timestamp
-                        dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                    else:
-                        dt = timestamp
-                    # Format to RFC3339 with timezone
-                    formatted_timestamp = dt.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
-                except Exception:
-                    # Fallback to current time with proper format
-                    formatted_timestamp = datetime.now().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
-            else:
-                # Use current time with proper RFC3339 format
-                formatted_timestamp = datetime.now().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
-            
-            properties = {
-                "rule": alert_data.get("rule", ""),
-                "priority": alert_data.get("priority", ""),
-                "output": alert_data.get("output", ""),
-                "source": alert_data.get("output_fields", {}).get("container.name", "unknown"),
-                "timestamp": formatted_timestamp,
-                "command": alert_data.get("output_fields", {}).get("proc.cmdline", ""),
-                "securityImpact": security_impact,
-                "nextSteps": next_steps,
-                "remediationSteps": remediation_steps,
-                "suggestedCommands": suggested_commands,
-                "aiProvider": ai_provider,
-                "alertHash": alert_hash,
-                "fields": json.dumps(alert_data.get("output_fields", {}))
-            }
+                return object_id
             
             # Store in Weaviate using v4 API
-            result = collection.data.insert(properties)
+            try:
+                result = collection.data.insert(properties, uuid=object_id)
+            except Exception:
+                # Inserted concurrently by another writer
+                if collection.data.exists(object_id):
+                    return object_id
+                raise
             
             logger.info(f"✅ Stored alert in Weaviate: {alert_data.get('rule', 'Unknown')} (ID: {result})")
             return str(result)
@@ -332,7 +371,222 @@ class WeaviateService:
             logger.error(f"❌ Failed to store alert in Weaviate: {e}")
             return None
     
-    def find_similar_alerts(self, query: str, limit: int = 5, certainty: float = 0.7) -> List[Dict[str, Any]]:
+    def build_alert_properties(self, alert_data: Dict[str, Any], ai_analysis: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Build the SecurityAlert object properties for an alert.
+        
+        Args:
+            alert_data: Original Falco alert data
+            ai_analysis: AI analysis of the alert
+            
+        Returns:
+            dict: Object properties, including the deduplication hash
+        """
+        # Generate hash for deduplication
+        alert_hash = alert_fingerprint(alert_data.get('rule', ''), alert_data.get('output', ''))
+        
+        # Extract AI analysis sections
+        security_impact = ""
+        next_steps = ""
+        remediation_steps = ""
+        suggested_commands = ""
+        ai_provider = ""
+        
+        if ai_analysis and not ai_analysis.get("error"):
+            security_impact = self._extract_content(ai_analysis.get("Security Impact", ""))
+            next_steps = self._extract_content(ai_analysis.get("Next Steps", ""))
+            remediation_steps = self._extract_content(ai_analysis.get("Remediation Steps", ""))
+            suggested_commands = self._extract_content(ai_analysis.get("Suggested Commands", ""))
+            ai_provider = ai_analysis.get("llm_provider", "")
+        
+        # Prepare the data object with proper RFC3339 timestamp
+        timestamp = alert_data.get("time")
+        if timestamp:
+            # Parse and reformat to ensure RFC3339 compliance
+            try:
+                if isinstance(timestamp, str):
+                    # Try to parse existing timestamp
+                    dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+                else:
+                    dt = timestamp
+                # Format to RFC3339 with timezone
+                formatted_timestamp = dt.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+            except Exception:
+                # Fallback to current time with proper format
+                formatted_timestamp = datetime.now().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        else:
+            # Use current time with proper RFC3339 format
+            formatted_timestamp = datetime.now().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        
+        properties = {
+            "rule": alert_data.get("rule", ""),
+            "priority": alert_data.get("priority", ""),
+            "output": alert_data.get("output", ""),
+            "source": alert_data.get("output_fields", {}).get("container.name", "unknown"),
+            "timestamp": formatted_timestamp,
+            "command": alert_data.get("output_fields", {}).get("proc.cmdline", ""),
+            "securityImpact": security_impact,
+            "nextSteps": next_steps,
+            "remediationSteps": remediation_steps,
+            "suggestedCommands": suggested_commands,
+            "aiProvider": ai_provider,
+            "alertHash": alert_hash,
+            "fields": json.dumps(alert_data.get("output_fields", {}))
+        }
+        
+        return properties
+    
+    def _ensure_alert_schema(self) -> bool:
+        """Make sure the SecurityAlert collection exists (checked once per connection)."""
+        if not self._collection_exists("SecurityAlert"):
+            logger.info("📋 Creating SecurityAlert schema on first use")
+            return self.create_schema()
+        return True
+    
+    def store_alerts_batch(self, properties_list: List[Dict[str, Any]], batch_size: int = 100,
+                           mode: str = "fixed") -> Dict[str, Any]:
+        """
+        Store many alerts with the client batch API.
+        
+        Args:
+            properties_list: Object properties (see build_alert_properties)
+            batch_size: Objects per batch request in fixed-size mode
+            mode: 'fixed' or 'dynamic' batching
+            
+        Returns:
+            dict: {'uuids': UUID per input (None if it failed), 'errors': {index: message},
+                   'existing': indexes of alerts that were already stored (not re-vectorized)}
+        """
+        if not self.client:
+            raise ConnectionError("Weaviate client not connected")
+        if not self._ensure_alert_schema():
+            raise RuntimeError("SecurityAlert schema is not available")
+        
+        collection = self._collection("SecurityAlert")
+        object_ids = [alert_object_uuid(properties["alertHash"]) for properties in properties_list]
+        
+        # Adding an existing ID would replace (and re-embed) the object, so skip those;
+        # one by-ID query covers the whole batch
+        already_stored = self._existing_object_ids(collection, list(set(object_ids)))
+        existing = set()
+        index_by_id = {}
+        for index, object_id in enumerate(object_ids):
+            if object_id in already_stored or object_id in index_by_id:
+                existing.add(index)
+            else:
+                index_by_id[object_id] = index
+        
+        errors = {}
+        if index_by_id:
+            batching = collection.batch.dynamic() if mode == "dynamic" else \
+                collection.batch.fixed_size(batch_size=batch_size)
+            with batching as batch:
+                for object_id, index in index_by_id.items():
+                    batch.add_object(properties=properties_list[index], uuid=object_id)
+            for failed in collection.batch.failed_objects:
+                failed_id = str(failed.original_uuid or failed.object_.uuid)
+                if failed_id in index_by_id:
+                    errors[index_by_id[failed_id]] = failed.message
+        
+        uuids = [None if index in errors else object_id for index, object_id in enumerate(object_ids)]
+        if errors:
+            logger.warning(f"⚠️ Weaviate batch: {len(errors)} of {len(index_by_id)} objects failed")
+        return {'uuids': uuids, 'errors': errors, 'existing': existing}
+    
+    def _existing_object_ids(self, collection, object_ids: List[str]) -> set:
+        """IDs among object_ids that are already stored in the collection."""
+        if not object_ids:
+            return set()
+        result = collection.query.fetch_objects(
+            filters=wvc.query.Filter.by_id().contains_any(object_ids),
+            limit=len(object_ids),
+            return_properties=["alertHash"]
+        )
+        return {str(obj.uuid) for obj in result.objects}
+    
+    def backfill_alert_uuids(self, batch_size: int = 200, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Re-key existing SecurityAlert objects to their deterministic UUIDs and remove duplicates.
+        
+        Objects are copied to the new ID together with their stored vector, so
+        nothing is re-embedded; the old objects are deleted after the copy succeeded.
+        
+        Args:
+            batch_size: Objects moved per batch
+            dry_run: Only report what would change
+            
+        Returns:
+            dict: Counts of scanned, already keyed, moved, duplicate and failed objects
+        """
+        if not self.client:
+            raise ConnectionError("Weaviate client not connected")
+        if not self._ensure_alert_schema():
+            raise RuntimeError("SecurityAlert schema is not available")
+        collection = self._collection("SecurityAlert")
+        
+        # Plan: group objects by their target ID (only IDs and hashes are held in memory)
+        groups = defaultdict(list)
+        scanned = 0
+        for obj in collection.iterator(return_properties=["alertHash", "rule", "output"]):
+            scanned += 1
+            alert_hash = obj.properties.get("alertHash") or \
+                alert_fingerprint(obj.properties.get("rule", ""), obj.properties.get("output", ""))
+            groups[alert_object_uuid(alert_hash)].append((str(obj.uuid), alert_hash))
+        
+        moves = []       # (old ID, target ID, alert hash)
+        duplicates = []  # old IDs to delete
+        already_keyed = 0
+        for target_id, members in groups.items():
+            current_ids = [object_id for object_id, _ in members]
+            if target_id in current_ids:
+                already_keyed += 1
+                duplicates.extend(object_id for object_id in current_ids if object_id != target_id)
+            else:
+                moves.append((current_ids[0], target_id, members[0][1]))
+                duplicates.extend(current_ids[1:])
+        
+        summary = {'scanned': scanned, 'already_keyed': already_keyed, 'to_move': len(moves),
+                   'duplicates': len(duplicates), 'moved': 0, 'duplicates_removed': 0, 'failed': 0,
+                   'dry_run': dry_run}
+        if dry_run:
+            return summary
+        
+        for start in range(0, len(moves), batch_size):
+            chunk = moves[start:start + batch_size]
+            fetched = collection.query.fetch_objects(
+                filters=wvc.query.Filter.by_id().contains_any([old_id for old_id, _, _ in chunk]),
+                limit=len(chunk),
+                include_vector=True
+            )
+            objects = {str(obj.uuid): obj for obj in fetched.objects}
+            moved_from = {}
+            with collection.batch.fixed_size(batch_size=batch_size) as batch:
+                for old_id, target_id, alert_hash in chunk:
+                    obj = objects.get(old_id)
+                    if obj is None:
+                        continue
+                    vector = obj.vector.get("default") if isinstance(obj.vector, dict) and "default" in obj.vector \
+                        else (obj.vector or None)
+                    batch.add_object(properties={**obj.properties, "alertHash": alert_hash},
+                                     uuid=target_id, vector=vector)
+                    moved_from[target_id] = old_id
+            failed_ids = {str(failed.original_uuid or failed.object_.uuid) for failed in collection.batch.failed_objects}
+            done = [old_id for target_id, old_id in moved_from.items() if target_id not in failed_ids]
+            summary['failed'] += len(chunk) - len(done)
+            if done:
+                collection.data.delete_many(where=wvc.query.Filter.by_id().contains_any(done))
+                summary['moved'] += len(done)
+        
+        for start in range(0, len(duplicates), batch_size):
+            chunk = duplicates[start:start + batch_size]
+            collection.data.delete_many(where=wvc.query.Filter.by_id().contains_any(chunk))
+            summary['duplicates_removed'] += len(chunk)
+        
+        logger.info(f"✅ SecurityAlert UUID backfill: {summary}")
+        return summary
+    
+    def find_similar_alerts(self, query: str, limit: int = 5, certainty: float = 0.7,
+                            filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """
         Find similar alerts using semantic search or text search.
         
@@ -340,50 +594,33 @@ class WeaviateService:
             query: Search query (can be alert text, rule name, or description)
             limit: Maximum number of results
             certainty: Minimum similarity threshold (0.0 - 1.0)
+            filters: Optional priority/rule/source/time_range filters, applied by Weaviate
             
         Returns:
             List of similar alerts with metadata
         """
         try:
-            # Ensure connection is established
-            if not self.client:
-                logger.warning("⚠️ Weaviate client not connected, attempting to connect...")
-                if not self.connect():
-                    logger.error("❌ Failed to connect to Weaviate")
-                    return []
+            # Without Weaviate, search the local vector index instead
+            if not self._ensure_connected():
+                return self._local_similar_alerts(query, limit, certainty, filters)
             
             # Get the collection
-            collection = self.client.collections.get("SecurityAlert")
-            
-            # Check the collection's vectorizer configuration
-            collection_config = collection.config.get()
-            current_vectorizer = collection_config.vectorizer
-            
-            # Check if we should attempt semantic search based on AI provider and available keys
-            provider_name = os.getenv("PROVIDER_NAME", "").lower()
-            has_openai_key = bool(os.getenv("OPENAI_API_KEY") or os.getenv("OPENAI_VIRTUAL_KEY"))
-            has_ollama = (provider_name == "ollama")
+            collection = self._collection("SecurityAlert")
             
             result = None
             search_method = "text"  # Default to text search
+            where = self._alert_filters(filters)
             
             # Only attempt semantic search if collection has a vectorizer and we have the right provider/keys
-            if current_vectorizer != "none" and (has_ollama or has_openai_key):
+            if self._semantic_search_available():
                 try:
-                    if has_ollama:
-                        logger.info(f"🔍 Attempting semantic search with Ollama for query: {query[:50]}...")
-                    elif has_openai_key:
-                        logger.info(f"🔍 Attempting semantic search with OpenAI for query: {query[:50]}...")
-                    
+                    logger.debug(f"🔍 Attempting semantic search for query: {query[:50]}...")
                     result = collection.query.near_text(
                         query=query,
                         limit=limit,
+                        filters=where,
                         return_metadata=wvc.query.MetadataQuery(certainty=True),
-                        return_properties=[
-                            "rule", "priority", "output", "source", "timestamp", 
-                            "securityImpact", "nextSteps", "remediationSteps", 
-                            "suggestedCommands", "aiProvider", "command"
-                        ]
+                        return_properties=ALERT_RETURN_PROPERTIES
                     )
                     search_method = "semantic"
                     logger.info(f"✅ Semantic search successful")
@@ -393,75 +630,49 @@ class WeaviateService:
                     search_method = "text"
                     result = None
             else:
-                if current_vectorizer == "none":
-                    logger.info(f"🔍 Using text search (collection has no vectorizer configured) for query: {query[:50]}...")
-                else:
-                    logger.info(f"🔍 Using text search (no API keys available for vectorization) for query: {query[:50]}...")
+                logger.debug(f"🔍 Using text search (no vectorizer or API keys for vectorization) for query: {query[:50]}...")
             
             # Perform text search if semantic search wasn't attempted or failed
             if search_method == "text" or result is None:
-                # Fallback to basic text search using BM25 or contains
-                # Split query into keywords for better matching
-                keywords = query.lower().split()
-                
-                if keywords:
-                    # Create a filter that looks for keywords in rule, output, or source
-                    # Use simpler like/contains filters
-                    filters = []
-                    for keyword in keywords[:3]:  # Limit to first 3 keywords
-                        # Create OR conditions for each field using like operator
-                        field_filters = [
-                            wvc.query.Filter.by_property("rule").like(f"*{keyword}*"),
-                            wvc.query.Filter.by_property("output").like(f"*{keyword}*"),
-                            wvc.query.Filter.by_property("source").like(f"*{keyword}*")
-                        ]
-                        filters.extend(field_filters)
-                    
-                    # Combine with OR logic
-                    if len(filters) > 1:
-                        combined_filter = filters[0]
-                        for f in filters[1:]:
-                            combined_filter = combined_filter | f
-                    else:
-                        combined_filter = filters[0] if filters else None
-                    
-                    # Query with text filters - simplified approach
-                    result = collection.query.fetch_objects(
+                search_method = "text"
+                if query.strip():
+                    # BM25 ranks the whole collection server-side, with the filters pushed down
+                    result = collection.query.bm25(
+                        query=query,
+                        query_properties=ALERT_SEARCH_PROPERTIES,
                         limit=limit,
-                        return_properties=[
-                            "rule", "priority", "output", "source", "timestamp", 
-                            "securityImpact", "nextSteps", "remediationSteps", 
-                            "suggestedCommands", "aiProvider", "command"
-                        ]
+                        filters=where,
+                        return_metadata=wvc.query.MetadataQuery(score=True),
+                        return_properties=ALERT_RETURN_PROPERTIES
                     )
                 else:
                     # No keywords, return recent alerts
-                    result_objects = collection.query.limit(limit).return_properties([
-                        "rule", "priority", "output", "source", "timestamp", 
-                        "securityImpact", "nextSteps", "remediationSteps", 
-                        "suggestedCommands", "aiProvider", "command"
-                    ]).objects
-                    
-                    # Create result object for compatibility
-                    class MockResult:
-                        def __init__(self, objects):
-                            self.objects = objects
-                    result = MockResult(result_objects)
+                    result = collection.query.fetch_objects(
+                        limit=limit,
+                        filters=where,
+                        sort=wvc.query.Sort.by_property("timestamp", ascending=False),
+                        return_properties=ALERT_RETURN_PROPERTIES
+                    )
             
-            if not result or not result.objects:
+            # Objects that matched only some words of the rule or source filter are dropped
+            exact = self._exact_filter_values(filters)
+            candidates = [obj for obj in (result.objects if result else [])
+                          if all(obj.properties.get(field) == value for field, value in exact.items())]
+            if not candidates:
                 logger.info(f"🔍 No similar alerts found for query: {query[:50]}...")
                 return []
             
             # Convert to the expected format
+            top_score = max((obj.metadata.score or 0 for obj in candidates if obj.metadata), default=0)
             filtered_alerts = []
-            for obj in result.objects:
-                # Get certainty if available (semantic search) or calculate text similarity
+            for obj in candidates:
+                # Certainty from semantic search, or rescored text match for the returned candidates
                 obj_certainty = 0
                 if search_method == "semantic" and obj.metadata and obj.metadata.certainty:
                     obj_certainty = obj.metadata.certainty
                 elif search_method == "text":
-                    # Calculate basic text similarity for text search
-                    obj_certainty = self._calculate_text_similarity(query, obj.properties)
+                    bm25_score = obj.metadata.score if obj.metadata and obj.metadata.score else 0
+                    obj_certainty = text_match_score(query, obj.properties, bm25_score, top_score)
                 
                 # Apply certainty threshold
                 if obj_certainty >= certainty:
@@ -478,7 +689,25 @@ class WeaviateService:
             
         except Exception as e:
             logger.error(f"❌ Failed to search similar alerts: {e}")
-            return []
+            return self._local_similar_alerts(query, limit, certainty, filters)
+    
+    def _ensure_connected(self) -> bool:
+        """Connect if needed, retrying a failed connection at most every WEAVIATE_RECONNECT_SECONDS."""
+        if self.client:
+            return True
+        if time.time() < self._connect_retry_at:
+            return False
+        logger.warning("⚠️ Weaviate client not connected, attempting to connect...")
+        if self.connect():
+            return True
+        logger.error("❌ Failed to connect to Weaviate")
+        self._connect_retry_at = time.time() + float(os.getenv("WEAVIATE_RECONNECT_SECONDS", "30"))
+        return False
+    
+    def _local_similar_alerts(self, query: str, limit: int, certainty: float,
+                              filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Similar alerts from the in-process vector index while Weaviate is unavailable."""
+        return get_local_vector_index().find_similar_alerts(query, limit, certainty, filters)
     
     def get_alert_patterns(self, days: int = 30) -> Dict[str, Any]:
         """
@@ -492,87 +721,8 @@ class WeaviateService:
         """
         try:
             logger.info(f"📊 Analyzing alert patterns for last {days} days...")
-            
-            # Get real alert data from the database
-            import sqlite3
-            import os
-            from datetime import datetime, timedelta
-            from collections import Counter
-            
-            # Connect to database using correct path
-            default_db_path = './data/alerts.db' if not os.path.exists('/app') else '/app/data/alerts.db'
-            db_path = os.getenv('DB_PATH', default_db_path)
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            
-            # Get alerts from the last N days
-            cutoff_date = (datetime.now() - timedelta(days=days)).isoformat()
-            cursor.execute('''
-                SELECT rule, priority, source, timestamp 
-                FROM alerts 
-                WHERE timestamp > ?
-                ORDER BY timestamp DESC
-            ''', (cutoff_date,))
-            
-            alerts = cursor.fetchall()
-            conn.close()
-            
-            if not alerts:
-                return {
-                    "total_alerts": 0,
-                    "rule_frequency": {},
-                    "priority_distribution": {},
-                    "source_distribution": {},
-                    "timeline": [],
-                    "message": "No alerts found for the specified time period"
-                }
-            
-            # Analyze patterns - filter out None values
-            rules = [alert[0] for alert in alerts if alert[0] is not None]
-            priorities = [alert[1] for alert in alerts if alert[1] is not None]
-            sources = [alert[2] for alert in alerts if alert[2] is not None]
-            
-            # Count frequencies
-            rule_frequency = dict(Counter(rules).most_common(10))
-            priority_distribution = dict(Counter(priorities))
-            source_distribution = dict(Counter(sources))
-            
-            # Generate timeline (alerts per day)
-            timeline = []
-            date_counts = {}
-            
-            for alert in alerts:
-                timestamp = alert[3]
-                # Ensure timestamp is not None and is a string
-                if timestamp is None or not isinstance(timestamp, str):
-                    continue
-                    
-                try:
-                    # Parse the timestamp and extract date
-                    date = datetime.fromisoformat(timestamp.replace('Z', '+00:00')).date()
-                    date_str = date.isoformat()
-                    date_counts[date_str] = date_counts.get(date_str, 0) + 1
-                except (ValueError, TypeError, AttributeError) as e:
-                    # Log specific parsing errors for debugging
-                    logger.debug(f"Failed to parse timestamp '{timestamp}': {e}")
-                    continue
-            
-            # Sort by date - ensure all keys are valid strings
-            valid_dates = [date for date in date_counts.keys() if date is not None and isinstance(date, str)]
-            sorted_dates = sorted(valid_dates)
-            timeline = [{"date": date, "count": date_counts[date]} for date in sorted_dates]
-            
-            patterns = {
-                "total_alerts": len(alerts),
-                "rule_frequency": rule_frequency,
-                "priority_distribution": priority_distribution,
-                "source_distribution": source_distribution,
-                "timeline": timeline,
-                "analysis_period_days": days,
-                "message": f"Analyzed {len(alerts)} alerts over {days} days"
-            }
-            
-            logger.info(f"📊 Generated alert patterns for {len(alerts)} alerts")
+            patterns = get_alert_analytics().alert_patterns(days)
+            logger.info(f"📊 Generated alert patterns for {patterns['total_alerts']} alerts")
             return patterns
             
         except Exception as e:
@@ -677,10 +827,8 @@ class WeaviateService:
             # If not in environment, try to get from database
             if not provider_name:
                 try:
-                    # Import here to avoid circular dependency
-                    from app import get_ai_config
-                    ai_config = get_ai_config()
-                    provider_name = ai_config.get('provider_name', {}).get('value', 'openai').lower()
+                    from config_service import get_config_service
+                    provider_name = (get_config_service().get_value('ai', 'provider_name', 'openai') or 'openai').lower()
                 except Exception:
                     logger.warning("⚠️ Could not get AI provider from database, defaulting to OpenAI")
                     provider_name = "openai"
@@ -741,10 +889,8 @@ class WeaviateService:
             # If not in environment, try to get from database
             if not provider_name:
                 try:
-                    # Import here to avoid circular dependency
-                    from app import get_ai_config
-                    ai_config = get_ai_config()
-                    provider_name = ai_config.get('provider_name', {}).get('value', 'openai').lower()
+                    from config_service import get_config_service
+                    provider_name = (get_config_service().get_value('ai', 'provider_name', 'openai') or 'openai').lower()
                 except Exception:
                     provider_name = "openai"
             
@@ -763,56 +909,46 @@ class WeaviateService:
             logger.warning(f"⚠️ Failed to determine expected vectorizer: {e}")
             return "none"
 
-    def _calculate_text_similarity(self, query: str, properties: Dict[str, Any]) -> float:
+    def _alert_filters(self, filters: Optional[Dict[str, Any]]):
         """
-        Calculate basic text similarity for text search results.
+        Translate search filters into a Weaviate filter so they are applied server-side.
         
         Args:
-            query: Search query
-            properties: Object properties
+            filters: Optional 'priority' (name or list), 'rule', 'source', 'time_range'
+                     ('1h', '24h', '7d', '30d') or 'since' (ISO timestamp); 'all' means no filter
             
         Returns:
-            Similarity score (0.0 - 1.0)
+            Combined Weaviate filter, or None
+        
+        ``rule`` and ``source`` are word-tokenized, so their conditions also match values sharing
+        their words ("web" matches "web-1"); callers drop those with ``_exact_filter_values``.
         """
-        try:
-            query_lower = query.lower()
-            query_words = set(query_lower.split())
-            
-            # Combine relevant text fields
-            text_fields = [
-                properties.get("rule", ""),
-                properties.get("output", ""),
-                properties.get("source", ""),
-                properties.get("securityImpact", ""),
-                properties.get("nextSteps", "")
-            ]
-            
-            combined_text = " ".join(text_fields).lower()
-            combined_words = set(combined_text.split())
-            
-            # Calculate Jaccard similarity (intersection / union)
-            if not query_words or not combined_words:
-                return 0.0
-            
-            intersection = len(query_words.intersection(combined_words))
-            union = len(query_words.union(combined_words))
-            
-            jaccard_similarity = intersection / union if union > 0 else 0.0
-            
-            # Boost score if query appears as substring in key fields
-            boost = 0.0
-            if query_lower in properties.get("rule", "").lower():
-                boost += 0.3
-            if query_lower in properties.get("output", "").lower():
-                boost += 0.2
-            
-            # Ensure score stays within bounds
-            final_score = min(1.0, jaccard_similarity + boost)
-            return final_score
-            
-        except Exception as e:
-            logger.warning(f"⚠️ Error calculating text similarity: {e}")
-            return 0.0
+        if not filters:
+            return None
+        conditions = []
+        priority = filters.get("priority")
+        if priority and priority != "all":
+            priorities = priority if isinstance(priority, list) else [priority]
+            conditions.append(wvc.query.Filter.by_property("priority").contains_any(priorities))
+        for field in ("rule", "source"):
+            value = filters.get(field)
+            if value and value != "all":
+                conditions.append(wvc.query.Filter.by_property(field).equal(value))
+        since = None
+        if filters.get("time_range") in SEARCH_TIME_RANGES:
+            since = datetime.now(timezone.utc) - SEARCH_TIME_RANGES[filters["time_range"]]
+        elif filters.get("since"):
+            try:
+                since = datetime.fromisoformat(str(filters["since"]).replace('Z', '+00:00'))
+                if since.tzinfo is None:
+                    since = since.replace(tzinfo=timezone.utc)
+            except ValueError:
+                logger.warning(f"⚠️ Ignoring invalid 'since' filter: {filters['since']}")
+        if since:
+            conditions.append(wvc.query.Filter.by_property("timestamp").greater_or_equal(since))
+        if not conditions:
+            return None
+        return wvc.query.Filter.all_of(conditions) if len(conditions) > 1 else conditions[0]
     
     def create_conversation_schema(self) -> bool:
         """
@@ -823,7 +959,7 @@ class WeaviateService:
         """
         try:
             # Check if collection already exists
-            if self.client.collections.exists("ConversationContext"):
+            if self._collection_exists("ConversationContext"):
                 logger.info("📋 ConversationContext collection already exists")
                 return True
             
@@ -879,6 +1015,8 @@ class WeaviateService:
             )
             
             logger.info("✅ ConversationContext schema created successfully")
+            self._invalidate_schema_cache("ConversationContext")
+            self._known_collections.add("ConversationContext")
             return True
             
         except Exception as e:
@@ -908,12 +1046,12 @@ class WeaviateService:
                 if not self.connect():
                     return None
             
-            if not self.client.collections.exists("ConversationContext"):
+            if not self._collection_exists("ConversationContext"):
                 if not self.create_conversation_schema():
                     return None
             
             # Get collection
-            collection = self.client.collections.get("ConversationContext")
+            collection = self._collection("ConversationContext")
             
             # Extract relevant alert IDs from context
             relevant_alerts = []
@@ -961,10 +1099,10 @@ class WeaviateService:
                 if not self.connect():
                     return []
             
-            if not self.client.collections.exists("ConversationContext"):
+            if not self._collection_exists("ConversationContext"):
                 return []
             
-            collection = self.client.collections.get("ConversationContext")
+            collection = self._collection("ConversationContext")
             
             # Query conversations for this session - simplified approach
             result = collection.query.fetch_objects(
@@ -1024,10 +1162,10 @@ class WeaviateService:
                 if not self.connect():
                     return []
             
-            if not self.client.collections.exists("ConversationContext"):
+            if not self._collection_exists("ConversationContext"):
                 return []
             
-            collection = self.client.collections.get("ConversationContext")
+            collection = self._collection("ConversationContext")
             
             # Build filter
             where_filter = None
@@ -1129,7 +1267,7 @@ class WeaviateService:
     
     def cluster_alerts_smart(self, days: int = 30, min_cluster_size: int = 2) -> Dict[str, Any]:
         """
-        Perform intelligent alert clustering using ML algorithms.
+        Report alert clusters from the precomputed cluster assignments.
         
         Args:
             days: Number of days to analyze
@@ -1139,103 +1277,7 @@ class WeaviateService:
             Dictionary with clustering results
         """
         try:
-            logger.info(f"🧠 Starting smart alert clustering for last {days} days...")
-            
-            # Get real alert data from the database
-            import sqlite3
-            import json
-            import os
-            from datetime import datetime, timedelta
-            from collections import Counter
-            
-            # Connect to database using correct path
-            default_db_path = './data/alerts.db' if not os.path.exists('/app') else '/app/data/alerts.db'
-            db_path = os.getenv('DB_PATH', default_db_path)
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            
-            # Get alerts from the last N days
-            cutoff_date = (datetime.now() - timedelta(days=days)).isoformat()
-            cursor.execute('''
-                SELECT rule, priority, output, source, timestamp 
-                FROM alerts 
-                WHERE timestamp > ?
-                ORDER BY timestamp DESC
-            ''', (cutoff_date,))
-            
-            alerts = cursor.fetchall()
-            conn.close()
-            
-            if not alerts:
-                return {
-                    "clusters": [],
-                    "total_alerts": 0,
-                    "clustered_alerts": 0,
-                    "noise_alerts": 0,
-                    "cluster_count": 0,
-                    "clustering_efficiency": 0.0,
-                    "message": "No alerts found for the specified time period"
-                }
-            
-            # Group alerts by rule (simple clustering approach)
-            rule_groups = {}
-            for alert in alerts:
-                rule = alert[0]
-                if rule not in rule_groups:
-                    rule_groups[rule] = []
-                rule_groups[rule].append({
-                    'rule': alert[0],
-                    'priority': alert[1],
-                    'output': alert[2],
-                    'source': alert[3],
-                    'timestamp': alert[4]
-                })
-            
-            # Create clusters from groups with minimum size
-            clusters = []
-            cluster_id = 0
-            clustered_count = 0
-            
-            for rule, rule_alerts in rule_groups.items():
-                if len(rule_alerts) >= min_cluster_size:
-                    # Get most common priority and source
-                    priorities = [a['priority'] for a in rule_alerts]
-                    sources = [a['source'] for a in rule_alerts]
-                    
-                    common_priority = Counter(priorities).most_common(1)[0][0]
-                    common_source = Counter(sources).most_common(1)[0][0]
-                    
-                    cluster = {
-                        "cluster_id": cluster_id,
-                        "size": len(rule_alerts),
-                        "common_rule": rule,
-                        "common_source": common_source,
-                        "common_priority": common_priority,
-                        "description": f"Cluster of {len(rule_alerts)} alerts from rule '{rule}'",
-                        "alerts": rule_alerts[:5],  # Sample alerts
-                        "diversity_score": len(set(sources)) / len(rule_alerts) if rule_alerts else 0
-                    }
-                    clusters.append(cluster)
-                    clustered_count += len(rule_alerts)
-                    cluster_id += 1
-            
-            # Sort clusters by size (largest first)
-            clusters.sort(key=lambda x: x['size'], reverse=True)
-            
-            total_alerts = len(alerts)
-            noise_alerts = total_alerts - clustered_count
-            clustering_efficiency = clustered_count / total_alerts if total_alerts > 0 else 0
-            
-            return {
-                "clusters": clusters,
-                "total_alerts": total_alerts,
-                "clustered_alerts": clustered_count,
-                "noise_alerts": noise_alerts,
-                "cluster_count": len(clusters),
-                "clustering_efficiency": clustering_efficiency,
-                "message": f"Successfully clustered {clustered_count} out of {total_alerts} alerts"
-            }
-            
+            return get_alert_clustering_service().get_clusters(days, min_cluster_size)
         except Exception as e:
             logger.error(f"❌ Smart clustering failed: {e}")
             return {"error": str(e)}
@@ -1253,32 +1295,14 @@ class WeaviateService:
         try:
             logger.info("🔮 Generating predictive threat intelligence...")
             
-            # Get real alert data from database for analysis
-            import sqlite3
-            import os
-            from datetime import datetime, timedelta
-            from collections import Counter
-            
-            # Connect to database using correct path
-            default_db_path = './data/alerts.db' if not os.path.exists('/app') else '/app/data/alerts.db'
-            db_path = os.getenv('DB_PATH', default_db_path)
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            
-            # Get similar alerts based on rule
+            # Statistics of the most recent alerts of this rule, from the shared analytics frame
             rule = alert_data.get('rule', '')
-            cursor.execute('''
-                SELECT rule, priority, output, source, timestamp 
-                FROM alerts 
-                WHERE rule = ? OR rule LIKE ?
-                ORDER BY timestamp DESC
-                LIMIT 50
-            ''', (rule, f'%{rule}%'))
+            history = get_alert_analytics().rule_history(rule)
             
-            similar_alerts = cursor.fetchall()
-            conn.close()
+            # Anomaly of the alert for its workload, from the streaming baselines
+            anomaly = self._behavioral_anomaly(alert_data)
             
-            if not similar_alerts:
+            if not history['incidents']:
                 return {
                     "risk_score": 5.0,  # Medium risk
                     "confidence": 0.3,
@@ -1286,30 +1310,23 @@ class WeaviateService:
                     "recommendations": ["Monitor for similar patterns", "Establish baseline behavior"],
                     "threat_category": self._classify_threat_category(alert_data),
                     "similar_incidents": 0,
-                    "attack_chain": []
+                    "attack_chain": self._correlated_attack_chain(alert_data),
+                    "behavioral_anomaly": anomaly
                 }
             
-            # Calculate risk factors from historical data
-            priorities = [alert[1] for alert in similar_alerts]
-            priority_weights = {'critical': 10, 'error': 8, 'warning': 6, 'notice': 4, 'info': 2}
-            
-            # Calculate average priority weight
-            avg_priority_weight = sum(priority_weights.get(p, 5) for p in priorities) / len(priorities)
-            
-            # Calculate frequency factor
-            recent_count = len([a for a in similar_alerts if a[4] >= (datetime.now() - timedelta(days=7)).isoformat()])
+            similar_incidents = history['incidents']
+            recent_count = history['recent_count']
             frequency_factor = min(10, recent_count / 2)  # Max 10, normalized
             
-            # Calculate source diversity
-            sources = [alert[3] for alert in similar_alerts]
-            source_diversity = len(set(sources))
-            
             # Calculate final risk score (consistent formula)
-            risk_score = (avg_priority_weight * 0.5) + (frequency_factor * 0.3) + (min(source_diversity, 5) * 0.2)
+            risk_score = (history['avg_priority_weight'] * 0.5) + (frequency_factor * 0.3) + \
+                (min(history['source_diversity'], 5) * 0.2)
+            if anomaly['anomaly_score'] >= 7.0:
+                risk_score += 1.0  # Unusual for this workload
             risk_score = max(1.0, min(10.0, risk_score))
             
             # Determine confidence based on data quality
-            confidence = min(1.0, len(similar_alerts) / 20.0)
+            confidence = min(1.0, similar_incidents / 20.0)
             
             # Generate threat category
             threat_category = self._classify_threat_category(alert_data)
@@ -1336,7 +1353,7 @@ class WeaviateService:
                 ]
             
             # Generate prediction text
-            prediction = f"Based on {len(similar_alerts)} similar incidents, this alert shows {self._get_risk_level_text(risk_score)} risk characteristics"
+            prediction = f"Based on {similar_incidents} similar incidents, this alert shows {self._get_risk_level_text(risk_score)} risk characteristics"
             
             return {
                 "risk_score": round(risk_score, 1),
@@ -1344,10 +1361,11 @@ class WeaviateService:
                 "prediction": prediction,
                 "recommendations": recommendations,
                 "threat_category": threat_category,
-                "similar_incidents": len(similar_alerts),
-                "attack_chain": self._generate_simple_attack_chain(rule, threat_category),
-                "priority_trend": Counter(priorities).most_common(3),
-                "recent_activity": recent_count
+                "similar_incidents": similar_incidents,
+                "attack_chain": self._generate_simple_attack_chain(rule, threat_category, alert_data),
+                "priority_trend": history['priority_trend'],
+                "recent_activity": recent_count,
+                "behavioral_anomaly": anomaly
             }
             
         except Exception as e:
@@ -1367,24 +1385,26 @@ class WeaviateService:
         try:
             logger.info("🏷️ Performing real-time alert classification...")
             
-            # Extract alert text for analysis
-            alert_text = f"{alert_data.get('rule', '')} {alert_data.get('output', '')}"
-            alert_text_lower = alert_text.lower()
+            # One keyword pass over rule and output, shared by all helpers
+            match = self._keyword_match(alert_data)
             
             # Classify threat category
-            threat_category = self._classify_threat_category(alert_data)
+            threat_category = self._classify_threat_category(alert_data, match)
             
             # Determine severity adjustment
-            severity_adjustment = self._calculate_severity_adjustment(alert_data)
+            severity_adjustment = self._calculate_severity_adjustment(alert_data, match)
             
             # Generate tags
-            tags = self._generate_smart_tags(alert_data)
+            tags = self._generate_smart_tags(alert_data, match, threat_category)
             
             # Predict false positive likelihood
-            false_positive_likelihood = self._predict_false_positive(alert_data)
+            false_positive_likelihood = self._predict_false_positive(alert_data, match)
+            
+            # Anomaly of the alert for its workload, from the streaming baselines
+            anomaly = self._behavioral_anomaly(alert_data)
             
             # Calculate urgency score
-            urgency_score = self._calculate_urgency_score(alert_data, threat_category)
+            urgency_score = self._calculate_urgency_score(alert_data, threat_category, anomaly['anomaly_score'])
             
             return {
                 "threat_category": threat_category,
@@ -1395,7 +1415,8 @@ class WeaviateService:
                 "adjusted_priority": self._adjust_priority(alert_data.get('priority', 'unknown'), severity_adjustment),
                 "false_positive_likelihood": false_positive_likelihood,
                 "urgency_score": urgency_score,
-                "classification_reasons": self._get_classification_reasons(alert_data, threat_category)
+                "anomaly_score": anomaly['anomaly_score'],
+                "classification_reasons": self._get_classification_reasons(alert_data, threat_category, match) + anomaly['reasons']
             }
             
         except Exception as e:
@@ -1446,6 +1467,12 @@ class WeaviateService:
             logger.error(f"❌ Enhanced contextual analysis failed: {e}")
             return {"error": str(e)}
     
+    @staticmethod
+    def _exact_filter_values(filters: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Rule/source filter values that returned alerts must equal exactly, as the local index requires."""
+        return {field: filters[field] for field in ("rule", "source")
+                if filters and filters.get(field) and filters[field] != "all"}
+    
     def advanced_semantic_search(self, query: str, search_type: str = "intelligent", 
                                 limit: int = 10, filters: Dict[str, Any] = None) -> Dict[str, Any]:
         """
@@ -1473,7 +1500,7 @@ class WeaviateService:
             if search_type == "intelligent":
                 results = self._intelligent_search(processed_query, limit, filters)
             elif search_type == "semantic":
-                results = self.find_similar_alerts(processed_query["main_query"], limit)
+                results = self.find_similar_alerts(processed_query["main_query"], limit, filters=filters)
             else:
                 results = self._keyword_search(processed_query["keywords"], limit, filters)
             
@@ -1565,7 +1592,7 @@ class WeaviateService:
         # Priority escalation factor
         priorities = [alert.get('priority', 'unknown') for alert in similar_alerts]
         priority_weights = {'critical': 1.0, 'error': 0.8, 'warning': 0.5, 'notice': 0.3, 'info': 0.1}
-        avg_priority_weight = np.mean([priority_weights.get(p, 0.5) for p in priorities]) if priorities else 0.5
+        avg_priority_weight = sum(priority_weights.get(p, 0.5) for p in priorities) / len(priorities) if priorities else 0.5
         factors['severity_trend'] = avg_priority_weight
         
         # Source diversity factor
@@ -1671,61 +1698,34 @@ class WeaviateService:
         else:
             return f"Low confidence prediction - limited historical data ({frequency} references)"
     
-    def _classify_threat_category(self, alert_data: Dict[str, Any]) -> str:
+    def _keyword_match(self, alert_data: Dict[str, Any]) -> AlertKeywordMatch:
+        """Match all classification keywords against the alert in one pass."""
+        return get_alert_classifier(self.threat_categories).match(alert_data)
+    
+    def _classify_threat_category(self, alert_data: Dict[str, Any],
+                                  match: Optional[AlertKeywordMatch] = None) -> str:
         """Classify alert into threat category."""
-        alert_text = f"{alert_data.get('rule', '')} {alert_data.get('output', '')}".lower()
-        
-        category_scores = {}
-        for category, keywords in self.threat_categories.items():
-            score = sum(1 for keyword in keywords if keyword in alert_text)
-            if score > 0:
-                category_scores[category] = score
-        
-        if category_scores:
-            return max(category_scores, key=category_scores.get)
-        
-        return "unknown"
+        return get_alert_classifier(self.threat_categories).threat_category(match or self._keyword_match(alert_data))
     
-    def _calculate_severity_adjustment(self, alert_data: Dict[str, Any]) -> float:
-        """Calculate severity adjustment factor."""
-        base_adjustment = 0.0
-        
-        # Check for escalation indicators
-        alert_text = alert_data.get('output', '').lower()
-        
-        escalation_indicators = ['root', 'admin', 'privilege', 'escalat', 'sudo', 'su ']
-        for indicator in escalation_indicators:
-            if indicator in alert_text:
-                base_adjustment += 0.2
-        
-        # Check for persistence indicators
-        persistence_indicators = ['cron', 'service', 'startup', 'registry', 'autostart']
-        for indicator in persistence_indicators:
-            if indicator in alert_text:
-                base_adjustment += 0.15
-        
-        return min(1.0, base_adjustment)
+    def _calculate_severity_adjustment(self, alert_data: Dict[str, Any],
+                                       match: Optional[AlertKeywordMatch] = None) -> float:
+        """Calculate severity adjustment factor from escalation and persistence indicators in the output."""
+        return get_alert_classifier(self.threat_categories).severity_adjustment(match or self._keyword_match(alert_data))
     
-    def _generate_smart_tags(self, alert_data: Dict[str, Any]) -> List[str]:
+    def _generate_smart_tags(self, alert_data: Dict[str, Any], match: Optional[AlertKeywordMatch] = None,
+                             threat_category: Optional[str] = None) -> List[str]:
         """Generate intelligent tags for the alert."""
         tags = []
-        
-        alert_text = f"{alert_data.get('rule', '')} {alert_data.get('output', '')}".lower()
+        classifier = get_alert_classifier(self.threat_categories)
+        match = match or self._keyword_match(alert_data)
         
         # Add threat category
-        threat_category = self._classify_threat_category(alert_data)
+        threat_category = threat_category or classifier.threat_category(match)
         if threat_category != "unknown":
             tags.append(f"threat:{threat_category}")
         
         # Add technical tags
-        if 'container' in alert_text:
-            tags.append("tech:container")
-        if 'network' in alert_text or 'connection' in alert_text:
-            tags.append("tech:network")
-        if 'file' in alert_text or 'filesystem' in alert_text:
-            tags.append("tech:filesystem")
-        if 'process' in alert_text or 'execution' in alert_text:
-            tags.append("tech:process")
+        tags.extend(classifier.tech_tags(match))
         
         # Add severity tags
         priority = alert_data.get('priority', '').lower()
@@ -1738,13 +1738,11 @@ class WeaviateService:
         
         return tags
     
-    def _predict_false_positive(self, alert_data: Dict[str, Any]) -> float:
+    def _predict_false_positive(self, alert_data: Dict[str, Any],
+                                match: Optional[AlertKeywordMatch] = None) -> float:
         """Predict likelihood of false positive."""
         # Simple heuristic - can be enhanced with ML
-        rule = alert_data.get('rule', '').lower()
-        
-        false_positive_indicators = ['informational', 'notice', 'debug']
-        if any(indicator in rule for indicator in false_positive_indicators):
+        if get_alert_classifier(self.threat_categories).false_positive_hint(match or self._keyword_match(alert_data)):
             return 0.7
         
         if alert_data.get('priority', '').lower() in ['critical', 'error']:
@@ -1752,8 +1750,9 @@ class WeaviateService:
         
         return 0.3  # Default moderate chance
     
-    def _calculate_urgency_score(self, alert_data: Dict[str, Any], threat_category: str) -> float:
-        """Calculate urgency score for alert processing."""
+    def _calculate_urgency_score(self, alert_data: Dict[str, Any], threat_category: str,
+                                 anomaly_score: Optional[float] = None) -> float:
+        """Calculate urgency score for alert processing (raised for alerts anomalous for their workload)."""
         base_score = 5.0
         
         # Priority weight
@@ -1769,6 +1768,10 @@ class WeaviateService:
         }
         base_score += category_weights.get(threat_category, 0.0)
         
+        # Behavioral anomaly weight
+        if anomaly_score is not None and anomaly_score >= 7.0:
+            base_score += 1.0
+        
         return min(10.0, base_score)
     
     def _calculate_classification_confidence(self, alert_data: Dict[str, Any]) -> float:
@@ -1796,14 +1799,14 @@ class WeaviateService:
         except ValueError:
             return original_priority
     
-    def _get_classification_reasons(self, alert_data: Dict[str, Any], threat_category: str) -> List[str]:
+    def _get_classification_reasons(self, alert_data: Dict[str, Any], threat_category: str,
+                                    match: Optional[AlertKeywordMatch] = None) -> List[str]:
         """Get reasons for classification decision."""
         reasons = []
         
-        alert_text = f"{alert_data.get('rule', '')} {alert_data.get('output', '')}".lower()
-        
         if threat_category in self.threat_categories:
-            matching_keywords = [kw for kw in self.threat_categories[threat_category] if kw in alert_text]
+            matching_keywords = get_alert_classifier(self.threat_categories).category_keywords(
+                match or self._keyword_match(alert_data), threat_category)
             if matching_keywords:
                 reasons.append(f"Contains {threat_category} indicators: {', '.join(matching_keywords[:3])}")
         
@@ -1818,54 +1821,27 @@ class WeaviateService:
     def _get_temporal_context(self, alert_data: Dict[str, Any], window_hours: int = 6) -> Dict[str, Any]:
         """Get temporal context around alert time."""
         try:
-            alert_time = alert_data.get('time', datetime.now().isoformat())
-            if isinstance(alert_time, str):
-                alert_datetime = datetime.fromisoformat(alert_time.replace('Z', '+00:00'))
-            else:
-                alert_datetime = datetime.now()
+            alert_datetime = self._alert_datetime(alert_data)
+            start_time = alert_datetime - timedelta(hours=window_hours)
+            end_time = alert_datetime + timedelta(hours=window_hours)
             
-            # Define time window
-            start_time = (alert_datetime - timedelta(hours=window_hours)).isoformat()
-            end_time = (alert_datetime + timedelta(hours=window_hours)).isoformat()
+            # Counts come from aggregates over the whole window; only a page of alerts is fetched
+            total_alerts = self.count_alert_window(start_time, end_time)
+            source_counts = self.count_alert_window(start_time, end_time, group_by="source")
+            rule_counts = self.count_alert_window(start_time, end_time, group_by="rule")
             
-            # Query alerts in time window - simplified approach
-            collection = self.client.collections.get("SecurityAlert")
-            result = collection.query.fetch_objects(
-                limit=50,
+            temporal_alerts = self.query_alert_window(
+                start_time, end_time, limit=TEMPORAL_CONTEXT_LIMIT,
                 return_properties=["rule", "priority", "source", "timestamp", "output"]
             )
             
-            # Filter by time window after retrieval
-            filtered_objects = []
-            for obj in result.objects:
-                timestamp = obj.properties.get("timestamp", "")
-                if timestamp >= start_time and timestamp <= end_time:
-                    filtered_objects.append(obj)
-            
-            # Create result object for compatibility
-            class MockResult:
-                def __init__(self, objects):
-                    self.objects = objects
-            result = MockResult(filtered_objects)
-            
-            temporal_alerts = []
-            for obj in result.objects:
-                temporal_alerts.append({
-                    'id': str(obj.uuid),
-                    'rule': obj.properties.get('rule', ''),
-                    'priority': obj.properties.get('priority', ''),
-                    'source': obj.properties.get('source', ''),
-                    'timestamp': obj.properties.get('timestamp', ''),
-                    'output': obj.properties.get('output', '')
-                })
-            
             return {
                 "window_hours": window_hours,
-                "total_alerts": len(temporal_alerts),
+                "total_alerts": total_alerts,
                 "alerts": temporal_alerts,
-                "alert_density": len(temporal_alerts) / (window_hours * 2) if window_hours > 0 else 0,
-                "unique_sources": len(set(alert['source'] for alert in temporal_alerts)),
-                "unique_rules": len(set(alert['rule'] for alert in temporal_alerts))
+                "alert_density": total_alerts / (window_hours * 2) if window_hours > 0 else 0,
+                "unique_sources": len(source_counts),
+                "unique_rules": len(rule_counts)
             }
             
         except Exception as e:
@@ -1873,58 +1849,25 @@ class WeaviateService:
             return {"error": str(e)}
     
     def _reconstruct_attack_chain(self, alert_data: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Reconstruct potential attack chain from historical data."""
+        """Attack chain of the alert's container, read from the correlation engine's sliding window."""
         try:
             source = alert_data.get('output_fields', {}).get('container.name', 
                                    alert_data.get('source', 'unknown'))
             
-            # Get alerts from same source in last 24 hours
-            past_24h = (datetime.now() - timedelta(hours=24)).isoformat()
-            collection = self.client.collections.get("SecurityAlert")
-            
-            result = collection.query.fetch_objects(
-                limit=100,
-                return_properties=["rule", "priority", "timestamp", "output", "command", "source"]
-            )
-            
-            # Filter by source and timestamp after retrieval
-            filtered_objects = []
-            for obj in result.objects:
-                obj_source = obj.properties.get("source", "")
-                obj_timestamp = obj.properties.get("timestamp", "")
-                if obj_source == source and obj_timestamp >= past_24h:
-                    filtered_objects.append(obj)
-            
-            # Create result object for compatibility
-            class MockResult:
-                def __init__(self, objects):
-                    self.objects = objects
-            result = MockResult(filtered_objects)
-            
-            chain_alerts = []
-            for obj in result.objects:
-                chain_alerts.append({
-                    'id': str(obj.uuid),
-                    'rule': obj.properties.get('rule', ''),
-                    'priority': obj.properties.get('priority', ''),
-                    'timestamp': obj.properties.get('timestamp', ''),
-                    'output': obj.properties.get('output', ''),
-                    'command': obj.properties.get('command', '')
-                })
-            
-            # Sort by timestamp to create chronological chain
-            chain_alerts.sort(key=lambda x: x['timestamp'])
-            
-            # Analyze progression
-            chain_analysis = self._analyze_attack_progression(chain_alerts)
+            # Chronological alerts of the container, sequences in progress and open incidents
+            chain = get_correlation_engine().chain(alert_data)
+            chain_alerts = chain['scopes']['container']['alerts']
             
             return {
                 "source": source,
                 "chain_length": len(chain_alerts),
                 "alerts": chain_alerts[-10:],  # Last 10 for brevity
-                "progression_analysis": chain_analysis,
-                "time_span_hours": 24,
-                "attack_phases": self._identify_attack_phases(chain_alerts)
+                "progression_analysis": self._analyze_attack_progression(chain_alerts),
+                "time_span_hours": round(chain['window_seconds'] / 3600, 2),
+                "attack_phases": self._identify_attack_phases(chain_alerts),
+                "sequences_in_progress": [sequence for scope in chain['scopes'].values()
+                                          for sequence in scope['in_progress']],
+                "incidents": [incident for scope in chain['scopes'].values() for incident in scope['incidents']]
             }
             
         except Exception as e:
@@ -1937,53 +1880,44 @@ class WeaviateService:
             source = alert_data.get('output_fields', {}).get('container.name', 
                                    alert_data.get('source', 'unknown'))
             
-            # Get historical data for source
-            past_30d = (datetime.now() - timedelta(days=30)).isoformat()
-            collection = self.client.collections.get("SecurityAlert")
-            
-            result = collection.query.fetch_objects(
-                limit=200,
-                return_properties=["rule", "priority", "timestamp", "source"]
-            )
-            
-            # Filter by source and timestamp after retrieval
-            filtered_objects = []
-            for obj in result.objects:
-                obj_source = obj.properties.get("source", "")
-                obj_timestamp = obj.properties.get("timestamp", "")
-                if obj_source == source and obj_timestamp >= past_30d:
-                    filtered_objects.append(obj)
-            
-            # Create result object for compatibility
-            class MockResult:
-                def __init__(self, objects):
-                    self.objects = objects
-            result = MockResult(filtered_objects)
-            
-            historical_alerts = [obj.properties for obj in result.objects]
-            
-            # Analyze patterns
-            rule_frequency = Counter(alert['rule'] for alert in historical_alerts)
-            priority_distribution = Counter(alert['priority'] for alert in historical_alerts)
+            # 30 days of history for the source, counted by Weaviate
+            past_30d = datetime.now(timezone.utc) - timedelta(days=30)
+            rule_frequency = Counter(self.count_alert_window(past_30d, source=source, group_by="rule"))
+            priority_distribution = self.count_alert_window(past_30d, source=source, group_by="priority")
+            total_alerts = self.count_alert_window(past_30d, source=source)
             
             # Calculate baseline behavior
-            avg_alerts_per_day = len(historical_alerts) / 30 if historical_alerts else 0
+            avg_alerts_per_day = total_alerts / 30
             most_common_rule = rule_frequency.most_common(1)[0] if rule_frequency else ("unknown", 0)
             
             return {
                 "source": source,
-                "total_alerts_30d": len(historical_alerts),
+                "total_alerts_30d": total_alerts,
                 "avg_alerts_per_day": avg_alerts_per_day,
                 "most_common_rule": most_common_rule[0],
                 "rule_frequency": dict(rule_frequency.most_common(5)),
-                "priority_distribution": dict(priority_distribution),
-                "behavioral_score": self._calculate_behavioral_score(historical_alerts, alert_data)
+                "priority_distribution": priority_distribution,
+                "behavioral_score": self._calculate_behavioral_score(alert_data)
             }
             
         except Exception as e:
             logger.warning(f"Failed to analyze source patterns: {e}")
             return {"error": str(e)}
     
+    def _alert_datetime(self, alert_data: Dict[str, Any]) -> datetime:
+        """Timezone-aware time of an alert (now if it has no parseable time)."""
+        alert_time = alert_data.get('time')
+        try:
+            if isinstance(alert_time, str):
+                alert_datetime = datetime.fromisoformat(alert_time.replace('Z', '+00:00'))
+            elif isinstance(alert_time, datetime):
+                alert_datetime = alert_time
+            else:
+                return datetime.now(timezone.utc)
+        except ValueError:
+            return datetime.now(timezone.utc)
+        return alert_datetime if alert_datetime.tzinfo else alert_datetime.replace(tzinfo=timezone.utc)
+    
     def _assess_impact(self, alert_data: Dict[str, Any], temporal_context: Dict[str, Any]) -> Dict[str, Any]:
         """Assess potential impact of the alert."""
         impact_score = 5.0  # Base impact
@@ -2139,7 +2073,8 @@ class WeaviateService:
         # Start with semantic search
         semantic_results = self.find_similar_alerts(
             processed_query["main_query"], 
-            limit=limit//2
+            limit=limit//2,
+            filters=filters
         )
         results.extend(semantic_results)
         
@@ -2163,48 +2098,150 @@ class WeaviateService:
         
         return unique_results[:limit]
     
+    def _alert_window_filter(self, start: datetime, end: Optional[datetime] = None, source: Optional[str] = None):
+        """
+        Weaviate filter for alerts with start <= timestamp <= end, optionally from one source.
+        
+        ``source`` is a word-tokenized property, so the source condition also matches other
+        sources sharing its words ("web" matches "web-1"); callers keep exact matches only.
+        """
+        conditions = [wvc.query.Filter.by_property("timestamp").greater_or_equal(start)]
+        if end is not None:
+            conditions.append(wvc.query.Filter.by_property("timestamp").less_or_equal(end))
+        if source:
+            conditions.append(wvc.query.Filter.by_property("source").equal(source))
+        return wvc.query.Filter.all_of(conditions) if len(conditions) > 1 else conditions[0]
+    
+    def query_alert_window(self, start: datetime, end: Optional[datetime] = None, source: Optional[str] = None,
+                           limit: int = 100, return_properties: Optional[List[str]] = None,
+                           newest_first: bool = True) -> List[Dict[str, Any]]:
+        """
+        Fetch alerts in a time window, filtered and sorted by Weaviate.
+        
+        Args:
+            start: Window start (inclusive)
+            end: Window end (inclusive), or None for open-ended
+            source: Only alerts from this source (container name)
+            limit: Maximum number of alerts
+            return_properties: Properties to return (default: rule, priority, source, timestamp, output)
+            newest_first: Sort by timestamp descending (ascending otherwise)
+            
+        Returns:
+            List of alert property dicts with 'id' and ISO 'timestamp'
+        """
+        collection = self._collection("SecurityAlert")
+        where = self._alert_window_filter(start, end, source)
+        properties = return_properties or ["rule", "priority", "source", "timestamp", "output"]
+        alerts = []
+        offset = 0
+        while True:
+            result = collection.query.fetch_objects(
+                limit=limit,
+                offset=offset,
+                filters=where,
+                sort=wvc.query.Sort.by_property("timestamp", ascending=not newest_first),
+                return_properties=properties if not source else list(dict.fromkeys(properties + ["source"]))
+            )
+            for obj in result.objects:
+                if source and obj.properties.get('source') != source:
+                    continue  # Matched a word of another source only
+                alert = {key: value for key, value in obj.properties.items() if key in properties}
+                alert['id'] = str(obj.uuid)
+                if isinstance(alert.get('timestamp'), datetime):
+                    alert['timestamp'] = alert['timestamp'].isoformat()
+                alerts.append(alert)
+                if len(alerts) == limit:
+                    return alerts
+            offset += limit
+            # Without a source every object matched; otherwise page on while other sources crowd the page
+            if not source or len(result.objects) < limit or offset + limit > WINDOW_FETCH_LIMIT:
+                return alerts
+    
+    def count_alert_window(self, start: datetime, end: Optional[datetime] = None, source: Optional[str] = None,
+                           group_by: Optional[str] = None):
+        """
+        Count alerts in a time window with a single aggregate query.
+        
+        Args:
+            start: Window start (inclusive)
+            end: Window end (inclusive), or None for open-ended
+            source: Only alerts from this source (container name)
+            group_by: Property to group the counts by
+            
+        Returns:
+            Total count, or a dict of property value -> count when grouped
+        """
+        collection = self._collection("SecurityAlert")
+        where = self._alert_window_filter(start, end, source)
+        if source:
+            # Grouping by the full source value shows whether the word-tokenized filter matched other sources
+            by_source = self._group_counts(collection, where, "source")
+            if any(value != source for value in by_source):
+                return self._count_exact_source(collection, where, source, group_by)
+            if group_by is None:
+                return by_source.get(source, 0)
+        if group_by is None:
+            result = collection.aggregate.over_all(filters=where, total_count=True)
+            return result.total_count or 0
+        return self._group_counts(collection, where, group_by)
+    
+    @staticmethod
+    def _group_counts(collection, where, prop: str) -> Dict[Any, int]:
+        """Counts per value of ``prop`` among the objects matching ``where`` (at most WINDOW_GROUP_LIMIT values)."""
+        result = collection.aggregate.over_all(
+            filters=where, total_count=True,
+            group_by=wvc.aggregate.GroupByAggregate(prop=prop, limit=WINDOW_GROUP_LIMIT)
+        )
+        return {group.grouped_by.value: group.total_count or 0 for group in result.groups}
+    
+    @staticmethod
+    def _count_exact_source(collection, where, source: str, group_by: Optional[str]):
+        """Count the objects of exactly ``source`` client-side (at most WINDOW_FETCH_LIMIT are read)."""
+        properties = list(dict.fromkeys(["source"] + ([group_by] if group_by else [])))
+        counts: Counter = Counter()
+        offset = 0
+        while offset < WINDOW_FETCH_LIMIT:
+            page = min(1000, WINDOW_FETCH_LIMIT - offset)
+            result = collection.query.fetch_objects(limit=page, offset=offset, filters=where,
+                                                    return_properties=properties)
+            for obj in result.objects:
+                if obj.properties.get('source') == source:
+                    counts[obj.properties.get(group_by) if group_by else None] += 1
+            if len(result.objects) < page:
+                break
+            offset += page
+        else:
+            logger.debug(f"Window count for source '{source}' stopped after {WINDOW_FETCH_LIMIT} objects")
+        return dict(counts) if group_by else counts[None]
+    
     def _keyword_search(self, keywords: List[str], limit: int, filters: Dict) -> List[Dict]:
-        """Perform keyword-based search."""
+        """Perform keyword-based search (BM25 with the filters applied by Weaviate)."""
         if not keywords:
             return []
         
         try:
-            collection = self.client.collections.get("SecurityAlert")
-            
-            # Build filter for keywords
-            keyword_filters = []
-            for keyword in keywords[:3]:  # Limit to 3 keywords
-                keyword_filters.extend([
-                    wvc.query.Filter.by_property("rule").like(f"*{keyword}*"),
-                    wvc.query.Filter.by_property("output").like(f"*{keyword}*")
-                ])
-            
-            combined_filter = keyword_filters[0]
-            for f in keyword_filters[1:]:
-                combined_filter = combined_filter | f
-            
-            result = collection.query.fetch_objects(
+            collection = self._collection("SecurityAlert")
+            result = collection.query.bm25(
+                query=" ".join(keywords),
+                query_properties=ALERT_SEARCH_PROPERTIES,
                 limit=limit,
+                filters=self._alert_filters(filters),
+                return_metadata=wvc.query.MetadataQuery(score=True),
                 return_properties=["rule", "priority", "output", "source", "timestamp"]
             )
             
-            # Apply keyword filtering after retrieval
-            filtered_objects = []
+            exact = self._exact_filter_values(filters)
+            results = []
             for obj in result.objects:
-                properties = obj.properties
-                text_content = f"{properties.get('rule', '')} {properties.get('output', '')}".lower()
-                
-                # Check if any keywords match
-                if any(keyword in text_content for keyword in keywords):
-                    filtered_objects.append(obj)
-            
-            # Create result object for compatibility
-            class MockResult:
-                def __init__(self, objects):
-                    self.objects = objects
-            result = MockResult(filtered_objects)
-            
-            return [dict(obj.properties) for obj in result.objects]
+                if any(obj.properties.get(field) != value for field, value in exact.items()):
+                    continue  # Matched only some words of the rule or source filter
+                alert_dict = dict(obj.properties)
+                alert_dict["_additional"] = {
+                    "id": str(obj.uuid),
+                    "score": obj.metadata.score if obj.metadata else None
+                }
+                results.append(alert_dict)
+            return results
             
         except Exception as e:
             logger.warning(f"Keyword search failed: {e}")
@@ -2302,7 +2339,7 @@ class WeaviateService:
         }
     
     def _identify_attack_phases(self, chain_alerts: List[Dict]) -> List[Dict[str, Any]]:
-        """Identify attack phases from alert chain."""
+        """Identify attack phases from alert chain (correlation sequence steps first, then rule keywords)."""
         phases = []
         
         if not chain_alerts:
@@ -2324,15 +2361,17 @@ class WeaviateService:
             'exfiltration': ['copy', 'transfer', 'upload']
         }
         
+        correlation = get_correlation_engine()
         for rule, alerts in rule_groups.items():
             rule_lower = rule.lower()
             
             # Determine phase
-            detected_phase = "unknown"
+            detected_phase = correlation.rule_phase(rule) or "unknown"
             for phase, keywords in phase_mapping.items():
+                if detected_phase != "unknown":
+                    break
                 if any(keyword in rule_lower for keyword in keywords):
                     detected_phase = phase
-                    break
             
             phases.append({
                 "phase": detected_phase,
@@ -2343,27 +2382,19 @@ class WeaviateService:
         
         return phases
     
-    def _calculate_behavioral_score(self, historical_alerts: List[Dict], current_alert: Dict) -> float:
-        """Calculate behavioral anomaly score."""
-        if not historical_alerts:
-            return 5.0  # Neutral score for no history
-        
-        # Check if current alert rule is common for this source
-        historical_rules = [alert['rule'] for alert in historical_alerts]
-        rule_frequency = Counter(historical_rules)
-        
-        current_rule = current_alert.get('rule', '')
-        current_rule_count = rule_frequency.get(current_rule, 0)
-        
-        # Calculate anomaly score
-        if current_rule_count == 0:
-            return 8.0  # High anomaly - never seen before
-        elif current_rule_count < 3:
-            return 6.5  # Medium anomaly - rare
-        elif current_rule_count < 10:
-            return 4.0  # Low anomaly - uncommon
-        else:
-            return 2.0  # Normal - common pattern
+    def _behavioral_anomaly(self, alert_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Behavioral anomaly of an alert: the score recorded when it was ingested (the baselines
+        already include it), or a read-only score for alerts that were never ingested.
+        """
+        anomaly = alert_data.get('anomaly')
+        if isinstance(anomaly, dict) and 'anomaly_score' in anomaly:
+            return anomaly
+        return get_behavior_baselines().score(alert_data)
+
+    def _calculate_behavioral_score(self, current_alert: Dict) -> float:
+        """Behavioral anomaly score (0-10) of the alert for its workload, from the streaming baselines."""
+        return self._behavioral_anomaly(current_alert)['anomaly_score']
     
     def _get_impact_level(self, impact_score: float) -> str:
         """Convert impact score to level description."""
@@ -2389,8 +2420,55 @@ class WeaviateService:
         else:
             return "low"
     
-    def _generate_simple_attack_chain(self, rule: str, threat_category: str) -> List[Dict[str, Any]]:
-        """Generate a simple attack chain based on rule and threat category."""
+    def _correlated_attack_chain(self, alert_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Observed and next steps of the furthest correlation sequence in progress for the alert's container or pod."""
+        try:
+            chain = get_correlation_engine().chain(alert_data)
+        except Exception as e:
+            logger.warning(f"Failed to read correlation state: {e}")
+            return []
+        
+        incidents = [incident for scope in chain['scopes'].values() for incident in scope['incidents']]
+        if incidents:
+            incident = incidents[0]
+            phases = incident.get('phases') or incident['steps']
+            return [{
+                "phase": phase,
+                "description": f"Correlated incident {incident['id']}: {step}",
+                "sequence": incident['sequence'],
+                "likelihood": 1.0
+            } for step, phase in zip(incident['steps'], phases)]
+        
+        in_progress = sorted((sequence for scope in chain['scopes'].values() for sequence in scope['in_progress']),
+                             key=lambda sequence: -sequence['progress'])
+        if not in_progress:
+            return []
+        sequence = in_progress[0]
+        steps = [{
+            "phase": step['phase'],
+            "description": f"Observed: {step['rule']}",
+            "sequence": sequence['sequence'],
+            "alert_id": step['alert_id'],
+            "timestamp": step['timestamp'],
+            "likelihood": 1.0
+        } for step in sequence['steps_seen']]
+        steps.append({
+            "phase": sequence['next_phase'],
+            "description": f"Next step of {sequence['sequence']}: {sequence['next_step']}",
+            "sequence": sequence['sequence'],
+            "expires_in_seconds": sequence['expires_in_seconds'],
+            "likelihood": sequence['progress']
+        })
+        return steps
+    
+    def _generate_simple_attack_chain(self, rule: str, threat_category: str,
+                                      alert_data: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Attack chain from the correlation engine's state for the alert, else a template based on rule and threat category."""
+        if alert_data is not None:
+            correlated = self._correlated_attack_chain(alert_data)
+            if correlated:
+                return correlated
+        
         chain = []
         
         # Current phase
@@ -2460,26 +2538,22 @@ class WeaviateService:
             
             if self.client.is_ready():
                 # Check if collections exist
-                alerts_exists = self.client.collections.exists("SecurityAlert")
-                conversations_exists = self.client.collections.exists("ConversationContext")
+                alerts_exists = self._collection_exists("SecurityAlert")
+                conversations_exists = self._collection_exists("ConversationContext")
                 
-                # Get basic stats using v4 API
+                # Get basic stats using v4 API (cached for a few seconds, health checks poll often)
                 alert_count = 0
                 conversation_count = 0
                 
                 if alerts_exists:
                     try:
-                        collection = self.client.collections.get("SecurityAlert")
-                        result = collection.aggregate.over_all(total_count=True)
-                        alert_count = result.total_count if result.total_count else 0
+                        alert_count = self._total_count("SecurityAlert")
                     except Exception as e:
                         logger.warning(f"Could not get alert count: {e}")
                 
                 if conversations_exists:
                     try:
-                        collection = self.client.collections.get("ConversationContext")
-                        result = collection.aggregate.over_all(total_count=True)
-                        conversation_count = result.total_count if result.total_count else 0
+                        conversation_count = self._total_count("ConversationContext")
                     except Exception as e:
                         logger.warning(f"Could not get conversation count: {e}")
                 
@@ -2497,9 +2571,14 @@ class WeaviateService:
         except Exception as e:
             return {"status": "error", "error": str(e)}
 
-# Global instance
-weaviate_service = WeaviateService()
+# Global instance, created on first use
+weaviate_service = None
 
 def get_weaviate_service() -> WeaviateService:
     """Get the global Weaviate service instance."""
+    global weaviate_service
+    if weaviate_service is None:
+        weaviate_service = WeaviateService()
+        # The provider decides whether queries can be embedded, so its changes reset the cached capability
+        get_config_service().subscribe(weaviate_service._on_config_published)
     return weaviate_service 
\ No newline at end of file
@@ -0,0 +1,299 @@
+"""
+Weaviate Writer Service for Falco Vanguard
+
+Takes vector-store writes off the webhook path. Alerts are appended to a
+bounded in-memory buffer and a background worker writes them to Weaviate
+with the client batch API:
+
+- a batch is flushed when it is full or when the oldest buffered alert has
+  waited WEAVIATE_FLUSH_INTERVAL_SECONDS,
+- objects the batch reports as failed are retried with exponential backoff
+  (WEAVIATE_WRITE_MAX_RETRIES) and then dropped with an error log,
+- while Weaviate is not connected alerts stay buffered,
+- when the buffer is full the oldest alert is dropped, so submitting never
+  blocks; drops and the buffer high-water mark are reported as backpressure
+  metrics.
+
+SQLite stays the system of record; Weaviate is an index that may lag by a
+flush interval.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WeaviateBatchWriter:
+    """Buffers alerts and writes them to Weaviate in batches from a worker thread."""
+
+    def __init__(self, service_getter: Callable[[], Any], max_buffer: Optional[int] = None,
+                 batch_size: Optional[int] = None, flush_interval: Optional[float] = None,
+                 max_retries: Optional[int] = None, mode: Optional[str] = None):
+        """
+        Initialize the writer.
+
+        Args:
+            service_getter: Returns the WeaviateService (or None if unavailable); called from the worker
+            max_buffer: Buffered alerts before the oldest is dropped (WEAVIATE_WRITE_BUFFER_SIZE)
+            batch_size: Objects per batch (WEAVIATE_BATCH_SIZE)
+            flush_interval: Longest time an alert waits for a batch to fill (WEAVIATE_FLUSH_INTERVAL_SECONDS)
+            max_retries: Retries for objects a batch reports as failed (WEAVIATE_WRITE_MAX_RETRIES)
+            mode: 'fixed' or 'dynamic' client batching (WEAVIATE_BATCH_MODE)
+        """
+        self.service_getter = service_getter
+        self.max_buffer = max_buffer or int(os.getenv('WEAVIATE_WRITE_BUFFER_SIZE', '5000'))
+        self.batch_size = batch_size or int(os.getenv('WEAVIATE_BATCH_SIZE', '100'))
+        self.flush_interval = flush_interval if flush_interval is not None else \
+            float(os.getenv('WEAVIATE_FLUSH_INTERVAL_SECONDS', '1.0'))
+        self.max_retries = max_retries if max_retries is not None else \
+            int(os.getenv('WEAVIATE_WRITE_MAX_RETRIES', '3'))
+        self.mode = mode or os.getenv('WEAVIATE_BATCH_MODE', 'fixed')
+
+        self._buffer: deque = deque()
+        self._cond = threading.Condition()
+        self._retry_at = 0.0
+        self._in_flight = 0
+        self._started_pid: Optional[int] = None
+        # Hashes of recently written alerts, to skip duplicates without even the by-ID lookup
+        self._recent_hashes: OrderedDict = OrderedDict()
+        self._recent_limit = 10000
+        self._counters = {'submitted': 0, 'written': 0, 'duplicates': 0, 'retried': 0, 'failed': 0,
+                          'dropped_overflow': 0, 'batches': 0, 'not_connected': 0}
+        self._high_water = 0
+        self._last_flush: Dict[str, Any] = {}
+        self._last_error: Optional[str] = None
+
+    def submit(self, alert_data: Dict[str, Any], ai_analysis: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Queue an alert for writing. Never blocks.
+
+        Returns:
+            False if the buffer was full and the oldest alert had to be dropped
+        """
+        self.start()
+        item = {'alert': alert_data, 'ai_analysis': ai_analysis, 'attempts': 0, 'queued_at': time.time()}
+        with self._cond:
+            accepted = True
+            if len(self._buffer) >= self.max_buffer:
+                self._buffer.popleft()
+                self._counters['dropped_overflow'] += 1
+                accepted = False
+            self._buffer.append(item)
+            self._counters['submitted'] += 1
+            self._high_water = max(self._high_water, len(self._buffer))
+            dropped = self._counters['dropped_overflow']
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify()
+        if not accepted and dropped % 100 == 1:
+            logger.warning(f"⚠️ WEAVIATE_WRITER: Buffer full ({self.max_buffer}), dropping oldest alerts "
+                           f"({dropped} so far)")
+        return accepted
+
+    def start(self) -> None:
+        """Start the worker thread (idempotent per process)."""
+        if self._started_pid == os.getpid():
+            return
+        with self._cond:
+            if self._started_pid != os.getpid():
+                self._started_pid = os.getpid()
+                threading.Thread(target=self._run, name='weaviate-writer', daemon=True).start()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """
+        Wait until everything buffered has been written (or given up on).
+
+        Returns:
+            True if the buffer drained within the timeout
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            self._retry_at = 0.0
+            self._cond.notify()
+            while self._buffer or self._in_flight:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(min(remaining, 0.1))
+        return True
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get buffer, backpressure and write statistics."""
+        with self._cond:
+            depth = len(self._buffer)
+            oldest = self._buffer[0]['queued_at'] if self._buffer else None
+            counters = dict(self._counters)
+            high_water = self._high_water
+            last_flush = dict(self._last_flush)
+            last_error = self._last_error
+        return {
+            'buffer_depth': depth,
+            'buffer_capacity': self.max_buffer,
+            'buffer_high_water': high_water,
+            'oldest_queued_seconds': round(time.time() - oldest, 2) if oldest else 0,
+            'batch_size': self.batch_size,
+            'flush_interval_seconds': self.flush_interval,
+            'mode': self.mode,
+            'counters': counters,
+            'last_flush': last_flush,
+            'last_error': last_error
+        }
+
+    # --- Worker ---
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            try:
+                self._write(batch)
+            except Exception as e:
+                with self._cond:
+                    self._last_error = str(e)
+                logger.error(f"❌ WEAVIATE_WRITER: Batch write failed: {e}")
+                self._requeue(batch, backoff=True)
+            finally:
+                with self._cond:
+                    self._in_flight = 0
+                    self._cond.notify_all()
+
+    def _next_batch(self) -> List[Dict[str, Any]]:
+        """Block until a full batch is buffered or the oldest alert's flush interval is up."""
+        with self._cond:
+            while True:
+                now = time.time()
+                if self._buffer and now >= self._retry_at:
+                    due_at = self._buffer[0]['queued_at'] + self.flush_interval
+                    if len(self._buffer) >= self.batch_size or now >= due_at:
+                        batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                        self._in_flight = len(batch)
+                        return batch
+                    wait = due_at - now
+                elif self._buffer:
+                    wait = self._retry_at - now
+                else:
+                    wait = None
+                self._cond.wait(wait)
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        service = self.service_getter()
+        if service is None or not service.client:
+            # Keep alerts until Weaviate is up (init_weaviate retries the connection)
+            with self._cond:
+                self._counters['not_connected'] += 1
+            self._requeue(batch, backoff=True, count_attempt=False)
+            return
+
+        started = time.time()
+        for item in batch:
+            if not item.get('properties'):
+                item['properties'] = service.build_alert_properties(item['alert'], item['ai_analysis'])
+        properties_list = []
+        items = []
+        batch_hashes = set()
+        with self._cond:
+            for item in batch:
+                alert_hash = item['properties'].get('alertHash')
+                if alert_hash in self._recent_hashes:
+                    self._recent_hashes.move_to_end(alert_hash)
+                    self._counters['duplicates'] += 1
+                    continue
+                # Later duplicates in the same batch are skipped as well
+                if alert_hash in batch_hashes:
+                    self._counters['duplicates'] += 1
+                    continue
+                if alert_hash:
+                    batch_hashes.add(alert_hash)
+                properties_list.append(item['properties'])
+                items.append(item)
+        if not items:
+            return
+
+        # Hashes are only remembered once the write succeeded, so a failed batch is retried in full
+        result = service.store_alerts_batch(properties_list, batch_size=self.batch_size, mode=self.mode)
+        errors = result.get('errors', {})
+        failed = []
+        for index, item in enumerate(items):
+            if index in errors:
+                item['last_error'] = errors[index]
+                failed.append(item)
+        existing = len(result.get('existing', ()))
+        written = len(items) - len(failed) - existing
+
+        with self._cond:
+            for index, item in enumerate(items):
+                if index not in errors:
+                    self._remember(item['properties'].get('alertHash'))
+            self._counters['batches'] += 1
+            self._counters['written'] += written
+            self._counters['duplicates'] += existing
+            self._last_flush = {
+                'at': started,
+                'objects': len(items),
+                'failed': len(failed),
+                'duration_ms': round((time.time() - started) * 1000, 1),
+                'max_queue_delay_ms': round((started - min(item['queued_at'] for item in items)) * 1000, 1)
+            }
+            if failed:
+                self._last_error = failed[0]['last_error']
+        logger.debug(f"📦 WEAVIATE_WRITER: Wrote {written}/{len(items)} alerts in "
+                     f"{self._last_flush['duration_ms']}ms")
+        if failed:
+            self._requeue(failed, backoff=True)
+
+    def _requeue(self, items: List[Dict[str, Any]], backoff: bool, count_attempt: bool = True) -> None:
+        retry = []
+        with self._cond:
+            for item in items:
+                if count_attempt:
+                    item['attempts'] += 1
+                    if item['attempts'] > self.max_retries:
+                        self._counters['failed'] += 1
+                        logger.error(f"❌ WEAVIATE_WRITER: Giving up on alert '{item['alert'].get('rule', 'Unknown')}' "
+                                     f"after {self.max_retries} retries: {item.get('last_error', self._last_error)}")
+                        continue
+                    self._counters['retried'] += 1
+                retry.append(item)
+            if not retry:
+                return
+            attempts = max(item['attempts'] for item in retry)
+            # Retries go back to the front, ahead of newer alerts
+            self._buffer.extendleft(reversed(retry))
+            while len(self._buffer) > self.max_buffer:
+                self._buffer.pop()
+                self._counters['dropped_overflow'] += 1
+            if backoff:
+                self._retry_at = time.time() + min(2 ** attempts, 30)
+
+    def _remember(self, alert_hash: Optional[str]) -> None:
+        """Record a written alert's hash (caller holds ``_cond``)."""
+        if not alert_hash:
+            return
+        self._recent_hashes[alert_hash] = True
+        if len(self._recent_hashes) > self._recent_limit:
+            self._recent_hashes.popitem(last=False)
+
+
+# Global instance, created on first use
+weaviate_writer = None
+_weaviate_writer_lock = threading.Lock()
+
+def get_weaviate_writer(service_getter: Optional[Callable[[], Any]] = None) -> WeaviateBatchWriter:
+    """
+    Get the global Weaviate batch writer.
+
+    Args:
+        service_getter: Returns the WeaviateService; only used when the writer is created
+    """
+    global weaviate_writer
+    if weaviate_writer is None:
+        with _weaviate_writer_lock:
+            if weaviate_writer is None:
+                if service_getter is None:
+                    from weaviate_service import get_weaviate_service
+                    service_getter = get_weaviate_service
+                weaviate_writer = WeaviateBatchWriter(service_getter)
+    return weaviate_writer